@@ -1,16 +1,94 @@
-from flask import Flask, render_template, request, jsonify, send_from_directory
+from flask import Flask, Response, render_template, request, jsonify, send_from_directory
 from flask_cors import CORS
-from playwright.sync_api import sync_playwright
 import time
 import os
+import json
+import threading
 from urllib.parse import urlparse
 import traceback
+import statistics
+from concurrent.futures import ThreadPoolExecutor
+import requests
+
+from browser_pool import get_pool, current_pool, current_async_pool, PoolBusyError
+from jobs import JobManager, JobQueueFull
+from batch import parse_url_list, run_batch
+from crawl import RobotsPolicy, fetch_robots, run_crawl
+from collector import collect_page_data, install_vitals
+from network import NetworkRecorder, resource_counts
+from settle import SettleTracker, SETTLE_PROFILES, DEFAULT_SETTLE
+from cache import ResultCache, CacheMiss, CACHE_MODES, cache_key
+from screenshots import ScreenshotStore, parse_screenshot_option
+from rules import RULE_PROFILES, DEFAULT_PROFILE, build_raw_metrics, check_raw_metrics, evaluate
+from history import HistoryStore, METRICS as HISTORY_METRICS
+from blocking import NAVIGATION_PROFILES, DEFAULT_NAVIGATION, RequestBlocker, parse_block_patterns
+from static import ENGINE_MODES, DEFAULT_ENGINE, NotHtmlError, collect_static
+from archive import ARCHIVE_MODES, ArchiveStore, ArchiveNotFound, ReplayRouter
+from code_coverage import CoverageRecorder
+from thirdparty import summarize_third_parties
+from monitor import BreachStore, MonitorScheduler, load_config as load_monitor_config
+from devices import (DEVICE_PROFILES, DEFAULT_DEVICE, parse_devices, device_context_options, throttle_page,
+                     device_phases, combine_devices)
+from telemetry import REGISTRY, PHASE_SECONDS, ORIGIN_WAIT_SECONDS, Timings, ANALYSES_IN_FLIGHT, ANALYSES_TOTAL, ANALYSIS_SECONDS, ERRORS_TOTAL
+from sampling import SAMPLE_MODES, MAX_RUNS, run_samples, aggregate, summarize
+from flight import SingleFlight, OriginLimiter
+from urls import normalize_url, origin_of
+from payload import (parse_fields, parse_limit, wants, collector_sections, shape, list_page, decode_cursor,
+                     negotiate_encoding, compress, COMPRESS_MIN_BYTES, COMPRESSIBLE_TYPES)
 
 app = Flask(__name__)
 CORS(app)
 
-# Create screenshots directory if it doesn't exist
-os.makedirs('static/screenshots', exist_ok=True)
+# Screenshots are content-addressed and pruned by size/age
+screenshot_store = ScreenshotStore(
+    directory='static/screenshots',
+    max_bytes=int(float(os.environ.get('ANALYZER_SCREENSHOT_MAX_MB', 200)) * 1024 * 1024),
+    max_age=float(os.environ.get('ANALYZER_SCREENSHOT_MAX_AGE', 7 * 86400))
+)
+
+result_cache = ResultCache(
+    ttl=float(os.environ.get('ANALYZER_CACHE_TTL', 300)),
+    max_entries=int(os.environ.get('ANALYZER_CACHE_MAX_ENTRIES', 500)),
+    max_bytes=int(float(os.environ.get('ANALYZER_CACHE_MAX_MB', 64)) * 1024 * 1024),
+    max_stale=float(os.environ.get('ANALYZER_CACHE_MAX_STALE', 86400)),
+    db_path=os.environ.get('ANALYZER_CACHE_DB'),
+    db_max_entries=int(os.environ.get('ANALYZER_CACHE_DB_MAX_ENTRIES', 5000)),
+    db_max_bytes=int(float(os.environ.get('ANALYZER_CACHE_DB_MAX_MB', 256)) * 1024 * 1024)
+)
+CACHE_DEFAULT = os.environ.get('ANALYZER_CACHE_DEFAULT', 'prefer')
+
+# Concurrent identical requests share one analysis; each origin gets a few navigations at a time
+flights = SingleFlight()
+origin_limiter = OriginLimiter(
+    limit=int(os.environ.get('ANALYZER_ORIGIN_CONCURRENCY', 2)),
+    timeout=float(os.environ.get('ANALYZER_ORIGIN_WAIT_TIMEOUT', 120))
+)
+
+# Recorded navigations (options.archive) for offline replay, opened by the first record or replay
+ARCHIVE_DIR = os.environ.get('ANALYZER_ARCHIVE_DIR', 'archives')
+_archive_store = None
+_archive_store_lock = threading.Lock()
+
+# Every fresh result's numbers are kept for trend queries; set to '' to disable. The file is only
+# created by the first recorded analysis: the CLI tools import the app
+HISTORY_DB = os.environ.get('ANALYZER_HISTORY_DB', 'history.db')
+history_store = HistoryStore(HISTORY_DB) if HISTORY_DB else None
+
+# The in-process scheduler only starts when a config is given (see the end of this file)
+MONITOR_CONFIG = os.environ.get('ANALYZER_MONITOR_CONFIG')
+monitor_scheduler = None
+# Budget breaches of monitoring runs, also written by `python monitor.py run`. Only opened when
+# monitoring is configured: the CLI tools import the app and must not create the file
+MONITOR_DB = os.environ.get('ANALYZER_MONITOR_DB', 'monitor.db' if MONITOR_CONFIG else '')
+breach_store = BreachStore(MONITOR_DB) if MONITOR_DB else None
+
+# Upper bound on concurrent analyses for a single /api/batch request
+BATCH_MAX_WORKERS = int(os.environ.get('ANALYZER_BATCH_MAX_WORKERS', os.environ.get('ANALYZER_POOL_SIZE', 2)))
+
+# Limits for crawls started over the API
+CRAWL_MAX_PAGES = int(os.environ.get('ANALYZER_CRAWL_MAX_PAGES', 1000))
+CRAWL_MIN_DELAY = float(os.environ.get('ANALYZER_CRAWL_MIN_DELAY', 0.5))
+
 CORS(app, 
     resources={
         r"/api/*": {
@@ -20,6 +98,23 @@ CORS(app,
         }
     }
 )
+@app.after_request
+def compress_response(response):
+    """gzip or brotli for sizeable JSON/text bodies; streams are left alone"""
+    if (response.direct_passthrough or response.is_streamed or response.status_code < 200
+            or 'Content-Encoding' in response.headers or response.mimetype not in COMPRESSIBLE_TYPES):
+        return response
+    encoding = negotiate_encoding(request.accept_encodings)
+    if encoding is None:
+        return response
+    body = response.get_data()
+    if len(body) < COMPRESS_MIN_BYTES:
+        return response
+    response.set_data(compress(body, encoding))
+    response.headers['Content-Encoding'] = encoding
+    response.vary.add('Accept-Encoding')
+    return response
+
 @app.route('/')
 def index():
     return render_template('index.html')
@@ -30,676 +125,953 @@ def analyze_website():
         data = request.get_json()
         url = data.get('url')
         
-        if not url:
-            return jsonify({'error': 'URL is required'}), 400
+        error = validate_url(url)
+        if error:
+            return jsonify({'error': error}), 400
         
-        # Validate URL
         try:
-            parsed = urlparse(url)
-            if not parsed.scheme or not parsed.netloc:
-                return jsonify({'error': 'Invalid URL format'}), 400
-        except Exception:
-            return jsonify({'error': 'Invalid URL'}), 400
+            options = parse_options(data)
+            limit = parse_limit(data.get('limit'))
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
         
-        results = run_analysis(url)
-        return jsonify(results)
+        results = analyze_cached(url, options)
+        started = time.perf_counter()
+        response = jsonify(shape_result(url, results, options, limit))
+        PHASE_SECONDS.observe(time.perf_counter() - started, phase='serialize')
+        return response
         
+    except CacheMiss as e:
+        return jsonify({'error': str(e)}), 504
+    except ArchiveNotFound as e:
+        return jsonify({'error': str(e)}), 404
+    except PoolBusyError as e:
+        return jsonify({'error': f'Analyzer busy: {str(e)}'}), 503, {'Retry-After': '5'}
     except Exception as e:
         print(f"Error: {str(e)}")
         print(traceback.format_exc())
         return jsonify({'error': f'Analysis failed: {str(e)}'}), 500
 
-def run_analysis(url):
-    """Main analysis function using Playwright"""
+@app.route('/api/jobs', methods=['POST'])
+def submit_job():
+    data = request.get_json(silent=True) or {}
+    url = data.get('url')
+    error = validate_url(url)
+    if error:
+        return jsonify({'error': error}), 400
     
-    with sync_playwright() as p:
-        browser = p.chromium.launch(headless=True)
-        page = browser.new_page()
-        
-        metrics = {}
-        issues = []
-        detailed_breakdown = {
-            'performance': [],
-            'seo': [],
-            'accessibility': [],
-            'bestPractices': []
-        }
-        
-        # Navigation timing
-        start_time = time.time()
-        
+    try:
+        options = parse_options(data)
+        limit = parse_limit(data.get('limit'))
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    
+    try:
+        job = job_manager.submit(url, options, limit)
+    except JobQueueFull as e:
+        return jsonify({'error': f'Job queue full: {str(e)}'}), 503, {'Retry-After': '5'}
+    
+    return jsonify({
+        'id': job['id'],
+        'status': job['status'],
+        'statusUrl': f"/api/jobs/{job['id']}",
+        'eventsUrl': f"/api/jobs/{job['id']}/events"
+    }), 202
+
+@app.route('/api/jobs/<job_id>', methods=['GET'])
+def get_job(job_id):
+    job = job_manager.get(job_id)
+    if job is None:
+        return jsonify({'error': 'Job not found'}), 404
+    return jsonify(job)
+
+@app.route('/api/jobs/<job_id>/events', methods=['GET'])
+def stream_job(job_id):
+    if job_manager.get(job_id) is None:
+        return jsonify({'error': 'Job not found'}), 404
+    
+    def generate():
+        for event in job_manager.stream(job_id):
+            if event is None:
+                yield ': keepalive\n\n'
+                continue
+            name, data = event
+            yield f"event: {name}\ndata: {json.dumps(data)}\n\n"
+    
+    return Response(generate(), mimetype='text/event-stream',
+                    headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
+@app.route('/api/batch', methods=['POST'])
+def analyze_batch():
+    """Analyze a list of URLs, streaming NDJSON records as each one finishes"""
+    data = request.get_json(silent=True)
+    try:
+        if isinstance(data, dict):
+            urls = data.get('urls') or []
+            workers = data.get('workers')
+            options = parse_options(data)
+            limit = parse_limit(data.get('limit'))
+        elif isinstance(data, list):
+            urls, workers = data, None
+            options = parse_options({})
+            limit = parse_limit(None)
+        else:
+            urls = parse_url_list(request.get_data(as_text=True))
+            workers = request.args.get('workers')
+            options = parse_options(query_options(request.args))
+            limit = parse_limit(request.args.get('limit'))
+        if not isinstance(urls, list) or not all(isinstance(url, str) for url in urls):
+            raise ValueError('urls must be a list of strings')
+        workers = int(workers or BATCH_MAX_WORKERS)
+    except ValueError as e:
+        return jsonify({'error': f'Invalid batch request: {str(e)}'}), 400
+    
+    if not urls:
+        return jsonify({'error': 'At least one URL is required'}), 400
+    workers = max(1, min(workers, BATCH_MAX_WORKERS))
+    
+    def generate():
+        runner = lambda batch_url: analyze_cached(batch_url, options)
+        for record in run_batch(urls, runner, workers=workers, validate=validate_url):
+            # Same projection and list windows as /api/analyze
+            if 'result' in record:
+                record['result'] = shape_result(record['url'], record['result'], options, limit)
+            yield json.dumps(record) + '\n'
+    
+    return Response(generate(), mimetype='application/x-ndjson',
+                    headers={'X-Accel-Buffering': 'no'})
+
+@app.route('/api/crawl', methods=['POST'])
+def crawl_site():
+    """Crawl the seed URL's site, streaming one NDJSON record per page and a site summary"""
+    data = request.get_json(silent=True) or {}
+    url = data.get('url')
+    error = validate_url(url)
+    if error:
+        return jsonify({'error': error}), 400
+    try:
+        options = parse_options(data)
+        max_pages = int(data.get('maxPages') or 100)
+        max_depth = int(data.get('maxDepth') if data.get('maxDepth') is not None else 10)
+        workers = int(data.get('workers') or BATCH_MAX_WORKERS)
+        delay = float(data.get('delay') if data.get('delay') is not None else 1.0)
+    except (TypeError, ValueError) as e:
+        return jsonify({'error': f'Invalid crawl request: {str(e)}'}), 400
+    if not 1 <= max_pages <= CRAWL_MAX_PAGES:
+        return jsonify({'error': f'maxPages must be between 1 and {CRAWL_MAX_PAGES}'}), 400
+    if isinstance(options['device'], list):
+        return jsonify({'error': 'Invalid crawl request: a crawl runs on a single device'}), 400
+    options['links'] = True
+    workers = max(1, min(workers, BATCH_MAX_WORKERS))
+    robots = None if data.get('ignoreRobots') else RobotsPolicy(fetch_robots)
+    
+    def generate():
+        runner = lambda page_url: analyze_cached(page_url, options)
+        for record in run_crawl(url, runner, max_pages=max_pages, max_depth=max_depth, workers=workers,
+                                delay=max(delay, CRAWL_MIN_DELAY), robots=robots):
+            yield json.dumps(record) + '\n'
+    
+    return Response(generate(), mimetype='application/x-ndjson',
+                    headers={'X-Accel-Buffering': 'no'})
+
+@app.route('/api/rescore', methods=['POST'])
+def rescore():
+    """Re-score stored rawMetrics under a rule profile and device thresholds without running a browser"""
+    data = request.get_json(silent=True) or {}
+    profile = data.get('profile') or DEFAULT_PROFILE
+    if profile not in RULE_PROFILES:
+        return jsonify({'error': f"profile must be one of: {', '.join(RULE_PROFILES)}"}), 400
+    device = data.get('device') or DEFAULT_DEVICE
+    if device not in DEVICE_PROFILES:
+        return jsonify({'error': f"device must be one of: {', '.join(DEVICE_PROFILES)}"}), 400
+    
+    raw = data.get('rawMetrics')
+    batch = isinstance(raw, list)
+    payloads = raw if batch else [raw]
+    if not payloads or not all(isinstance(item, dict) for item in payloads):
+        return jsonify({'error': 'rawMetrics must be an object or a list of objects'}), 400
+    
+    # A bad payload in a batch gets an error entry; the others are still scored
+    results = []
+    for item in payloads:
         try:
-            response = page.goto(url, wait_until='domcontentloaded', timeout=30000)
-            load_time = time.time() - start_time
-            
-            # Wait for page to settle
-            page.wait_for_timeout(2000)
-            
-            # Take screenshot
-            try:
-                screenshot_path = f"static/screenshots/screenshot_{int(time.time())}.png"
-                page.screenshot(path=screenshot_path, full_page=False)
-                screenshot_url = f"/{screenshot_path}"
-            except Exception as e:
-                print(f"Screenshot error: {e}")
-                screenshot_url = None
-            
-            # Get page title and description for confirmation
-            try:
-                page_info = page.evaluate("""() => {
-                    return {
-                        title: document.title,
-                        description: document.querySelector('meta[name="description"]')?.content || '',
-                        favicon: document.querySelector('link[rel*="icon"]')?.href || '',
-                        h1: document.querySelector('h1')?.textContent?.trim() || 'No H1 found'
-                    };
-                }""")
-            except:
-                page_info = {
-                    'title': 'Could not extract',
-                    'description': 'Could not extract',
-                    'favicon': '',
-                    'h1': 'Could not extract'
-                }
-            
-            # Get performance metrics
-            try:
-                performance_metrics = page.evaluate("""() => {
-                    const perfData = window.performance.timing;
-                    const paint = performance.getEntriesByType('paint');
-                    
-                    return {
-                        dns: perfData.domainLookupEnd - perfData.domainLookupStart,
-                        tcp: perfData.connectEnd - perfData.connectStart,
-                        ttfb: perfData.responseStart - perfData.requestStart,
-                        domLoad: perfData.domContentLoadedEventEnd - perfData.navigationStart,
-                        pageLoad: perfData.loadEventEnd - perfData.navigationStart,
-                        fcp: paint.find(p => p.name === 'first-contentful-paint')?.startTime || 0
-                    };
-                }""")
-            except:
-                performance_metrics = {
-                    'dns': 0, 'tcp': 0, 'ttfb': 0,
-                    'domLoad': load_time * 1000,
-                    'pageLoad': load_time * 1000,
-                    'fcp': 0
-                }
-            
-            # Network requests count
-            try:
-                network_requests = page.evaluate("() => performance.getEntriesByType('resource').length")
-            except:
-                network_requests = 0
-            
-            # Page size
-            try:
-                page_content = page.content()
-                page_size = len(page_content.encode('utf-8')) / 1024
-            except:
-                page_size = 0
-            
-            # Get CSS and JS file counts
-            try:
-                resource_breakdown = page.evaluate("""() => {
-                    const resources = performance.getEntriesByType('resource');
-                    return {
-                        css: resources.filter(r => r.name.includes('.css')).length,
-                        js: resources.filter(r => r.name.includes('.js')).length,
-                        images: resources.filter(r => r.initiatorType === 'img').length,
-                        fonts: resources.filter(r => r.name.includes('.woff') || r.name.includes('.ttf')).length
-                    };
-                }""")
-            except:
-                resource_breakdown = {'css': 0, 'js': 0, 'images': 0, 'fonts': 0}
-            
-            # Get detailed site overview
-            try:
-                site_overview = page.evaluate("""() => {
-                    // Count elements
-                    const allElements = document.getElementsByTagName('*').length;
-                    const links = document.querySelectorAll('a').length;
-                    const internalLinks = Array.from(document.querySelectorAll('a')).filter(a => 
-                        a.href.startsWith(window.location.origin) || a.href.startsWith('/')
-                    ).length;
-                    const externalLinks = links - internalLinks;
-                    const forms = document.querySelectorAll('form').length;
-                    const buttons = document.querySelectorAll('button, input[type="submit"]').length;
-                    const headings = {
-                        h1: document.querySelectorAll('h1').length,
-                        h2: document.querySelectorAll('h2').length,
-                        h3: document.querySelectorAll('h3').length,
-                        h4: document.querySelectorAll('h4').length,
-                        h5: document.querySelectorAll('h5').length,
-                        h6: document.querySelectorAll('h6').length
-                    };
-                    
-                    // Get all meta tags
-                    const metaTags = Array.from(document.querySelectorAll('meta')).map(meta => ({
-                        name: meta.name || meta.property || 'http-equiv',
-                        content: meta.content ? meta.content.substring(0, 100) : ''
-                    }));
-                    
-                    // Get language
-                    const lang = document.documentElement.lang || 'not specified';
-                    
-                    // Get character encoding
-                    const charset = document.characterSet || 'not specified';
-                    
-                    // Get all CSS files
-                    const cssFiles = Array.from(document.querySelectorAll('link[rel="stylesheet"]')).map(link => ({
-                        href: link.href,
-                        media: link.media || 'all'
-                    }));
-                    
-                    // Get all JS files
-                    const jsFiles = Array.from(document.querySelectorAll('script[src]')).map(script => ({
-                        src: script.src,
-                        async: script.async,
-                        defer: script.defer
-                    }));
-                    
-                    // Get inline scripts count
-                    const inlineScripts = document.querySelectorAll('script:not([src])').length;
-                    
-                    // Get favicon
-                    const favicon = document.querySelector('link[rel*="icon"]')?.href || 'none';
-                    
-                    // Get schema.org markup
-                    const schemaMarkup = document.querySelectorAll('script[type="application/ld+json"]').length;
-                    
-                    // Get Open Graph tags
-                    const ogTags = Array.from(document.querySelectorAll('meta[property^="og:"]')).map(meta => ({
-                        property: meta.property,
-                        content: meta.content
-                    }));
-                    
-                    // Get Twitter Card tags
-                    const twitterTags = Array.from(document.querySelectorAll('meta[name^="twitter:"]')).map(meta => ({
-                        name: meta.name,
-                        content: meta.content
-                    }));
-                    
-                    // Get all images with details
-                    const images = Array.from(document.querySelectorAll('img')).map(img => ({
-                        src: img.src,
-                        alt: img.alt || 'missing',
-                        width: img.width || 'auto',
-                        height: img.height || 'auto',
-                        loading: img.loading || 'eager'
-                    }));
-                    
-                    // Check for lazy loading
-                    const lazyLoadedImages = images.filter(img => img.loading === 'lazy').length;
-                    
-                    return {
-                        totalElements: allElements,
-                        links: { total: links, internal: internalLinks, external: externalLinks },
-                        forms: forms,
-                        buttons: buttons,
-                        headings: headings,
-                        metaTags: metaTags,
-                        language: lang,
-                        charset: charset,
-                        cssFiles: cssFiles,
-                        jsFiles: jsFiles,
-                        inlineScripts: inlineScripts,
-                        favicon: favicon,
-                        schemaMarkup: schemaMarkup,
-                        ogTags: ogTags,
-                        twitterTags: twitterTags,
-                        images: images,
-                        lazyLoadedImages: lazyLoadedImages
-                    };
-                }""")
-            except Exception as e:
-                print(f"Error getting site overview: {e}")
-                site_overview = {
-                    'totalElements': 0,
-                    'links': {'total': 0, 'internal': 0, 'external': 0},
-                    'forms': 0,
-                    'buttons': 0,
-                    'headings': {'h1': 0, 'h2': 0, 'h3': 0, 'h4': 0, 'h5': 0, 'h6': 0},
-                    'metaTags': [],
-                    'language': 'not detected',
-                    'charset': 'not detected',
-                    'cssFiles': [],
-                    'jsFiles': [],
-                    'inlineScripts': 0,
-                    'favicon': 'none',
-                    'schemaMarkup': 0,
-                    'ogTags': [],
-                    'twitterTags': [],
-                    'images': [],
-                    'lazyLoadedImages': 0
-                }
-            
-            metrics = {
-                'ttfb': f"{performance_metrics.get('ttfb', 0):.0f}ms",
-                'fcp': f"{performance_metrics.get('fcp', 0):.0f}ms",
-                'domLoad': f"{performance_metrics.get('domLoad', 0):.0f}ms",
-                'pageLoad': f"{performance_metrics.get('pageLoad', 0):.0f}ms",
-                'networkRequests': network_requests,
-                'pageSize': f"{page_size:.2f} KB",
-                'loadTime': f"{load_time:.2f}s",
-                'cssFiles': resource_breakdown['css'],
-                'jsFiles': resource_breakdown['js'],
-                'imageCount': resource_breakdown['images'],
-                'fontFiles': resource_breakdown['fonts']
-            }
-            
-            # Check HTTPS
-            is_https = url.startswith('https://')
-            if not is_https:
-                issues.append({
-                    'title': 'Not using HTTPS',
-                    'description': 'Website is not secured with HTTPS encryption',
-                    'severity': 'error',
-                    'impact': 'High security risk, affects SEO ranking'
-                })
-                detailed_breakdown['seo'].append({
-                    'check': 'HTTPS',
-                    'status': 'fail',
-                    'points_lost': 15,
-                    'reason': 'Not using HTTPS protocol'
-                })
-                detailed_breakdown['bestPractices'].append({
-                    'check': 'HTTPS',
-                    'status': 'fail',
-                    'points_lost': 30,
-                    'reason': 'No SSL/TLS encryption'
-                })
-            else:
-                issues.append({
-                    'title': 'Using HTTPS',
-                    'description': 'Website is properly secured with HTTPS',
-                    'severity': 'success',
-                    'impact': 'Secure connection established'
-                })
-                detailed_breakdown['seo'].append({
-                    'check': 'HTTPS',
-                    'status': 'pass',
-                    'points_lost': 0,
-                    'reason': 'Properly secured'
-                })
-            
-            # Check for missing alt tags
-            try:
-                alt_data = page.evaluate("""() => {
-                    const imgs = document.querySelectorAll('img');
-                    const total = imgs.length;
-                    const missing = Array.from(imgs).filter(img => !img.alt).length;
-                    return {total, missing};
-                }""")
-                total_images = alt_data['total']
-                missing_alts = alt_data['missing']
-            except:
-                total_images = 0
-                missing_alts = 0
-            
-            if missing_alts > 0:
-                percentage = (missing_alts / total_images * 100) if total_images > 0 else 0
-                issues.append({
-                    'title': f'Missing Alt Tags on {missing_alts}/{total_images} Images',
-                    'description': f'{percentage:.1f}% of images lack alt attributes for screen readers',
-                    'severity': 'warning',
-                    'impact': f'Affects {missing_alts} images - reduces accessibility score'
-                })
-                points_lost = min(missing_alts * 5, 40)
-                detailed_breakdown['accessibility'].append({
-                    'check': 'Image Alt Attributes',
-                    'status': 'fail',
-                    'points_lost': points_lost,
-                    'reason': f'{missing_alts} images missing alt text ({percentage:.1f}%)'
-                })
-            else:
-                if total_images > 0:
-                    issues.append({
-                        'title': f'All {total_images} Images Have Alt Tags',
-                        'description': 'All images properly labeled for accessibility',
-                        'severity': 'success',
-                        'impact': 'Screen reader friendly'
-                    })
-            
-            # Check SEO meta tags
-            try:
-                meta_checks = page.evaluate("""() => {
-                    const title = document.title;
-                    const description = document.querySelector('meta[name="description"]')?.content || '';
-                    return {
-                        title: title,
-                        titleLength: title.length,
-                        description: description,
-                        descriptionLength: description.length,
-                        viewport: !!document.querySelector('meta[name="viewport"]'),
-                        ogImage: !!document.querySelector('meta[property="og:image"]'),
-                        ogTitle: !!document.querySelector('meta[property="og:title"]'),
-                        ogDescription: !!document.querySelector('meta[property="og:description"]'),
-                        canonical: !!document.querySelector('link[rel="canonical"]'),
-                        robots: document.querySelector('meta[name="robots"]')?.content || 'not set'
-                    };
-                }""")
-            except:
-                meta_checks = {
-                    'title': '',
-                    'titleLength': 0,
-                    'description': '',
-                    'descriptionLength': 0,
-                    'viewport': False,
-                    'ogImage': False,
-                    'ogTitle': False,
-                    'ogDescription': False,
-                    'canonical': False,
-                    'robots': 'not set'
-                }
-            
-            # Title checks
-            if meta_checks['titleLength'] == 0:
-                issues.append({
-                    'title': 'Missing Page Title',
-                    'description': 'No title tag found',
-                    'severity': 'error',
-                    'impact': 'Critical SEO issue - 30 points lost'
-                })
-                detailed_breakdown['seo'].append({
-                    'check': 'Title Tag',
-                    'status': 'fail',
-                    'points_lost': 30,
-                    'reason': 'Title tag is completely missing'
-                })
-            elif meta_checks['titleLength'] < 30:
-                issues.append({
-                    'title': 'Title Too Short',
-                    'description': f'Title is {meta_checks["titleLength"]} characters. Recommended: 50-60',
-                    'severity': 'warning',
-                    'impact': '10 points lost - title should be 50-60 characters'
-                })
-                detailed_breakdown['seo'].append({
-                    'check': 'Title Length',
-                    'status': 'warning',
-                    'points_lost': 10,
-                    'reason': f'Only {meta_checks["titleLength"]} characters (optimal: 50-60)'
-                })
-            elif meta_checks['titleLength'] > 60:
-                issues.append({
-                    'title': 'Title Too Long',
-                    'description': f'Title is {meta_checks["titleLength"]} characters. Recommended: 50-60',
-                    'severity': 'warning',
-                    'impact': f'{meta_checks["titleLength"] - 60} characters will be truncated in search results'
-                })
-                detailed_breakdown['seo'].append({
-                    'check': 'Title Length',
-                    'status': 'warning',
-                    'points_lost': 10,
-                    'reason': f'{meta_checks["titleLength"]} characters (optimal: 50-60)'
-                })
-            else:
-                issues.append({
-                    'title': 'Title Length Optimal',
-                    'description': f'Title is {meta_checks["titleLength"]} characters - perfect length',
-                    'severity': 'success',
-                    'impact': 'Well optimized for search results'
-                })
-            
-            # Description checks
-            if meta_checks['descriptionLength'] == 0:
-                issues.append({
-                    'title': 'Missing Meta Description',
-                    'description': 'No meta description tag found',
-                    'severity': 'error',
-                    'impact': 'Critical SEO issue - 25 points lost'
-                })
-                detailed_breakdown['seo'].append({
-                    'check': 'Meta Description',
-                    'status': 'fail',
-                    'points_lost': 25,
-                    'reason': 'Meta description is completely missing'
-                })
-            elif meta_checks['descriptionLength'] < 120:
-                issues.append({
-                    'title': 'Meta Description Too Short',
-                    'description': f'Description is {meta_checks["descriptionLength"]} characters. Recommended: 150-160',
-                    'severity': 'warning',
-                    'impact': 'Could provide more detail for search results'
-                })
-            elif meta_checks['descriptionLength'] > 160:
-                issues.append({
-                    'title': 'Meta Description Too Long',
-                    'description': f'Description is {meta_checks["descriptionLength"]} characters. Recommended: 150-160',
-                    'severity': 'warning',
-                    'impact': f'{meta_checks["descriptionLength"] - 160} characters will be truncated'
-                })
-            else:
-                issues.append({
-                    'title': 'Meta Description Optimal',
-                    'description': f'Description is {meta_checks["descriptionLength"]} characters - perfect length',
-                    'severity': 'success',
-                    'impact': 'Well optimized for search results'
-                })
-            
-            # Viewport check
-            if not meta_checks['viewport']:
-                issues.append({
-                    'title': 'Missing Viewport Meta Tag',
-                    'description': 'No viewport meta tag for mobile responsiveness',
-                    'severity': 'error',
-                    'impact': '10 points lost from SEO, 15 from accessibility'
-                })
-                detailed_breakdown['seo'].append({
-                    'check': 'Viewport Meta Tag',
-                    'status': 'fail',
-                    'points_lost': 10,
-                    'reason': 'Mobile viewport not configured'
-                })
-                detailed_breakdown['accessibility'].append({
-                    'check': 'Mobile Viewport',
-                    'status': 'fail',
-                    'points_lost': 15,
-                    'reason': 'Not mobile-friendly'
-                })
-            
-            # Open Graph checks
-            if not meta_checks['ogImage']:
-                detailed_breakdown['seo'].append({
-                    'check': 'Open Graph Image',
-                    'status': 'fail',
-                    'points_lost': 10,
-                    'reason': 'No og:image for social sharing'
-                })
-            
-            # Performance breakdown
-            ttfb = performance_metrics.get('ttfb', 0)
-            fcp = performance_metrics.get('fcp', 0)
-            page_load = performance_metrics.get('pageLoad', 0)
-            
-            # TTFB analysis
-            if ttfb > 600:
-                points = 10
-                issues.append({
-                    'title': f'Slow Server Response: {ttfb:.0f}ms',
-                    'description': f'TTFB is {ttfb - 600:.0f}ms slower than recommended (600ms)',
-                    'severity': 'warning',
-                    'impact': f'Server response time costs {points} performance points'
-                })
-                detailed_breakdown['performance'].append({
-                    'check': 'Time to First Byte (TTFB)',
-                    'status': 'fail',
-                    'points_lost': points,
-                    'reason': f'{ttfb:.0f}ms (optimal: <600ms, {ttfb - 600:.0f}ms too slow)'
-                })
-            else:
-                detailed_breakdown['performance'].append({
-                    'check': 'Time to First Byte (TTFB)',
-                    'status': 'pass',
-                    'points_lost': 0,
-                    'reason': f'{ttfb:.0f}ms (optimal: <600ms)'
-                })
-            
-            # FCP analysis
-            if fcp > 2000:
-                points = 15
-                issues.append({
-                    'title': f'Slow First Contentful Paint: {fcp:.0f}ms',
-                    'description': f'FCP is {fcp - 2000:.0f}ms slower than recommended (2000ms)',
-                    'severity': 'warning',
-                    'impact': f'Content appears {points} points too slowly'
-                })
-                detailed_breakdown['performance'].append({
-                    'check': 'First Contentful Paint (FCP)',
-                    'status': 'fail',
-                    'points_lost': points,
-                    'reason': f'{fcp:.0f}ms (optimal: <2000ms, {fcp - 2000:.0f}ms too slow)'
-                })
-            else:
-                detailed_breakdown['performance'].append({
-                    'check': 'First Contentful Paint (FCP)',
-                    'status': 'pass',
-                    'points_lost': 0,
-                    'reason': f'{fcp:.0f}ms (optimal: <2000ms)'
-                })
-            
-            # Page Load analysis
-            if page_load > 3000:
-                points = 20
-                issues.append({
-                    'title': f'Slow Page Load: {page_load:.0f}ms',
-                    'description': f'Page takes {page_load - 3000:.0f}ms longer than recommended (3000ms)',
-                    'severity': 'warning',
-                    'impact': f'Total load time costs {points} performance points'
-                })
-                detailed_breakdown['performance'].append({
-                    'check': 'Total Page Load',
-                    'status': 'fail',
-                    'points_lost': points,
-                    'reason': f'{page_load:.0f}ms (optimal: <3000ms, {page_load - 3000:.0f}ms too slow)'
-                })
-            else:
-                detailed_breakdown['performance'].append({
-                    'check': 'Total Page Load',
-                    'status': 'pass',
-                    'points_lost': 0,
-                    'reason': f'{page_load:.0f}ms (optimal: <3000ms)'
-                })
-            
-            # Network requests analysis
-            if network_requests > 50:
-                points = 15
-                issues.append({
-                    'title': f'Too Many Network Requests: {network_requests}',
-                    'description': f'{network_requests - 50} more requests than recommended (50 max)',
-                    'severity': 'warning',
-                    'impact': f'Excessive requests cost {points} performance points'
-                })
-                detailed_breakdown['performance'].append({
-                    'check': 'Network Requests',
-                    'status': 'fail',
-                    'points_lost': points,
-                    'reason': f'{network_requests} requests (optimal: <50, {network_requests - 50} excess)'
-                })
-                detailed_breakdown['bestPractices'].append({
-                    'check': 'Resource Optimization',
-                    'status': 'fail',
-                    'points_lost': 10,
-                    'reason': f'{network_requests} requests - should bundle/minimize'
-                })
-            else:
-                detailed_breakdown['performance'].append({
-                    'check': 'Network Requests',
-                    'status': 'pass',
-                    'points_lost': 0,
-                    'reason': f'{network_requests} requests (optimal: <50)'
-                })
-            
-            # Page size analysis
-            if page_size > 1000:
-                points = 10
-                issues.append({
-                    'title': f'Large Page Size: {page_size:.2f} KB',
-                    'description': f'Page is {page_size - 1000:.2f} KB larger than recommended (1000 KB)',
-                    'severity': 'warning',
-                    'impact': f'Page size costs {points} performance points'
-                })
-                detailed_breakdown['performance'].append({
-                    'check': 'Page Size',
-                    'status': 'fail',
-                    'points_lost': points,
-                    'reason': f'{page_size:.0f}KB (optimal: <1000KB, {page_size - 1000:.0f}KB too large)'
-                })
-                detailed_breakdown['bestPractices'].append({
-                    'check': 'Page Weight',
-                    'status': 'fail',
-                    'points_lost': 10,
-                    'reason': f'{page_size:.0f}KB - compress assets'
-                })
-            else:
-                detailed_breakdown['performance'].append({
-                    'check': 'Page Size',
-                    'status': 'pass',
-                    'points_lost': 0,
-                    'reason': f'{page_size:.0f}KB (optimal: <1000KB)'
-                })
-            
-            # Calculate scores with detailed breakdown
-            scores = calculate_scores(
-                performance_metrics, 
-                network_requests, 
-                page_size, 
-                is_https, 
-                missing_alts, 
-                meta_checks,
-                detailed_breakdown
-            )
-            
+            check_raw_metrics(item)
+            results.append(dict(evaluate(item, profile, device=device), profile=profile, device=device))
         except Exception as e:
-            browser.close()
-            raise Exception(f"Failed to load or analyze page: {str(e)}")
-        
-        browser.close()
-        
-        return {
-            'url': url,
-            'timestamp': time.strftime('%Y-%m-%d %H:%M:%S'),
-            'pageInfo': page_info,
-            'screenshot': screenshot_url,
-            'scores': scores,
-            'metrics': metrics,
-            'issues': issues,
-            'breakdown': detailed_breakdown,
-            'overview': site_overview
-        }
+            if not batch:
+                return jsonify({'error': str(e)}), 400
+            results.append({'error': str(e)})
+    return jsonify(results if batch else results[0])
+
+@app.route('/api/history', methods=['GET'])
+def history_summary():
+    """p50/p95/min/max/mean per metric for one URL over the last `days`"""
+    if not history_store:
+        return jsonify({'error': 'History is disabled'}), 404
+    url = request.args.get('url')
+    if not url:
+        return jsonify({'error': 'url is required'}), 400
+    try:
+        days = float(request.args.get('days', 30))
+    except ValueError:
+        return jsonify({'error': 'days must be a number'}), 400
+    metrics = [request.args['metric']] if request.args.get('metric') else list(HISTORY_METRICS)
+    unknown = [metric for metric in metrics if metric not in HISTORY_METRICS]
+    if unknown:
+        return jsonify({'error': f"metric must be one of: {', '.join(HISTORY_METRICS)}"}), 400
+    
+    since = time.time() - days * 86400
+    return jsonify({
+        'url': url,
+        'days': days,
+        'metrics': {metric: history_store.summary(url, metric, since) for metric in metrics}
+    })
+
+@app.route('/api/history/series', methods=['GET'])
+def history_series():
+    if not history_store:
+        return jsonify({'error': 'History is disabled'}), 404
+    url = request.args.get('url')
+    metric = request.args.get('metric')
+    if not url or metric not in HISTORY_METRICS:
+        return jsonify({'error': f"url and metric ({', '.join(HISTORY_METRICS)}) are required"}), 400
+    try:
+        days = float(request.args.get('days', 30))
+        limit = min(int(request.args.get('limit', 1000)), 10000)
+    except ValueError:
+        return jsonify({'error': 'days and limit must be numbers'}), 400
+    
+    since = time.time() - days * 86400
+    return jsonify({'url': url, 'metric': metric, 'points': history_store.series(url, metric, since, limit=limit)})
+
+@app.route('/api/history/regressions', methods=['GET'])
+def history_regressions():
+    """Flag metrics whose last `days` differ significantly (and for the worse) from the `baselineDays` before"""
+    if not history_store:
+        return jsonify({'error': 'History is disabled'}), 404
+    try:
+        days = float(request.args.get('days', 1))
+        baseline_days = float(request.args.get('baselineDays', 14))
+        alpha = float(request.args.get('alpha', 0.01))
+        min_change = float(request.args.get('minChange', 0.05))
+    except ValueError:
+        return jsonify({'error': 'days, baselineDays, alpha and minChange must be numbers'}), 400
+    
+    url = request.args.get('url')
+    urls = [url] if url else history_store.recent_urls(time.time() - days * 86400)
+    report = []
+    for page_url in urls:
+        findings = history_store.regressions(page_url, days * 86400, baseline_days * 86400,
+                                             alpha=alpha, min_change=min_change)
+        report.append({
+            'url': page_url,
+            'regressions': [finding for finding in findings if finding['regression']],
+            'metrics': findings
+        })
+    return jsonify({'days': days, 'baselineDays': baseline_days, 'alpha': alpha, 'results': report})
+
+@app.route('/api/monitors', methods=['GET'])
+def monitor_status():
+    """Schedule, last run and run counts of every monitor of the in-process scheduler"""
+    if monitor_scheduler is None:
+        return jsonify({'error': 'Monitoring is not configured'}), 404
+    return jsonify(monitor_scheduler.status())
+
+@app.route('/api/monitors/breaches', methods=['GET'])
+def monitor_breaches():
+    """Budget breaches of the last `days`, newest first, with per-URL run counts"""
+    if not breach_store:
+        return jsonify({'error': 'Monitoring is not configured'}), 404
+    try:
+        days = float(request.args.get('days', 7))
+        limit = min(int(request.args.get('limit', 100)), 10000)
+    except ValueError:
+        return jsonify({'error': 'days and limit must be numbers'}), 400
+    
+    url = request.args.get('url')
+    since = time.time() - days * 86400
+    return jsonify({
+        'days': days,
+        'runs': breach_store.summary(since, url),
+        'breaches': breach_store.breaches(since, url, limit=limit)
+    })
+
+@app.route('/api/results/page', methods=['GET'])
+def result_list_page():
+    """Next window of a list that /api/analyze truncated, read from the result cache"""
+    try:
+        key, url, path, offset, limit = decode_cursor(request.args.get('cursor') or '')
+        if request.args.get('limit'):
+            limit = parse_limit(request.args.get('limit'))
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    hit = result_cache.get(key, url)
+    if hit is None:
+        return jsonify({'error': 'Result no longer cached; run the analysis again'}), 410
+    page = list_page(hit[0], path, offset, limit, key)
+    if page is None:
+        return jsonify({'error': f'{path} is not part of this result'}), 404
+    return jsonify(page)
+
+@app.route('/api/archives', methods=['GET'])
+def list_archives():
+    try:
+        limit = int(request.args.get('limit', 100))
+    except ValueError:
+        return jsonify({'error': 'limit must be an integer'}), 400
+    store = get_archive_store(create=False)
+    if store is None:
+        return jsonify({'archives': [], 'stats': {'archives': 0, 'urls': 0, 'bodyBytes': 0, 'blobs': 0,
+                                                  'storedBytes': 0}})
+    return jsonify({'archives': store.list(request.args.get('url'), limit), 'stats': store.stats()})
+
+@app.route('/api/archives/<archive_id>/har', methods=['GET'])
+def export_archive(archive_id):
+    """The archive as a self-contained HAR, bodies embedded"""
+    store = get_archive_store(create=False)
+    try:
+        if store is None:
+            raise ArchiveNotFound(f'No archive {archive_id}')
+        har = store.har(archive_id)
+    except ArchiveNotFound as e:
+        return jsonify({'error': str(e)}), 404
+    return Response(json.dumps(har), mimetype='application/json',
+                    headers={'Content-Disposition': f'attachment; filename="{archive_id}.har"'})
+
+@app.route('/api/pool', methods=['GET'])
+def pool_stats():
+    stats = get_pool().stats()
+    async_pool = current_async_pool()
+    if async_pool is not None:
+        # Serving through asgi.py: /api/analyze runs on the asyncio pool
+        stats['async'] = async_pool.stats()
+    return jsonify(stats)
+
+@app.route('/api/concurrency', methods=['GET'])
+def concurrency_stats():
+    return jsonify({'coalescing': flights.stats(), 'origins': origin_limiter.stats()})
+
+@app.route('/api/cache', methods=['GET'])
+def cache_stats():
+    return jsonify(result_cache.stats())
+
+@app.route('/metrics', methods=['GET'])
+def prometheus_metrics():
+    """Prometheus text exposition of phase histograms, pool, queue and cache state"""
+    return Response(REGISTRY.render(), mimetype='text/plain; version=0.0.4')
+
+def service_metrics():
+    """Scrape-time numbers owned by the pool, job queue and cache"""
+    families = []
+    pool = current_pool()
+    if pool is not None:
+        stats = pool.stats()
+        families.append(('analyzer_pool_size', 'gauge', 'Browsers in the pool', [({}, stats['size'])]))
+        families.append(('analyzer_pool_busy', 'gauge', 'Browsers running an analysis', [({}, stats['busy'])]))
+        families.append(('analyzer_pool_queue_depth', 'gauge', 'Analyses waiting for a browser',
+                         [({}, stats['queueDepth'])]))
+        families.append(('analyzer_browser_rss_bytes', 'gauge', 'Resident memory of each browser and its children',
+                         [({'slot': index}, int(slot['rssMb'] * 1024 * 1024))
+                          for index, slot in enumerate(stats['browsers'])]))
+        families.append(('analyzer_pool_events_total', 'counter', 'Pool lifecycle events',
+                         [({'event': name}, value) for name, value in sorted(stats['counters'].items())
+                          if not name.startswith('waitSeconds')]))
+    async_pool = current_async_pool()
+    if async_pool is not None:
+        stats = async_pool.stats()
+        families.append(('analyzer_async_pool_busy', 'gauge', 'Contexts running an analysis on the asyncio pool',
+                         [({}, stats['busy'])]))
+        families.append(('analyzer_async_pool_queue_depth', 'gauge', 'Analyses waiting for the asyncio pool',
+                         [({}, stats['queueDepth'])]))
+        families.append(('analyzer_async_browser_rss_bytes', 'gauge', 'Resident memory of each asyncio pool browser',
+                         [({'slot': index}, int(slot['rssMb'] * 1024 * 1024))
+                          for index, slot in enumerate(stats['browsers'])]))
+    jobs = job_manager.stats()
+    families.append(('analyzer_job_queue_depth', 'gauge', 'Jobs waiting for a worker', [({}, jobs['queueDepth'])]))
+    families.append(('analyzer_jobs', 'gauge', 'Retained jobs by status',
+                     [({'status': status}, count) for status, count in sorted(jobs['jobs'].items())]))
+    coalescing = flights.stats()
+    families.append(('analyzer_coalesced_requests_total', 'counter', 'Requests that shared an in-flight analysis',
+                     [({}, coalescing['followers'])]))
+    origins = origin_limiter.stats()
+    families.append(('analyzer_origin_queued', 'gauge', 'Analyses waiting for a per-origin slot',
+                     [({}, sum(item['queued'] for item in origins['origins']))]))
+    cache = result_cache.stats()
+    families.append(('analyzer_cache_events_total', 'counter', 'Result cache lookups and maintenance',
+                     [({'event': name}, cache[name])
+                      for name in ('hits', 'misses', 'diskHits', 'revalidated', 'evictions', 'diskEvictions', 'stores')]))
+    families.append(('analyzer_cache_bytes', 'gauge', 'Serialized size of the in-memory cache',
+                     [({}, cache['bytes'])]))
+    return families
+
+REGISTRY.collectors.append(service_metrics)
+
+def validate_url(url):
+    """Return an error message if url can't be analyzed, otherwise None"""
+    if not url:
+        return 'URL is required'
+    try:
+        parsed = urlparse(url)
+        if not parsed.scheme or not parsed.netloc:
+            return 'Invalid URL format'
+        # Raises for a port that isn't a number in range
+        normalize_url(url)
+    except Exception:
+        return 'Invalid URL'
+    return None
+
+QUERY_BOOLEANS = {'true': True, 'false': False}
+
+def query_options(args):
+    """Analysis options from a query string, in the types a JSON body would use.
+
+    'true'/'false' become booleans and a repeated name (e.g. block) a list;
+    numbers stay strings, which parse_options() already converts.
+    """
+    options = {}
+    for name, values in args.lists():
+        values = [QUERY_BOOLEANS.get(value.lower(), value) for value in values]
+        options[name] = values if len(values) > 1 else values[0]
+    return options
+
+def parse_options(data):
+    """Validate the analysis options of a request, raising ValueError on bad input"""
+    options = {}
+    
+    settle = data.get('settle') or DEFAULT_SETTLE
+    if settle not in SETTLE_PROFILES:
+        raise ValueError(f"settle must be one of: {', '.join(SETTLE_PROFILES)}")
+    options['settle'] = settle
+    
+    cache_mode = data.get('cache') or CACHE_DEFAULT
+    if cache_mode not in CACHE_MODES:
+        raise ValueError(f"cache must be one of: {', '.join(CACHE_MODES)}")
+    options['cache'] = cache_mode
+    
+    options['screenshot'] = parse_screenshot_option(data.get('screenshot'))
+    
+    profile = data.get('profile') or DEFAULT_PROFILE
+    if profile not in RULE_PROFILES:
+        raise ValueError(f"profile must be one of: {', '.join(RULE_PROFILES)}")
+    options['profile'] = profile
+    
+    try:
+        runs = int(data['runs']) if data.get('runs') is not None else 1
+    except (TypeError, ValueError):
+        raise ValueError('runs must be an integer')
+    if not 1 <= runs <= MAX_RUNS:
+        raise ValueError(f'runs must be between 1 and {MAX_RUNS}')
+    options['runs'] = runs
+    
+    run_mode = data.get('runMode') or 'cold'
+    if run_mode not in SAMPLE_MODES:
+        raise ValueError(f"runMode must be one of: {', '.join(SAMPLE_MODES)}")
+    options['runMode'] = run_mode
+    
+    mode = data.get('mode') or DEFAULT_ENGINE
+    if mode not in ENGINE_MODES:
+        raise ValueError(f"mode must be one of: {', '.join(ENGINE_MODES)}")
+    options['mode'] = mode
+    
+    navigation = data.get('navigation') or DEFAULT_NAVIGATION
+    if navigation not in NAVIGATION_PROFILES:
+        raise ValueError(f"navigation must be one of: {', '.join(NAVIGATION_PROFILES)}")
+    options['navigation'] = navigation
+    options['block'] = parse_block_patterns(data.get('block'))
+    
+    options['fields'] = parse_fields(data.get('fields'))
+    compact = data.get('compact', False)
+    if not isinstance(compact, bool):
+        raise ValueError('compact must be true or false')
+    options['compact'] = compact
+    coverage = data.get('coverage', False)
+    if not isinstance(coverage, bool):
+        raise ValueError('coverage must be true or false')
+    options['coverage'] = coverage
+    
+    archive = data.get('archive') or None
+    if archive is not None and archive not in ARCHIVE_MODES:
+        raise ValueError(f"archive must be one of: {', '.join(ARCHIVE_MODES)}")
+    if archive and mode == 'static':
+        raise ValueError('archive needs a browser: use mode browser or auto')
+    if archive and runs > 1:
+        raise ValueError('archive can only be used with runs=1')
+    options['archive'] = archive
+    if archive == 'record':
+        # A recording has to load the live page
+        options['cache'] = 'bypass'
+    archive_id = data.get('archiveId') or None
+    if archive_id is not None and (archive != 'replay' or not isinstance(archive_id, str)):
+        raise ValueError('archiveId must be a string and needs archive=replay')
+    options['archiveId'] = archive_id
+    
+    devices = parse_devices(data.get('device'))
+    if mode == 'static' and devices != [DEFAULT_DEVICE]:
+        raise ValueError('device emulation needs a browser: use mode browser or auto')
+    if archive and len(devices) > 1:
+        raise ValueError('archive can only be used with a single device')
+    # A list runs every device side by side and combines the results
+    options['device'] = devices[0] if len(devices) == 1 else devices
+    
+    return options
 
-def calculate_scores(perf_metrics, network_reqs, page_size, is_https, missing_alts, meta_checks, breakdown):
-    """Calculate precise scores for each category (0-100)"""
-    
-    # Performance Score (starts at 100)
-    perf_score = 100
-    for item in breakdown['performance']:
-        perf_score -= item['points_lost']
-    perf_score = max(0, perf_score)
-    
-    # SEO Score (starts at 100)
-    seo_score = 100
-    for item in breakdown['seo']:
-        seo_score -= item['points_lost']
-    seo_score = max(0, seo_score)
-    
-    # Accessibility Score (starts at 100)
-    access_score = 100
-    for item in breakdown['accessibility']:
-        access_score -= item['points_lost']
-    access_score = max(0, access_score)
-    
-    # Best Practices Score (starts at 100)
-    bp_score = 100
-    for item in breakdown['bestPractices']:
-        bp_score -= item['points_lost']
-    bp_score = max(0, bp_score)
+def analyze_cached(url, options, on_phase=None):
+    """run_analysis() behind the result cache, honouring options['cache']"""
+    if isinstance(options['device'], list):
+        return analyze_devices(url, options, on_phase)
+    timings = Timings()
+    options = resolve_archive(url, options)
+    key = cache_key(url, options)
+    if options['cache'] != 'bypass':
+        with timings.span('cacheLookup'):
+            hit = result_cache.get(key, url)
+        if hit is not None:
+            return cached_result(hit, timings)
+        if options['cache'] == 'only':
+            ANALYSES_TOTAL.inc(result='cacheMiss')
+            raise CacheMiss(f'No cached result for {url}')
     
+    # Identical requests already being analyzed share that run instead of starting another
+    started = time.perf_counter()
+    result, shared = flights.do(key, lambda: analyze_fresh(url, options, key, on_phase, timings))
+    return fresh_result(result, shared, started, timings)
+
+def analyze_devices(url, options, on_phase=None):
+    """analyze_cached() once per device in options['device'], in parallel browser contexts, combined"""
+    devices = options['device']
+    with ThreadPoolExecutor(max_workers=len(devices), thread_name_prefix='device') as executor:
+        futures = {device: executor.submit(analyze_cached, url, dict(options, device=device),
+                                           device_phases(on_phase, device))
+                   for device in devices}
+        results = {device: future.result() for device, future in futures.items()}
+    return combine_devices(url, options['profile'], results)
+
+def shape_result(url, result, options, limit):
+    """shape() a result for a response; each device of a combined report is cut under its own cache key"""
+    if 'devices' not in result:
+        return shape(result, options.get('fields'), limit, cache_key(url, replayed_options(options, result)))
+    return dict(result, devices={
+        device: shape(device_result, options.get('fields'), limit,
+                      cache_key(url, replayed_options(dict(options, device=device), device_result)))
+        for device, device_result in result['devices'].items()
+    })
+
+def replayed_options(options, result):
+    """options pinned to the archive a replayed result came from, so cursors name the key it was cached under"""
+    archive_id = (result.get('archive') or {}).get('id')
+    if options.get('archive') != 'replay' or options.get('archiveId') or not archive_id:
+        return options
+    return dict(options, archiveId=archive_id)
+
+def resolve_archive(url, options):
+    """Pin a replay to the URL's latest archive, so the cache key names the archive it used"""
+    if options.get('archive') != 'replay' or options.get('archiveId'):
+        return options
+    archive_id = get_archive_store().latest(url)
+    if archive_id is None:
+        raise ArchiveNotFound(f'No archive recorded for {url}')
+    return dict(options, archiveId=archive_id)
+
+def cached_result(hit, timings):
+    """Mark a result cache hit (result, age) for the response"""
+    result, age = hit
+    if result.get('screenshot') and not screenshot_store.exists(result['screenshot']):
+        # Retention can delete a screenshot that cached results still name
+        result['screenshot'] = None
+    result['cached'] = True
+    result['ageSeconds'] = round(age, 1)
+    result['timings'] = timings.report()
+    ANALYSES_TOTAL.inc(result='cached')
+    return result
+
+def fresh_result(result, shared, started, timings):
+    """Mark a result coming out of flights for the response"""
+    if shared:
+        timings.add('coalesced', time.perf_counter() - started)
+        result['timings'] = timings.report()
+        result['coalesced'] = True
+        ANALYSES_TOTAL.inc(result='coalesced')
+    result['cached'] = False
+    result['ageSeconds'] = 0
+    return result
+
+def analyze_fresh(url, options, key, on_phase=None, timings=None):
+    """run_analysis() plus the bookkeeping of a new result: metrics, cache store, history"""
+    timings = timings or Timings()
+    ANALYSES_IN_FLIGHT.inc()
+    started = time.perf_counter()
+    try:
+        result = run_analysis(url, options, on_phase, timings)
+    except Exception as e:
+        record_failure(e, options, started)
+        raise
+    finally:
+        ANALYSES_IN_FLIGHT.dec()
+    record_success(url, key, result, started, timings)
+    return result
+
+def record_failure(error, options, started):
+    # Report the underlying error, not the 'Failed to load...' wrapper
+    ERRORS_TOTAL.inc(type=type(error.__cause__ or error).__name__)
+    ANALYSES_TOTAL.inc(result='error')
+    ANALYSIS_SECONDS.observe(time.perf_counter() - started, engine=options['mode'], outcome='error')
+
+def record_success(url, key, result, started, timings):
+    """Metrics, cache store and history for a new result"""
+    ANALYSES_TOTAL.inc(result='analyzed')
+    ANALYSIS_SECONDS.observe(time.perf_counter() - started, engine=result.get('engine', 'browser'), outcome='ok')
+    
+    result['timings'] = timings.report()
+    with timings.span('cacheStore'):
+        result_cache.put(key, url, result)
+    # Blocked and replayed navigations would skew trends and regression checks, and
+    # history keeps one device per URL so throttled runs don't mix with desktop ones
+    representative = ((result.get('navigation') or {}).get('representative', True)
+                      and (result.get('archive') or {}).get('mode') != 'replay'
+                      and result.get('device', DEFAULT_DEVICE) == DEFAULT_DEVICE)
+    if history_store and representative:
+        try:
+            history_store.record(result)
+        except Exception as e:
+            print(f"History record error: {e}")
+
+def run_analysis(url, options=None, on_phase=None, timings=None):
+    """Main analysis function using Playwright
+
+    on_phase(name, data) is called as navigation, metrics, overview and
+    scores become available; with runs > 1 a 'sample' phase follows each run.
+    mode=static never starts a browser; mode=auto only does when the
+    markup looks client-rendered. Phase durations are added to `timings`.
+    """
+    options = options or parse_options({})
+    timings = timings or Timings()
+    # Politeness towards the target: only a few navigations per origin at once
+    with origin_limiter.slot(origin_of(url)) as waited:
+        timings.add('originWait', waited)
+        ORIGIN_WAIT_SECONDS.observe(waited)
+        return _run_analysis(url, options, on_phase, timings)
+
+def _run_analysis(url, options, on_phase, timings):
+    escalated = None
+    # An archive records or replays a browser navigation and an emulated device needs one,
+    # so auto goes straight to the browser
+    if options['mode'] != 'browser' and not options.get('archive') and options['device'] == DEFAULT_DEVICE:
+        try:
+            with timings.span('staticFetch'):
+                sample = collect_static(url, collector_sections(options['fields'], options.get('links')))
+        except (NotHtmlError, requests.RequestException) as e:
+            if options['mode'] == 'static':
+                raise Exception(f"Failed to load or analyze page: {str(e)}") from e
+            escalated = str(e)
+        else:
+            escalated = escalation_reason(options, sample)
+            if not escalated:
+                return build_result(url, options, [sample], on_phase, timings)
+    
+    archive_options, replay = archive_setup(options, timings)
+    context_options = device_context_options(options['device'], archive_options)
+    pool = get_pool()
+    if options['runs'] > 1:
+        result = pool.run(lambda context: analyze_sampled(context, url, options, on_phase, timings),
+                          context_options=context_options, on_timing=timings.add)
+    else:
+        def analyze_new_page(context):
+            if replay:
+                replay.install(context)
+            with timings.span('newPage'):
+                page = context.new_page()
+            return analyze_page(page, url, options, on_phase, timings)
+        try:
+            result = pool.run(analyze_new_page, context_options=context_options, on_timing=timings.add)
+        except Exception:
+            archive_discard(archive_options)
+            raise
+    archive_finish(url, result, archive_options, replay, timings)
+    if escalated:
+        result['escalated'] = escalated
+    return result
+
+def get_archive_store(create=True):
+    """The archive store, opened on first use so importing the app creates no archives/ directory.
+
+    With create=False an existing directory is opened and None returned otherwise.
+    """
+    global _archive_store
+    with _archive_store_lock:
+        if _archive_store is None and (create or os.path.isdir(ARCHIVE_DIR)):
+            _archive_store = ArchiveStore(ARCHIVE_DIR)
+        return _archive_store
+
+def archive_setup(options, timings):
+    """(context options, replay router) for options['archive']"""
+    if options.get('archive') == 'record':
+        # Playwright writes the HAR when the pool closes the context
+        return {'record_har_path': get_archive_store().recording_path(), 'record_har_content': 'embed'}, None
+    if options.get('archive') == 'replay':
+        with timings.span('replayLoad'):
+            return None, ReplayRouter(get_archive_store(), options['archiveId'])
+    return None, None
+
+def archive_discard(context_options):
+    """Remove the HAR of a recording whose analysis failed"""
+    if context_options:
+        try:
+            os.remove(context_options['record_har_path'])
+        except OSError:
+            pass
+
+def archive_finish(url, result, context_options, replay, timings):
+    if replay:
+        result['archive'] = replay.report()
+    elif context_options:
+        try:
+            with timings.span('archive'):
+                result['archive'] = dict(get_archive_store().ingest(url, context_options['record_har_path']), mode='record')
+        except (OSError, ValueError, KeyError) as e:
+            print(f"Archive record error: {e}")
+            result['archive'] = {'mode': 'record', 'error': str(e)}
+
+def escalation_reason(options, sample):
+    """Why auto mode still needs a browser after a static fetch, or None"""
+    if options['mode'] != 'auto':
+        return None
+    status = sample['document']['status']
+    if status >= 400:
+        return f"HTTP {status} for the static fetch"
+    return sample['clientRendered']
+
+def analyze_page(page, url, options, on_phase=None, timings=None):
+    """Collect metrics and checks for an already opened page"""
+    try:
+        sample = collect_sample(page, url, options, timings=timings)
+        return build_result(url, options, [sample], on_phase, timings)
+    except Exception as e:
+        raise Exception(f"Failed to load or analyze page: {str(e)}") from e
+
+def analyze_sampled(context, url, options, on_phase=None, timings=None):
+    """Load the page options['runs'] times on one browser and score the medians"""
+    runs = options['runs']
+    
+    def collect(page, index, is_last):
+        try:
+            sample = collect_sample(page, url, options, take_screenshot=is_last, timings=timings)
+        finally:
+            page.close()
+        if on_phase:
+            on_phase('sample', {
+                'run': index + 1 if index is not None else None,
+                'runs': runs,
+                'priming': index is None,
+                'loadTime': f"{sample['loadTime']:.2f}s",
+                'status': sample['document']['status']
+            })
+        return sample
+    
+    try:
+        samples = run_samples(context, runs, options['runMode'], collect,
+                              context_options=device_context_options(options['device']))
+        return build_result(url, options, samples, on_phase, timings)
+    except Exception as e:
+        raise Exception(f"Failed to load or analyze page: {str(e)}") from e
+
+def collect_sample(page, url, options, take_screenshot=True, timings=None):
+    """Navigate once and gather everything the scoring needs from the page"""
+    timings = timings or Timings()
+    
+    # Navigation timing; every request is recorded from here on
+    with timings.span('instrument'):
+        settle_tracker = SettleTracker(page)
+        network_recorder = NetworkRecorder(page)
+        blocker = RequestBlocker(page, options['navigation'], options['block'])
+        coverage = CoverageRecorder(page) if options.get('coverage') else None
+        install_vitals(page)
+        # CPU and network throttling stay on until the page closes
+        throttle_page(page, options['device'])
+    start_time = time.time()
+    with timings.span('goto'):
+        response = page.goto(url, wait_until='domcontentloaded', timeout=30000)
+    load_time = time.time() - start_time
+    
+    document = document_info(response)
+    
+    # Wait for page to settle
+    with timings.span('settle'):
+        settle = settle_tracker.wait(options['settle'])
+    with timings.span('network'):
+        network = network_recorder.finish()
+    if coverage:
+        with timings.span('coverage'):
+            coverage_report = coverage.finish()
+    
+    # Take screenshot; its file is written while the page data is collected
+    screenshot = None
+    if take_screenshot and options['screenshot'] and wants(options['fields'], 'screenshot'):
+        try:
+            with timings.span('screenshot'):
+                screenshot = screenshot_store.capture(page, options['screenshot'])
+        except Exception as e:
+            print(f"Screenshot error: {e}")
+    
+    # Collect everything from the page in one round-trip
+    with timings.span('collect'):
+        page_data = collect_page_data(page, load_time, collector_sections(options['fields'], options.get('links')))
+    screenshot_url = screenshot.result() if screenshot else None
+    page_data['network'] = network
+    page_data['thirdParty'] = summarize_third_parties(url, network, page_data['scriptTiming'])
+    if coverage:
+        page_data['coverage'] = coverage_report
     return {
-        'performance': perf_score,
-        'seo': seo_score,
-        'accessibility': access_score,
-        'bestPractices': bp_score
+        'loadTime': load_time,
+        'document': document,
+        'settle': settle,
+        'screenshot': screenshot_url,
+        'pageData': page_data,
+        'navigation': blocker.report()
+    }
+
+def document_info(response):
+    """Status and validators of the main document; validators let the cache revalidate cheaply later"""
+    headers = response.headers if response else {}
+    return {
+        'status': response.status if response else None,
+        'contentType': headers.get('content-type'),
+        'etag': headers.get('etag'),
+        'lastModified': headers.get('last-modified')
+    }
+
+def build_result(url, options, samples, on_phase=None, timings=None):
+    """Score one or more samples of the same URL; timings use the median across samples"""
+    last = samples[-1]
+    page_data = last['pageData']
+    page_info = page_data['pageInfo']
+    network = page_data['network']
+    resource_breakdown = resource_counts(network)
+    site_overview = page_data['overview']
+    load_time = last['loadTime']
+    
+    # Raw numbers every scoring rule reads; stored so results can be re-scored later
+    raw_metrics = build_raw_metrics(url, page_data)
+    sampling = None
+    if len(samples) > 1:
+        raw_samples = [build_raw_metrics(url, sample['pageData']) for sample in samples]
+        stats, medians = aggregate(raw_samples)
+        raw_metrics.update(medians)
+        load_times = [sample['loadTime'] for sample in samples]
+        load_time = statistics.median(load_times)
+        stats['loadTime'] = summarize([value * 1000 for value in load_times])
+        sampling = {'runs': len(samples), 'mode': options['runMode'], 'stats': stats}
+    
+    if on_phase:
+        on_phase('navigation', {
+            'status': last['document']['status'],
+            'loadTime': f"{load_time:.2f}s",
+            'screenshot': last['screenshot'],
+            'pageInfo': page_info
+        })
+    
+    def ms(value):
+        return f"{value:.0f}ms" if value is not None else 'n/a'
+    
+    metrics = {
+        'ttfb': ms(raw_metrics['ttfb']),
+        'fcp': ms(raw_metrics['fcp']),
+        'domLoad': ms(raw_metrics['domLoad']),
+        'pageLoad': ms(raw_metrics['pageLoad']),
+        'lcp': ms(raw_metrics['lcp']),
+        'cls': f"{raw_metrics['cls']:.3f}" if raw_metrics['cls'] is not None else 'n/a',
+        'tbt': ms(raw_metrics['tbt']),
+        'inp': ms(raw_metrics['inp']),
+        'longTasks': raw_metrics['longTasks'],
+        'networkRequests': raw_metrics['networkRequests'],
+        'pageSize': f"{raw_metrics['pageSize']:.2f} KB" if network else 'n/a',
+        'decodedSize': f"{network['decodedBytes'] / 1024:.2f} KB" if network else 'n/a',
+        'loadTime': f"{load_time:.2f}s",
+        'cssFiles': resource_breakdown['css'],
+        'jsFiles': resource_breakdown['js'],
+        'imageCount': resource_breakdown['images'],
+        'fontFiles': resource_breakdown['fonts']
     }
+    if on_phase:
+        on_phase('metrics', metrics)
+        if wants(options['fields'], 'overview'):
+            # Counts only: the lists arrive, windowed, with the result
+            on_phase('overview', {name: value for name, value in site_overview.items()
+                                  if not isinstance(value, list)})
+    
+    # Score the raw numbers with the rule engine
+    # Compact results are for machines: no issue or reason text is formatted
+    compact = options['compact']
+    with (timings or Timings()).span('score'):
+        evaluation = evaluate(raw_metrics, options['profile'], messages=not compact, device=options['device'])
+    scores = evaluation['scores']
+    engine = last.get('engine', 'browser')
+    if engine == 'static':
+        # No check in the performance category can run without a browser
+        scores['performance'] = None
+    issues = evaluation['issues']
+    navigation = last.get('navigation')
+    if navigation and not navigation['representative'] and not compact:
+        issues.insert(0, {
+            'title': 'Performance metrics not representative',
+            'description': f"The {navigation['profile']} navigation profile blocked "
+                           f"{navigation['blockedRequests']} requests",
+            'severity': 'warning',
+            'impact': 'Timings, request counts and page weight understate a real visit'
+        })
+    detailed_breakdown = evaluation['breakdown']
+    if on_phase:
+        on_phase('scores', {'scores': scores, 'issues': issues, 'breakdown': detailed_breakdown})
+    
+    result = {
+        'url': url,
+        'timestamp': time.strftime('%Y-%m-%d %H:%M:%S'),
+        'pageInfo': page_info,
+        'screenshot': last['screenshot'],
+        'scores': scores,
+        'metrics': metrics,
+        'issues': issues,
+        'breakdown': detailed_breakdown,
+        'overview': site_overview,
+        'settle': last['settle'],
+        'document': last['document'],
+        'network': network,
+        'vitals': page_data['vitals'],
+        'profile': options['profile'],
+        'device': options['device'],
+        'rawMetrics': raw_metrics
+    }
+    if compact:
+        del result['metrics'], result['issues']
+    if sampling:
+        result['sampling'] = sampling
+    if navigation:
+        result['navigation'] = navigation
+    if options.get('links'):
+        result['links'] = page_data.get('links', [])
+    if page_data.get('coverage'):
+        result['coverage'] = page_data['coverage']
+    if page_data.get('thirdParty'):
+        result['thirdParty'] = page_data['thirdParty']
+    if engine != 'browser':
+        result['static'] = last['static']
+    result['engine'] = engine
+    return result
+
+job_manager = JobManager(
+    analyze_cached,
+    concurrency=int(os.environ.get('ANALYZER_JOB_WORKERS', 2)),
+    max_pending=int(os.environ.get('ANALYZER_JOB_MAX_PENDING', 100)),
+    retention=int(os.environ.get('ANALYZER_JOB_RETENTION', 3600)),
+    shape=shape_result
+)
+
+if MONITOR_CONFIG:
+    # Every process that imports the app runs its own scheduler: use one worker,
+    # or run `python monitor.py run` as a separate process instead
+    monitor_config = load_monitor_config(MONITOR_CONFIG, parse_options)
+    monitor_scheduler = MonitorScheduler(monitor_config['monitors'], analyze_cached, breach_store,
+                                         concurrency=monitor_config['concurrency'],
+                                         jitter=monitor_config['jitter']).start()
 
 if __name__ == '__main__':
     print("🚀 Website Analyzer Starting...")
@@ -0,0 +1,433 @@
+import argparse
+import base64
+import gzip
+import hashlib
+import json
+import os
+import sqlite3
+import sys
+import threading
+import time
+import uuid
+from collections import deque
+
+from urls import normalize_url
+
+ARCHIVE_MODES = ('record', 'replay')
+
+# The stored body is decoded, so these would describe the wrong bytes on replay
+WIRE_HEADERS = ('content-encoding', 'content-length', 'transfer-encoding')
+
+# Categories whose scores only depend on the page's markup, not on timings
+REPLAY_CATEGORIES = ('seo', 'accessibility', 'bestPractices')
+
+# Unrecorded URLs listed in a replay report
+MAX_MISSING_URLS = 20
+
+# gc() leaves bodies younger than this, which a recording being ingested may still reference
+GC_GRACE_SECONDS = 3600
+
+
+class ArchiveNotFound(LookupError):
+    """Raised when a replay names an archive that doesn't exist, or the URL has none"""
+
+
+class ArchiveStore:
+    """Recorded navigations as HAR manifests over a shared, content-addressed body store.
+
+    Bodies are gzipped under their SHA-256, so a stylesheet or script served
+    on every page of a site is stored once however many archives reference
+    it. A manifest is the recorded HAR 1.2 log with each body replaced by
+    its hash (`content._sha256`); SQLite indexes the archives of each URL.
+    """
+
+    def __init__(self, directory='archives'):
+        self.directory = directory
+        self._blob_dir = os.path.join(directory, 'blobs')
+        self._har_dir = os.path.join(directory, 'har')
+        os.makedirs(self._blob_dir, exist_ok=True)
+        os.makedirs(self._har_dir, exist_ok=True)
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(os.path.join(directory, 'index.db'), check_same_thread=False)
+        self._db.execute('PRAGMA journal_mode=WAL')
+        self._db.execute("""CREATE TABLE IF NOT EXISTS archives (
+            id TEXT PRIMARY KEY,
+            url TEXT NOT NULL,
+            ts REAL NOT NULL,
+            entries INTEGER NOT NULL,
+            bytes INTEGER NOT NULL
+        )""")
+        self._db.execute('CREATE INDEX IF NOT EXISTS idx_archives_url_ts ON archives(url, ts)')
+        self._db.commit()
+
+    def recording_path(self):
+        """Where Playwright should write the HAR of a new recording (record_har_path)"""
+        return os.path.join(self._har_dir, f'recording-{uuid.uuid4().hex}.har')
+
+    def ingest(self, url, har_path):
+        """Move a HAR recorded with embedded bodies into the store and index it; returns its summary"""
+        try:
+            with open(har_path) as f:
+                har = json.load(f)
+        finally:
+            try:
+                os.remove(har_path)
+            except OSError:
+                pass
+
+        archive_id = f"{time.strftime('%Y%m%d%H%M%S')}-{uuid.uuid4().hex[:8]}"
+        total_bytes = new_blobs = stored_bytes = 0
+        entries = har['log']['entries']
+        for entry in entries:
+            content = entry['response'].get('content') or {}
+            text = content.pop('text', None)
+            encoding = content.pop('encoding', None)
+            if text is None:
+                continue
+            body = base64.b64decode(text) if encoding == 'base64' else text.encode()
+            digest, written = self._put_blob(body)
+            content['_sha256'] = digest
+            total_bytes += len(body)
+            if written:
+                new_blobs += 1
+                stored_bytes += written
+
+        with gzip.open(self._manifest_path(archive_id), 'wt') as f:
+            json.dump(har, f, separators=(',', ':'))
+        ts = time.time()
+        with self._lock:
+            self._db.execute('INSERT INTO archives (id, url, ts, entries, bytes) VALUES (?, ?, ?, ?, ?)',
+                             (archive_id, normalize_url(url), ts, len(entries), total_bytes))
+            self._db.commit()
+        return {
+            'id': archive_id,
+            'url': url,
+            'recordedAt': time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(ts)),
+            'entries': len(entries),
+            'bytes': total_bytes,
+            'newBlobs': new_blobs,
+            'storedBytes': stored_bytes
+        }
+
+    def _blob_path(self, digest):
+        return os.path.join(self._blob_dir, digest[:2], f'{digest}.gz')
+
+    def _manifest_path(self, archive_id):
+        return os.path.join(self._har_dir, f'{archive_id}.har.gz')
+
+    def _put_blob(self, body):
+        """(sha256, compressed bytes written); 0 written when the body was already stored"""
+        digest = hashlib.sha256(body).hexdigest()
+        path = self._blob_path(digest)
+        if os.path.exists(path):
+            # Referenced again; keeps it out of gc()'s grace window check
+            os.utime(path)
+            return digest, 0
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        data = gzip.compress(body, compresslevel=6)
+        tmp_path = f'{path}.{threading.get_ident()}.tmp'
+        with open(tmp_path, 'wb') as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+        return digest, len(data)
+
+    def blob(self, digest):
+        with gzip.open(self._blob_path(digest), 'rb') as f:
+            return f.read()
+
+    def manifest(self, archive_id):
+        """The stored HAR of an archive, bodies referenced by hash"""
+        try:
+            with gzip.open(self._manifest_path(os.path.basename(archive_id)), 'rt') as f:
+                return json.load(f)
+        except FileNotFoundError:
+            raise ArchiveNotFound(f'No archive {archive_id}')
+
+    def har(self, archive_id):
+        """A self-contained HAR with every body embedded, for browser devtools and other tools"""
+        har = self.manifest(archive_id)
+        for entry in har['log']['entries']:
+            content = entry['response'].get('content') or {}
+            digest = content.pop('_sha256', None)
+            if digest is not None:
+                content['text'] = base64.b64encode(self.blob(digest)).decode()
+                content['encoding'] = 'base64'
+        return har
+
+    def latest(self, url):
+        """Id of the most recent archive of url, or None"""
+        with self._lock:
+            row = self._db.execute('SELECT id FROM archives WHERE url = ? ORDER BY ts DESC LIMIT 1',
+                                   (normalize_url(url),)).fetchone()
+        return row[0] if row else None
+
+    def list(self, url=None, limit=100):
+        """Archives, newest first; only those of url when given"""
+        query = 'SELECT id, url, ts, entries, bytes FROM archives'
+        args = []
+        if url:
+            query += ' WHERE url = ?'
+            args.append(normalize_url(url))
+        query += ' ORDER BY ts DESC LIMIT ?'
+        args.append(limit)
+        with self._lock:
+            rows = self._db.execute(query, args).fetchall()
+        return [{'id': archive_id, 'url': archive_url, 'recordedAt': time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(ts)),
+                 'entries': entries, 'bytes': size} for archive_id, archive_url, ts, entries, size in rows]
+
+    def urls(self):
+        """Every URL with at least one archive"""
+        with self._lock:
+            return [row[0] for row in self._db.execute('SELECT DISTINCT url FROM archives ORDER BY url')]
+
+    def delete(self, archive_id):
+        """Drop an archive; its bodies stay until gc() finds them unreferenced"""
+        with self._lock:
+            deleted = self._db.execute('DELETE FROM archives WHERE id = ?', (archive_id,)).rowcount
+            self._db.commit()
+        try:
+            os.remove(self._manifest_path(os.path.basename(archive_id)))
+        except OSError:
+            pass
+        return bool(deleted)
+
+    def gc(self):
+        """Delete bodies no manifest references any more"""
+        referenced = set()
+        for name in os.listdir(self._har_dir):
+            if name.endswith('.har.gz'):
+                har = self.manifest(name[:-len('.har.gz')])
+                referenced.update(entry['response'].get('content', {}).get('_sha256')
+                                  for entry in har['log']['entries'])
+        removed = freed = 0
+        cutoff = time.time() - GC_GRACE_SECONDS
+        for root, _, files in os.walk(self._blob_dir):
+            for name in files:
+                if name[:-len('.gz')] in referenced:
+                    continue
+                path = os.path.join(root, name)
+                try:
+                    if os.path.getmtime(path) > cutoff:
+                        continue
+                    size = os.path.getsize(path)
+                    os.remove(path)
+                    removed += 1
+                    freed += size
+                except OSError:
+                    pass
+        return {'removedBlobs': removed, 'freedBytes': freed}
+
+    def stats(self):
+        blobs = stored = 0
+        for root, _, files in os.walk(self._blob_dir):
+            for name in files:
+                blobs += 1
+                stored += os.path.getsize(os.path.join(root, name))
+        with self._lock:
+            archives, urls, total = self._db.execute(
+                'SELECT COUNT(*), COUNT(DISTINCT url), COALESCE(SUM(bytes), 0) FROM archives').fetchone()
+        return {'archives': archives, 'urls': urls, 'bodyBytes': total, 'blobs': blobs, 'storedBytes': stored}
+
+
+class ReplayRouter:
+    """Answers a browser context's requests from an archive, never from the network.
+
+    Requests are matched on method and URL; a URL recorded several times
+    is served in recorded order, its last response repeating. Anything
+    that wasn't recorded is aborted and counted. Bodies are loaded up
+    front, so serving doesn't touch the disk.
+    """
+
+    def __init__(self, store, archive_id):
+        self.archive_id = archive_id
+        self._responses = {}
+        for entry in store.manifest(archive_id)['log']['entries']:
+            response = entry['response']
+            # A fresh context has no cache to revalidate, and failed requests should fail again
+            if response['status'] == 304 or response['status'] <= 0:
+                continue
+            digest = (response.get('content') or {}).get('_sha256')
+            headers = {}
+            for header in response.get('headers', []):
+                name = header['name'].lower()
+                if name in WIRE_HEADERS:
+                    continue
+                # fulfill() takes one value per header; repeated ones are joined as on the wire
+                headers[name] = f"{headers[name]}\n{header['value']}" if name in headers else header['value']
+            key = (entry['request']['method'], entry['request']['url'])
+            self._responses.setdefault(key, deque()).append({
+                'status': response['status'],
+                'headers': headers,
+                'body': store.blob(digest) if digest else b''
+            })
+        self.served = 0
+        self.missing = []
+
+    def install(self, context):
+        context.route('**/*', self._handle)
+
+    async def install_async(self, context):
+        await context.route('**/*', self._handle_async)
+
+    def _lookup(self, request):
+        recorded = self._responses.get((request.method, request.url))
+        if not recorded:
+            self.missing.append(request.url)
+            return None
+        self.served += 1
+        return recorded.popleft() if len(recorded) > 1 else recorded[0]
+
+    def _handle(self, route):
+        response = self._lookup(route.request)
+        if response is None:
+            route.abort('internetdisconnected')
+        else:
+            route.fulfill(**response)
+
+    async def _handle_async(self, route):
+        response = self._lookup(route.request)
+        if response is None:
+            await route.abort('internetdisconnected')
+        else:
+            await route.fulfill(**response)
+
+    def report(self):
+        return {
+            'mode': 'replay',
+            'id': self.archive_id,
+            'served': self.served,
+            'missing': len(self.missing),
+            'missingUrls': self.missing[:MAX_MISSING_URLS]
+        }
+
+
+def diff_results(before, after, categories=REPLAY_CATEGORIES):
+    """Score and per-check status changes between two results of the same page"""
+    changes = []
+    for category in categories:
+        old_score = (before.get('scores') or {}).get(category)
+        new_score = (after.get('scores') or {}).get(category)
+        if old_score != new_score:
+            changes.append({'category': category, 'check': None, 'before': old_score, 'after': new_score})
+        old_checks = {item['check']: item['status'] for item in (before.get('breakdown') or {}).get(category, [])}
+        new_checks = {item['check']: item['status'] for item in (after.get('breakdown') or {}).get(category, [])}
+        for check in sorted(set(old_checks) | set(new_checks)):
+            if old_checks.get(check) != new_checks.get(check):
+                changes.append({'category': category, 'check': check,
+                                'before': old_checks.get(check), 'after': new_checks.get(check)})
+    return changes
+
+
+def _load_results(path):
+    """url -> result from an NDJSON file written by `archive.py replay` or batch.py"""
+    results = {}
+    with open(path) as f:
+        for line in f:
+            record = json.loads(line)
+            if record.get('status') == 'ok':
+                results[normalize_url(record['url'])] = record['result']
+    return results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Inspect archived navigations and re-analyze them offline')
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    listing = commands.add_parser('list', help='List archives, newest first')
+    listing.add_argument('--url', help='Only archives of this URL')
+    listing.add_argument('--limit', type=int, default=100)
+
+    replay = commands.add_parser('replay', help='Re-analyze the latest archive of every archived URL')
+    replay.add_argument('--url', action='append', help='Only this URL (repeatable)')
+    replay.add_argument('-w', '--workers', type=int, default=4, help='Concurrent analyses (default: 4)')
+    replay.add_argument('--profile', help='Scoring profile (default: default)')
+    replay.add_argument('-o', '--output', help='Write NDJSON results here instead of stdout')
+    replay.add_argument('--baseline', help='NDJSON from an earlier replay; exit 1 when scores or checks differ')
+    replay.add_argument('--categories', default=','.join(REPLAY_CATEGORIES),
+                        help='Categories compared against the baseline (default: %(default)s)')
+
+    export = commands.add_parser('export', help='Write an archive as a self-contained HAR file')
+    export.add_argument('id')
+    export.add_argument('-o', '--output', help='HAR file (default: stdout)')
+
+    delete = commands.add_parser('delete', help='Delete archives')
+    delete.add_argument('ids', nargs='+')
+
+    commands.add_parser('gc', help='Delete stored bodies no archive references')
+    commands.add_parser('stats', help='Archive count and storage used')
+    args = parser.parse_args(argv)
+
+    store = ArchiveStore(os.environ.get('ANALYZER_ARCHIVE_DIR', 'archives'))
+    if args.command == 'list':
+        for archive in store.list(args.url, args.limit):
+            print(json.dumps(archive))
+    elif args.command == 'export':
+        har = json.dumps(store.har(args.id))
+        if args.output:
+            with open(args.output, 'w') as f:
+                f.write(har)
+        else:
+            print(har)
+    elif args.command == 'delete':
+        for archive_id in args.ids:
+            if not store.delete(archive_id):
+                print(f'No archive {archive_id}', file=sys.stderr)
+    elif args.command == 'gc':
+        print(json.dumps(store.gc()))
+    elif args.command == 'stats':
+        print(json.dumps(store.stats()))
+    elif args.command == 'replay':
+        return _replay(store, args)
+    return 0
+
+
+def _replay(store, args):
+    urls = args.url or store.urls()
+    # Replays are served from disk: no history, no cache, one browser per worker
+    os.environ['ANALYZER_HISTORY_DB'] = ''
+    os.environ.setdefault('ANALYZER_POOL_SIZE', str(args.workers))
+    os.environ.setdefault('ANALYZER_POOL_MAX_QUEUE', str(args.workers))
+    os.environ.setdefault('ANALYZER_ORIGIN_CONCURRENCY', str(args.workers))
+    from app import analyze_cached, parse_options
+    from batch import run_batch
+    options = parse_options({'archive': 'replay', 'cache': 'bypass', 'screenshot': False, 'profile': args.profile})
+    baseline = _load_results(args.baseline) if args.baseline else None
+    categories = [name.strip() for name in args.categories.split(',') if name.strip()]
+
+    out = open(args.output, 'w') if args.output else sys.stdout
+    summary = {}
+    changed = 0
+    try:
+        for record in run_batch(urls, lambda url: analyze_cached(url, options), workers=args.workers):
+            if 'summary' in record:
+                summary = record['summary']
+                continue
+            if record['status'] == 'error':
+                print(f"Failed: {record['url']}: {record['error']}", file=sys.stderr)
+            elif baseline is not None:
+                before = baseline.get(normalize_url(record['url']))
+                if before is None:
+                    print(f"New: {record['url']} (not in baseline)", file=sys.stderr)
+                else:
+                    changes = diff_results(before, record['result'], categories)
+                    if changes:
+                        changed += 1
+                        record['changes'] = changes
+                        for change in changes:
+                            label = f"{change['category']}/{change['check']}" if change['check'] else change['category']
+                            print(f"Changed: {record['url']}: {label} {change['before']} -> {change['after']}",
+                                  file=sys.stderr)
+            out.write(json.dumps(record) + '\n')
+            out.flush()
+    finally:
+        if args.output:
+            out.close()
+
+    print(f"{summary.get('succeeded', 0)}/{summary.get('total', 0)} archives replayed in "
+          f"{summary.get('durationSeconds', 0)}s" + (f", {changed} changed" if baseline is not None else ''),
+          file=sys.stderr)
+    return 1 if summary.get('failed') or changed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
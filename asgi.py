@@ -0,0 +1,244 @@
+"""ASGI entry point: `uvicorn asgi:app`.
+
+POST /api/analyze runs on the asyncio engine, so one worker process keeps
+hundreds of analyses in flight without a thread each. Every other route
+(jobs, batch, crawl, history, metrics, the UI) is served by the Flask app
+through a WSGI bridge on a thread pool, streaming responses included.
+"""
+import asyncio
+import io
+import json
+import os
+import sys
+import threading
+import time
+import traceback
+from concurrent.futures import ThreadPoolExecutor
+
+from werkzeug.datastructures import Headers
+from werkzeug.http import parse_accept_header
+
+from app import app as flask_app, validate_url, parse_options, shape_result
+from archive import ArchiveNotFound
+from async_engine import analyze_cached_async
+from browser_pool import PoolBusyError, current_pool, current_async_pool
+from cache import CacheMiss
+from payload import parse_limit, negotiate_encoding, compress, COMPRESS_MIN_BYTES
+from telemetry import PHASE_SECONDS
+
+# Threads running bridged Flask requests; a streaming response holds one until it ends
+WSGI_THREADS = int(os.environ.get('ANALYZER_ASGI_WSGI_THREADS', 32))
+# Bridged response chunks buffered ahead of a slow client
+STREAM_BUFFER = 16
+
+_executor = ThreadPoolExecutor(max_workers=WSGI_THREADS, thread_name_prefix='wsgi-bridge')
+_END = object()
+
+
+async def app(scope, receive, send):
+    if scope['type'] == 'lifespan':
+        await _lifespan(receive, send)
+    elif scope['type'] != 'http':
+        return
+    elif scope['path'] == '/api/analyze' and scope['method'] == 'POST':
+        await _analyze(scope, receive, send)
+    else:
+        await _bridge(scope, receive, send)
+
+
+async def _lifespan(receive, send):
+    while True:
+        message = await receive()
+        if message['type'] == 'lifespan.startup':
+            await send({'type': 'lifespan.startup.complete'})
+        elif message['type'] == 'lifespan.shutdown':
+            pool = current_async_pool()
+            if pool is not None:
+                await pool.shutdown()
+            if current_pool() is not None:
+                current_pool().shutdown()
+            await send({'type': 'lifespan.shutdown.complete'})
+            return
+
+
+async def _read_body(receive):
+    chunks = []
+    while True:
+        message = await receive()
+        if message['type'] == 'http.disconnect':
+            return None
+        chunks.append(message.get('body', b''))
+        if not message.get('more_body'):
+            return b''.join(chunks)
+
+
+def _header(scope, name):
+    for key, value in scope['headers']:
+        if key == name:
+            return value.decode('latin-1')
+    return None
+
+
+async def _send_json(scope, send, payload, status=200, headers=None):
+    """JSON the way Flask's jsonify writes it, compressed like app.compress_response"""
+    body = (json.dumps(payload, sort_keys=True, separators=(',', ':')) + '\n').encode()
+    response_headers = [(b'content-type', b'application/json'), (b'access-control-allow-origin', b'*')]
+    encoding = negotiate_encoding(parse_accept_header(_header(scope, b'accept-encoding'))) \
+        if len(body) >= COMPRESS_MIN_BYTES else None
+    if encoding is not None:
+        body = compress(body, encoding)
+        response_headers += [(b'content-encoding', encoding.encode()), (b'vary', b'Accept-Encoding')]
+    response_headers.append((b'content-length', str(len(body)).encode()))
+    for name, value in (headers or {}).items():
+        response_headers.append((name.lower().encode(), value.encode()))
+    await send({'type': 'http.response.start', 'status': status, 'headers': response_headers})
+    await send({'type': 'http.response.body', 'body': body})
+
+
+async def _analyze(scope, receive, send):
+    """app.analyze_website() without a thread: same validation, errors and response"""
+    body = await _read_body(receive)
+    if body is None:
+        return
+    try:
+        data = json.loads(body or b'null')
+    except ValueError:
+        return await _send_json(scope, send, {'error': 'Request body must be JSON'}, 400)
+    if not isinstance(data, dict):
+        return await _send_json(scope, send, {'error': 'Request body must be a JSON object'}, 400)
+
+    url = data.get('url')
+    error = validate_url(url)
+    if error:
+        return await _send_json(scope, send, {'error': error}, 400)
+    try:
+        options = parse_options(data)
+        limit = parse_limit(data.get('limit'))
+    except ValueError as e:
+        return await _send_json(scope, send, {'error': str(e)}, 400)
+
+    try:
+        results = await analyze_cached_async(url, options)
+    except CacheMiss as e:
+        return await _send_json(scope, send, {'error': str(e)}, 504)
+    except ArchiveNotFound as e:
+        return await _send_json(scope, send, {'error': str(e)}, 404)
+    except PoolBusyError as e:
+        return await _send_json(scope, send, {'error': f'Analyzer busy: {str(e)}'}, 503, {'Retry-After': '5'})
+    except Exception as e:
+        print(f"Error: {str(e)}")
+        print(traceback.format_exc())
+        return await _send_json(scope, send, {'error': f'Analysis failed: {str(e)}'}, 500)
+    started = time.perf_counter()
+    shaped = shape_result(url, results, options, limit)
+    await _send_json(scope, send, shaped)
+    PHASE_SECONDS.observe(time.perf_counter() - started, phase='serialize')
+
+
+def _environ(scope, body):
+    server = scope.get('server') or ('localhost', 80)
+    client = scope.get('client') or ('', 0)
+    environ = {
+        'REQUEST_METHOD': scope['method'],
+        'SCRIPT_NAME': scope.get('root_path', '').encode().decode('latin-1'),
+        'PATH_INFO': scope['path'].encode().decode('latin-1'),
+        'QUERY_STRING': scope['query_string'].decode('latin-1'),
+        'SERVER_NAME': server[0],
+        'SERVER_PORT': str(server[1]),
+        'SERVER_PROTOCOL': f"HTTP/{scope.get('http_version', '1.1')}",
+        'REMOTE_ADDR': client[0],
+        'REMOTE_PORT': str(client[1]),
+        'wsgi.version': (1, 0),
+        'wsgi.url_scheme': scope.get('scheme', 'http'),
+        'wsgi.input': io.BytesIO(body),
+        'wsgi.input_terminated': True,
+        'wsgi.errors': sys.stderr,
+        'wsgi.multithread': True,
+        'wsgi.multiprocess': False,
+        'wsgi.run_once': False,
+    }
+    for key, value in scope['headers']:
+        name = key.decode('latin-1').upper().replace('-', '_')
+        value = value.decode('latin-1')
+        if name not in ('CONTENT_TYPE', 'CONTENT_LENGTH'):
+            name = f'HTTP_{name}'
+        environ[name] = f'{environ[name]},{value}' if name in environ else value
+    environ.setdefault('CONTENT_LENGTH', str(len(body)))
+    return environ
+
+
+def _run_wsgi(environ, loop, chunks, disconnected):
+    """Run the Flask app on a bridge thread, handing (status, headers) then body chunks to the loop"""
+    def put(item):
+        asyncio.run_coroutine_threadsafe(chunks.put(item), loop).result()
+
+    def start_response(status, headers, exc_info=None):
+        put((int(status.split(' ', 1)[0]), headers))
+
+    try:
+        iterable = flask_app(environ, start_response)
+        try:
+            for chunk in iterable:
+                if disconnected.is_set():
+                    break
+                if chunk:
+                    put(chunk)
+        finally:
+            if hasattr(iterable, 'close'):
+                iterable.close()
+    except Exception as e:
+        print(f"WSGI bridge error: {e}")
+        put(e)
+    finally:
+        put(_END)
+
+
+async def _bridge(scope, receive, send):
+    body = await _read_body(receive)
+    if body is None:
+        return
+    loop = asyncio.get_running_loop()
+    chunks = asyncio.Queue(STREAM_BUFFER)
+    disconnected = threading.Event()
+
+    async def watch_disconnect():
+        while (await receive())['type'] != 'http.disconnect':
+            pass
+        disconnected.set()
+
+    watcher = loop.create_task(watch_disconnect())
+    worker = loop.run_in_executor(_executor, _run_wsgi, _environ(scope, body), loop, chunks, disconnected)
+    started = False
+    try:
+        while True:
+            item = await chunks.get()
+            if item is _END:
+                break
+            if isinstance(item, Exception):
+                if not started:
+                    await send({'type': 'http.response.start', 'status': 500,
+                                'headers': [(b'content-type', b'text/plain')]})
+                    await send({'type': 'http.response.body', 'body': b'Internal Server Error'})
+                    started = True
+                    return
+                continue
+            if isinstance(item, tuple):
+                status, headers = item
+                await send({'type': 'http.response.start', 'status': status,
+                            'headers': [(name.lower().encode('latin-1'), value.encode('latin-1'))
+                                        for name, value in Headers(headers).items()]})
+                started = True
+            elif not disconnected.is_set():
+                # Each chunk goes out as it is produced, so SSE and NDJSON keep streaming
+                await send({'type': 'http.response.body', 'body': item, 'more_body': True})
+        if started:
+            await send({'type': 'http.response.body', 'body': b''})
+    finally:
+        disconnected.set()
+        watcher.cancel()
+        # Let the bridge thread finish putting its last items
+        while not worker.done():
+            try:
+                chunks.get_nowait()
+            except asyncio.QueueEmpty:
+                await asyncio.sleep(0.01)
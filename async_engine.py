@@ -0,0 +1,215 @@
+import asyncio
+import time
+
+import requests
+
+from app import (build_result, cached_result, fresh_result, document_info, escalation_reason, record_failure,
+                 record_success, resolve_archive, archive_setup, archive_discard, archive_finish,
+                 result_cache, screenshot_store, flights, origin_limiter)
+from browser_pool import get_async_pool
+from blocking import AsyncRequestBlocker
+from cache import CacheMiss, cache_key
+from code_coverage import AsyncCoverageRecorder
+from collector import collect_page_data_async, install_vitals_async
+from devices import DEFAULT_DEVICE, device_context_options, throttle_page_async, device_phases, combine_devices
+from network import AsyncNetworkRecorder
+from payload import wants, collector_sections
+from sampling import run_samples_async
+from settle import AsyncSettleTracker
+from static import NotHtmlError, collect_static
+from thirdparty import summarize_third_parties
+from telemetry import ORIGIN_WAIT_SECONDS, Timings, ANALYSES_IN_FLIGHT, ANALYSES_TOTAL
+from urls import origin_of
+
+
+async def analyze_cached_async(url, options, on_phase=None):
+    """app.analyze_cached() on the asyncio engine; shares its cache, flights and origin slots"""
+    if isinstance(options['device'], list):
+        return await analyze_devices_async(url, options, on_phase)
+    timings = Timings()
+    options = await asyncio.to_thread(resolve_archive, url, options)
+    key = cache_key(url, options)
+    if options['cache'] != 'bypass':
+        with timings.span('cacheLookup'):
+            # May revalidate over HTTP or read the disk cache
+            hit = await asyncio.to_thread(result_cache.get, key, url)
+        if hit is not None:
+            return cached_result(hit, timings)
+        if options['cache'] == 'only':
+            ANALYSES_TOTAL.inc(result='cacheMiss')
+            raise CacheMiss(f'No cached result for {url}')
+
+    started = time.perf_counter()
+    result, shared = await flights.do_async(key, lambda: analyze_fresh_async(url, options, key, on_phase, timings))
+    return fresh_result(result, shared, started, timings)
+
+
+async def analyze_devices_async(url, options, on_phase=None):
+    """app.analyze_devices(): every device's run is a concurrent task on the loop"""
+    devices = options['device']
+    results = await asyncio.gather(*(analyze_cached_async(url, dict(options, device=device),
+                                                          device_phases(on_phase, device))
+                                     for device in devices))
+    return combine_devices(url, options['profile'], dict(zip(devices, results)))
+
+
+async def analyze_fresh_async(url, options, key, on_phase=None, timings=None):
+    timings = timings or Timings()
+    ANALYSES_IN_FLIGHT.inc()
+    started = time.perf_counter()
+    try:
+        result = await run_analysis_async(url, options, on_phase, timings)
+    except Exception as e:
+        record_failure(e, options, started)
+        raise
+    finally:
+        ANALYSES_IN_FLIGHT.dec()
+    # Cache store and history writes touch SQLite
+    await asyncio.to_thread(record_success, url, key, result, started, timings)
+    return result
+
+
+async def run_analysis_async(url, options, on_phase=None, timings=None):
+    """app.run_analysis() with every browser call awaited instead of blocking a thread"""
+    timings = timings or Timings()
+    async with origin_limiter.slot_async(origin_of(url)) as waited:
+        timings.add('originWait', waited)
+        ORIGIN_WAIT_SECONDS.observe(waited)
+        return await _run_analysis_async(url, options, on_phase, timings)
+
+
+async def _run_analysis_async(url, options, on_phase, timings):
+    escalated = None
+    if options['mode'] != 'browser' and not options.get('archive') and options['device'] == DEFAULT_DEVICE:
+        try:
+            with timings.span('staticFetch'):
+                sample = await asyncio.to_thread(collect_static, url,
+                                                 collector_sections(options['fields'], options.get('links')))
+        except (NotHtmlError, requests.RequestException) as e:
+            if options['mode'] == 'static':
+                raise Exception(f"Failed to load or analyze page: {str(e)}") from e
+            escalated = str(e)
+        else:
+            escalated = escalation_reason(options, sample)
+            if not escalated:
+                return build_result(url, options, [sample], on_phase, timings)
+
+    # Loading a replay reads the archive's bodies from disk
+    archive_options, replay = await asyncio.to_thread(archive_setup, options, timings)
+    context_options = device_context_options(options['device'], archive_options)
+    pool = get_async_pool()
+    if options['runs'] > 1:
+        result = await pool.run(lambda context: analyze_sampled_async(context, url, options, on_phase, timings),
+                                context_options=context_options, on_timing=timings.add)
+    else:
+        async def analyze_new_page(context):
+            if replay:
+                await replay.install_async(context)
+            with timings.span('newPage'):
+                page = await context.new_page()
+            return await analyze_page_async(page, url, options, on_phase, timings)
+        try:
+            result = await pool.run(analyze_new_page, context_options=context_options, on_timing=timings.add)
+        except Exception:
+            archive_discard(archive_options)
+            raise
+    await asyncio.to_thread(archive_finish, url, result, archive_options, replay, timings)
+    if escalated:
+        result['escalated'] = escalated
+    return result
+
+
+async def analyze_page_async(page, url, options, on_phase=None, timings=None):
+    try:
+        sample = await collect_sample_async(page, url, options, timings=timings)
+        return build_result(url, options, [sample], on_phase, timings)
+    except Exception as e:
+        raise Exception(f"Failed to load or analyze page: {str(e)}") from e
+
+
+async def analyze_sampled_async(context, url, options, on_phase=None, timings=None):
+    runs = options['runs']
+
+    async def collect(page, index, is_last):
+        try:
+            sample = await collect_sample_async(page, url, options, take_screenshot=is_last, timings=timings)
+        finally:
+            await page.close()
+        if on_phase:
+            on_phase('sample', {
+                'run': index + 1 if index is not None else None,
+                'runs': runs,
+                'priming': index is None,
+                'loadTime': f"{sample['loadTime']:.2f}s",
+                'status': sample['document']['status']
+            })
+        return sample
+
+    try:
+        samples = await run_samples_async(context, runs, options['runMode'], collect,
+                                          context_options=device_context_options(options['device']))
+        return build_result(url, options, samples, on_phase, timings)
+    except Exception as e:
+        raise Exception(f"Failed to load or analyze page: {str(e)}") from e
+
+
+async def _timed(timings, phase, awaitable):
+    with timings.span(phase):
+        return await awaitable
+
+
+async def _nothing():
+    return None
+
+
+async def _capture(page, settings, timings):
+    try:
+        written = await _timed(timings, 'screenshot', screenshot_store.capture_async(page, settings))
+        return await asyncio.wrap_future(written)
+    except Exception as e:
+        print(f"Screenshot error: {e}")
+        return None
+
+
+async def collect_sample_async(page, url, options, take_screenshot=True, timings=None):
+    """app.collect_sample(); setup and the post-settle reads overlap instead of running in turn"""
+    timings = timings or Timings()
+
+    settle_tracker = AsyncSettleTracker(page)
+    network_recorder = AsyncNetworkRecorder(page)
+    blocker = AsyncRequestBlocker(page, options['navigation'], options['block'])
+    coverage = AsyncCoverageRecorder(page) if options.get('coverage') else None
+    setup = [settle_tracker.install(), network_recorder.start(), blocker.install(), install_vitals_async(page),
+             throttle_page_async(page, options['device'])]
+    if coverage:
+        setup.append(coverage.start())
+    await _timed(timings, 'instrument', asyncio.gather(*setup))
+    start_time = time.time()
+    with timings.span('goto'):
+        response = await page.goto(url, wait_until='domcontentloaded', timeout=30000)
+    load_time = time.time() - start_time
+    document = document_info(response)
+
+    with timings.span('settle'):
+        settle = await settle_tracker.wait(options['settle'])
+
+    # The network summary, DOM collection, screenshot and coverage don't depend on each other
+    capture = take_screenshot and options['screenshot'] and wants(options['fields'], 'screenshot')
+    network, page_data, screenshot_url, coverage_report = await asyncio.gather(
+        _timed(timings, 'network', network_recorder.finish()),
+        _timed(timings, 'collect', collect_page_data_async(page, load_time,
+                                                           collector_sections(options['fields'], options.get('links')))),
+        _capture(page, options['screenshot'], timings) if capture else _nothing(),
+        _timed(timings, 'coverage', coverage.finish()) if coverage else _nothing())
+    page_data['network'] = network
+    page_data['thirdParty'] = summarize_third_parties(url, network, page_data['scriptTiming'])
+    if coverage:
+        page_data['coverage'] = coverage_report
+    return {
+        'loadTime': load_time,
+        'document': document,
+        'settle': settle,
+        'screenshot': screenshot_url,
+        'pageData': page_data,
+        'navigation': blocker.report()
+    }
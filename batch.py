@@ -0,0 +1,188 @@
+import argparse
+import json
+import multiprocessing
+import os
+import sys
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, ThreadPoolExecutor, wait
+
+from archive import ARCHIVE_MODES
+from cache import CACHE_MODES
+from devices import DEVICE_PROFILES
+from sampling import SAMPLE_MODES
+from static import ENGINE_MODES
+from blocking import NAVIGATION_PROFILES
+from settle import SETTLE_PROFILES
+from payload import MAX_LIMIT
+
+
+def parse_url_list(text):
+    """Accept either a JSON array of URLs or one URL per line ('#' starts a comment)"""
+    text = text.strip()
+    if text.startswith('['):
+        urls = json.loads(text)
+        if not all(isinstance(url, str) for url in urls):
+            raise ValueError('URL list must contain only strings')
+        return [url.strip() for url in urls if url.strip()]
+    urls = []
+    for line in text.splitlines():
+        line = line.strip()
+        if line and not line.startswith('#'):
+            urls.append(line)
+    return urls
+
+
+def run_batch(urls, runner, workers=4, processes=False, validate=None, options=None):
+    """Analyze urls concurrently and yield one record per URL in completion order.
+
+    At most `workers` analyses are in flight, so a list of thousands of
+    URLs never floods the browser pool queue. A failing URL yields an
+    error record and the batch carries on. A final summary record closes
+    the stream. In process mode `runner` is ignored and each spawned worker
+    calls app.analyze_cached(url, options) itself.
+    """
+    started = time.time()
+    executor_cls = ProcessPoolExecutor if processes else ThreadPoolExecutor
+    # Spawned, not forked: the parent has usually imported the app, whose SQLite handles
+    # and worker threads must not be inherited by the children
+    kwargs = {'initializer': _init_process, 'mp_context': multiprocessing.get_context('spawn')} if processes else {}
+    succeeded = failed = 0
+
+    with executor_cls(max_workers=workers, **kwargs) as executor:
+        pending = {}
+        remaining = iter(enumerate(urls))
+        exhausted = False
+        while True:
+            # Refill the window, reporting invalid URLs as we pass them
+            while not exhausted and len(pending) < workers:
+                item = next(remaining, None)
+                if item is None:
+                    exhausted = True
+                    break
+                index, url = item
+                error = validate(url) if validate else None
+                if error:
+                    failed += 1
+                    yield {'index': index, 'url': url, 'status': 'error', 'error': error}
+                    continue
+                if processes:
+                    future = executor.submit(_timed_in_process, url, options)
+                else:
+                    future = executor.submit(_timed, runner, url)
+                pending[future] = (index, url)
+
+            if not pending:
+                break
+
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                index, url = pending.pop(future)
+                try:
+                    result, elapsed = future.result()
+                    succeeded += 1
+                    yield {'index': index, 'url': url, 'status': 'ok',
+                           'elapsed': round(elapsed, 3), 'result': result}
+                except Exception as e:
+                    failed += 1
+                    yield {'index': index, 'url': url, 'status': 'error', 'error': str(e)}
+
+    duration = time.time() - started
+    total = succeeded + failed
+    yield {
+        'summary': {
+            'total': total,
+            'succeeded': succeeded,
+            'failed': failed,
+            'workers': workers,
+            'mode': 'processes' if processes else 'threads',
+            'durationSeconds': round(duration, 2),
+            'urlsPerMinute': round(total / duration * 60, 2) if duration > 0 else 0
+        }
+    }
+
+
+def _timed(runner, url):
+    start = time.time()
+    result = runner(url)
+    return result, time.time() - start
+
+
+def _init_process():
+    # One warm browser per worker process unless told otherwise
+    os.environ.setdefault('ANALYZER_POOL_SIZE', '1')
+
+
+def _timed_in_process(url, options):
+    from app import analyze_cached
+    return _timed(lambda process_url: analyze_cached(process_url, options), url)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Analyze many URLs and write NDJSON results')
+    parser.add_argument('source', help="File with a JSON array or one URL per line ('-' for stdin)")
+    parser.add_argument('-w', '--workers', type=int, default=4, help='Concurrent analyses (default: 4)')
+    parser.add_argument('--processes', action='store_true',
+                        help='Run each worker in its own process for CPU isolation')
+    parser.add_argument('-o', '--output', help='Write NDJSON here instead of stdout')
+    parser.add_argument('--settle', choices=list(SETTLE_PROFILES),
+                        help='Page settle strategy (default: balanced)')
+    parser.add_argument('--cache', choices=list(CACHE_MODES),
+                        help='Result cache mode (default: ANALYZER_CACHE_DEFAULT or prefer)')
+    parser.add_argument('--mode', choices=list(ENGINE_MODES),
+                        help='browser (default), static (markup only) or auto')
+    parser.add_argument('--navigation', choices=list(NAVIGATION_PROFILES),
+                        help='full (default) or lite (skip images, media, fonts and trackers)')
+    parser.add_argument('--block', action='append', metavar='PATTERN',
+                        help='URL glob to abort during navigation (repeatable)')
+    parser.add_argument('--runs', type=int, help='Loads per URL; timings are scored on the median (default: 1)')
+    parser.add_argument('--run-mode', choices=list(SAMPLE_MODES), help='cold or warm HTTP cache between runs')
+    parser.add_argument('--fields', help='Comma-separated result fields to collect and output (default: all)')
+    parser.add_argument('--compact', action='store_true', help='Numeric results only: no issue or reason text')
+    parser.add_argument('--archive', choices=list(ARCHIVE_MODES),
+                        help='record each navigation for offline replay, or replay the latest recording')
+    parser.add_argument('--coverage', action='store_true',
+                        help='Record JS/CSS coverage and render-blocking resources')
+    parser.add_argument('--device', action='append', choices=list(DEVICE_PROFILES),
+                        help='Emulated device; repeat to analyze each URL on several devices (default: desktop)')
+    args = parser.parse_args(argv)
+
+    text = sys.stdin.read() if args.source == '-' else open(args.source).read()
+    urls = parse_url_list(text)
+
+    if not args.processes:
+        # Thread mode needs one warm browser per worker to scale
+        os.environ.setdefault('ANALYZER_POOL_SIZE', str(args.workers))
+        os.environ.setdefault('ANALYZER_POOL_MAX_QUEUE', str(args.workers))
+    from app import analyze_cached, parse_options, validate_url, shape_result
+    options = parse_options({'settle': args.settle, 'cache': args.cache,
+                             'runs': args.runs, 'runMode': args.run_mode, 'mode': args.mode,
+                             'navigation': args.navigation, 'block': args.block,
+                             'fields': args.fields, 'compact': args.compact, 'archive': args.archive,
+                             'coverage': args.coverage, 'device': args.device})
+
+    out = open(args.output, 'w') if args.output else sys.stdout
+    summary = {}
+    try:
+        runner = lambda url: analyze_cached(url, options)
+        for record in run_batch(urls, runner, workers=args.workers, processes=args.processes,
+                                validate=validate_url, options=options):
+            if options['fields'] and record.get('result'):
+                record['result'] = shape_result(record['url'], record['result'], options, MAX_LIMIT)
+            out.write(json.dumps(record) + '\n')
+            out.flush()
+            if 'summary' in record:
+                summary = record['summary']
+            elif record['status'] == 'error':
+                print(f"Failed: {record['url']}: {record['error']}", file=sys.stderr)
+    finally:
+        if args.output:
+            out.close()
+
+    print(f"{summary.get('succeeded', 0)}/{summary.get('total', 0)} analyzed in "
+          f"{summary.get('durationSeconds', 0)}s ({summary.get('urlsPerMinute', 0)} URLs/min)",
+          file=sys.stderr)
+    return 1 if summary.get('failed') else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,379 @@
+import argparse
+import json
+import os
+import platform
+import statistics
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+from blocking import NAVIGATION_PROFILES
+from static import ENGINE_MODES
+
+# Synthetic pages from a landing page up to a DOM that strains collection
+FIXTURES = {
+    'tiny': {'elements': 20, 'images': 1, 'scripts': 1, 'stylesheets': 1},
+    'medium': {'elements': 1500, 'images': 60, 'scripts': 15, 'stylesheets': 3},
+    'large': {'elements': 10000, 'images': 500, 'scripts': 100, 'stylesheets': 10},
+    'huge': {'elements': 25000, 'images': 2000, 'scripts': 300, 'stylesheets': 20},
+}
+DEFAULT_FIXTURES = ('tiny', 'medium', 'large')
+
+# 1x1 transparent GIF
+PIXEL = (b'GIF89a\x01\x00\x01\x00\x80\x00\x00\x00\x00\x00\xff\xff\xff!\xf9\x04\x01\x00\x00\x00\x00'
+         b',\x00\x00\x00\x00\x01\x00\x01\x00\x00\x02\x02D\x01\x00;')
+
+# Relative change that counts as a regression when diffing against a baseline
+DEFAULT_THRESHOLD = 0.10
+
+
+def build_fixture(name):
+    """Deterministic HTML for a fixture; every subresource is served by the fixture server"""
+    spec = FIXTURES[name]
+    head = [
+        '<!DOCTYPE html><html lang="en"><head><meta charset="utf-8">',
+        '<meta name="viewport" content="width=device-width, initial-scale=1">',
+        f'<title>Benchmark fixture: {name}</title>',
+        f'<meta name="description" content="Synthetic {name} page for analyzer benchmarks">',
+    ]
+    head += [f'<link rel="stylesheet" href="/css/{i}.css">' for i in range(spec['stylesheets'])]
+    body = ['</head><body><header><h1>Fixture ' + name + '</h1><nav>']
+    body += [f'<a href="/page/{name}?n={i}">Section {i}</a>' for i in range(min(20, spec['elements'] // 10 + 1))]
+    body.append('</nav></header><main>')
+
+    # Spread text blocks, images and scripts through the body so the DOM is wide and deep
+    remaining = max(spec['elements'] - spec['images'] - spec['scripts'], 0)
+    per_section = 50
+    for section in range(0, remaining, per_section):
+        body.append(f'<section id="s{section}"><h2>Section {section}</h2><ul>')
+        body += [f'<li><span>Item {section + i}</span></li>'
+                 for i in range(min(per_section, remaining - section) // 2)]
+        body.append('</ul></section>')
+    body += [f'<img src="/img/{i}.gif" width="1" height="1" alt="Image {i}">' for i in range(spec['images'])]
+    body += [f'<script src="/js/{i}.js" defer></script>' for i in range(spec['scripts'])]
+    body.append('</main><footer><p>End of fixture</p></footer></body></html>')
+    return '\n'.join(head + body).encode()
+
+
+class FixtureServer:
+    """Local HTTP server for the fixtures, so a benchmark never leaves the machine.
+
+    /page/<fixture> serves the page, delayed by the server-wide ttfb (ms)
+    or a per-request ?ttfb= override. /img, /js and /css serve tiny
+    cacheable subresources.
+    """
+
+    def __init__(self, ttfb=0, host='127.0.0.1', port=0):
+        self.ttfb = ttfb
+        self.pages = {name: build_fixture(name) for name in FIXTURES}
+        self.httpd = ThreadingHTTPServer((host, port), self._handler())
+        self.httpd.daemon_threads = True
+        self._thread = None
+
+    @property
+    def base_url(self):
+        host, port = self.httpd.server_address[:2]
+        return f'http://{host}:{port}'
+
+    def url(self, fixture, ttfb=None):
+        query = f'?ttfb={ttfb}' if ttfb is not None else ''
+        return f'{self.base_url}/page/{fixture}{query}'
+
+    def start(self):
+        self._thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+    def _handler(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+
+            def do_GET(self):
+                parsed = urlparse(self.path)
+                parts = parsed.path.strip('/').split('/')
+                if len(parts) == 2 and parts[0] == 'page' and parts[1] in server.pages:
+                    ttfb = parse_qs(parsed.query).get('ttfb', [server.ttfb])[0]
+                    time.sleep(max(float(ttfb), 0) / 1000)
+                    self._send(200, 'text/html; charset=utf-8', server.pages[parts[1]], cache=False)
+                elif len(parts) == 2 and parts[0] == 'img':
+                    self._send(200, 'image/gif', PIXEL)
+                elif len(parts) == 2 and parts[0] == 'js':
+                    self._send(200, 'application/javascript', f'window.__f{parts[1][:-3]}=1;'.encode())
+                elif len(parts) == 2 and parts[0] == 'css':
+                    self._send(200, 'text/css', f'.c{parts[1][:-4]}{{margin:0}}'.encode())
+                elif parsed.path == '/robots.txt':
+                    self._send(200, 'text/plain', b'User-agent: *\nAllow: /\n')
+                else:
+                    self._send(404, 'text/plain', b'Not found')
+
+            def _send(self, status, content_type, body, cache=True):
+                self.send_response(status)
+                self.send_header('Content-Type', content_type)
+                self.send_header('Content-Length', str(len(body)))
+                self.send_header('Cache-Control', 'public, max-age=3600' if cache else 'no-store')
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        return Handler
+
+
+def process_tree_rss_mb(pid=None):
+    """Resident memory of a process and all of its descendants (Linux /proc)"""
+    pid = pid or os.getpid()
+    children = {}
+    try:
+        entries = os.listdir('/proc')
+    except OSError:
+        entries = []
+    for entry in entries:
+        if not entry.isdigit():
+            continue
+        try:
+            with open(f'/proc/{entry}/stat') as f:
+                # The command name may contain spaces; ppid follows the closing paren
+                ppid = int(f.read().rsplit(')', 1)[1].split()[1])
+        except (OSError, ValueError, IndexError):
+            continue
+        children.setdefault(ppid, []).append(int(entry))
+
+    total_kb = 0
+    stack = [pid]
+    while stack:
+        current = stack.pop()
+        stack.extend(children.get(current, []))
+        try:
+            with open(f'/proc/{current}/status') as f:
+                for line in f:
+                    if line.startswith('VmRSS:'):
+                        total_kb += int(line.split()[1])
+                        break
+        except (OSError, ValueError):
+            continue
+    if not total_kb:
+        # Not Linux: fall back to this process's own high-water mark
+        import resource
+        maxrss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return maxrss / (1024 * 1024) if sys.platform == 'darwin' else maxrss / 1024
+    return total_kb / 1024
+
+
+class RssSampler:
+    """Polls process_tree_rss_mb() in the background and keeps the peak"""
+
+    def __init__(self, interval=0.25):
+        self.interval = interval
+        self.peak_mb = 0.0
+        self._stop = threading.Event()
+        self._thread = None
+
+    def __enter__(self):
+        self.peak_mb = process_tree_rss_mb()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+        self.peak_mb = max(self.peak_mb, process_tree_rss_mb())
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            self.peak_mb = max(self.peak_mb, process_tree_rss_mb())
+
+
+def percentile(values, fraction):
+    """Linear-interpolated percentile of values (fraction in 0..1)"""
+    ordered = sorted(values)
+    if not ordered:
+        return None
+    position = (len(ordered) - 1) * fraction
+    lower = int(position)
+    upper = min(lower + 1, len(ordered) - 1)
+    return ordered[lower] + (ordered[upper] - ordered[lower]) * (position - lower)
+
+
+def run_scenario(runner, url, iterations, concurrency):
+    """Run iterations analyses of url with at most concurrency in flight"""
+    latencies = []
+    phases = {}
+    errors = []
+
+    def one(index):
+        # A distinct URL per run, so identical in-flight requests aren't coalesced
+        start = time.perf_counter()
+        result = runner(f"{url}{'&' if '?' in url else '?'}run={index}")
+        return time.perf_counter() - start, result
+
+    started = time.perf_counter()
+    with RssSampler() as rss, ThreadPoolExecutor(max_workers=concurrency) as executor:
+        futures = [executor.submit(one, index) for index in range(iterations)]
+        for future in futures:
+            try:
+                elapsed, result = future.result()
+            except Exception as e:
+                errors.append(str(e))
+                continue
+            latencies.append(elapsed)
+            for phase, ms in ((result.get('timings') or {}).get('phases') or {}).items():
+                phases.setdefault(phase, []).append(ms)
+    duration = time.perf_counter() - started
+
+    return {
+        'iterations': iterations,
+        'concurrency': concurrency,
+        'succeeded': len(latencies),
+        'failed': len(errors),
+        'errors': errors[:5],
+        'p50Ms': _ms(percentile(latencies, 0.5)),
+        'p95Ms': _ms(percentile(latencies, 0.95)),
+        'meanMs': _ms(statistics.fmean(latencies) if latencies else None),
+        'analysesPerMinute': round(len(latencies) / duration * 60, 2) if duration > 0 else 0,
+        'peakRssMb': round(rss.peak_mb, 1),
+        'phasesP50Ms': {phase: round(percentile(values, 0.5), 1) for phase, values in sorted(phases.items())},
+        'durationSeconds': round(duration, 2)
+    }
+
+
+def _ms(seconds):
+    return round(seconds * 1000, 1) if seconds is not None else None
+
+
+def run_benchmark(runner, server, fixtures=DEFAULT_FIXTURES, iterations=5, concurrency=4, warmup=1):
+    """Every fixture sequentially, then concurrently; yields (scenario name, report)"""
+    for fixture in fixtures:
+        url = server.url(fixture)
+        for _ in range(warmup):
+            try:
+                runner(url)
+            except Exception as e:
+                print(f"Warmup failed for {fixture}: {e}", file=sys.stderr)
+        yield f'{fixture}/sequential', run_scenario(runner, url, iterations, 1)
+        if concurrency > 1:
+            yield f'{fixture}/concurrent', run_scenario(runner, url, iterations * concurrency, concurrency)
+
+
+# Metric -> True when a higher value is better
+COMPARED_METRICS = {'p50Ms': False, 'p95Ms': False, 'analysesPerMinute': True, 'peakRssMb': False}
+
+
+def compare(baseline, current, threshold=DEFAULT_THRESHOLD):
+    """Per-scenario deltas between two benchmark reports; regressions exceed threshold"""
+    rows = []
+    for scenario, report in current['scenarios'].items():
+        before = baseline.get('scenarios', {}).get(scenario)
+        if before is None:
+            continue
+        for metric, higher_is_better in COMPARED_METRICS.items():
+            old, new = before.get(metric), report.get(metric)
+            if not old or new is None:
+                continue
+            change = (new - old) / old
+            worse = -change if higher_is_better else change
+            rows.append({
+                'scenario': scenario,
+                'metric': metric,
+                'baseline': old,
+                'current': new,
+                'change': round(change, 4),
+                'regression': worse > threshold
+            })
+    return rows
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Benchmark the analyzer against local synthetic pages')
+    parser.add_argument('--fixtures', default=','.join(DEFAULT_FIXTURES),
+                        help=f"Comma-separated subset of: {', '.join(FIXTURES)} (default: {','.join(DEFAULT_FIXTURES)})")
+    parser.add_argument('-n', '--iterations', type=int, default=5,
+                        help='Sequential analyses per fixture; the concurrent pass runs n x concurrency (default: 5)')
+    parser.add_argument('-c', '--concurrency', type=int, default=4,
+                        help='Analyses in flight for the concurrent pass; 1 skips it (default: 4)')
+    parser.add_argument('--warmup', type=int, default=1, help='Untimed analyses per fixture first (default: 1)')
+    parser.add_argument('--ttfb', type=float, default=0, help='Server delay before each page, in ms (default: 0)')
+    parser.add_argument('--mode', choices=list(ENGINE_MODES), help='Analysis engine (default: browser)')
+    parser.add_argument('--navigation', choices=list(NAVIGATION_PROFILES), help='Navigation profile (default: full)')
+    parser.add_argument('--no-screenshot', action='store_true', help='Skip screenshots')
+    parser.add_argument('-o', '--output', help='Write the JSON report here (e.g. bench-baseline.json)')
+    parser.add_argument('--baseline', help='Earlier JSON report to diff against')
+    parser.add_argument('--threshold', type=float, default=DEFAULT_THRESHOLD,
+                        help='Relative change that fails the run against --baseline (default: 0.10)')
+    parser.add_argument('--serve', action='store_true', help='Only run the fixture server (Ctrl+C to stop)')
+    args = parser.parse_args(argv)
+
+    fixtures = [name.strip() for name in args.fixtures.split(',') if name.strip()]
+    unknown = [name for name in fixtures if name not in FIXTURES]
+    if unknown:
+        parser.error(f"unknown fixtures: {', '.join(unknown)}")
+
+    server = FixtureServer(ttfb=args.ttfb).start()
+    if args.serve:
+        print(f"Serving fixtures at {server.base_url}/page/<{'|'.join(FIXTURES)}>", file=sys.stderr)
+        try:
+            threading.Event().wait()
+        except KeyboardInterrupt:
+            pass
+        server.stop()
+        return 0
+
+    # Measure the analyzer, not the cache or the history database
+    os.environ.setdefault('ANALYZER_POOL_SIZE', str(args.concurrency))
+    os.environ.setdefault('ANALYZER_POOL_MAX_QUEUE', str(args.concurrency * 2))
+    os.environ['ANALYZER_HISTORY_DB'] = ''
+    os.environ.setdefault('ANALYZER_ORIGIN_CONCURRENCY', str(args.concurrency))
+    from app import analyze_cached, parse_options
+    options = parse_options({'cache': 'bypass', 'mode': args.mode, 'navigation': args.navigation,
+                             'screenshot': False if args.no_screenshot else None})
+    runner = lambda url: analyze_cached(url, options)
+
+    report = {
+        'createdAt': time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime()),
+        'environment': {'python': platform.python_version(), 'platform': platform.platform(),
+                        'cpus': os.cpu_count()},
+        'settings': {'fixtures': fixtures, 'iterations': args.iterations, 'concurrency': args.concurrency,
+                     'warmup': args.warmup, 'ttfbMs': args.ttfb, 'options': options},
+        'scenarios': {}
+    }
+    try:
+        for scenario, result in run_benchmark(runner, server, fixtures, args.iterations,
+                                              args.concurrency, args.warmup):
+            report['scenarios'][scenario] = result
+            print(f"{scenario:<22} p50 {result['p50Ms']} ms  p95 {result['p95Ms']} ms  "
+                  f"{result['analysesPerMinute']}/min  peak {result['peakRssMb']} MB"
+                  + (f"  ({result['failed']} failed)" if result['failed'] else ''), file=sys.stderr)
+    finally:
+        server.stop()
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+    else:
+        print(json.dumps(report, indent=2))
+
+    failed = any(result['failed'] for result in report['scenarios'].values())
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        rows = compare(baseline, report, args.threshold)
+        for row in rows:
+            flag = '  REGRESSION' if row['regression'] else ''
+            print(f"{row['scenario']:<22} {row['metric']:<18} {row['baseline']} -> {row['current']} "
+                  f"({row['change']:+.1%}){flag}", file=sys.stderr)
+        failed = failed or any(row['regression'] for row in rows)
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,119 @@
+import fnmatch
+import re
+from urllib.parse import urlparse
+
+# full: load everything, as a visitor would. lite: skip what DOM-derived
+# checks never look at - images, media, fonts and analytics/ads traffic.
+NAVIGATION_PROFILES = {
+    'full': {'resourceTypes': (), 'blockTrackers': False},
+    'lite': {'resourceTypes': ('image', 'media', 'font'), 'blockTrackers': True},
+}
+DEFAULT_NAVIGATION = 'full'
+
+MAX_BLOCK_PATTERNS = 50
+
+# Well-known analytics, tag-manager and advertising hosts; subdomains match too
+TRACKER_HOSTS = frozenset((
+    'google-analytics.com', 'googletagmanager.com', 'googletagservices.com',
+    'doubleclick.net', 'googlesyndication.com', 'googleadservices.com', 'adservice.google.com',
+    'connect.facebook.net', 'analytics.tiktok.com', 'ads-twitter.com', 'static.ads-twitter.com',
+    'snap.licdn.com', 'px.ads.linkedin.com', 'bat.bing.com', 'clarity.ms',
+    'hotjar.com', 'fullstory.com', 'mouseflow.com', 'crazyegg.com', 'luckyorange.com',
+    'segment.com', 'segment.io', 'mixpanel.com', 'amplitude.com', 'heap.io', 'heapanalytics.com',
+    'newrelic.com', 'nr-data.net', 'scorecardresearch.com', 'quantserve.com', 'chartbeat.com',
+    'criteo.com', 'criteo.net', 'taboola.com', 'outbrain.com', 'adnxs.com', 'rubiconproject.com',
+    'pubmatic.com', 'openx.net', 'casalemedia.com', 'amazon-adsystem.com', 'moatads.com',
+    'mc.yandex.ru', 'hs-analytics.net', 'hs-scripts.com', 'optimizely.com',
+))
+
+
+def parse_block_patterns(value):
+    """Validate the request's `block` field: a list of URL glob patterns"""
+    if value is None:
+        return []
+    if isinstance(value, str):
+        value = [value]
+    if not isinstance(value, list) or not all(isinstance(pattern, str) and pattern for pattern in value):
+        raise ValueError('block must be a list of URL patterns')
+    if len(value) > MAX_BLOCK_PATTERNS:
+        raise ValueError(f'block accepts at most {MAX_BLOCK_PATTERNS} patterns')
+    return sorted(set(value))
+
+
+def is_tracker(host):
+    """True when host or any parent domain is a known tracker host"""
+    labels = (host or '').lower().split('.')
+    return any('.'.join(labels[i:]) in TRACKER_HOSTS for i in range(len(labels) - 1))
+
+
+class RequestBlocker:
+    """Aborts requests the navigation profile or the caller's patterns exclude.
+
+    Nothing is routed for the full profile without patterns, so a normal
+    audit keeps the browser's fast path (and its HTTP cache). Attach
+    before page.goto().
+    """
+
+    is_async = False
+
+    def __init__(self, page, profile=DEFAULT_NAVIGATION, patterns=None):
+        config = NAVIGATION_PROFILES[profile]
+        self.profile = profile
+        self.resource_types = frozenset(config['resourceTypes'])
+        self.block_trackers = config['blockTrackers']
+        self.patterns = patterns or []
+        self._pattern = re.compile('|'.join(fnmatch.translate(p) for p in self.patterns)) if self.patterns else None
+        self.blocked = {}
+        self.active = bool(self.resource_types or self.block_trackers or self._pattern)
+        self.page = page
+        if self.active and not self.is_async:
+            page.route('**/*', self._handle)
+
+    def _reason(self, request):
+        if request.resource_type in self.resource_types:
+            return request.resource_type
+        url = request.url
+        if self._pattern is not None and self._pattern.match(url):
+            return 'pattern'
+        if self.block_trackers and is_tracker(urlparse(url).hostname):
+            return 'tracker'
+        return None
+
+    def _decide(self, route):
+        reason = self._reason(route.request)
+        if reason is not None:
+            self.blocked[reason] = self.blocked.get(reason, 0) + 1
+        return reason
+
+    def _handle(self, route):
+        if self._decide(route) is None:
+            # Not continue_(): a replaying context route must still see the request
+            route.fallback()
+        else:
+            route.abort('blockedbyclient')
+
+    def report(self):
+        """What was blocked, and whether timings still describe a real visit"""
+        return {
+            'profile': self.profile,
+            'patterns': self.patterns,
+            'blockedRequests': sum(self.blocked.values()),
+            'blockedByReason': dict(self.blocked),
+            'representative': not self.active
+        }
+
+
+class AsyncRequestBlocker(RequestBlocker):
+    """RequestBlocker for Playwright's async API; await install() before page.goto()"""
+
+    is_async = True
+
+    async def install(self):
+        if self.active:
+            await self.page.route('**/*', self._handle_async)
+
+    async def _handle_async(self, route):
+        if self._decide(route) is None:
+            await route.fallback()
+        else:
+            await route.abort('blockedbyclient')
@@ -0,0 +1,459 @@
+import asyncio
+import os
+import queue
+import threading
+import time
+
+from playwright.async_api import async_playwright
+from playwright.sync_api import sync_playwright
+
+
+class PoolBusyError(Exception):
+    """Raised when no browser slot frees up in time"""
+
+
+class _Task:
+    def __init__(self, fn, context_options, on_timing=None):
+        self.fn = fn
+        self.context_options = context_options or {}
+        self.on_timing = on_timing
+        self.submitted = time.time()
+        self.claimed = False
+        self.cancelled = False
+        self.started = threading.Event()
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class BrowserPool:
+    """Keeps a fixed number of warm Chromium processes and runs analyses on them.
+
+    Playwright's sync API is bound to the thread that started it, so every
+    slot is a dedicated thread owning its own Playwright driver and browser.
+    Callers hand in a function that receives a fresh BrowserContext; the
+    context is always closed afterwards, the browser stays up.
+    """
+
+    def __init__(self, size=2, max_uses=100, max_rss_mb=1500, max_queue=32,
+                 acquire_timeout=60, launch_options=None):
+        self.size = size
+        self.max_uses = max_uses
+        self.max_rss_mb = max_rss_mb
+        self.max_queue = max_queue
+        self.acquire_timeout = acquire_timeout
+        self.launch_options = launch_options or {'headless': True}
+
+        self._tasks = queue.Queue()
+        self._lock = threading.Lock()
+        self._waiting = 0
+        self._busy = 0
+        self._counters = {
+            'submitted': 0,
+            'completed': 0,
+            'failed': 0,
+            'rejected': 0,
+            'timedOut': 0,
+            'launches': 0,
+            'recycles': 0,
+            'waitSecondsTotal': 0.0,
+            'waitSecondsMax': 0.0,
+        }
+        self._slots = [{'uses': 0, 'rssMb': 0.0, 'launchedAt': None} for _ in range(size)]
+        self._threads = []
+        for index in range(size):
+            thread = threading.Thread(target=self._slot_main, args=(index,),
+                                      name=f'browser-slot-{index}', daemon=True)
+            thread.start()
+            self._threads.append(thread)
+
+    def run(self, fn, context_options=None, timeout=None, on_timing=None):
+        """Run fn(context) on the next free browser and return its result.
+
+        on_timing(phase, seconds) is called from the browser thread for the
+        queue wait, any browser launch and the context creation.
+        """
+        task = _Task(fn, context_options, on_timing)
+        with self._lock:
+            if self._waiting >= self.max_queue:
+                self._counters['rejected'] += 1
+                raise PoolBusyError(f'All {self.size} browsers busy and {self._waiting} analyses queued')
+            self._waiting += 1
+            self._counters['submitted'] += 1
+        self._tasks.put(task)
+
+        timeout = self.acquire_timeout if timeout is None else timeout
+        if not task.started.wait(timeout):
+            with self._lock:
+                if not task.claimed:
+                    task.cancelled = True
+                    self._waiting -= 1
+                    self._counters['timedOut'] += 1
+                    raise PoolBusyError(f'No browser became available within {timeout}s')
+        task.done.wait()
+        if task.error is not None:
+            raise task.error
+        return task.result
+
+    def stats(self):
+        """Snapshot of queue depth, wait times and per-browser state"""
+        with self._lock:
+            counters = dict(self._counters)
+            started = counters['completed'] + counters['failed'] + self._busy
+            return {
+                'size': self.size,
+                'busy': self._busy,
+                'queueDepth': self._waiting,
+                'maxQueue': self.max_queue,
+                'avgWaitSeconds': round(counters['waitSecondsTotal'] / started, 4) if started else 0.0,
+                'counters': counters,
+                'browsers': [dict(slot) for slot in self._slots],
+            }
+
+    def shutdown(self):
+        for _ in self._threads:
+            self._tasks.put(None)
+
+    def _claim(self, task):
+        with self._lock:
+            if task.cancelled:
+                return False
+            task.claimed = True
+            waited = time.time() - task.submitted
+            self._waiting -= 1
+            self._busy += 1
+            self._counters['waitSecondsTotal'] += waited
+            self._counters['waitSecondsMax'] = max(self._counters['waitSecondsMax'], waited)
+        task.started.set()
+        if task.on_timing:
+            task.on_timing('queue', waited)
+        return True
+
+    def _slot_main(self, index):
+        slot = self._slots[index]
+        with sync_playwright() as p:
+            browser = None
+            while True:
+                task = self._tasks.get()
+                if task is None:
+                    break
+                if not self._claim(task):
+                    continue
+
+                failed = False
+                try:
+                    # Health check before handing the browser out
+                    if browser is None or not browser.is_connected():
+                        launch_start = time.time()
+                        browser = self._launch(p, browser, slot)
+                        if task.on_timing:
+                            task.on_timing('browserLaunch', time.time() - launch_start)
+                    context_start = time.time()
+                    context = browser.new_context(**task.context_options)
+                    if task.on_timing:
+                        task.on_timing('newContext', time.time() - context_start)
+                    try:
+                        task.result = task.fn(context)
+                    finally:
+                        try:
+                            context.close()
+                        except Exception:
+                            pass
+                except Exception as e:
+                    task.error = e
+                    failed = True
+
+                slot['uses'] += 1
+                slot['rssMb'] = _browser_rss_mb(browser)
+                with self._lock:
+                    self._busy -= 1
+                    self._counters['failed' if failed else 'completed'] += 1
+                task.done.set()
+
+                if browser is not None and (slot['uses'] >= self.max_uses
+                                            or slot['rssMb'] > self.max_rss_mb
+                                            or not browser.is_connected()):
+                    print(f"Recycling browser slot {index} after {slot['uses']} uses ({slot['rssMb']:.0f} MB)")
+                    with self._lock:
+                        self._counters['recycles'] += 1
+                    try:
+                        browser = self._launch(p, browser, slot)
+                    except Exception as e:
+                        # Next task retries the launch
+                        print(f"Browser relaunch failed on slot {index}: {e}")
+                        browser = None
+
+            if browser is not None:
+                try:
+                    browser.close()
+                except Exception:
+                    pass
+
+    def _launch(self, p, old_browser, slot):
+        if old_browser is not None:
+            try:
+                old_browser.close()
+            except Exception:
+                pass
+        browser = p.chromium.launch(**self.launch_options)
+        slot['uses'] = 0
+        slot['rssMb'] = 0.0
+        slot['launchedAt'] = time.strftime('%Y-%m-%d %H:%M:%S')
+        with self._lock:
+            self._counters['launches'] += 1
+        return browser
+
+
+def _browser_rss_mb(browser):
+    """Resident memory of the browser and all of its child processes (Linux only)"""
+    if browser is None or not browser.is_connected():
+        return 0.0
+    try:
+        session = browser.new_browser_cdp_session()
+        try:
+            info = session.send('SystemInfo.getProcessInfo')
+        finally:
+            session.detach()
+    except Exception:
+        return 0.0
+    return processes_rss_mb(info)
+
+
+def processes_rss_mb(info):
+    """Summed VmRSS of the processes in a SystemInfo.getProcessInfo response"""
+    total_kb = 0
+    for process in info.get('processInfo', []):
+        try:
+            with open(f"/proc/{process['id']}/status") as f:
+                for line in f:
+                    if line.startswith('VmRSS:'):
+                        total_kb += int(line.split()[1])
+                        break
+        except (OSError, ValueError, KeyError):
+            continue
+    return total_kb / 1024
+
+
+class AsyncBrowserPool:
+    """BrowserPool for asyncio: a few browsers, each serving many concurrent contexts.
+
+    Playwright's async API multiplexes every browser over one driver
+    connection on the event loop, so a browser is no longer tied to a thread
+    and can run pages_per_browser analyses side by side. Work goes to the
+    least busy browser; browsers are launched on first use and replaced after
+    max_uses contexts or once they grow past max_rss_mb, the old one closing
+    when its last context finishes. Must be used from a single event loop.
+    """
+
+    def __init__(self, browsers=2, pages_per_browser=8, max_uses=100, max_rss_mb=1500,
+                 max_queue=256, acquire_timeout=60, launch_options=None):
+        self.size = browsers
+        self.pages_per_browser = pages_per_browser
+        self.max_uses = max_uses
+        self.max_rss_mb = max_rss_mb
+        self.max_queue = max_queue
+        self.acquire_timeout = acquire_timeout
+        self.launch_options = launch_options or {'headless': True}
+
+        self._playwright = None
+        self._capacity = asyncio.Semaphore(browsers * pages_per_browser)
+        self._launch_lock = asyncio.Lock()
+        # Open contexts per browser, so a retired browser closes after its last one
+        self._contexts = {}
+        self._waiting = 0
+        self._busy = 0
+        self._counters = {
+            'submitted': 0,
+            'completed': 0,
+            'failed': 0,
+            'rejected': 0,
+            'timedOut': 0,
+            'launches': 0,
+            'recycles': 0,
+            'waitSecondsTotal': 0.0,
+            'waitSecondsMax': 0.0,
+        }
+        self._slots = [{'uses': 0, 'rssMb': 0.0, 'launchedAt': None, 'active': 0, 'browser': None}
+                       for _ in range(browsers)]
+
+    async def run(self, fn, context_options=None, timeout=None, on_timing=None):
+        """Await fn(context) on a fresh context and return its result; on_timing as BrowserPool.run"""
+        if self._capacity.locked() and self._waiting >= self.max_queue:
+            self._counters['rejected'] += 1
+            raise PoolBusyError(f'All {self.size * self.pages_per_browser} pages busy and {self._waiting} analyses queued')
+        self._counters['submitted'] += 1
+        timeout = self.acquire_timeout if timeout is None else timeout
+        submitted = time.time()
+        if not self._capacity.locked():
+            # Free capacity: acquire() returns without suspending
+            await self._capacity.acquire()
+        else:
+            self._waiting += 1
+            try:
+                await asyncio.wait_for(self._capacity.acquire(), timeout)
+            except asyncio.TimeoutError:
+                self._counters['timedOut'] += 1
+                raise PoolBusyError(f'No browser became available within {timeout}s')
+            finally:
+                self._waiting -= 1
+        waited = time.time() - submitted
+        self._busy += 1
+        self._counters['waitSecondsTotal'] += waited
+        self._counters['waitSecondsMax'] = max(self._counters['waitSecondsMax'], waited)
+        if on_timing:
+            on_timing('queue', waited)
+
+        slot = min(self._slots, key=lambda item: item['active'])
+        slot['active'] += 1
+        browser = None
+        failed = False
+        try:
+            browser = await self._browser(slot, on_timing)
+            self._contexts[browser] = self._contexts.get(browser, 0) + 1
+            context_start = time.time()
+            context = await browser.new_context(**(context_options or {}))
+            if on_timing:
+                on_timing('newContext', time.time() - context_start)
+            try:
+                return await fn(context)
+            finally:
+                try:
+                    await context.close()
+                except Exception:
+                    pass
+        except BaseException:
+            failed = True
+            raise
+        finally:
+            slot['active'] -= 1
+            self._busy -= 1
+            self._counters['failed' if failed else 'completed'] += 1
+            self._capacity.release()
+            if browser is not None:
+                self._contexts[browser] -= 1
+                await self._after_use(slot, browser)
+
+    async def _browser(self, slot, on_timing):
+        """The slot's browser, (re)launching it when missing or disconnected"""
+        async with self._launch_lock:
+            browser = slot['browser']
+            if browser is not None and browser.is_connected():
+                return browser
+            launch_start = time.time()
+            if self._playwright is None:
+                self._playwright = await async_playwright().start()
+            browser = slot['browser'] = await self._playwright.chromium.launch(**self.launch_options)
+            slot['uses'] = 0
+            slot['rssMb'] = 0.0
+            slot['launchedAt'] = time.strftime('%Y-%m-%d %H:%M:%S')
+            self._counters['launches'] += 1
+        if on_timing:
+            on_timing('browserLaunch', time.time() - launch_start)
+        return browser
+
+    async def _after_use(self, slot, browser):
+        if slot['browser'] is browser:
+            slot['uses'] += 1
+            slot['rssMb'] = await _browser_rss_mb_async(browser)
+            if slot['uses'] >= self.max_uses or slot['rssMb'] > self.max_rss_mb or not browser.is_connected():
+                print(f"Recycling async browser after {slot['uses']} uses ({slot['rssMb']:.0f} MB)")
+                self._counters['recycles'] += 1
+                # The next analysis on this slot launches a replacement
+                slot['browser'] = None
+        if slot['browser'] is not browser and not self._contexts[browser]:
+            # Retired and its last context is done
+            del self._contexts[browser]
+            await _close_quietly(browser)
+
+    def stats(self):
+        """Same shape as BrowserPool.stats(), plus per-browser active contexts"""
+        counters = dict(self._counters)
+        started = counters['completed'] + counters['failed'] + self._busy
+        return {
+            'size': self.size,
+            'pagesPerBrowser': self.pages_per_browser,
+            'busy': self._busy,
+            'queueDepth': self._waiting,
+            'maxQueue': self.max_queue,
+            'avgWaitSeconds': round(counters['waitSecondsTotal'] / started, 4) if started else 0.0,
+            'counters': counters,
+            'browsers': [{name: value for name, value in slot.items() if name != 'browser'}
+                         for slot in self._slots],
+        }
+
+    async def shutdown(self):
+        for slot in self._slots:
+            slot['browser'] = None
+        for browser in list(self._contexts):
+            await _close_quietly(browser)
+        self._contexts.clear()
+        if self._playwright is not None:
+            await self._playwright.stop()
+            self._playwright = None
+
+
+async def _close_quietly(browser):
+    try:
+        await browser.close()
+    except Exception:
+        pass
+
+
+async def _browser_rss_mb_async(browser):
+    """_browser_rss_mb() for an async browser"""
+    if not browser.is_connected():
+        return 0.0
+    try:
+        session = await browser.new_browser_cdp_session()
+        try:
+            info = await session.send('SystemInfo.getProcessInfo')
+        finally:
+            await session.detach()
+    except Exception:
+        return 0.0
+    return processes_rss_mb(info)
+
+
+_pool = None
+_pool_lock = threading.Lock()
+_async_pool = None
+
+
+def current_pool():
+    """The pool if it has been started, without starting it"""
+    return _pool
+
+
+def get_pool():
+    """Process-wide pool, created lazily so the Flask reloader parent never launches Chromium"""
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = BrowserPool(
+                size=int(os.environ.get('ANALYZER_POOL_SIZE', 2)),
+                max_uses=int(os.environ.get('ANALYZER_POOL_MAX_USES', 100)),
+                max_rss_mb=float(os.environ.get('ANALYZER_POOL_MAX_RSS_MB', 1500)),
+                max_queue=int(os.environ.get('ANALYZER_POOL_MAX_QUEUE', 32)),
+                acquire_timeout=float(os.environ.get('ANALYZER_POOL_ACQUIRE_TIMEOUT', 60)),
+            )
+        return _pool
+
+
+def current_async_pool():
+    """The asyncio pool if it has been started, without starting it"""
+    return _async_pool
+
+
+def get_async_pool():
+    """Process-wide AsyncBrowserPool; call from the event loop that will use it"""
+    global _async_pool
+    if _async_pool is None:
+        _async_pool = AsyncBrowserPool(
+            browsers=int(os.environ.get('ANALYZER_ASYNC_BROWSERS', os.environ.get('ANALYZER_POOL_SIZE', 2))),
+            pages_per_browser=int(os.environ.get('ANALYZER_ASYNC_PAGES_PER_BROWSER', 8)),
+            max_uses=int(os.environ.get('ANALYZER_POOL_MAX_USES', 100)),
+            max_rss_mb=float(os.environ.get('ANALYZER_POOL_MAX_RSS_MB', 1500)),
+            max_queue=int(os.environ.get('ANALYZER_ASYNC_MAX_QUEUE', 256)),
+            acquire_timeout=float(os.environ.get('ANALYZER_POOL_ACQUIRE_TIMEOUT', 60)),
+        )
+    return _async_pool
@@ -0,0 +1,238 @@
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+import zlib
+from collections import OrderedDict
+
+import requests
+
+from urls import normalize_url
+
+CACHE_MODES = ('prefer', 'bypass', 'only')
+
+
+class CacheMiss(Exception):
+    """Raised for cache=only requests that have no usable entry"""
+
+
+def cache_key(url, options):
+    """Stable key for a URL plus every option that changes the result"""
+    relevant = {name: value for name, value in options.items() if name != 'cache'}
+    raw = normalize_url(url) + '|' + json.dumps(relevant, sort_keys=True)
+    return hashlib.sha256(raw.encode('utf-8')).hexdigest()
+
+
+class ResultCache:
+    """Analysis results keyed by normalized URL + options.
+
+    Entries are fresh for `ttl` seconds. The in-memory tier is an LRU bounded
+    by entry count and serialized bytes; the optional SQLite tier survives
+    restarts and is an LRU of its own, bounded by `db_max_entries` and
+    compressed bytes (`db_max_bytes`). Stale entries that carry an ETag or Last-Modified validator are
+    kept for up to `max_stale` seconds so they can be revalidated with a
+    cheap conditional GET instead of a full browser run.
+    """
+
+    def __init__(self, ttl=300, max_entries=500, max_bytes=64 * 1024 * 1024,
+                 max_stale=86400, db_path=None, revalidate_timeout=5, db_max_entries=None, db_max_bytes=None):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.max_stale = max_stale
+        self.revalidate_timeout = revalidate_timeout
+        self.db_max_entries = db_max_entries or max_entries
+        self.db_max_bytes = db_max_bytes or max_bytes
+        self._entries = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self._counters = {'hits': 0, 'misses': 0, 'diskHits': 0, 'revalidated': 0,
+                          'evictions': 0, 'diskEvictions': 0, 'stores': 0}
+        self._db = None
+        if db_path:
+            self._db = sqlite3.connect(db_path, check_same_thread=False)
+            self._db.execute("""CREATE TABLE IF NOT EXISTS results (
+                key TEXT PRIMARY KEY,
+                url TEXT NOT NULL,
+                stored_at REAL NOT NULL,
+                etag TEXT,
+                last_modified TEXT,
+                payload BLOB NOT NULL,
+                last_used REAL,
+                size INTEGER
+            )""")
+            # Databases created before the disk tier was bounded get its columns added
+            existing = {row[1] for row in self._db.execute('PRAGMA table_info(results)')}
+            for column, kind in (('last_used', 'REAL'), ('size', 'INTEGER')):
+                if column not in existing:
+                    self._db.execute(f'ALTER TABLE results ADD COLUMN {column} {kind}')
+            self._db.execute('UPDATE results SET last_used = stored_at, size = length(payload) WHERE size IS NULL')
+            self._db.execute('CREATE INDEX IF NOT EXISTS idx_results_last_used ON results(last_used)')
+            self._db.commit()
+
+    def get(self, key, url):
+        """Return (result, age_seconds) for a fresh or successfully revalidated entry, else None"""
+        entry = self._lookup(key)
+        if entry is None:
+            self._count('misses')
+            return None
+
+        age = time.time() - entry['storedAt']
+        if age > self.ttl:
+            if not self._revalidate(url, entry):
+                self._count('misses')
+                return None
+            self._touch(key, entry)
+            self._count('revalidated')
+            age = 0.0
+
+        self._count('hits')
+        self._used(key, entry)
+        return json.loads(entry['payload']), age
+
+    def put(self, key, url, result):
+        document = result.get('document') or {}
+        entry = {
+            'url': url,
+            'storedAt': time.time(),
+            'etag': document.get('etag'),
+            'lastModified': document.get('lastModified'),
+            'payload': json.dumps(result, separators=(',', ':')),
+        }
+        self._remember(key, entry)
+        self._count('stores')
+        if self._db is not None:
+            payload = zlib.compress(entry['payload'].encode('utf-8'))
+            entry['diskUsedAt'] = entry['storedAt']
+            with self._lock:
+                self._db.execute(
+                    'INSERT OR REPLACE INTO results (key, url, stored_at, etag, last_modified, payload, last_used, size) '
+                    'VALUES (?, ?, ?, ?, ?, ?, ?, ?)',
+                    (key, url, entry['storedAt'], entry['etag'], entry['lastModified'], payload,
+                     entry['storedAt'], len(payload)))
+                self._prune_db()
+                self._db.commit()
+
+    def _prune_db(self):
+        """Delete expired rows, then the least recently used ones over the disk limits (lock held)"""
+        now = time.time()
+        expired = self._db.execute(
+            'DELETE FROM results WHERE stored_at < ? OR (stored_at < ? AND etag IS NULL AND last_modified IS NULL)',
+            (now - self.ttl - self.max_stale, now - self.ttl)).rowcount
+        count, total = self._db.execute('SELECT COUNT(*), COALESCE(SUM(size), 0) FROM results').fetchone()
+        evicted = []
+        if count > self.db_max_entries or total > self.db_max_bytes:
+            for key, size in self._db.execute('SELECT key, size FROM results ORDER BY last_used'):
+                if count <= self.db_max_entries and total <= self.db_max_bytes:
+                    break
+                evicted.append((key,))
+                count -= 1
+                total -= size
+            self._db.executemany('DELETE FROM results WHERE key = ?', evicted)
+        self._counters['diskEvictions'] += expired + len(evicted)
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._counters)
+            stats['entries'] = len(self._entries)
+            stats['bytes'] = self._bytes
+        lookups = stats['hits'] + stats['misses']
+        stats['hitRate'] = round(stats['hits'] / lookups, 4) if lookups else 0.0
+        stats['ttl'] = self.ttl
+        stats['persistent'] = self._db is not None
+        return stats
+
+    def _lookup(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+        if entry is not None and self._usable(entry):
+            return entry
+        if self._db is None:
+            return None
+
+        with self._lock:
+            row = self._db.execute(
+                'SELECT url, stored_at, etag, last_modified, payload FROM results WHERE key = ?',
+                (key,)).fetchone()
+        if row is None:
+            return None
+        entry = {
+            'url': row[0],
+            'storedAt': row[1],
+            'etag': row[2],
+            'lastModified': row[3],
+            'payload': zlib.decompress(row[4]).decode('utf-8'),
+        }
+        if not self._usable(entry):
+            with self._lock:
+                self._db.execute('DELETE FROM results WHERE key = ?', (key,))
+                self._db.commit()
+            return None
+        self._count('diskHits')
+        self._remember(key, entry)
+        self._used(key, entry)
+        return entry
+
+    def _usable(self, entry):
+        age = time.time() - entry['storedAt']
+        if age <= self.ttl:
+            return True
+        has_validator = entry['etag'] or entry['lastModified']
+        return bool(has_validator) and age <= self.ttl + self.max_stale
+
+    def _revalidate(self, url, entry):
+        """Ask the origin whether the document changed since the entry was stored"""
+        headers = {}
+        if entry['etag']:
+            headers['If-None-Match'] = entry['etag']
+        if entry['lastModified']:
+            headers['If-Modified-Since'] = entry['lastModified']
+        if not headers:
+            return False
+        try:
+            response = requests.get(url, headers=headers, timeout=self.revalidate_timeout,
+                                    stream=True, allow_redirects=True)
+            response.close()
+        except requests.RequestException as e:
+            print(f"Cache revalidation failed for {url}: {e}")
+            return False
+        return response.status_code == 304
+
+    def _touch(self, key, entry):
+        entry['storedAt'] = time.time()
+        if self._db is not None:
+            with self._lock:
+                self._db.execute('UPDATE results SET stored_at = ? WHERE key = ?', (entry['storedAt'], key))
+                self._db.commit()
+
+    def _used(self, key, entry):
+        """Move an entry up the disk LRU; at most once a minute, so hits don't all write"""
+        now = time.time()
+        if self._db is None or now - entry.get('diskUsedAt', 0) < 60:
+            return
+        entry['diskUsedAt'] = now
+        with self._lock:
+            self._db.execute('UPDATE results SET last_used = ? WHERE key = ?', (now, key))
+            self._db.commit()
+
+    def _remember(self, key, entry):
+        size = len(entry['payload'])
+        with self._lock:
+            previous = self._entries.pop(key, None)
+            if previous is not None:
+                self._bytes -= len(previous['payload'])
+            if size > self.max_bytes:
+                return
+            self._entries[key] = entry
+            self._bytes += size
+            while len(self._entries) > self.max_entries or self._bytes > self.max_bytes:
+                _, evicted = self._entries.popitem(last=False)
+                self._bytes -= len(evicted['payload'])
+                self._counters['evictions'] += 1
+
+    def _count(self, name):
+        with self._lock:
+            self._counters[name] += 1
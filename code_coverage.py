@@ -0,0 +1,255 @@
+from urllib.parse import urlparse
+
+# Scripts and stylesheets listed per result, most wasted bytes first
+MAX_COVERAGE_ENTRIES = 50
+
+# Block-level JS coverage; call counts aren't needed to tell used from unused
+JS_COVERAGE_PARAMS = {'callCount': False, 'detailed': True}
+
+# Run after the page settled: the resources Chromium held first paint for,
+# and the transfer size of every script and stylesheet. Chromium reports
+# renderBlockingStatus itself; older versions fall back to the markup
+# (synchronous head scripts, stylesheets whose media matches).
+RENDER_BLOCKING_SCRIPT = """() => {
+    const nav = performance.getEntriesByType('navigation')[0];
+    const paint = performance.getEntriesByName('first-contentful-paint')[0];
+    const fcp = paint ? paint.startTime : null;
+    const documentEnd = nav ? nav.responseEnd : 0;
+    const markup = new Set();
+    document.querySelectorAll('head script[src]').forEach(s => {
+        if (!s.async && !s.defer && s.type !== 'module') markup.add(s.src);
+    });
+    document.querySelectorAll('link[rel~="stylesheet"][href]').forEach(l => {
+        if (!l.disabled && (!l.media || matchMedia(l.media).matches)) markup.add(l.href);
+    });
+    const resources = [];
+    const sizes = {};
+    for (const e of performance.getEntriesByType('resource')) {
+        const type = e.initiatorType === 'script' ? 'script'
+            : (e.initiatorType === 'link' || e.initiatorType === 'css') ? 'stylesheet' : null;
+        if (!type) continue;
+        sizes[e.name] = e.transferSize;
+        const blocking = e.renderBlockingStatus ? e.renderBlockingStatus === 'blocking' : markup.has(e.name);
+        if (!blocking) continue;
+        const end = fcp === null ? e.responseEnd : Math.min(e.responseEnd, fcp);
+        resources.push({
+            url: e.name,
+            type: type,
+            transferBytes: e.transferSize,
+            startMs: Math.round(e.startTime),
+            endMs: Math.round(e.responseEnd),
+            blockingMs: Math.max(0, Math.round(end - documentEnd))
+        });
+    }
+    return {fcp: fcp, documentEndMs: Math.round(documentEnd), resources: resources, sizes: sizes};
+}"""
+
+
+def unused_script_bytes(functions):
+    """(total, unused) bytes of one script from its V8 block coverage.
+
+    Ranges nest, and a byte is unused when the innermost range covering it
+    never ran. One sweep over the sorted ranges keeps only the current
+    nesting on a stack, so the cost follows the number of ranges, never
+    the size of the script.
+    """
+    ranges = sorted((item['startOffset'], -item['endOffset'], item['count'])
+                    for function in functions for item in function['ranges'])
+    total = unused = position = 0
+    stack = []
+    for start, negative_end, count in ranges:
+        while stack and stack[-1][0] <= start:
+            end, closed_count = stack.pop()
+            if not closed_count:
+                unused += max(0, end - position)
+            position = max(position, end)
+        if stack and not stack[-1][1]:
+            unused += max(0, start - position)
+        position = max(position, start)
+        stack.append((-negative_end, count))
+        total = max(total, -negative_end)
+    while stack:
+        end, closed_count = stack.pop()
+        if not closed_count:
+            unused += max(0, end - position)
+        position = max(position, end)
+    return total, unused
+
+
+def used_stylesheet_bytes(ranges):
+    """Bytes covered by the union of used rule ranges [(start, end)]"""
+    used = 0
+    current_start = current_end = None
+    for start, end in sorted(ranges):
+        if current_end is None or start > current_end:
+            if current_end is not None:
+                used += current_end - current_start
+            current_start, current_end = start, end
+        else:
+            current_end = max(current_end, end)
+    if current_end is not None:
+        used += current_end - current_start
+    return used
+
+
+class CoverageRecorder:
+    """Opt-in JS and CSS coverage plus render-blocking resources for one page load.
+
+    Uses V8 precise coverage and CSS rule usage tracking over CDP. Only
+    offsets are read, never source text, and each script is reduced to its
+    totals as soon as it is read, so a multi-megabyte bundle costs a few
+    numbers. Start before page.goto(); finish() once the page settled.
+    """
+
+    def __init__(self, page):
+        self._reset(page)
+        try:
+            session = page.context.new_cdp_session(page)
+            session.on('CSS.styleSheetAdded', self._on_stylesheet)
+            for method, params in self._start_commands():
+                session.send(method, params)
+            self._session = session
+        except Exception as e:
+            self.error = str(e)
+
+    def _reset(self, page):
+        self.page = page
+        self.error = None
+        self._session = None
+        self._stylesheets = {}
+
+    def _start_commands(self):
+        return (('Profiler.enable', {}), ('Profiler.startPreciseCoverage', JS_COVERAGE_PARAMS),
+                ('DOM.enable', {}), ('CSS.enable', {}), ('CSS.startRuleUsageTracking', {}))
+
+    def _on_stylesheet(self, params):
+        header = params['header']
+        if header.get('origin') == 'regular':
+            self._stylesheets[header['styleSheetId']] = header
+
+    def finish(self):
+        """Summary of unused bytes per script/stylesheet and the render-blocking resources"""
+        if self._session is None:
+            return self._report(None, None, None)
+        try:
+            scripts = self._session.send('Profiler.takePreciseCoverage')['result']
+            rules = self._session.send('CSS.stopRuleUsageTracking')['ruleUsage']
+            blocking = self.page.evaluate(RENDER_BLOCKING_SCRIPT)
+        except Exception as e:
+            self.error = str(e)
+            return self._report(None, None, None)
+        finally:
+            try:
+                self._session.detach()
+            except Exception:
+                pass
+            self._session = None
+        return self._report(scripts, rules, blocking)
+
+    def _report(self, scripts, rules, blocking):
+        if scripts is None:
+            return {'error': self.error}
+        sizes = blocking['sizes']
+        script_entries = _script_usage(scripts, self.page.url, sizes)
+        stylesheet_entries = _stylesheet_usage(self._stylesheets, rules, self.page.url, sizes)
+        resources = sorted(blocking['resources'], key=lambda item: item['blockingMs'], reverse=True)
+        return {
+            'unusedJsBytes': sum(entry['unusedBytes'] for entry in script_entries),
+            'totalJsBytes': sum(entry['totalBytes'] for entry in script_entries),
+            'unusedCssBytes': sum(entry['unusedBytes'] for entry in stylesheet_entries),
+            'totalCssBytes': sum(entry['totalBytes'] for entry in stylesheet_entries),
+            'scripts': script_entries[:MAX_COVERAGE_ENTRIES],
+            'stylesheets': stylesheet_entries[:MAX_COVERAGE_ENTRIES],
+            'renderBlocking': {
+                'fcp': round(blocking['fcp']) if blocking['fcp'] is not None else None,
+                'documentEndMs': blocking['documentEndMs'],
+                # Blocking resources load in parallel: paint could start once the last of them is gone
+                'estimatedSavingsMs': max((item['blockingMs'] for item in resources), default=0),
+                'resources': resources
+            },
+            'totals': {'scripts': len(script_entries), 'stylesheets': len(stylesheet_entries)}
+        }
+
+
+class AsyncCoverageRecorder(CoverageRecorder):
+    """CoverageRecorder for Playwright's async API; await start() before page.goto()"""
+
+    def __init__(self, page):
+        self._reset(page)
+
+    async def start(self):
+        try:
+            session = await self.page.context.new_cdp_session(self.page)
+            session.on('CSS.styleSheetAdded', self._on_stylesheet)
+            for method, params in self._start_commands():
+                await session.send(method, params)
+            self._session = session
+        except Exception as e:
+            self.error = str(e)
+
+    async def finish(self):
+        if self._session is None:
+            return self._report(None, None, None)
+        try:
+            scripts = (await self._session.send('Profiler.takePreciseCoverage'))['result']
+            rules = (await self._session.send('CSS.stopRuleUsageTracking'))['ruleUsage']
+            blocking = await self.page.evaluate(RENDER_BLOCKING_SCRIPT)
+        except Exception as e:
+            self.error = str(e)
+            return self._report(None, None, None)
+        finally:
+            try:
+                await self._session.detach()
+            except Exception:
+                pass
+            self._session = None
+        return self._report(scripts, rules, blocking)
+
+
+def _entry(url, page_url, total, unused, sizes):
+    """Usage of one resource; wasted bytes scale the unused share to what went over the wire"""
+    transfer = sizes.get(url) or 0
+    return {
+        'url': 'inline' if url == page_url else url,
+        'totalBytes': total,
+        'unusedBytes': unused,
+        'unusedPercent': round(unused / total * 100, 1) if total else 0.0,
+        'transferBytes': transfer,
+        'wastedBytes': round(transfer * unused / total) if transfer and total else unused
+    }
+
+
+def _script_usage(scripts, page_url, sizes):
+    usage = {}
+    while scripts:
+        # Drop each script's ranges as soon as they are counted
+        script = scripts.pop()
+        url = script['url']
+        # Skips eval'd code and the analyzer's own injected scripts
+        if urlparse(url).scheme not in ('http', 'https'):
+            continue
+        total, unused = unused_script_bytes(script['functions'])
+        counts = usage.setdefault(url, [0, 0])
+        counts[0] += total
+        counts[1] += unused
+    entries = [_entry(url, page_url, total, unused, sizes) for url, (total, unused) in usage.items()]
+    entries.sort(key=lambda entry: entry['wastedBytes'], reverse=True)
+    return entries
+
+
+def _stylesheet_usage(stylesheets, rules, page_url, sizes):
+    used_ranges = {}
+    for rule in rules:
+        if rule['used']:
+            used_ranges.setdefault(rule['styleSheetId'], []).append((rule['startOffset'], rule['endOffset']))
+    usage = {}
+    for sheet_id, header in stylesheets.items():
+        url = header.get('sourceURL') or page_url
+        total = int(header.get('length') or 0)
+        used = used_stylesheet_bytes(used_ranges.get(sheet_id, ()))
+        counts = usage.setdefault(url, [0, 0])
+        counts[0] += total
+        counts[1] += max(0, total - used)
+    entries = [_entry(url, page_url, total, unused, sizes) for url, (total, unused) in usage.items()]
+    entries.sort(key=lambda entry: entry['wastedBytes'], reverse=True)
+    return entries
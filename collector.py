@@ -0,0 +1,402 @@
+import os
+
+# Everything run_analysis() needs from the page in a single page.evaluate
+# round-trip. The DOM is walked once; every section runs in its own
+# try/catch so one broken section only falls back to its defaults instead
+# of failing the whole collection. Request counts and page weight come from
+# the network recorder (network.py), not from the page.
+# Installed before navigation so PerformanceObserver sees every entry from
+# the first paint on. Only running aggregates are kept, never the entries.
+VITALS_INIT_SCRIPT = """(() => {
+    if (window !== window.top || window.__analyzerVitals) return;
+    const state = window.__analyzerVitals = {
+        lcp: null, lcpElement: null, lcpUrl: null,
+        cls: 0, clsWindow: 0, clsWindowStart: 0, clsLast: 0,
+        longTasks: [], interactions: {}, scripts: {}, scriptCount: 0,
+        loaf: (PerformanceObserver.supportedEntryTypes || []).includes('long-animation-frame')
+    };
+    const observe = (type, fn, extra) => {
+        try {
+            new PerformanceObserver(list => list.getEntries().forEach(fn))
+                .observe(Object.assign({ type: type, buffered: true }, extra));
+        } catch (e) {}
+    };
+    observe('largest-contentful-paint', entry => {
+        state.lcp = entry.renderTime || entry.loadTime || entry.startTime;
+        state.lcpElement = entry.element ? entry.element.localName : null;
+        state.lcpUrl = entry.url || null;
+    });
+    // CLS is the largest session window: shifts less than 1s apart, 5s at most
+    observe('layout-shift', entry => {
+        if (entry.hadRecentInput) return;
+        if (!state.clsWindow || entry.startTime - state.clsLast > 1000 || entry.startTime - state.clsWindowStart > 5000) {
+            state.clsWindow = 0;
+            state.clsWindowStart = entry.startTime;
+        }
+        state.clsWindow += entry.value;
+        state.clsLast = entry.startTime;
+        state.cls = Math.max(state.cls, state.clsWindow);
+    });
+    observe('longtask', entry => {
+        if (state.longTasks.length < 1000) state.longTasks.push([entry.startTime, entry.duration]);
+    });
+    // Main-thread time per script URL; a frame's blocking time is split
+    // between its scripts by how long each ran
+    observe('long-animation-frame', entry => {
+        const scripts = entry.scripts || [];
+        const ran = scripts.reduce((sum, script) => sum + script.duration, 0);
+        for (const script of scripts) {
+            const url = script.sourceURL;
+            if (!url) continue;
+            let totals = state.scripts[url];
+            if (!totals) {
+                if (state.scriptCount >= 500) continue;
+                totals = state.scripts[url] = [0, 0];
+                state.scriptCount++;
+            }
+            totals[0] += script.duration;
+            totals[1] += ran ? entry.blockingDuration * script.duration / ran : 0;
+        }
+    });
+    observe('event', entry => {
+        if (!entry.interactionId) return;
+        const previous = state.interactions[entry.interactionId] || 0;
+        state.interactions[entry.interactionId] = Math.max(previous, entry.duration);
+    }, { durationThreshold: 16 });
+})();"""
+
+COLLECT_SCRIPT = """({ only, limit }) => {
+    const sections = {};
+    const errors = {};
+    const run = (name, fn) => {
+        if (only && !only.includes(name)) return;
+        try {
+            sections[name] = fn();
+        } catch (e) {
+            errors[name] = String((e && e.message) || e);
+        }
+    };
+    const once = (fn) => {
+        let done = false, value;
+        return () => {
+            if (!done) { value = fn(); done = true; }
+            return value;
+        };
+    };
+
+    // Single pass over every element, bucketing the ones later sections need
+    const dom = once(() => {
+        const all = document.getElementsByTagName('*');
+        const walk = { total: all.length, tags: {}, a: [], img: [], meta: [], link: [], script: [], submitInputs: 0 };
+        for (let i = 0; i < all.length; i++) {
+            const el = all[i];
+            const tag = el.localName;
+            walk.tags[tag] = (walk.tags[tag] || 0) + 1;
+            switch (tag) {
+                case 'a': walk.a.push(el); break;
+                case 'img': walk.img.push(el); break;
+                case 'meta': walk.meta.push(el); break;
+                case 'link': walk.link.push(el); break;
+                case 'script': walk.script.push(el); break;
+                case 'input': if (el.type === 'submit') walk.submitInputs++; break;
+            }
+        }
+        return walk;
+    });
+
+    const metas = once(() => {
+        const byName = {}, byProperty = {}, og = [], twitter = [], all = [];
+        for (const meta of dom().meta) {
+            const name = meta.getAttribute('name') || '';
+            const property = meta.getAttribute('property') || '';
+            const content = meta.getAttribute('content') || '';
+            if (name && !(name in byName)) byName[name] = content;
+            if (property && !(property in byProperty)) byProperty[property] = content;
+            if (property.startsWith('og:')) og.push({ property: property, content: content });
+            if (name.startsWith('twitter:')) twitter.push({ name: name, content: content });
+            all.push({ name: name || property || 'http-equiv', content: content.substring(0, 100) });
+        }
+        return { byName, byProperty, og, twitter, all };
+    });
+
+    const linkRel = (rel) => dom().link.find(link => (link.getAttribute('rel') || '').toLowerCase().includes(rel));
+    const title = once(() => document.title || '');
+
+    run('pageInfo', () => ({
+        title: title(),
+        description: metas().byName['description'] || '',
+        favicon: linkRel('icon')?.href || '',
+        h1: document.querySelector('h1')?.textContent?.trim() || 'No H1 found'
+    }));
+
+    // Navigation Timing Level 2: every value is relative to the navigation
+    // start, and events that have not fired yet are 0 (reported as null)
+    const fcpEntry = once(() => performance.getEntriesByName('first-contentful-paint')[0]);
+
+    run('performance', () => {
+        const nav = performance.getEntriesByType('navigation')[0];
+        if (!nav) throw new Error('no navigation timing entry');
+        return {
+            dns: nav.domainLookupEnd - nav.domainLookupStart,
+            tcp: nav.connectEnd - nav.connectStart,
+            ttfb: nav.responseStart - nav.requestStart,
+            domLoad: nav.domContentLoadedEventEnd || null,
+            pageLoad: nav.loadEventEnd || null,
+            fcp: fcpEntry() ? fcpEntry().startTime : null
+        };
+    });
+
+    run('vitals', () => {
+        const state = window.__analyzerVitals;
+        if (!state) throw new Error('vitals observers not installed');
+        // Total Blocking Time: the part of every long task past 50ms, after FCP
+        const fcp = fcpEntry() ? fcpEntry().startTime : 0;
+        let tbt = 0, longestTask = 0;
+        for (const [start, duration] of state.longTasks) {
+            longestTask = Math.max(longestTask, duration);
+            const clipped = start + duration - Math.max(start, fcp);
+            if (clipped > 50) tbt += clipped - 50;
+        }
+        // INP: worst interaction, ignoring one outlier per 50 interactions
+        const interactions = Object.values(state.interactions).sort((a, b) => b - a);
+        const inp = interactions.length
+            ? interactions[Math.min(interactions.length - 1, Math.floor(interactions.length / 50))]
+            : null;
+        return {
+            lcp: state.lcp,
+            lcpElement: state.lcpElement,
+            lcpUrl: state.lcpUrl,
+            cls: Math.round(state.cls * 10000) / 10000,
+            tbt: Math.round(tbt),
+            longTasks: state.longTasks.length,
+            longestTask: Math.round(longestTask),
+            inp: inp,
+            interactions: interactions.length
+        };
+    });
+
+    run('scriptTiming', () => {
+        const state = window.__analyzerVitals;
+        if (!state) throw new Error('vitals observers not installed');
+        return {
+            supported: state.loaf,
+            scripts: Object.entries(state.scripts).map(([url, totals]) =>
+                [url, Math.round(totals[0]), Math.round(totals[1])])
+        };
+    });
+
+    // Unique same-origin link targets, for the crawler
+    run('links', () => {
+        const origin = window.location.origin;
+        const seen = new Set();
+        for (const a of dom().a) {
+            if (seen.size >= 1000) break;
+            if ((a.getAttribute('rel') || '').toLowerCase().includes('nofollow')) continue;
+            const href = a.href.split('#')[0];
+            if (href.startsWith(origin + '/')) seen.add(href);
+        }
+        return Array.from(seen);
+    });
+
+    run('overview', () => {
+        const walk = dom();
+        const meta = metas();
+        const origin = window.location.origin;
+        let internalLinks = 0;
+        for (const a of walk.a) {
+            if (a.href.startsWith(origin) || a.href.startsWith('/')) internalLinks++;
+        }
+        // Lists keep their first `limit` items; totals has the real counts
+        const totals = { cssFiles: 0, jsFiles: 0, images: walk.img.length,
+                         metaTags: meta.all.length, ogTags: meta.og.length, twitterTags: meta.twitter.length };
+        const cssFiles = [], jsFiles = [];
+        let inlineScripts = 0, schemaMarkup = 0;
+        for (const link of walk.link) {
+            if ((link.getAttribute('rel') || '').toLowerCase() === 'stylesheet') {
+                if (totals.cssFiles++ < limit) cssFiles.push({ href: link.href, media: link.media || 'all' });
+            }
+        }
+        for (const script of walk.script) {
+            if (script.hasAttribute('src')) {
+                if (totals.jsFiles++ < limit) jsFiles.push({ src: script.src, async: script.async, defer: script.defer });
+            } else {
+                inlineScripts++;
+            }
+            if (script.type === 'application/ld+json') schemaMarkup++;
+        }
+        let lazyLoadedImages = 0;
+        const images = [];
+        for (const img of walk.img) {
+            const loading = img.loading || 'eager';
+            if (loading === 'lazy') lazyLoadedImages++;
+            if (images.length >= limit) continue;
+            images.push({
+                src: img.src,
+                alt: img.alt || 'missing',
+                width: img.width || 'auto',
+                height: img.height || 'auto',
+                loading: loading
+            });
+        }
+        return {
+            totalElements: walk.total,
+            links: { total: walk.a.length, internal: internalLinks, external: walk.a.length - internalLinks },
+            forms: walk.tags.form || 0,
+            buttons: (walk.tags.button || 0) + walk.submitInputs,
+            headings: {
+                h1: walk.tags.h1 || 0,
+                h2: walk.tags.h2 || 0,
+                h3: walk.tags.h3 || 0,
+                h4: walk.tags.h4 || 0,
+                h5: walk.tags.h5 || 0,
+                h6: walk.tags.h6 || 0
+            },
+            metaTags: meta.all.slice(0, limit),
+            language: document.documentElement.lang || 'not specified',
+            charset: document.characterSet || 'not specified',
+            cssFiles: cssFiles,
+            jsFiles: jsFiles,
+            inlineScripts: inlineScripts,
+            favicon: linkRel('icon')?.href || 'none',
+            schemaMarkup: schemaMarkup,
+            ogTags: meta.og.slice(0, limit),
+            twitterTags: meta.twitter.slice(0, limit),
+            images: images,
+            lazyLoadedImages: lazyLoadedImages,
+            totals: totals
+        };
+    });
+
+    run('altData', () => {
+        const imgs = dom().img;
+        return { total: imgs.length, missing: imgs.filter(img => !img.alt).length };
+    });
+
+    run('metaChecks', () => {
+        const meta = metas();
+        const description = meta.byName['description'] || '';
+        return {
+            title: title(),
+            titleLength: title().length,
+            description: description,
+            descriptionLength: description.length,
+            viewport: 'viewport' in meta.byName,
+            ogImage: 'og:image' in meta.byProperty,
+            ogTitle: 'og:title' in meta.byProperty,
+            ogDescription: 'og:description' in meta.byProperty,
+            canonical: dom().link.some(link => (link.getAttribute('rel') || '').toLowerCase() === 'canonical'),
+            robots: meta.byName['robots'] || 'not set'
+        };
+    });
+
+    return { sections, errors };
+}"""
+
+
+# Upper bound on each overview list, so image-heavy pages don't produce megabyte payloads
+COLLECT_LIST_LIMIT = int(os.environ.get('ANALYZER_COLLECT_LIST_LIMIT', 1000))
+
+
+def section_defaults(load_time):
+    """Fallback value for every section, used when that section fails or isn't collected"""
+    return {
+        'pageInfo': {
+            'title': 'Could not extract',
+            'description': 'Could not extract',
+            'favicon': '',
+            'h1': 'Could not extract'
+        },
+        'performance': {
+            'dns': 0, 'tcp': 0, 'ttfb': 0,
+            'domLoad': load_time * 1000,
+            'pageLoad': load_time * 1000,
+            'fcp': 0
+        },
+        'vitals': {
+            'lcp': None, 'lcpElement': None, 'lcpUrl': None,
+            'cls': None, 'tbt': None, 'longTasks': 0, 'longestTask': 0,
+            'inp': None, 'interactions': 0
+        },
+        'overview': {
+            'totalElements': 0,
+            'links': {'total': 0, 'internal': 0, 'external': 0},
+            'forms': 0,
+            'buttons': 0,
+            'headings': {'h1': 0, 'h2': 0, 'h3': 0, 'h4': 0, 'h5': 0, 'h6': 0},
+            'metaTags': [],
+            'language': 'not detected',
+            'charset': 'not detected',
+            'cssFiles': [],
+            'jsFiles': [],
+            'inlineScripts': 0,
+            'favicon': 'none',
+            'schemaMarkup': 0,
+            'ogTags': [],
+            'twitterTags': [],
+            'images': [],
+            'lazyLoadedImages': 0,
+            'totals': {}
+        },
+        'altData': {'total': 0, 'missing': 0},
+        'scriptTiming': {'supported': False, 'scripts': []},
+        'links': [],
+        'metaChecks': {
+            'title': '',
+            'titleLength': 0,
+            'description': '',
+            'descriptionLength': 0,
+            'viewport': False,
+            'ogImage': False,
+            'ogTitle': False,
+            'ogDescription': False,
+            'canonical': False,
+            'robots': 'not set'
+        }
+    }
+
+
+def install_vitals(page):
+    """Start buffering Core Web Vitals; call before page.goto()"""
+    page.add_init_script(VITALS_INIT_SCRIPT)
+
+
+async def install_vitals_async(page):
+    await page.add_init_script(VITALS_INIT_SCRIPT)
+
+
+def collect_page_data(page, load_time, sections=None):
+    """Run the collection script and fill failed sections with their defaults.
+
+    Returns a dict with one key per section plus 'errors', mapping each
+    failed section name to its error message. With a list of `sections`
+    only those run in the page; the rest are defaults.
+    """
+    try:
+        payload = page.evaluate(COLLECT_SCRIPT, {'only': sections, 'limit': COLLECT_LIST_LIMIT})
+    except Exception as e:
+        print(f"Error collecting page data: {e}")
+        payload = {'sections': {}, 'errors': {'all': str(e)}}
+    return _with_defaults(payload, load_time)
+
+
+async def collect_page_data_async(page, load_time, sections=None):
+    """collect_page_data() for Playwright's async API"""
+    try:
+        payload = await page.evaluate(COLLECT_SCRIPT, {'only': sections, 'limit': COLLECT_LIST_LIMIT})
+    except Exception as e:
+        print(f"Error collecting page data: {e}")
+        payload = {'sections': {}, 'errors': {'all': str(e)}}
+    return _with_defaults(payload, load_time)
+
+
+def _with_defaults(payload, load_time):
+    sections = payload.get('sections') or {}
+    errors = payload.get('errors') or {}
+    for name, error in errors.items():
+        print(f"Error collecting {name}: {error}")
+
+    data = {}
+    for name, default in section_defaults(load_time).items():
+        data[name] = sections[name] if name in sections else default
+    data['errors'] = errors
+    return data
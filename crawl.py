@@ -0,0 +1,423 @@
+import argparse
+import hashlib
+import heapq
+import json
+import math
+import os
+import shutil
+import sqlite3
+import sys
+import tempfile
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from urllib import robotparser
+from urllib.parse import urlsplit
+
+from blocking import NAVIGATION_PROFILES
+from static import ENGINE_MODES, get_session
+from urls import normalize_url, origin_of
+
+# Token matched against robots.txt User-agent groups
+ROBOTS_AGENT = 'WebsiteAnalyzer'
+MAX_CRAWL_DELAY = 30.0
+WORST_PAGES = 10
+
+# Link targets that are never HTML pages
+SKIP_EXTENSIONS = (
+    '.pdf', '.zip', '.gz', '.tar', '.rar', '.7z', '.exe', '.dmg', '.msi',
+    '.jpg', '.jpeg', '.png', '.gif', '.webp', '.svg', '.ico', '.avif', '.bmp',
+    '.mp3', '.mp4', '.webm', '.mov', '.avi', '.wav', '.ogg',
+    '.css', '.js', '.json', '.xml', '.rss', '.txt', '.csv',
+    '.doc', '.docx', '.xls', '.xlsx', '.ppt', '.pptx', '.woff', '.woff2', '.ttf',
+)
+
+
+class BloomFilter:
+    """Fixed-size set membership test: no false negatives, rare false positives"""
+
+    def __init__(self, capacity, error_rate=0.001):
+        self.size = max(8, int(-capacity * math.log(error_rate) / math.log(2) ** 2))
+        self.hashes = max(1, round(self.size / capacity * math.log(2)))
+        self.bits = bytearray(self.size // 8 + 1)
+
+    def _positions(self, key):
+        digest = hashlib.blake2b(key, digest_size=16).digest()
+        first = int.from_bytes(digest[:8], 'big')
+        second = int.from_bytes(digest[8:], 'big') | 1
+        return [(first + i * second) % self.size for i in range(self.hashes)]
+
+    def add(self, key):
+        for position in self._positions(key):
+            self.bits[position >> 3] |= 1 << (position & 7)
+
+    def __contains__(self, key):
+        return all(self.bits[position >> 3] & (1 << (position & 7)) for position in self._positions(key))
+
+
+class Frontier:
+    """FIFO queue of URLs to crawl plus the set of every URL ever queued, kept in SQLite.
+
+    Memory stays flat however large the site: pending URLs and the seen
+    set live on disk, and a fixed-size Bloom filter answers most "seen
+    before?" checks without a query (a 'maybe' is confirmed against the
+    seen table, so no URL is ever wrongly skipped). A popped URL stays
+    in the queue, leased, until done() says its record was written;
+    reopening the file puts leased URLs back at the front of the queue,
+    so pages in flight when a crawl was interrupted are not lost.
+    """
+
+    def __init__(self, path=None, bloom_capacity=1000000):
+        self._tmpdir = None
+        if path is None:
+            self._tmpdir = tempfile.mkdtemp(prefix='crawl-')
+            path = os.path.join(self._tmpdir, 'frontier.db')
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.execute('PRAGMA journal_mode=WAL')
+        self._db.execute('PRAGMA synchronous=OFF')
+        self._db.execute('CREATE TABLE IF NOT EXISTS seen (hash INTEGER PRIMARY KEY)')
+        self._db.execute("""CREATE TABLE IF NOT EXISTS queue (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            url TEXT NOT NULL,
+            depth INTEGER NOT NULL,
+            leased INTEGER NOT NULL DEFAULT 0
+        )""")
+        # Frontiers written before leasing get the column added
+        columns = {row[1] for row in self._db.execute('PRAGMA table_info(queue)')}
+        if 'leased' not in columns:
+            self._db.execute('ALTER TABLE queue ADD COLUMN leased INTEGER NOT NULL DEFAULT 0')
+        self._db.execute('UPDATE queue SET leased = 0 WHERE leased = 1')
+        self._db.execute('CREATE INDEX IF NOT EXISTS idx_queue_leased ON queue(leased, id)')
+        self._db.commit()
+        self._leases = {}
+        self._bloom = BloomFilter(bloom_capacity)
+        # Resuming from an existing file: re-prime the filter from disk
+        for (url_hash,) in self._db.execute('SELECT hash FROM seen'):
+            self._bloom.add(url_hash.to_bytes(8, 'big', signed=True))
+        self.pending = self._db.execute('SELECT COUNT(*) FROM queue').fetchone()[0]
+        self.seen = self._db.execute('SELECT COUNT(*) FROM seen').fetchone()[0]
+
+    def add_many(self, urls, depth):
+        """Queue every URL not seen before; returns how many were new"""
+        added = 0
+        for url in urls:
+            digest = hashlib.blake2b(url.encode('utf-8'), digest_size=8).digest()
+            url_hash = int.from_bytes(digest, 'big', signed=True)
+            if digest in self._bloom:
+                if self._db.execute('SELECT 1 FROM seen WHERE hash = ?', (url_hash,)).fetchone():
+                    continue
+            self._bloom.add(digest)
+            self._db.execute('INSERT INTO seen (hash) VALUES (?)', (url_hash,))
+            self._db.execute('INSERT INTO queue (url, depth) VALUES (?, ?)', (url, depth))
+            added += 1
+        self._db.commit()
+        self.pending += added
+        self.seen += added
+        return added
+
+    def pop(self):
+        """Lease the oldest queued (url, depth), or None when nothing is left to lease"""
+        row = self._db.execute('SELECT id, url, depth FROM queue WHERE leased = 0 ORDER BY id LIMIT 1').fetchone()
+        if row is None:
+            return None
+        self._db.execute('UPDATE queue SET leased = 1 WHERE id = ?', (row[0],))
+        self._db.commit()
+        self._leases[row[1]] = row[0]
+        self.pending -= 1
+        return row[1], row[2]
+
+    def done(self, url):
+        """Drop a leased URL from the queue once its record is written"""
+        lease = self._leases.pop(url, None)
+        if lease is not None:
+            self._db.execute('DELETE FROM queue WHERE id = ?', (lease,))
+            self._db.commit()
+
+    @property
+    def leased(self):
+        return len(self._leases)
+
+    def close(self):
+        self._db.close()
+        if self._tmpdir:
+            shutil.rmtree(self._tmpdir, ignore_errors=True)
+
+
+class RobotsPolicy:
+    """robots.txt rules and crawl delay per origin, fetched once each"""
+
+    def __init__(self, fetch, agent=ROBOTS_AGENT):
+        self.fetch = fetch
+        self.agent = agent
+        self._parsers = {}
+        self.status = {}
+
+    def _parser(self, origin):
+        if origin not in self._parsers:
+            parser = robotparser.RobotFileParser(origin + '/robots.txt')
+            try:
+                response = self.fetch(origin + '/robots.txt')
+                status = response.status_code
+                if status >= 500:
+                    # Server trouble: treat the whole site as disallowed (RFC 9309)
+                    parser.disallow_all = True
+                elif status >= 400:
+                    parser.allow_all = True
+                else:
+                    parser.parse(response.text.splitlines())
+                self.status[origin] = status
+            except Exception as e:
+                print(f"robots.txt unreachable for {origin}: {e}")
+                parser.disallow_all = True
+                self.status[origin] = 'unreachable'
+            self._parsers[origin] = parser
+        return self._parsers[origin]
+
+    def allowed(self, url):
+        return self._parser(origin_of(url)).can_fetch(self.agent, url)
+
+    def crawl_delay(self, url):
+        delay = self._parser(origin_of(url)).crawl_delay(self.agent)
+        return min(float(delay), MAX_CRAWL_DELAY) if delay else 0.0
+
+
+class SiteAggregate:
+    """Site-level score distribution and worst pages in constant memory"""
+
+    CATEGORIES = ('performance', 'seo', 'accessibility', 'bestPractices')
+
+    def __init__(self, worst=WORST_PAGES):
+        self.worst = worst
+        self.histograms = {category: [0] * 101 for category in self.CATEGORIES}
+        self.sums = {category: 0 for category in self.CATEGORIES}
+        self._worst_heap = []
+        self.statuses = {}
+
+    def add(self, url, result):
+        scores = result.get('scores') or {}
+        present = []
+        for category in self.CATEGORIES:
+            score = scores.get(category)
+            if score is None:
+                continue
+            score = int(round(min(100, max(0, score))))
+            self.histograms[category][score] += 1
+            self.sums[category] += score
+            present.append(score)
+        status = (result.get('document') or {}).get('status')
+        self.statuses[str(status)] = self.statuses.get(str(status), 0) + 1
+        if present:
+            # Max-heap on the average score via negation, keeping the `worst` lowest
+            entry = (-sum(present) / len(present), url, scores)
+            if len(self._worst_heap) < self.worst:
+                heapq.heappush(self._worst_heap, entry)
+            elif entry > self._worst_heap[0]:
+                heapq.heapreplace(self._worst_heap, entry)
+
+    def _category_summary(self, histogram, total):
+        count = sum(histogram)
+        if not count:
+            return None
+
+        def percentile(p):
+            rank = max(1, math.ceil(p / 100 * count))
+            running = 0
+            for score, hits in enumerate(histogram):
+                running += hits
+                if running >= rank:
+                    return score
+
+        return {
+            'count': count,
+            'mean': round(total / count, 1),
+            'min': percentile(0),
+            'p50': percentile(50),
+            'p90': percentile(90),
+            'max': percentile(100),
+            'distribution': {
+                'poor': sum(histogram[:50]),
+                'needsImprovement': sum(histogram[50:90]),
+                'good': sum(histogram[90:])
+            }
+        }
+
+    def summary(self):
+        worst = sorted(self._worst_heap, reverse=True)
+        return {
+            'scores': {category: self._category_summary(self.histograms[category], self.sums[category])
+                       for category in self.CATEGORIES},
+            'statuses': self.statuses,
+            'worstPages': [{'url': url, 'averageScore': round(-negated, 1), 'scores': scores}
+                           for negated, url, scores in worst]
+        }
+
+
+def crawlable(url, origin):
+    """Same origin, http(s), and not obviously a download"""
+    parts = urlsplit(url)
+    if parts.scheme not in ('http', 'https') or origin_of(url) != origin:
+        return False
+    return not parts.path.lower().endswith(SKIP_EXTENSIONS)
+
+
+def _normalized_link(link):
+    """normalize_url() of a discovered link, or None if it is malformed (e.g. a non-numeric port)"""
+    try:
+        return normalize_url(link)
+    except ValueError:
+        return None
+
+
+def fetch_robots(url):
+    return get_session().get(url, timeout=10)
+
+
+def run_crawl(seed, runner, max_pages=100, max_depth=10, workers=2, delay=1.0,
+              robots=None, frontier_path=None):
+    """Crawl the seed's origin breadth-first, yielding one record per page then a summary.
+
+    runner(url) must return an analysis result with a 'links' list. At
+    most `workers` pages are analyzed at once, and page starts on the
+    origin are spaced by the larger of `delay` and robots.txt's
+    Crawl-delay. Pages whose robots meta says nofollow are analyzed
+    but their links are not followed.
+    """
+    started = time.time()
+    seed = normalize_url(seed)
+    origin = origin_of(seed)
+    frontier = Frontier(frontier_path)
+    aggregate = SiteAggregate()
+    counters = {'analyzed': 0, 'failed': 0, 'robotsBlocked': 0}
+    spacing = max(delay, robots.crawl_delay(seed) if robots else 0.0)
+    next_start = 0.0
+
+    frontier.add_many([seed], 0)
+    try:
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            pending = {}
+            while True:
+                scheduled = counters['analyzed'] + counters['failed'] + len(pending)
+                # Start the next page when a slot is free and politeness allows it
+                while len(pending) < workers and scheduled < max_pages and frontier.pending:
+                    wait_for = next_start - time.time()
+                    if wait_for > 0:
+                        if pending:
+                            break
+                        time.sleep(wait_for)
+                    url, depth = frontier.pop()
+                    if robots and not robots.allowed(url):
+                        counters['robotsBlocked'] += 1
+                        frontier.done(url)
+                        continue
+                    pending[executor.submit(_timed, runner, url)] = (url, depth)
+                    next_start = time.time() + spacing
+                    scheduled += 1
+
+                if not pending:
+                    break
+
+                timeout = max(0.0, next_start - time.time()) if frontier.pending else None
+                done, _ = wait(pending, timeout=timeout, return_when=FIRST_COMPLETED)
+                for future in done:
+                    url, depth = pending.pop(future)
+                    try:
+                        result, elapsed = future.result()
+                    except Exception as e:
+                        counters['failed'] += 1
+                        yield {'url': url, 'depth': depth, 'status': 'error', 'error': str(e)}
+                        frontier.done(url)
+                        continue
+
+                    counters['analyzed'] += 1
+                    aggregate.add(url, result)
+                    meta_tags = (result.get('overview') or {}).get('metaTags') or []
+                    robots_meta = next((tag['content'] for tag in meta_tags
+                                        if tag['name'].lower() == 'robots'), '')
+                    links = result.pop('links', None) or []
+                    if depth < max_depth and 'nofollow' not in robots_meta.lower():
+                        frontier.add_many([link for link in map(_normalized_link, links)
+                                           if link and crawlable(link, origin)], depth + 1)
+                    yield {'url': url, 'depth': depth, 'status': 'ok', 'elapsed': round(elapsed, 3),
+                           'result': result}
+                    # Only now is the record out; an interrupted crawl re-queues the page on resume
+                    frontier.done(url)
+    finally:
+        discovered = frontier.seen
+        # Pages still in flight count as not crawled; a resume picks them up again
+        left = frontier.pending + frontier.leased
+        frontier.close()
+
+    duration = time.time() - started
+    summary = {
+        'seed': seed,
+        'pages': counters['analyzed'],
+        'failed': counters['failed'],
+        'discovered': discovered,
+        'notCrawled': left,
+        'robotsBlocked': counters['robotsBlocked'],
+        'robots': robots.status.get(origin) if robots else None,
+        'delaySeconds': spacing,
+        'durationSeconds': round(duration, 2),
+        'pagesPerMinute': round(counters['analyzed'] / duration * 60, 2) if duration > 0 else 0
+    }
+    summary.update(aggregate.summary())
+    yield {'summary': summary}
+
+
+def _timed(runner, url):
+    start = time.time()
+    result = runner(url)
+    return result, time.time() - start
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Audit every page of a site and write NDJSON results')
+    parser.add_argument('seed', help='Start URL; only pages on its origin are crawled')
+    parser.add_argument('--max-pages', type=int, default=100, help='Stop after this many pages (default: 100)')
+    parser.add_argument('--max-depth', type=int, default=10, help='Link depth limit (default: 10)')
+    parser.add_argument('-w', '--workers', type=int, default=2, help='Concurrent analyses (default: 2)')
+    parser.add_argument('--delay', type=float, default=1.0,
+                        help='Minimum seconds between page starts (default: 1; robots Crawl-delay wins if larger)')
+    parser.add_argument('--ignore-robots', action='store_true', help='Do not read robots.txt')
+    parser.add_argument('--frontier', help='SQLite file for the frontier, to resume an interrupted crawl')
+    parser.add_argument('--mode', choices=list(ENGINE_MODES), help='Analysis engine (default: browser)')
+    parser.add_argument('--navigation', choices=list(NAVIGATION_PROFILES), help='Navigation profile (default: full)')
+    parser.add_argument('-o', '--output', help='Write NDJSON here instead of stdout')
+    args = parser.parse_args(argv)
+
+    os.environ.setdefault('ANALYZER_POOL_SIZE', str(args.workers))
+    os.environ.setdefault('ANALYZER_POOL_MAX_QUEUE', str(args.workers))
+    # Every page shares the seed's origin; --delay and robots.txt set the pace instead
+    os.environ.setdefault('ANALYZER_ORIGIN_CONCURRENCY', str(args.workers))
+    from app import analyze_cached, parse_options, validate_url
+
+    error = validate_url(args.seed)
+    if error:
+        parser.error(error)
+    options = parse_options({'mode': args.mode, 'navigation': args.navigation})
+    options['links'] = True
+    robots = None if args.ignore_robots else RobotsPolicy(fetch_robots)
+
+    out = open(args.output, 'w') if args.output else sys.stdout
+    summary = {}
+    try:
+        records = run_crawl(args.seed, lambda url: analyze_cached(url, options),
+                            max_pages=args.max_pages, max_depth=args.max_depth, workers=args.workers,
+                            delay=args.delay, robots=robots, frontier_path=args.frontier)
+        for record in records:
+            out.write(json.dumps(record) + '\n')
+            out.flush()
+            if 'summary' in record:
+                summary = record['summary']
+            elif record['status'] == 'error':
+                print(f"Failed: {record['url']}: {record['error']}", file=sys.stderr)
+    finally:
+        if args.output:
+            out.close()
+
+    print(f"{summary.get('pages', 0)} pages analyzed, {summary.get('notCrawled', 0)} left in the frontier, "
+          f"{summary.get('durationSeconds', 0)}s", file=sys.stderr)
+    return 1 if summary.get('failed') else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
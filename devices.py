@@ -0,0 +1,131 @@
+import time
+
+# Lab devices. Viewport, user agent and touch are browser context options;
+# CPU slowdown and network shaping are applied per page over the DevTools
+# protocol, as Chrome DevTools and Lighthouse's devtools throttling do.
+# Network shaping in CDP delays each request, not each packet, so the
+# request latency is the round trip times Lighthouse's 3.75 multiplier and
+# throughput gets its 0.9 factor: the same values DevTools throttling uses
+DEVICE_PROFILES = {
+    # Playwright's default viewport, unthrottled: the numbers results always had
+    'desktop': {
+        'description': 'Desktop, 1280x720, no throttling',
+        'context': {'viewport': {'width': 1280, 'height': 720}},
+        'cpuSlowdown': 1,
+        'network': None
+    },
+    # Lighthouse's mid-tier phone on slow 4G (150ms RTT, 1.6 Mbps)
+    'mobile': {
+        'description': 'Mid-tier phone, 4x CPU slowdown, slow 4G',
+        'context': {
+            'viewport': {'width': 412, 'height': 823},
+            'device_scale_factor': 1.75,
+            'is_mobile': True,
+            'has_touch': True,
+            'user_agent': 'Mozilla/5.0 (Linux; Android 11; moto g power (2022)) AppleWebKit/537.36 '
+                          '(KHTML, like Gecko) Chrome/120.0.0.0 Mobile Safari/537.36'
+        },
+        'cpuSlowdown': 4,
+        'network': {'latencyMs': 562.5, 'downloadKbps': 1474.6, 'uploadKbps': 675}
+    },
+    # Low-end phone on regular 3G (300ms RTT, 700 Kbps)
+    'lowEndMobile': {
+        'description': 'Low-end phone, 6x CPU slowdown, 3G',
+        'context': {
+            'viewport': {'width': 360, 'height': 640},
+            'device_scale_factor': 2,
+            'is_mobile': True,
+            'has_touch': True,
+            'user_agent': 'Mozilla/5.0 (Linux; Android 7.0; Moto G (4)) AppleWebKit/537.36 '
+                          '(KHTML, like Gecko) Chrome/120.0.0.0 Mobile Safari/537.36'
+        },
+        'cpuSlowdown': 6,
+        'network': {'latencyMs': 1125, 'downloadKbps': 630, 'uploadKbps': 630}
+    },
+}
+DEFAULT_DEVICE = 'desktop'
+
+# Raw metrics lined up side by side in a multi-device report
+COMPARED_METRICS = ('ttfb', 'fcp', 'lcp', 'cls', 'tbt', 'inp', 'pageLoad', 'networkRequests', 'pageSize')
+
+
+def parse_devices(value):
+    """Validated list of device names from a request's `device` (a name or a list of names)"""
+    devices = value if isinstance(value, list) else [value or DEFAULT_DEVICE]
+    if not devices or not all(isinstance(name, str) and name in DEVICE_PROFILES for name in devices):
+        raise ValueError(f"device must be one or a list of: {', '.join(DEVICE_PROFILES)}")
+    if len(set(devices)) != len(devices):
+        raise ValueError('device must not list a device twice')
+    return devices
+
+
+def device_context_options(device, extra=None):
+    """Browser context options for a device, merged with extra ones (e.g. HAR recording)"""
+    return dict(DEVICE_PROFILES[device]['context'], **(extra or {}))
+
+
+def _throttle_commands(device):
+    profile = DEVICE_PROFILES[device]
+    commands = []
+    if profile['cpuSlowdown'] > 1:
+        commands.append(('Emulation.setCPUThrottlingRate', {'rate': profile['cpuSlowdown']}))
+    network = profile['network']
+    if network:
+        commands.append(('Network.enable', {}))
+        commands.append(('Network.emulateNetworkConditions', {
+            'offline': False,
+            'latency': network['latencyMs'],
+            'downloadThroughput': network['downloadKbps'] * 1024 / 8,
+            'uploadThroughput': network['uploadKbps'] * 1024 / 8
+        }))
+    return commands
+
+
+def throttle_page(page, device):
+    """Apply the device's CPU and network throttling to a page before it navigates.
+
+    Returns the CDP session holding the throttling (None when the device has
+    none); the settings last while it stays attached, i.e. until the page closes.
+    """
+    commands = _throttle_commands(device)
+    if not commands:
+        return None
+    session = page.context.new_cdp_session(page)
+    for method, params in commands:
+        session.send(method, params)
+    return session
+
+
+async def throttle_page_async(page, device):
+    """throttle_page() for Playwright's async API"""
+    commands = _throttle_commands(device)
+    if not commands:
+        return None
+    session = await page.context.new_cdp_session(page)
+    for method, params in commands:
+        await session.send(method, params)
+    return session
+
+
+def device_phases(on_phase, device):
+    """on_phase callback of one device's run: every event carries the device name"""
+    if on_phase is None:
+        return None
+    return lambda name, data: on_phase(name, dict(data, device=device))
+
+
+def combine_devices(url, profile, results):
+    """One report for a URL analyzed on several devices: each result plus a side-by-side comparison"""
+    return {
+        'url': url,
+        'timestamp': time.strftime('%Y-%m-%d %H:%M:%S'),
+        'profile': profile,
+        'devices': results,
+        'comparison': {
+            'scores': {device: result['scores'] for device, result in results.items()},
+            'metrics': {metric: {device: result['rawMetrics'].get(metric) for device, result in results.items()}
+                        for metric in COMPARED_METRICS}
+        },
+        'cached': all(result['cached'] for result in results.values()),
+        'ageSeconds': max(result['ageSeconds'] for result in results.values())
+    }
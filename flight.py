@@ -0,0 +1,234 @@
+import asyncio
+import json
+import threading
+import time
+from collections import OrderedDict, deque
+from contextlib import asynccontextmanager, contextmanager
+
+from browser_pool import PoolBusyError
+
+# Per-origin wait statistics are kept for this many recently seen origins
+MAX_TRACKED_ORIGINS = 500
+
+
+class OriginBusyError(PoolBusyError):
+    """Raised when an analysis waited too long for a slot on its origin"""
+
+
+def _resolve(future):
+    if not future.done():
+        future.set_result(None)
+
+
+class SingleFlight:
+    """Runs one call per key at a time; concurrent callers with the same key share its outcome.
+
+    The first caller (the leader) runs fn. Callers arriving while it runs
+    block and receive their own copy of the leader's result, or the same
+    exception. Nothing is remembered once the call finishes - that is the
+    result cache's job. Threads (do) and coroutines (do_async) can join each
+    other's calls.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls = {}
+        self._counters = {'leaders': 0, 'followers': 0, 'inFlight': 0}
+
+    def _join(self, key, waiter=None):
+        """(call, leader); a follower's waiter (loop, future) is notified on completion"""
+        with self._lock:
+            call = self._calls.get(key)
+            if call is None:
+                call = self._calls[key] = {'done': threading.Event(), 'followers': 0, 'waiters': [],
+                                           'payload': None, 'error': None}
+                self._counters['leaders'] += 1
+                return call, True
+            call['followers'] += 1
+            self._counters['followers'] += 1
+            if waiter is not None:
+                call['waiters'].append(waiter)
+            return call, False
+
+    def _finish(self, key, call, result=None, error=None):
+        with self._lock:
+            # Later arrivals start a call of their own from here on, so the
+            # follower count is final
+            del self._calls[key]
+        if error is not None:
+            call['error'] = error
+        elif call['followers']:
+            call['payload'] = json.dumps(result)
+        call['done'].set()
+        for loop, future in call['waiters']:
+            loop.call_soon_threadsafe(_resolve, future)
+
+    def _shared(self, call):
+        if call['error'] is not None:
+            raise call['error']
+        return json.loads(call['payload']), True
+
+    def do(self, key, fn):
+        """Return (result, shared); shared is True when another caller's run was reused"""
+        call, leader = self._join(key)
+        if not leader:
+            call['done'].wait()
+            return self._shared(call)
+        try:
+            result = fn()
+        except BaseException as e:
+            self._finish(key, call, error=e)
+            raise
+        self._finish(key, call, result)
+        return result, False
+
+    async def do_async(self, key, fn):
+        """do() for a coroutine function, without blocking the event loop while following"""
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        call, leader = self._join(key, (loop, future))
+        if not leader:
+            await future
+            return self._shared(call)
+        try:
+            result = await fn()
+        except BaseException as e:
+            self._finish(key, call, error=e)
+            raise
+        self._finish(key, call, result)
+        return result, False
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._counters)
+            stats['inFlight'] = len(self._calls)
+        requests = stats['leaders'] + stats['followers']
+        stats['hitRate'] = round(stats['followers'] / requests, 4) if requests else 0.0
+        return stats
+
+
+class OriginLimiter:
+    """Caps concurrent analyses per origin; callers over the cap queue in arrival order.
+
+    A finishing caller hands its slot straight to the longest waiter, so a
+    steady stream of new requests can't overtake the queue. Threads (slot)
+    and coroutines (slot_async) share the same slots and queue.
+    """
+
+    def __init__(self, limit=2, timeout=120):
+        self.limit = limit
+        self.timeout = timeout
+        self._lock = threading.Lock()
+        self._origins = {}
+        self._stats = OrderedDict()
+        self._totals = {'acquired': 0, 'waited': 0, 'timedOut': 0, 'waitSecondsTotal': 0.0}
+
+    @contextmanager
+    def slot(self, origin):
+        """Hold one of origin's slots for the duration of the block; yields seconds waited"""
+        start = time.monotonic()
+        ticket = self._enter(origin, lambda: {'granted': False, 'event': threading.Event()})
+        if ticket is not None and not ticket['event'].wait(self.timeout) and self._abandon(origin, ticket):
+            self._timed_out(origin)
+        waited = time.monotonic() - start
+        self._record(origin, waited, ticket is not None)
+        try:
+            yield waited
+        finally:
+            self._release(origin)
+
+    @asynccontextmanager
+    async def slot_async(self, origin):
+        """slot() for coroutines: waiting suspends the task instead of a thread"""
+        start = time.monotonic()
+        loop = asyncio.get_running_loop()
+        ticket = self._enter(origin, lambda: {'granted': False, 'loop': loop, 'future': loop.create_future()})
+        if ticket is not None:
+            try:
+                await asyncio.wait_for(asyncio.shield(ticket['future']), self.timeout)
+            except asyncio.TimeoutError:
+                if self._abandon(origin, ticket):
+                    self._timed_out(origin)
+            except BaseException:
+                # Cancelled while queued: give back a slot that was handed over meanwhile
+                if not self._abandon(origin, ticket):
+                    self._release(origin)
+                raise
+        waited = time.monotonic() - start
+        self._record(origin, waited, ticket is not None)
+        try:
+            yield waited
+        finally:
+            self._release(origin)
+
+    def _enter(self, origin, make_ticket):
+        """Take a free slot (None) or queue a new ticket and return it"""
+        with self._lock:
+            state = self._origins.setdefault(origin, {'active': 0, 'waiters': deque()})
+            if state['active'] < self.limit and not state['waiters']:
+                state['active'] += 1
+                return None
+            ticket = make_ticket()
+            state['waiters'].append(ticket)
+            return ticket
+
+    def _abandon(self, origin, ticket):
+        """Leave the queue after a timeout; False when the slot was handed over just in time"""
+        with self._lock:
+            if ticket['granted']:
+                return False
+            self._origins[origin]['waiters'].remove(ticket)
+            return True
+
+    def _timed_out(self, origin):
+        with self._lock:
+            self._totals['timedOut'] += 1
+        raise OriginBusyError(f'{origin} already has {self.limit} analyses running')
+
+    def _release(self, origin):
+        with self._lock:
+            state = self._origins[origin]
+            if state['waiters']:
+                ticket = state['waiters'].popleft()
+                ticket['granted'] = True
+                if 'event' in ticket:
+                    ticket['event'].set()
+                else:
+                    ticket['loop'].call_soon_threadsafe(_resolve, ticket['future'])
+                return
+            state['active'] -= 1
+            if not state['active']:
+                del self._origins[origin]
+
+    def _record(self, origin, waited, queued):
+        with self._lock:
+            self._totals['acquired'] += 1
+            self._totals['waitSecondsTotal'] += waited
+            stats = self._stats.pop(origin, None) or {'acquired': 0, 'waited': 0,
+                                                      'waitSecondsTotal': 0.0, 'waitSecondsMax': 0.0}
+            stats['acquired'] += 1
+            stats['waitSecondsTotal'] += waited
+            stats['waitSecondsMax'] = max(stats['waitSecondsMax'], waited)
+            if queued:
+                self._totals['waited'] += 1
+                stats['waited'] += 1
+            self._stats[origin] = stats
+            while len(self._stats) > MAX_TRACKED_ORIGINS:
+                self._stats.popitem(last=False)
+
+    def stats(self):
+        """Totals plus per-origin active/queued counts and wait times, busiest first"""
+        with self._lock:
+            totals = dict(self._totals)
+            origins = []
+            for origin, stats in self._stats.items():
+                state = self._origins.get(origin) or {'active': 0, 'waiters': ()}
+                origins.append(dict(stats, origin=origin, active=state['active'],
+                                    queued=len(state['waiters']),
+                                    avgWaitSeconds=round(stats['waitSecondsTotal'] / stats['acquired'], 4),
+                                    waitSecondsTotal=round(stats['waitSecondsTotal'], 4),
+                                    waitSecondsMax=round(stats['waitSecondsMax'], 4)))
+        origins.sort(key=lambda item: (item['active'] + item['queued'], item['waitSecondsTotal']), reverse=True)
+        totals['waitSecondsTotal'] = round(totals['waitSecondsTotal'], 4)
+        totals['avgWaitSeconds'] = round(totals['waitSecondsTotal'] / totals['acquired'], 4) if totals['acquired'] else 0.0
+        return {'limit': self.limit, **totals, 'origins': origins}
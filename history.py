@@ -0,0 +1,246 @@
+import math
+import os
+import sqlite3
+import threading
+import time
+
+from urls import normalize_url
+
+# API metric name -> column, and whether a higher value is worse
+METRICS = {
+    'ttfb': ('ttfb', True),
+    'fcp': ('fcp', True),
+    'domLoad': ('dom_load', True),
+    'pageLoad': ('page_load', True),
+    'lcp': ('lcp', True),
+    'cls': ('cls', True),
+    'tbt': ('tbt', True),
+    'inp': ('inp', True),
+    'networkRequests': ('network_requests', True),
+    'pageSize': ('page_size', True),
+    'performance': ('performance', False),
+    'seo': ('seo', False),
+    'accessibility': ('accessibility', False),
+    'bestPractices': ('best_practices', False),
+}
+
+# Largest sample per window pulled into Python for the significance test
+MAX_TEST_SAMPLE = 5000
+
+
+class HistoryStore:
+    """Numeric metrics of every analysis in SQLite, for trends and regression checks.
+
+    URLs are stored once in their own table and referenced by id. Each metric
+    has a covering (url_id, metric, ts) index, so percentile queries for one
+    URL walk the index in value order without touching the table.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+        # Opened on the first write, so importing the app creates no file
+        self._db = None
+        self._url_ids = {}
+
+    def _open(self, create):
+        # Caller holds self._lock. None while there is no file and nothing to write
+        if self._db is None and (create or os.path.exists(self.path)):
+            self._connect()
+        return self._db
+
+    def _connect(self):
+        self._db = sqlite3.connect(self.path, check_same_thread=False)
+        self._db.execute('PRAGMA journal_mode=WAL')
+        self._db.execute('PRAGMA synchronous=NORMAL')
+        self._db.execute("""CREATE TABLE IF NOT EXISTS urls (
+            id INTEGER PRIMARY KEY,
+            url TEXT NOT NULL UNIQUE
+        )""")
+        columns = ', '.join(f'{column} REAL' for column, _ in METRICS.values())
+        self._db.execute(f"""CREATE TABLE IF NOT EXISTS runs (
+            id INTEGER PRIMARY KEY,
+            url_id INTEGER NOT NULL REFERENCES urls(id),
+            ts REAL NOT NULL,
+            {columns}
+        )""")
+        # Databases created before a metric existed get its column added
+        existing = {row[1] for row in self._db.execute('PRAGMA table_info(runs)')}
+        for column, _ in METRICS.values():
+            if column not in existing:
+                self._db.execute(f'ALTER TABLE runs ADD COLUMN {column} REAL')
+        self._db.execute('CREATE INDEX IF NOT EXISTS idx_runs_url_ts ON runs(url_id, ts)')
+        for column, _ in METRICS.values():
+            self._db.execute(f'CREATE INDEX IF NOT EXISTS idx_runs_url_{column} ON runs(url_id, {column}, ts)')
+        self._db.commit()
+
+    def record(self, result, ts=None):
+        """Store the numeric metrics and scores of one analysis result"""
+        raw = result.get('rawMetrics') or {}
+        scores = result.get('scores') or {}
+        values = []
+        for name in METRICS:
+            value = scores.get(name) if name in scores else raw.get(name)
+            values.append(value if isinstance(value, (int, float)) and not isinstance(value, bool) else None)
+
+        columns = ', '.join(column for column, _ in METRICS.values())
+        placeholders = ', '.join('?' for _ in METRICS)
+        with self._lock:
+            self._open(create=True)
+            url_id = self._url_id(normalize_url(result['url']))
+            self._db.execute(f'INSERT INTO runs (url_id, ts, {columns}) VALUES (?, ?, {placeholders})',
+                             [url_id, ts or time.time()] + values)
+            self._db.commit()
+
+    def summary(self, url, metric, since, until=None):
+        """count/min/max/mean/p50/p95 of one metric for one URL in [since, until]"""
+        column = METRICS[metric][0]
+        until = until or time.time()
+        with self._lock:
+            url_id = self._known_url_id(normalize_url(url))
+            if url_id is None:
+                return {'metric': metric, 'count': 0}
+            where = f'url_id = ? AND ts BETWEEN ? AND ? AND {column} IS NOT NULL'
+            args = (url_id, since, until)
+            count, low, high, mean = self._db.execute(
+                f'SELECT COUNT(*), MIN({column}), MAX({column}), AVG({column}) FROM runs WHERE {where}',
+                args).fetchone()
+            result = {'metric': metric, 'count': count, 'min': low, 'max': high,
+                      'mean': round(mean, 2) if mean is not None else None}
+            for percentile in (50, 95):
+                result[f'p{percentile}'] = self._percentile(column, where, args, count, percentile)
+        return result
+
+    def series(self, url, metric, since, until=None, limit=1000):
+        """Most recent (ts, value) points of one metric, oldest first"""
+        column = METRICS[metric][0]
+        until = until or time.time()
+        with self._lock:
+            url_id = self._known_url_id(normalize_url(url))
+            if url_id is None:
+                return []
+            rows = self._db.execute(
+                f"""SELECT ts, {column} FROM runs
+                    WHERE url_id = ? AND ts BETWEEN ? AND ? AND {column} IS NOT NULL
+                    ORDER BY ts DESC LIMIT ?""", (url_id, since, until, limit)).fetchall()
+        return [{'ts': ts, 'value': value} for ts, value in reversed(rows)]
+
+    def regressions(self, url, recent_seconds, baseline_seconds, alpha=0.01, min_change=0.05, now=None):
+        """Compare the recent window against the baseline window just before it, per metric.
+
+        A metric is flagged when a two-sided Mann-Whitney U test rejects
+        "same distribution" at `alpha`, the median moved in the bad direction
+        and by at least `min_change` (relative).
+        """
+        now = now or time.time()
+        recent_start = now - recent_seconds
+        baseline_start = recent_start - baseline_seconds
+        findings = []
+        with self._lock:
+            url_id = self._known_url_id(normalize_url(url))
+            if url_id is None:
+                return findings
+            for metric, (column, higher_is_worse) in METRICS.items():
+                baseline = self._values(url_id, column, baseline_start, recent_start)
+                recent = self._values(url_id, column, recent_start, now)
+                if len(baseline) < 3 or len(recent) < 3:
+                    continue
+                p_value = mann_whitney_p(baseline, recent)
+                baseline_median = _median(baseline)
+                recent_median = _median(recent)
+                delta = recent_median - baseline_median
+                change = delta / abs(baseline_median) if baseline_median else (math.inf if delta else 0.0)
+                worse = delta > 0 if higher_is_worse else delta < 0
+                findings.append({
+                    'metric': metric,
+                    'baselineCount': len(baseline),
+                    'recentCount': len(recent),
+                    'baselineMedian': baseline_median,
+                    'recentMedian': recent_median,
+                    'change': round(change, 4) if math.isfinite(change) else None,
+                    'pValue': round(p_value, 6),
+                    'regression': p_value < alpha and worse and abs(change) >= min_change
+                })
+        return findings
+
+    def recent_urls(self, since, limit=100):
+        with self._lock:
+            if self._open(create=False) is None:
+                return []
+            rows = self._db.execute(
+                """SELECT urls.url FROM urls JOIN runs ON runs.url_id = urls.id
+                   WHERE runs.ts >= ? GROUP BY urls.id ORDER BY MAX(runs.ts) DESC LIMIT ?""",
+                (since, limit)).fetchall()
+        return [row[0] for row in rows]
+
+    def _url_id(self, url):
+        # Caller holds self._lock
+        url_id = self._known_url_id(url)
+        if url_id is None:
+            url_id = self._db.execute('INSERT INTO urls (url) VALUES (?)', (url,)).lastrowid
+            self._url_ids[url] = url_id
+        return url_id
+
+    def _known_url_id(self, url):
+        # Caller holds self._lock
+        if self._open(create=False) is None:
+            return None
+        if url not in self._url_ids:
+            row = self._db.execute('SELECT id FROM urls WHERE url = ?', (url,)).fetchone()
+            if row is None:
+                return None
+            self._url_ids[url] = row[0]
+        return self._url_ids[url]
+
+    def _percentile(self, column, where, args, count, percentile):
+        # Nearest-rank percentile read straight off the (url_id, metric, ts) index
+        if not count:
+            return None
+        offset = max(0, math.ceil(percentile / 100 * count) - 1)
+        row = self._db.execute(
+            f'SELECT {column} FROM runs WHERE {where} ORDER BY {column} LIMIT 1 OFFSET ?',
+            args + (offset,)).fetchone()
+        return row[0] if row else None
+
+    def _values(self, url_id, column, since, until):
+        rows = self._db.execute(
+            f"""SELECT {column} FROM runs
+                WHERE url_id = ? AND ts >= ? AND ts < ? AND {column} IS NOT NULL
+                ORDER BY ts DESC LIMIT ?""", (url_id, since, until, MAX_TEST_SAMPLE)).fetchall()
+        return [row[0] for row in rows]
+
+
+def mann_whitney_p(a, b):
+    """Two-sided p-value of the Mann-Whitney U test (normal approximation, tie-corrected)"""
+    n1, n2 = len(a), len(b)
+    combined = sorted([(value, 0) for value in a] + [(value, 1) for value in b])
+    rank_sum_a = 0.0
+    tie_term = 0.0
+    i = 0
+    while i < len(combined):
+        j = i
+        while j + 1 < len(combined) and combined[j + 1][0] == combined[i][0]:
+            j += 1
+        average_rank = (i + j) / 2 + 1
+        ties = j - i + 1
+        tie_term += ties ** 3 - ties
+        rank_sum_a += average_rank * sum(1 for k in range(i, j + 1) if combined[k][1] == 0)
+        i = j + 1
+
+    u = rank_sum_a - n1 * (n1 + 1) / 2
+    mean_u = n1 * n2 / 2
+    n = n1 + n2
+    variance = n1 * n2 / 12 * ((n + 1) - tie_term / (n * (n - 1)))
+    if variance <= 0:
+        return 1.0
+    # Continuity correction towards the mean
+    z = (abs(u - mean_u) - 0.5) / math.sqrt(variance)
+    return min(1.0, math.erfc(max(z, 0) / math.sqrt(2)))
+
+
+def _median(values):
+    ordered = sorted(values)
+    middle = len(ordered) // 2
+    if len(ordered) % 2:
+        return ordered[middle]
+    return (ordered[middle - 1] + ordered[middle]) / 2
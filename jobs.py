@@ -0,0 +1,163 @@
+import queue
+import threading
+import time
+import uuid
+
+
+class JobQueueFull(Exception):
+    """Raised when the pending job queue is at capacity"""
+
+
+class JobManager:
+    """Runs analyses on a bounded set of worker threads.
+
+    Request handlers only enqueue work and read job state, so they never
+    wait on the browser. Every phase reported by the runner is stored as an
+    event, which lets late subscribers replay the stream from the start.
+    A finished result goes through `shape(url, result, options, limit)`
+    before it is stored or streamed, so a job keeps only what it returns.
+    """
+
+    TERMINAL = ('done', 'failed')
+
+    def __init__(self, runner, concurrency=2, max_pending=100, retention=3600, shape=None):
+        self.runner = runner
+        self.shape = shape
+        self.concurrency = concurrency
+        self.retention = retention
+        self._queue = queue.Queue(maxsize=max_pending)
+        self._jobs = {}
+        self._cond = threading.Condition()
+        self._workers = []
+        self._started = False
+
+    def submit(self, url, options=None, limit=None):
+        """Queue an analysis and return the new job's snapshot; limit is passed to shape"""
+        self._ensure_workers()
+        job = {
+            'id': uuid.uuid4().hex,
+            'url': url,
+            'options': options or {},
+            'limit': limit,
+            'status': 'queued',
+            'createdAt': time.time(),
+            'startedAt': None,
+            'finishedAt': None,
+            'phases': {},
+            'events': [],
+            'result': None,
+            'error': None,
+        }
+        with self._cond:
+            self._prune()
+            self._jobs[job['id']] = job
+            self._append_event(job, 'status', {'status': 'queued'})
+        try:
+            self._queue.put_nowait(job['id'])
+        except queue.Full:
+            with self._cond:
+                del self._jobs[job['id']]
+            raise JobQueueFull(f'{self._queue.maxsize} jobs already pending')
+        return self.get(job['id'])
+
+    def get(self, job_id):
+        """Public view of a job, or None if unknown/expired"""
+        with self._cond:
+            job = self._jobs.get(job_id)
+            if job is None:
+                return None
+            snapshot = {key: job[key] for key in ('id', 'url', 'options', 'status', 'createdAt',
+                                                  'startedAt', 'finishedAt', 'error')}
+            snapshot['phases'] = dict(job['phases'])
+            snapshot['result'] = job['result']
+            snapshot['queueDepth'] = self._queue.qsize()
+            return snapshot
+
+    def stream(self, job_id, keepalive=15):
+        """Yield (event, data) pairs until the job finishes; None is a keepalive tick"""
+        seq = 0
+        while True:
+            with self._cond:
+                job = self._jobs.get(job_id)
+                if job is None:
+                    return
+                if seq >= len(job['events']) and job['status'] not in self.TERMINAL:
+                    self._cond.wait(keepalive)
+                pending = job['events'][seq:]
+                seq += len(pending)
+                finished = job['status'] in self.TERMINAL and seq >= len(job['events'])
+            if not pending and not finished:
+                yield None
+            for event in pending:
+                yield event
+            if finished:
+                return
+
+    def stats(self):
+        with self._cond:
+            counts = {}
+            for job in self._jobs.values():
+                counts[job['status']] = counts.get(job['status'], 0) + 1
+        return {
+            'workers': self.concurrency,
+            'queueDepth': self._queue.qsize(),
+            'maxPending': self._queue.maxsize,
+            'jobs': counts,
+        }
+
+    def _ensure_workers(self):
+        with self._cond:
+            if self._started:
+                return
+            self._started = True
+            for index in range(self.concurrency):
+                worker = threading.Thread(target=self._worker_main, name=f'job-worker-{index}', daemon=True)
+                worker.start()
+                self._workers.append(worker)
+
+    def _worker_main(self):
+        while True:
+            job_id = self._queue.get()
+            with self._cond:
+                job = self._jobs.get(job_id)
+                if job is None:
+                    continue
+                job['status'] = 'running'
+                job['startedAt'] = time.time()
+                self._append_event(job, 'status', {'status': 'running'})
+
+            def on_phase(name, data, job=job):
+                with self._cond:
+                    job['phases'][name] = data
+                    self._append_event(job, name, data)
+
+            try:
+                result = self.runner(job['url'], job['options'], on_phase=on_phase)
+                if self.shape:
+                    result = self.shape(job['url'], result, job['options'], job['limit'])
+            except Exception as e:
+                print(f"Job {job_id} failed: {e}")
+                with self._cond:
+                    job['status'] = 'failed'
+                    job['error'] = str(e)
+                    job['finishedAt'] = time.time()
+                    self._append_event(job, 'failed', {'error': str(e)})
+            else:
+                with self._cond:
+                    job['status'] = 'done'
+                    job['result'] = result
+                    job['finishedAt'] = time.time()
+                    self._append_event(job, 'done', result)
+
+    def _append_event(self, job, name, data):
+        # Caller holds self._cond
+        job['events'].append((name, data))
+        self._cond.notify_all()
+
+    def _prune(self):
+        # Caller holds self._cond
+        cutoff = time.time() - self.retention
+        expired = [job_id for job_id, job in self._jobs.items()
+                   if job['finishedAt'] is not None and job['finishedAt'] < cutoff]
+        for job_id in expired:
+            del self._jobs[job_id]
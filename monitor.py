@@ -0,0 +1,419 @@
+"""Scheduled synthetic monitoring with performance budgets.
+
+A config file lists URLs, each with its own interval, analysis options and
+budget. The scheduler spreads runs over time: the first run of every URL
+lands at a random point of its first interval, later ones are jittered, and
+a global cap bounds how many analyses it has in flight at once.
+"""
+import argparse
+import heapq
+import json
+import os
+import random
+import sqlite3
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from rules import CATEGORIES
+from urls import normalize_url
+
+# Raw metrics a budget can cap; every one of them is worse when higher
+BUDGET_METRICS = (
+    'ttfb', 'fcp', 'domLoad', 'pageLoad', 'lcp', 'cls', 'tbt', 'inp', 'networkRequests', 'pageSize',
+    'renderBlockingMs', 'thirdPartyKb', 'thirdPartyRequests', 'thirdPartyBlockingMs'
+)
+DEFAULT_INTERVAL = 3600
+MIN_INTERVAL = 60
+DEFAULT_CONCURRENCY = int(os.environ.get('ANALYZER_MONITOR_CONCURRENCY', 2))
+# Each interval is stretched or shortened by up to this fraction
+DEFAULT_JITTER = float(os.environ.get('ANALYZER_MONITOR_JITTER', 0.1))
+
+
+def parse_budget(budget):
+    """Validate a budget: maxima for raw metrics plus minimum category scores under 'scores'"""
+    if budget is None:
+        return {}
+    if not isinstance(budget, dict):
+        raise ValueError('budget must be an object')
+    parsed = {}
+    for name, limit in budget.items():
+        if name == 'scores':
+            if not isinstance(limit, dict):
+                raise ValueError('budget scores must be an object')
+            unknown = [category for category in limit if category not in CATEGORIES]
+            if unknown:
+                raise ValueError(f"unknown budget scores: {', '.join(unknown)} (allowed: {', '.join(CATEGORIES)})")
+            if not all(_is_number(value) and 0 <= value <= 100 for value in limit.values()):
+                raise ValueError('budget scores must be numbers between 0 and 100')
+            parsed['scores'] = dict(limit)
+        elif name in BUDGET_METRICS:
+            if not _is_number(limit) or limit < 0:
+                raise ValueError(f'budget {name} must be a non-negative number')
+            parsed[name] = limit
+        else:
+            raise ValueError(f"unknown budget metric {name} (allowed: {', '.join(BUDGET_METRICS)}, scores)")
+    return parsed
+
+
+def _is_number(value):
+    return isinstance(value, (int, float)) and not isinstance(value, bool)
+
+
+def check_budget(result, budget):
+    """Breaches of a budget by one result; metrics and scores the result lacks are skipped"""
+    raw = result.get('rawMetrics') or {}
+    scores = result.get('scores') or {}
+    breaches = []
+    for name, limit in budget.items():
+        if name == 'scores':
+            continue
+        value = raw.get(name)
+        if _is_number(value) and value > limit:
+            breaches.append({'metric': name, 'kind': 'max', 'limit': limit, 'value': value})
+    for category, minimum in budget.get('scores', {}).items():
+        value = scores.get(category)
+        if _is_number(value) and value < minimum:
+            breaches.append({'metric': category, 'kind': 'minScore', 'limit': minimum, 'value': value})
+    return breaches
+
+
+def parse_config(data, parse_options):
+    """Validate a monitoring config; parse_options is app.parse_options.
+
+    Monitors always bypass the result cache, since a cached result says
+    nothing new about the page, and skip screenshots unless they ask for one.
+    """
+    if not isinstance(data, dict) or not isinstance(data.get('monitors'), list) or not data['monitors']:
+        raise ValueError('config must be an object with a non-empty monitors list')
+    concurrency = data.get('concurrency', DEFAULT_CONCURRENCY)
+    if not isinstance(concurrency, int) or isinstance(concurrency, bool) or concurrency < 1:
+        raise ValueError('concurrency must be a positive integer')
+    jitter = data.get('jitter', DEFAULT_JITTER)
+    if not _is_number(jitter) or not 0 <= jitter < 1:
+        raise ValueError('jitter must be a number from 0 to below 1')
+
+    monitors = []
+    for index, entry in enumerate(data['monitors']):
+        try:
+            if not isinstance(entry, dict) or not isinstance(entry.get('url'), str) or not entry['url']:
+                raise ValueError('url is required')
+            interval = entry.get('interval', DEFAULT_INTERVAL)
+            if not _is_number(interval) or interval < MIN_INTERVAL:
+                raise ValueError(f'interval must be at least {MIN_INTERVAL} seconds')
+            options = entry.get('options') or {}
+            if not isinstance(options, dict):
+                raise ValueError('options must be an object')
+            options = dict({'screenshot': False}, **options)
+            options['cache'] = 'bypass'
+            options = parse_options(options)
+            if isinstance(options['device'], list):
+                raise ValueError('a monitor runs on one device: add one monitor per device')
+            monitors.append({
+                'url': entry['url'],
+                'interval': interval,
+                'options': options,
+                'budget': parse_budget(entry.get('budget'))
+            })
+        except ValueError as e:
+            raise ValueError(f'monitors[{index}]: {e}')
+    return {'monitors': monitors, 'concurrency': concurrency, 'jitter': jitter}
+
+
+def load_config(path, parse_options):
+    with open(path) as f:
+        return parse_config(json.load(f), parse_options)
+
+
+def run_monitor(monitor, runner):
+    """Analyze one monitored URL and check its budget; returns the run record"""
+    started = time.time()
+    record = {'url': monitor['url'], 'device': monitor['options']['device'], 'timestamp': started}
+    try:
+        result = runner(monitor['url'], monitor['options'])
+    except Exception as e:
+        record.update(status='error', error=str(e), breaches=[])
+    else:
+        breaches = check_budget(result, monitor['budget'])
+        record.update(status='fail' if breaches else 'pass', breaches=breaches, scores=result.get('scores'))
+    record['durationSeconds'] = round(time.time() - started, 2)
+    return record
+
+
+class BreachStore:
+    """Monitoring runs and the budget breaches each one found, in SQLite"""
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.execute('PRAGMA journal_mode=WAL')
+        self._db.execute('PRAGMA synchronous=NORMAL')
+        self._db.execute("""CREATE TABLE IF NOT EXISTS monitor_runs (
+            id INTEGER PRIMARY KEY,
+            url TEXT NOT NULL,
+            device TEXT NOT NULL,
+            ts REAL NOT NULL,
+            status TEXT NOT NULL,
+            duration REAL,
+            error TEXT
+        )""")
+        self._db.execute("""CREATE TABLE IF NOT EXISTS budget_breaches (
+            run_id INTEGER NOT NULL REFERENCES monitor_runs(id),
+            url TEXT NOT NULL,
+            ts REAL NOT NULL,
+            metric TEXT NOT NULL,
+            kind TEXT NOT NULL,
+            limit_value REAL NOT NULL,
+            value REAL NOT NULL
+        )""")
+        self._db.execute('CREATE INDEX IF NOT EXISTS idx_monitor_runs_url_ts ON monitor_runs(url, ts)')
+        self._db.execute('CREATE INDEX IF NOT EXISTS idx_budget_breaches_ts ON budget_breaches(ts)')
+        self._db.execute('CREATE INDEX IF NOT EXISTS idx_budget_breaches_url_ts ON budget_breaches(url, ts)')
+        self._db.commit()
+
+    def record(self, run):
+        """Store one run record from run_monitor()"""
+        url = normalize_url(run['url'])
+        with self._lock:
+            cursor = self._db.execute(
+                'INSERT INTO monitor_runs (url, device, ts, status, duration, error) VALUES (?, ?, ?, ?, ?, ?)',
+                (url, run['device'], run['timestamp'], run['status'], run['durationSeconds'], run.get('error')))
+            self._db.executemany(
+                'INSERT INTO budget_breaches (run_id, url, ts, metric, kind, limit_value, value) '
+                'VALUES (?, ?, ?, ?, ?, ?, ?)',
+                [(cursor.lastrowid, url, run['timestamp'], breach['metric'], breach['kind'],
+                  breach['limit'], breach['value']) for breach in run['breaches']])
+            self._db.commit()
+
+    def breaches(self, since, url=None, limit=100):
+        """Most recent breaches since `since`, newest first, optionally for one URL"""
+        where, args = 'b.ts >= ?', [since]
+        if url:
+            where += ' AND b.url = ?'
+            args.append(normalize_url(url))
+        with self._lock:
+            rows = self._db.execute(
+                f"""SELECT b.url, r.device, b.ts, b.metric, b.kind, b.limit_value, b.value
+                    FROM budget_breaches b JOIN monitor_runs r ON r.id = b.run_id
+                    WHERE {where} ORDER BY b.ts DESC LIMIT ?""", args + [limit]).fetchall()
+        return [{'url': url, 'device': device, 'timestamp': ts, 'metric': metric, 'kind': kind,
+                 'limit': limit_value, 'value': value}
+                for url, device, ts, metric, kind, limit_value, value in rows]
+
+    def summary(self, since, url=None):
+        """Per URL and device: runs, failed runs, errors and the last run since `since`"""
+        where, args = 'ts >= ?', [since]
+        if url:
+            where += ' AND url = ?'
+            args.append(normalize_url(url))
+        with self._lock:
+            rows = self._db.execute(
+                f"""SELECT url, device, COUNT(*), SUM(status = 'fail'), SUM(status = 'error'), MAX(ts)
+                    FROM monitor_runs WHERE {where} GROUP BY url, device ORDER BY url, device""", args).fetchall()
+        return [{'url': url, 'device': device, 'runs': runs, 'failed': failed, 'errors': errors, 'lastRun': last}
+                for url, device, runs, failed, errors, last in rows]
+
+
+class MonitorScheduler:
+    """Runs every monitor at its interval on a bounded set of worker threads.
+
+    One dispatcher thread keeps a heap of due times. A run only starts
+    while fewer than `concurrency` are in flight; due monitors wait their
+    turn rather than piling up behind a busy browser pool. A monitor whose
+    next run is already past when its last one ends skips the missed slots
+    instead of catching up in a burst.
+    """
+
+    def __init__(self, monitors, runner, store=None, concurrency=DEFAULT_CONCURRENCY, jitter=DEFAULT_JITTER):
+        self.monitors = monitors
+        self.runner = runner
+        self.store = store
+        self.concurrency = concurrency
+        self.jitter = jitter
+        self._cond = threading.Condition()
+        self._heap = []
+        self._state = [{'nextRun': None, 'running': False, 'runs': 0, 'failed': 0, 'errors': 0, 'lastRun': None}
+                       for _ in monitors]
+        self._active = 0
+        self._stopped = False
+        self._thread = None
+        self._executor = None
+
+    def start(self):
+        with self._cond:
+            if self._thread is not None:
+                return self
+            now = time.time()
+            for index, monitor in enumerate(self.monitors):
+                # Staggered first runs: a restart doesn't fire every URL at once
+                self._schedule(index, now + random.uniform(0, monitor['interval']))
+            self._executor = ThreadPoolExecutor(max_workers=self.concurrency, thread_name_prefix='monitor')
+            self._thread = threading.Thread(target=self._dispatch, name='monitor-scheduler', daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self, wait=True):
+        with self._cond:
+            self._stopped = True
+            self._cond.notify_all()
+        if self._executor is not None:
+            self._executor.shutdown(wait=wait)
+
+    def status(self):
+        """Public view of every monitor: schedule, last run and run counts since start"""
+        now = time.time()
+        with self._cond:
+            return {
+                'concurrency': self.concurrency,
+                'jitter': self.jitter,
+                'active': self._active,
+                'monitors': [{
+                    'url': monitor['url'],
+                    'device': monitor['options']['device'],
+                    'interval': monitor['interval'],
+                    'budget': monitor['budget'],
+                    'running': state['running'],
+                    'nextRunIn': round(max(0, state['nextRun'] - now), 1) if state['nextRun'] else None,
+                    'runs': state['runs'],
+                    'failed': state['failed'],
+                    'errors': state['errors'],
+                    'lastRun': state['lastRun']
+                } for monitor, state in zip(self.monitors, self._state)]
+            }
+
+    def _interval(self, index):
+        interval = self.monitors[index]['interval']
+        return interval * (1 + random.uniform(-self.jitter, self.jitter))
+
+    def _schedule(self, index, due):
+        self._state[index]['nextRun'] = due
+        heapq.heappush(self._heap, (due, index))
+
+    def _dispatch(self):
+        with self._cond:
+            while not self._stopped:
+                if not self._heap:
+                    self._cond.wait()
+                    continue
+                due, index = self._heap[0]
+                delay = due - time.time()
+                if delay > 0:
+                    self._cond.wait(delay)
+                    continue
+                if self._active >= self.concurrency:
+                    # Woken when a run finishes
+                    self._cond.wait()
+                    continue
+                heapq.heappop(self._heap)
+                self._active += 1
+                state = self._state[index]
+                state['running'] = True
+                state['nextRun'] = None
+                self._executor.submit(self._run, index, due)
+
+    def _run(self, index, due):
+        record = run_monitor(self.monitors[index], self.runner)
+        if record['status'] == 'fail':
+            summary = ', '.join(f"{breach['metric']} {breach['value']} (budget {breach['limit']})"
+                                for breach in record['breaches'])
+            print(f"Budget breach: {record['url']} [{record['device']}]: {summary}")
+        elif record['status'] == 'error':
+            print(f"Monitor error: {record['url']} [{record['device']}]: {record['error']}")
+        if self.store:
+            try:
+                self.store.record(record)
+            except Exception as e:
+                print(f"Monitor record error: {e}")
+
+        with self._cond:
+            self._active -= 1
+            state = self._state[index]
+            state['running'] = False
+            state['runs'] += 1
+            state['failed'] += record['status'] == 'fail'
+            state['errors'] += record['status'] == 'error'
+            state['lastRun'] = record
+            if not self._stopped:
+                now = time.time()
+                next_run = due + self._interval(index)
+                if next_run <= now:
+                    next_run = now + self._interval(index)
+                self._schedule(index, next_run)
+            self._cond.notify_all()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Analyze configured URLs on a schedule and check performance budgets')
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    run = commands.add_parser('run', help='Run the scheduler until interrupted, logging breaches to the monitor DB')
+    run.add_argument('config', help='Monitoring config (JSON)')
+
+    check = commands.add_parser('check', help='Analyze every monitor once; exit 1 on any breach or failure')
+    check.add_argument('config', help='Monitoring config (JSON)')
+    check.add_argument('-w', '--workers', type=int, help='Concurrent analyses (default: the config\'s concurrency)')
+    check.add_argument('-o', '--output', help='Write NDJSON run records here instead of stdout')
+    args = parser.parse_args(argv)
+
+    # This process runs the config it was given, not a second scheduler inside the app
+    os.environ.pop('ANALYZER_MONITOR_CONFIG', None)
+    from app import analyze_cached, parse_options, validate_url
+    try:
+        config = load_config(args.config, parse_options)
+    except (OSError, ValueError) as e:
+        print(f'Invalid config: {e}', file=sys.stderr)
+        return 2
+    invalid = [monitor['url'] for monitor in config['monitors'] if validate_url(monitor['url'])]
+    if invalid:
+        print(f"Invalid URLs: {', '.join(invalid)}", file=sys.stderr)
+        return 2
+
+    if args.command == 'run':
+        return _run(config, analyze_cached)
+    return _check(config, analyze_cached, args)
+
+
+def _run(config, runner):
+    db_path = os.environ.get('ANALYZER_MONITOR_DB', 'monitor.db')
+    scheduler = MonitorScheduler(config['monitors'], runner, BreachStore(db_path) if db_path else None,
+                                 concurrency=config['concurrency'], jitter=config['jitter']).start()
+    print(f"Monitoring {len(config['monitors'])} URLs, {config['concurrency']} at a time")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        print('Stopping, waiting for runs in flight...')
+        scheduler.stop()
+    return 0
+
+
+def _check(config, runner, args):
+    workers = args.workers or config['concurrency']
+    out = open(args.output, 'w') if args.output else sys.stdout
+    failed = 0
+    try:
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            futures = [executor.submit(run_monitor, monitor, runner) for monitor in config['monitors']]
+            for future in as_completed(futures):
+                record = future.result()
+                if record['status'] == 'fail':
+                    failed += 1
+                    for breach in record['breaches']:
+                        print(f"Breach: {record['url']} [{record['device']}]: {breach['metric']} "
+                              f"{breach['value']} (budget {breach['limit']})", file=sys.stderr)
+                elif record['status'] == 'error':
+                    failed += 1
+                    print(f"Failed: {record['url']} [{record['device']}]: {record['error']}", file=sys.stderr)
+                out.write(json.dumps(record) + '\n')
+                out.flush()
+    finally:
+        if out is not sys.stdout:
+            out.close()
+    print(f"{len(config['monitors']) - failed}/{len(config['monitors'])} monitors within budget", file=sys.stderr)
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
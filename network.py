@@ -0,0 +1,311 @@
+from urllib.parse import urlparse
+
+# Response types whose bodies should normally be sent compressed
+TEXT_TYPES = ('document', 'stylesheet', 'script', 'xhr', 'fetch')
+# Static types that should be cacheable by the browser
+STATIC_TYPES = ('stylesheet', 'script', 'image', 'font', 'media')
+# Compression only pays off above roughly one TCP packet
+MIN_COMPRESSIBLE_BYTES = 1400
+LARGEST_COUNT = 10
+
+# No response bodies are buffered: sizes come from the event stream
+NETWORK_ENABLE_PARAMS = {'maxTotalBufferSize': 0, 'maxResourceBufferSize': 0}
+
+
+def _empty_entry(url, resource_type, started):
+    return {
+        'url': url,
+        'type': resource_type,
+        'status': None,
+        'mimeType': None,
+        'encoding': None,
+        'cacheControl': None,
+        'transferBytes': 0,
+        'decodedBytes': 0,
+        'fromCache': False,
+        'failed': None,
+        'startMs': started,
+        'durationMs': None,
+        'waitMs': None,
+    }
+
+
+class NetworkRecorder:
+    """Records every request of one page load as a compact per-request entry.
+
+    Uses the CDP Network domain, which reports wire (transfer) bytes and
+    decoded bytes as the data streams in, so no response body is ever
+    buffered. When CDP is unavailable it falls back to Playwright's page
+    events, where sizes come from Content-Length only.
+
+    Attach before page.goto() and call finish() once the page has settled.
+    """
+
+    def __init__(self, page):
+        self._reset(page)
+        try:
+            session = page.context.new_cdp_session(page)
+            session.send('Network.enable', NETWORK_ENABLE_PARAMS)
+        except Exception:
+            session = None
+        self._subscribe(session)
+
+    def _reset(self, page):
+        self.page = page
+        self.entries = {}
+        self.finished = []
+        self._origin = None
+        self._session = None
+
+    def _subscribe(self, session):
+        self._session = session
+        if session is not None:
+            self.source = 'cdp'
+            session.on('Network.requestWillBeSent', self._on_cdp_request)
+            session.on('Network.responseReceived', self._on_cdp_response)
+            session.on('Network.dataReceived', self._on_cdp_data)
+            session.on('Network.requestServedFromCache', self._on_cdp_cached)
+            session.on('Network.loadingFinished', self._on_cdp_finished)
+            session.on('Network.loadingFailed', self._on_cdp_failed)
+        else:
+            self.source = 'events'
+            for event, handler in self._page_handlers():
+                self.page.on(event, handler)
+
+    def _page_handlers(self):
+        return (('request', self._on_request), ('response', self._on_response),
+                ('requestfinished', self._on_request_finished), ('requestfailed', self._on_request_failed))
+
+    def finish(self):
+        """Stop recording and return the summary plus every request entry"""
+        if self._session is not None:
+            try:
+                self._session.detach()
+            except Exception:
+                pass
+            self._session = None
+        else:
+            self._unsubscribe_page()
+        return self._summary()
+
+    def _unsubscribe_page(self):
+        for event, handler in self._page_handlers():
+            try:
+                self.page.remove_listener(event, handler)
+            except Exception:
+                pass
+
+    def _summary(self):
+        return summarize_requests(self.finished + list(self.entries.values()), self.source)
+
+    # --- CDP events -------------------------------------------------------
+
+    def _relative_ms(self, timestamp):
+        if self._origin is None:
+            self._origin = timestamp
+        return round((timestamp - self._origin) * 1000, 1)
+
+    def _on_cdp_request(self, params):
+        request_id = params['requestId']
+        url = params['request']['url']
+        if url.startswith('data:'):
+            return
+        redirect = params.get('redirectResponse')
+        if redirect and request_id in self.entries:
+            # Redirects reuse the request id; close out the hop that redirected
+            entry = self.entries.pop(request_id)
+            self._apply_response(entry, redirect)
+            entry['transferBytes'] = int(redirect.get('encodedDataLength') or 0)
+            entry['durationMs'] = round(self._relative_ms(params['timestamp']) - entry['startMs'], 1)
+            self.finished.append(entry)
+        resource_type = (params.get('type') or 'Other').lower()
+        entry = _empty_entry(url, resource_type, self._relative_ms(params['timestamp']))
+        entry['_ts'] = params['timestamp']
+        self.entries[request_id] = entry
+
+    def _on_cdp_response(self, params):
+        entry = self.entries.get(params['requestId'])
+        if entry is not None:
+            self._apply_response(entry, params['response'])
+
+    def _on_cdp_data(self, params):
+        entry = self.entries.get(params['requestId'])
+        if entry is not None:
+            entry['decodedBytes'] += params.get('dataLength') or 0
+
+    def _on_cdp_cached(self, params):
+        entry = self.entries.get(params['requestId'])
+        if entry is not None:
+            entry['fromCache'] = True
+
+    def _on_cdp_finished(self, params):
+        entry = self.entries.pop(params['requestId'], None)
+        if entry is None:
+            return
+        entry['transferBytes'] = int(params.get('encodedDataLength') or 0)
+        entry['durationMs'] = round((params['timestamp'] - entry.pop('_ts')) * 1000, 1)
+        self.finished.append(entry)
+
+    def _on_cdp_failed(self, params):
+        entry = self.entries.pop(params['requestId'], None)
+        if entry is None:
+            return
+        entry['failed'] = 'canceled' if params.get('canceled') else params.get('errorText') or 'failed'
+        entry['durationMs'] = round((params['timestamp'] - entry.pop('_ts')) * 1000, 1)
+        self.finished.append(entry)
+
+    def _apply_response(self, entry, response):
+        headers = {name.lower(): value for name, value in (response.get('headers') or {}).items()}
+        entry['status'] = response.get('status')
+        entry['mimeType'] = response.get('mimeType')
+        entry['encoding'] = headers.get('content-encoding')
+        entry['cacheControl'] = headers.get('cache-control')
+        if response.get('fromDiskCache') or response.get('fromPrefetchCache') or response.get('fromServiceWorker'):
+            entry['fromCache'] = True
+        timing = response.get('timing')
+        if timing:
+            entry['waitMs'] = round(timing.get('receiveHeadersEnd', 0) - timing.get('sendEnd', 0), 1)
+
+    # --- Playwright events (fallback) -------------------------------------
+
+    def _on_request(self, request):
+        if request.url.startswith('data:'):
+            return
+        self.entries[id(request)] = _empty_entry(request.url, request.resource_type, None)
+
+    def _on_response(self, response):
+        entry = self.entries.get(id(response.request))
+        if entry is None:
+            return
+        headers = response.headers
+        entry['status'] = response.status
+        entry['mimeType'] = (headers.get('content-type') or '').split(';')[0] or None
+        entry['encoding'] = headers.get('content-encoding')
+        entry['cacheControl'] = headers.get('cache-control')
+        entry['fromCache'] = response.from_service_worker
+        try:
+            entry['transferBytes'] = int(headers.get('content-length') or 0)
+        except ValueError:
+            pass
+
+    def _on_request_finished(self, request):
+        entry = self.entries.pop(id(request), None)
+        if entry is None:
+            return
+        self._apply_timing(entry, request.timing)
+        self.finished.append(entry)
+
+    def _on_request_failed(self, request):
+        entry = self.entries.pop(id(request), None)
+        if entry is None:
+            return
+        entry['failed'] = request.failure or 'failed'
+        self.finished.append(entry)
+
+    def _apply_timing(self, entry, timing):
+        if timing.get('startTime', -1) < 0:
+            return
+        if self._origin is None:
+            self._origin = timing['startTime']
+        entry['startMs'] = round(timing['startTime'] - self._origin, 1)
+        if timing.get('responseEnd', -1) >= 0:
+            entry['durationMs'] = round(timing['responseEnd'], 1)
+        if timing.get('responseStart', -1) >= 0 and timing.get('requestStart', -1) >= 0:
+            entry['waitMs'] = round(timing['responseStart'] - timing['requestStart'], 1)
+
+
+class AsyncNetworkRecorder(NetworkRecorder):
+    """NetworkRecorder for Playwright's async API; await start() before page.goto()"""
+
+    def __init__(self, page):
+        self._reset(page)
+        self.source = None
+
+    async def start(self):
+        try:
+            session = await self.page.context.new_cdp_session(self.page)
+            await session.send('Network.enable', NETWORK_ENABLE_PARAMS)
+        except Exception:
+            session = None
+        self._subscribe(session)
+
+    async def finish(self):
+        if self._session is not None:
+            try:
+                await self._session.detach()
+            except Exception:
+                pass
+            self._session = None
+        else:
+            self._unsubscribe_page()
+        return self._summary()
+
+
+def _is_cacheable(cache_control):
+    value = (cache_control or '').lower().replace(' ', '')
+    if not value or 'no-store' in value or 'no-cache' in value:
+        return False
+    return 'max-age=0' not in value.split(',')
+
+
+def summarize_requests(entries, source='cdp'):
+    """Page weight, per-type breakdown and notable requests from recorded entries"""
+    by_type = {}
+    totals = {'requestCount': 0, 'transferBytes': 0, 'decodedBytes': 0,
+              'failedRequests': 0, 'cachedRequests': 0, 'pendingRequests': 0}
+    uncompressed = []
+    uncached = []
+    hosts = set()
+    for entry in entries:
+        entry.pop('_ts', None)
+        if entry['durationMs'] is None and entry['failed'] is None:
+            totals['pendingRequests'] += 1
+        totals['requestCount'] += 1
+        totals['transferBytes'] += entry['transferBytes']
+        totals['decodedBytes'] += entry['decodedBytes']
+        if entry['failed']:
+            totals['failedRequests'] += 1
+        if entry['fromCache']:
+            totals['cachedRequests'] += 1
+        hosts.add(urlparse(entry['url']).hostname)
+
+        bucket = by_type.setdefault(entry['type'], {'count': 0, 'transferBytes': 0, 'decodedBytes': 0})
+        bucket['count'] += 1
+        bucket['transferBytes'] += entry['transferBytes']
+        bucket['decodedBytes'] += entry['decodedBytes']
+
+        ok = not entry['failed'] and entry['status'] == 200 and not entry['fromCache']
+        size = max(entry['decodedBytes'], entry['transferBytes'])
+        if ok and entry['type'] in TEXT_TYPES and not entry['encoding'] and size >= MIN_COMPRESSIBLE_BYTES:
+            uncompressed.append(entry['url'])
+        if ok and entry['type'] in STATIC_TYPES and not _is_cacheable(entry['cacheControl']):
+            uncached.append(entry['url'])
+
+    largest = sorted(entries, key=lambda entry: entry['transferBytes'], reverse=True)[:LARGEST_COUNT]
+    summary = dict(totals)
+    summary.update({
+        'source': source,
+        'hosts': len(hosts),
+        'byType': by_type,
+        'uncompressed': uncompressed,
+        'uncached': uncached,
+        'largest': [{'url': entry['url'], 'type': entry['type'], 'transferBytes': entry['transferBytes']}
+                    for entry in largest if entry['transferBytes']],
+        'requests': sorted(entries, key=lambda entry: entry['startMs'] if entry['startMs'] is not None else 0)
+    })
+    return summary
+
+
+def resource_counts(network):
+    """The css/js/images/fonts counts shown in the metrics panel"""
+    if network is None:
+        return {'count': None, 'css': None, 'js': None, 'images': None, 'fonts': None}
+    by_type = network['byType']
+    count = lambda name: by_type.get(name, {}).get('count', 0)
+    return {
+        'count': network['requestCount'],
+        'css': count('stylesheet'),
+        'js': count('script'),
+        'images': count('image'),
+        'fonts': count('font')
+    }
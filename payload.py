@@ -0,0 +1,175 @@
+import base64
+import gzip
+import json
+import os
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+# Top-level result keys a client can ask for with `fields`
+RESULT_FIELDS = (
+    'pageInfo', 'screenshot', 'scores', 'metrics', 'issues', 'breakdown', 'overview',
+    'settle', 'document', 'network', 'vitals', 'rawMetrics', 'sampling', 'navigation',
+    'links', 'static', 'timings', 'escalated', 'archive', 'coverage', 'thirdParty'
+)
+# Identify the result; always returned whatever `fields` says
+ENVELOPE_FIELDS = ('url', 'timestamp', 'engine', 'profile', 'device', 'cached', 'ageSeconds')
+
+# Collector sections the scoring rules read, so they run for every projection
+SCORING_SECTIONS = ('performance', 'vitals', 'metaChecks', 'altData', 'scriptTiming')
+# Sections that only feed a result field of the same name
+FIELD_SECTIONS = ('pageInfo', 'overview')
+
+# Lists that can grow with the page; the response returns a window of each
+LIST_PATHS = (
+    'overview.images', 'overview.metaTags', 'overview.cssFiles', 'overview.jsFiles',
+    'overview.ogTags', 'overview.twitterTags', 'network.requests', 'network.uncompressed', 'network.uncached', 'links',
+    'coverage.scripts', 'coverage.stylesheets', 'thirdParty.domains', 'thirdParty.entities'
+)
+DEFAULT_LIMIT = int(os.environ.get('ANALYZER_LIST_LIMIT', 100))
+MAX_LIMIT = 1000
+
+# Responses smaller than this aren't worth compressing
+COMPRESS_MIN_BYTES = 1024
+COMPRESSIBLE_TYPES = ('application/json', 'text/plain', 'text/html', 'text/css', 'application/javascript')
+
+
+def parse_fields(value):
+    """Validate the request's `fields`: a list or comma-separated string of result keys"""
+    if value is None:
+        return None
+    if isinstance(value, str):
+        value = [name.strip() for name in value.split(',') if name.strip()]
+    if not isinstance(value, list) or not all(isinstance(name, str) for name in value):
+        raise ValueError('fields must be a list of result fields')
+    unknown = [name for name in value if name not in RESULT_FIELDS]
+    if unknown:
+        raise ValueError(f"unknown fields: {', '.join(unknown)} (allowed: {', '.join(RESULT_FIELDS)})")
+    return sorted(set(value))
+
+
+def parse_limit(value):
+    """Validate the list window size (`limit`), defaulting to ANALYZER_LIST_LIMIT"""
+    if value is None or value == '':
+        return DEFAULT_LIMIT
+    try:
+        limit = int(value)
+    except (TypeError, ValueError):
+        raise ValueError('limit must be an integer')
+    if not 1 <= limit <= MAX_LIMIT:
+        raise ValueError(f'limit must be between 1 and {MAX_LIMIT}')
+    return limit
+
+
+def wants(fields, name):
+    """True when a projection includes the result field name (no projection includes all)"""
+    return fields is None or name in fields
+
+
+def collector_sections(fields, links=False):
+    """Collector sections needed for a projection; None collects everything"""
+    if fields is None and links:
+        return None
+    sections = list(SCORING_SECTIONS)
+    sections += [name for name in FIELD_SECTIONS if wants(fields, name)]
+    if links:
+        sections.append('links')
+    return sections
+
+
+def encode_cursor(key, url, path, offset, limit):
+    raw = json.dumps([key, url, path, offset, limit], separators=(',', ':')).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+
+def decode_cursor(cursor):
+    """(cache key, url, list path, offset, limit) from a cursor, raising ValueError if malformed"""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4))
+        key, url, path, offset, limit = json.loads(raw)
+    except Exception:
+        raise ValueError('Invalid cursor')
+    if path not in LIST_PATHS or not isinstance(offset, int) or offset < 0:
+        raise ValueError('Invalid cursor')
+    return key, url, path, offset, parse_limit(limit)
+
+
+def _lookup(result, path):
+    """(parent dict, list name, list) for a dotted list path, or None if absent"""
+    parent_name, _, name = path.rpartition('.')
+    parent = result.get(parent_name) if parent_name else result
+    if not isinstance(parent, dict) or not isinstance(parent.get(name), list):
+        return None
+    return parent, name, parent[name]
+
+
+def _total(parent, name, items):
+    # The collector caps lists too and records how many the page really had
+    return max(len(items), (parent.get('totals') or {}).get(name, 0))
+
+
+def shape(result, fields=None, limit=DEFAULT_LIMIT, key=None):
+    """The response for a result: projected to fields, every list cut to limit items.
+
+    Each cut list is reported under 'truncated' with its real total and,
+    while the cached result holds more items, a cursor for the next window.
+    The input result is not modified.
+    """
+    shaped = {name: value for name, value in result.items()
+              if name in ENVELOPE_FIELDS or wants(fields, name)}
+    truncated = {}
+    for path in LIST_PATHS:
+        found = _lookup(shaped, path)
+        if found is None:
+            continue
+        parent, name, items = found
+        total = _total(parent, name, items)
+        if total <= limit:
+            continue
+        if parent is not shaped:
+            parent = shaped[path.split('.')[0]] = dict(parent)
+        parent[name] = items[:limit]
+        more = key is not None and len(items) > limit
+        truncated[path] = {
+            'total': total,
+            'returned': len(parent[name]),
+            'nextCursor': encode_cursor(key, result['url'], path, limit, limit) if more else None
+        }
+    if truncated:
+        shaped['truncated'] = truncated
+    return shaped
+
+
+def list_page(result, path, offset, limit, key):
+    """One window of a list from a stored result, with the cursor for the following one"""
+    found = _lookup(result, path)
+    if found is None:
+        return None
+    parent, name, items = found
+    end = offset + limit
+    return {
+        'url': result['url'],
+        'path': path,
+        'offset': offset,
+        'items': items[offset:end],
+        'total': _total(parent, name, items),
+        'nextCursor': encode_cursor(key, result['url'], path, end, limit) if end < len(items) else None
+    }
+
+
+def negotiate_encoding(accept_encodings):
+    """Best supported Content-Encoding for a werkzeug Accept-Encoding header, or None"""
+    if brotli is not None and accept_encodings['br']:
+        return 'br'
+    if accept_encodings['gzip']:
+        return 'gzip'
+    return None
+
+
+def compress(body, encoding):
+    if encoding == 'br':
+        # Quality 5 is close to gzip's speed with a noticeably smaller result on JSON
+        return brotli.compress(body, quality=5)
+    return gzip.compress(body, compresslevel=6)
@@ -0,0 +1,907 @@
+import operator
+import string
+import threading
+
+from devices import DEFAULT_DEVICE
+
+CATEGORIES = ('performance', 'seo', 'accessibility', 'bestPractices')
+
+OPERATORS = {
+    '>': operator.gt,
+    '>=': operator.ge,
+    '<': operator.lt,
+    '<=': operator.le,
+    '==': operator.eq,
+    '!=': operator.ne,
+}
+
+# Every check the analyzer scores, in the order issues are reported.
+#
+# A rule reads raw metrics (see build_raw_metrics) and picks the first case
+# whose `when` conditions all hold; a case without conditions is the
+# fallback. Conditions are (metric, operator, operand) where a string
+# operand names one of the rule's params, so profiles can move thresholds
+# and points without touching the rule itself. Message templates are
+# str.format strings over the raw metrics, the rule params and:
+#   value   - the rule's metric
+#   excess  - how far the first condition's metric is past its operand
+#   points  - points lost by the case's first breakdown item
+#   points_<category> - points lost in that category
+RULES = [
+    {
+        'id': 'https',
+        'metric': 'isHttps',
+        'params': {'seoPoints': 15, 'bestPracticesPoints': 30},
+        'cases': [
+            {
+                'when': [('isHttps', '==', False)],
+                'issue': {
+                    'title': 'Not using HTTPS',
+                    'description': 'Website is not secured with HTTPS encryption',
+                    'severity': 'error',
+                    'impact': 'High security risk, affects SEO ranking'
+                },
+                'breakdown': [
+                    {'category': 'seo', 'check': 'HTTPS', 'status': 'fail',
+                     'points': 'seoPoints', 'reason': 'Not using HTTPS protocol'},
+                    {'category': 'bestPractices', 'check': 'HTTPS', 'status': 'fail',
+                     'points': 'bestPracticesPoints', 'reason': 'No SSL/TLS encryption'}
+                ]
+            },
+            {
+                'issue': {
+                    'title': 'Using HTTPS',
+                    'description': 'Website is properly secured with HTTPS',
+                    'severity': 'success',
+                    'impact': 'Secure connection established'
+                },
+                'breakdown': [
+                    {'category': 'seo', 'check': 'HTTPS', 'status': 'pass',
+                     'points': 0, 'reason': 'Properly secured'}
+                ]
+            }
+        ]
+    },
+    {
+        'id': 'imageAlt',
+        'metric': 'missingAlts',
+        'params': {'pointsPerImage': 5, 'maxPoints': 40},
+        'cases': [
+            {
+                'when': [('missingAlts', '>', 0)],
+                'issue': {
+                    'title': 'Missing Alt Tags on {missingAlts}/{totalImages} Images',
+                    'description': '{missingAltPercent:.1f}% of images lack alt attributes for screen readers',
+                    'severity': 'warning',
+                    'impact': 'Affects {missingAlts} images - reduces accessibility score'
+                },
+                'breakdown': [
+                    {'category': 'accessibility', 'check': 'Image Alt Attributes', 'status': 'fail',
+                     'points': {'per': 'pointsPerImage', 'max': 'maxPoints'},
+                     'reason': '{missingAlts} images missing alt text ({missingAltPercent:.1f}%)'}
+                ]
+            },
+            {
+                'when': [('totalImages', '>', 0)],
+                'issue': {
+                    'title': 'All {totalImages} Images Have Alt Tags',
+                    'description': 'All images properly labeled for accessibility',
+                    'severity': 'success',
+                    'impact': 'Screen reader friendly'
+                }
+            }
+        ]
+    },
+    {
+        'id': 'title',
+        'metric': 'titleLength',
+        'params': {'minLength': 30, 'maxLength': 60, 'missingPoints': 30, 'lengthPoints': 10},
+        'cases': [
+            {
+                'when': [('titleLength', '==', 0)],
+                'issue': {
+                    'title': 'Missing Page Title',
+                    'description': 'No title tag found',
+                    'severity': 'error',
+                    'impact': 'Critical SEO issue - {points} points lost'
+                },
+                'breakdown': [
+                    {'category': 'seo', 'check': 'Title Tag', 'status': 'fail',
+                     'points': 'missingPoints', 'reason': 'Title tag is completely missing'}
+                ]
+            },
+            {
+                'when': [('titleLength', '<', 'minLength')],
+                'issue': {
+                    'title': 'Title Too Short',
+                    'description': 'Title is {value} characters. Recommended: 50-60',
+                    'severity': 'warning',
+                    'impact': '{points} points lost - title should be 50-60 characters'
+                },
+                'breakdown': [
+                    {'category': 'seo', 'check': 'Title Length', 'status': 'warning',
+                     'points': 'lengthPoints', 'reason': 'Only {value} characters (optimal: 50-60)'}
+                ]
+            },
+            {
+                'when': [('titleLength', '>', 'maxLength')],
+                'issue': {
+                    'title': 'Title Too Long',
+                    'description': 'Title is {value} characters. Recommended: 50-60',
+                    'severity': 'warning',
+                    'impact': '{excess} characters will be truncated in search results'
+                },
+                'breakdown': [
+                    {'category': 'seo', 'check': 'Title Length', 'status': 'warning',
+                     'points': 'lengthPoints', 'reason': '{value} characters (optimal: 50-60)'}
+                ]
+            },
+            {
+                'issue': {
+                    'title': 'Title Length Optimal',
+                    'description': 'Title is {value} characters - perfect length',
+                    'severity': 'success',
+                    'impact': 'Well optimized for search results'
+                }
+            }
+        ]
+    },
+    {
+        'id': 'metaDescription',
+        'metric': 'descriptionLength',
+        'params': {'minLength': 120, 'maxLength': 160, 'missingPoints': 25},
+        'cases': [
+            {
+                'when': [('descriptionLength', '==', 0)],
+                'issue': {
+                    'title': 'Missing Meta Description',
+                    'description': 'No meta description tag found',
+                    'severity': 'error',
+                    'impact': 'Critical SEO issue - {points} points lost'
+                },
+                'breakdown': [
+                    {'category': 'seo', 'check': 'Meta Description', 'status': 'fail',
+                     'points': 'missingPoints', 'reason': 'Meta description is completely missing'}
+                ]
+            },
+            {
+                'when': [('descriptionLength', '<', 'minLength')],
+                'issue': {
+                    'title': 'Meta Description Too Short',
+                    'description': 'Description is {value} characters. Recommended: 150-160',
+                    'severity': 'warning',
+                    'impact': 'Could provide more detail for search results'
+                }
+            },
+            {
+                'when': [('descriptionLength', '>', 'maxLength')],
+                'issue': {
+                    'title': 'Meta Description Too Long',
+                    'description': 'Description is {value} characters. Recommended: 150-160',
+                    'severity': 'warning',
+                    'impact': '{excess} characters will be truncated'
+                }
+            },
+            {
+                'issue': {
+                    'title': 'Meta Description Optimal',
+                    'description': 'Description is {value} characters - perfect length',
+                    'severity': 'success',
+                    'impact': 'Well optimized for search results'
+                }
+            }
+        ]
+    },
+    {
+        'id': 'viewport',
+        'metric': 'viewport',
+        'params': {'seoPoints': 10, 'accessibilityPoints': 15},
+        'cases': [
+            {
+                'when': [('viewport', '==', False)],
+                'issue': {
+                    'title': 'Missing Viewport Meta Tag',
+                    'description': 'No viewport meta tag for mobile responsiveness',
+                    'severity': 'error',
+                    'impact': '{points_seo} points lost from SEO, {points_accessibility} from accessibility'
+                },
+                'breakdown': [
+                    {'category': 'seo', 'check': 'Viewport Meta Tag', 'status': 'fail',
+                     'points': 'seoPoints', 'reason': 'Mobile viewport not configured'},
+                    {'category': 'accessibility', 'check': 'Mobile Viewport', 'status': 'fail',
+                     'points': 'accessibilityPoints', 'reason': 'Not mobile-friendly'}
+                ]
+            }
+        ]
+    },
+    {
+        'id': 'ogImage',
+        'metric': 'ogImage',
+        'params': {'points': 10},
+        'cases': [
+            {
+                'when': [('ogImage', '==', False)],
+                'breakdown': [
+                    {'category': 'seo', 'check': 'Open Graph Image', 'status': 'fail',
+                     'points': 'points', 'reason': 'No og:image for social sharing'}
+                ]
+            }
+        ]
+    },
+    {
+        'id': 'ttfb',
+        'metric': 'ttfb',
+        'params': {'max': 600, 'points': 10},
+        'cases': [
+            {
+                'when': [('ttfb', '>', 'max')],
+                'issue': {
+                    'title': 'Slow Server Response: {value:.0f}ms',
+                    'description': 'TTFB is {excess:.0f}ms slower than recommended ({max}ms)',
+                    'severity': 'warning',
+                    'impact': 'Server response time costs {points} performance points'
+                },
+                'breakdown': [
+                    {'category': 'performance', 'check': 'Time to First Byte (TTFB)', 'status': 'fail',
+                     'points': 'points', 'reason': '{value:.0f}ms (optimal: <{max}ms, {excess:.0f}ms too slow)'}
+                ]
+            },
+            {
+                'breakdown': [
+                    {'category': 'performance', 'check': 'Time to First Byte (TTFB)', 'status': 'pass',
+                     'points': 0, 'reason': '{value:.0f}ms (optimal: <{max}ms)'}
+                ]
+            }
+        ]
+    },
+    {
+        'id': 'fcp',
+        'metric': 'fcp',
+        'params': {'max': 2000, 'points': 15},
+        'cases': [
+            {
+                'when': [('fcp', '>', 'max')],
+                'issue': {
+                    'title': 'Slow First Contentful Paint: {value:.0f}ms',
+                    'description': 'FCP is {excess:.0f}ms slower than recommended ({max}ms)',
+                    'severity': 'warning',
+                    'impact': 'Content appears {points} points too slowly'
+                },
+                'breakdown': [
+                    {'category': 'performance', 'check': 'First Contentful Paint (FCP)', 'status': 'fail',
+                     'points': 'points', 'reason': '{value:.0f}ms (optimal: <{max}ms, {excess:.0f}ms too slow)'}
+                ]
+            },
+            {
+                'breakdown': [
+                    {'category': 'performance', 'check': 'First Contentful Paint (FCP)', 'status': 'pass',
+                     'points': 0, 'reason': '{value:.0f}ms (optimal: <{max}ms)'}
+                ]
+            }
+        ]
+    },
+    {
+        'id': 'pageLoad',
+        'metric': 'pageLoad',
+        'params': {'max': 3000, 'points': 20},
+        'cases': [
+            {
+                'when': [('pageLoad', '>', 'max')],
+                'issue': {
+                    'title': 'Slow Page Load: {value:.0f}ms',
+                    'description': 'Page takes {excess:.0f}ms longer than recommended ({max}ms)',
+                    'severity': 'warning',
+                    'impact': 'Total load time costs {points} performance points'
+                },
+                'breakdown': [
+                    {'category': 'performance', 'check': 'Total Page Load', 'status': 'fail',
+                     'points': 'points', 'reason': '{value:.0f}ms (optimal: <{max}ms, {excess:.0f}ms too slow)'}
+                ]
+            },
+            {
+                'breakdown': [
+                    {'category': 'performance', 'check': 'Total Page Load', 'status': 'pass',
+                     'points': 0, 'reason': '{value:.0f}ms (optimal: <{max}ms)'}
+                ]
+            }
+        ]
+    },
+    {
+        'id': 'lcp',
+        'metric': 'lcp',
+        'params': {'max': 2500, 'points': 15},
+        'cases': [
+            {
+                'when': [('lcp', '>', 'max')],
+                'issue': {
+                    'title': 'Slow Largest Contentful Paint: {value:.0f}ms',
+                    'description': 'The main content renders {excess:.0f}ms later than recommended ({max}ms)',
+                    'severity': 'warning',
+                    'impact': 'Slow main content costs {points} performance points'
+                },
+                'breakdown': [
+                    {'category': 'performance', 'check': 'Largest Contentful Paint (LCP)', 'status': 'fail',
+                     'points': 'points', 'reason': '{value:.0f}ms (optimal: <{max}ms, {excess:.0f}ms over)'}
+                ]
+            },
+            {
+                'breakdown': [
+                    {'category': 'performance', 'check': 'Largest Contentful Paint (LCP)', 'status': 'pass',
+                     'points': 0, 'reason': '{value:.0f}ms (optimal: <{max}ms)'}
+                ]
+            }
+        ]
+    },
+    {
+        'id': 'cls',
+        'metric': 'cls',
+        'params': {'max': 0.1, 'points': 10},
+        'cases': [
+            {
+                'when': [('cls', '>', 'max')],
+                'issue': {
+                    'title': 'Layout Shifts: CLS {value:.3f}',
+                    'description': 'Content moves around while loading (recommended: {max} or less)',
+                    'severity': 'warning',
+                    'impact': 'Unstable layout costs {points} performance points'
+                },
+                'breakdown': [
+                    {'category': 'performance', 'check': 'Cumulative Layout Shift (CLS)', 'status': 'fail',
+                     'points': 'points', 'reason': '{value:.3f} (optimal: <{max}, {excess:.3f} over)'}
+                ]
+            },
+            {
+                'breakdown': [
+                    {'category': 'performance', 'check': 'Cumulative Layout Shift (CLS)', 'status': 'pass',
+                     'points': 0, 'reason': '{value:.3f} (optimal: <{max})'}
+                ]
+            }
+        ]
+    },
+    {
+        'id': 'tbt',
+        'metric': 'tbt',
+        'params': {'max': 200, 'points': 15},
+        'cases': [
+            {
+                'when': [('tbt', '>', 'max')],
+                'issue': {
+                    'title': 'Main Thread Blocked: {value:.0f}ms',
+                    'description': '{longTasks} long tasks block input for {excess:.0f}ms more than recommended ({max}ms)',
+                    'severity': 'warning',
+                    'impact': 'Blocking scripts cost {points} performance points'
+                },
+                'breakdown': [
+                    {'category': 'performance', 'check': 'Total Blocking Time (TBT)', 'status': 'fail',
+                     'points': 'points', 'reason': '{value:.0f}ms (optimal: <{max}ms, {excess:.0f}ms over)'}
+                ]
+            },
+            {
+                'breakdown': [
+                    {'category': 'performance', 'check': 'Total Blocking Time (TBT)', 'status': 'pass',
+                     'points': 0, 'reason': '{value:.0f}ms (optimal: <{max}ms)'}
+                ]
+            }
+        ]
+    },
+    {
+        'id': 'inp',
+        'metric': 'inp',
+        'params': {'max': 200, 'points': 10},
+        'cases': [
+            {
+                'when': [('inp', '>', 'max')],
+                'issue': {
+                    'title': 'Slow Interactions: {value:.0f}ms',
+                    'description': 'The page responds to input {excess:.0f}ms slower than recommended ({max}ms)',
+                    'severity': 'warning',
+                    'impact': 'Sluggish input handling costs {points} performance points'
+                },
+                'breakdown': [
+                    {'category': 'performance', 'check': 'Interaction to Next Paint (INP)', 'status': 'fail',
+                     'points': 'points', 'reason': '{value:.0f}ms (optimal: <{max}ms, {excess:.0f}ms over)'}
+                ]
+            },
+            {
+                'breakdown': [
+                    {'category': 'performance', 'check': 'Interaction to Next Paint (INP)', 'status': 'pass',
+                     'points': 0, 'reason': '{value:.0f}ms (optimal: <{max}ms)'}
+                ]
+            }
+        ]
+    },
+    {
+        'id': 'networkRequests',
+        'metric': 'networkRequests',
+        'params': {'max': 50, 'points': 15, 'bestPracticesPoints': 10},
+        'cases': [
+            {
+                'when': [('networkRequests', '>', 'max')],
+                'issue': {
+                    'title': 'Too Many Network Requests: {value}',
+                    'description': '{excess} more requests than recommended ({max} max)',
+                    'severity': 'warning',
+                    'impact': 'Excessive requests cost {points} performance points'
+                },
+                'breakdown': [
+                    {'category': 'performance', 'check': 'Network Requests', 'status': 'fail',
+                     'points': 'points', 'reason': '{value} requests (optimal: <{max}, {excess} excess)'},
+                    {'category': 'bestPractices', 'check': 'Resource Optimization', 'status': 'fail',
+                     'points': 'bestPracticesPoints', 'reason': '{value} requests - should bundle/minimize'}
+                ]
+            },
+            {
+                'breakdown': [
+                    {'category': 'performance', 'check': 'Network Requests', 'status': 'pass',
+                     'points': 0, 'reason': '{value} requests (optimal: <{max})'}
+                ]
+            }
+        ]
+    },
+    {
+        'id': 'pageSize',
+        'metric': 'pageSize',
+        'params': {'max': 1000, 'points': 10, 'bestPracticesPoints': 10},
+        'cases': [
+            {
+                'when': [('pageSize', '>', 'max')],
+                'issue': {
+                    'title': 'Large Page Size: {value:.2f} KB',
+                    'description': 'Page is {excess:.2f} KB larger than recommended ({max} KB)',
+                    'severity': 'warning',
+                    'impact': 'Page size costs {points} performance points'
+                },
+                'breakdown': [
+                    {'category': 'performance', 'check': 'Page Size', 'status': 'fail',
+                     'points': 'points', 'reason': '{value:.0f}KB (optimal: <{max}KB, {excess:.0f}KB too large)'},
+                    {'category': 'bestPractices', 'check': 'Page Weight', 'status': 'fail',
+                     'points': 'bestPracticesPoints', 'reason': '{value:.0f}KB - compress assets'}
+                ]
+            },
+            {
+                'breakdown': [
+                    {'category': 'performance', 'check': 'Page Size', 'status': 'pass',
+                     'points': 0, 'reason': '{value:.0f}KB (optimal: <{max}KB)'}
+                ]
+            }
+        ]
+    },
+    {
+        'id': 'thirdPartyBlocking',
+        'metric': 'thirdPartyBlockingMs',
+        'params': {'max': 250, 'points': 10},
+        'cases': [
+            {
+                'when': [('thirdPartyBlockingMs', '>', 'max')],
+                'issue': {
+                    'title': 'Third-Party Code Blocks the Main Thread: {value:.0f}ms',
+                    'description': 'Scripts from other domains blocked the main thread {excess:.0f}ms longer than recommended ({max}ms)',
+                    'severity': 'warning',
+                    'impact': 'Defer, lazy-load or drop the heaviest providers listed under thirdParty.entities'
+                },
+                'breakdown': [
+                    {'category': 'bestPractices', 'check': 'Third-Party Main-Thread Time', 'status': 'fail',
+                     'points': 'points', 'reason': '{value:.0f}ms blocking (optimal: <{max}ms)'}
+                ]
+            },
+            {
+                'breakdown': [
+                    {'category': 'bestPractices', 'check': 'Third-Party Main-Thread Time', 'status': 'pass',
+                     'points': 0, 'reason': '{value:.0f}ms blocking (optimal: <{max}ms)'}
+                ]
+            }
+        ]
+    },
+    {
+        'id': 'thirdPartyWeight',
+        'metric': 'thirdPartyKb',
+        'params': {'max': 500, 'points': 5},
+        'cases': [
+            {
+                'when': [('thirdPartyKb', '>', 'max')],
+                'issue': {
+                    'title': 'Heavy Third-Party Content: {value:.0f} KB',
+                    'description': '{thirdPartyRequests} requests to other domains transferred {excess:.0f} KB more than recommended ({max} KB)',
+                    'severity': 'warning',
+                    'impact': 'Third-party weight costs {points} best-practice points'
+                },
+                'breakdown': [
+                    {'category': 'bestPractices', 'check': 'Third-Party Weight', 'status': 'fail',
+                     'points': 'points', 'reason': '{value:.0f}KB in {thirdPartyRequests} requests (optimal: <{max}KB)'}
+                ]
+            },
+            {
+                'breakdown': [
+                    {'category': 'bestPractices', 'check': 'Third-Party Weight', 'status': 'pass',
+                     'points': 0, 'reason': '{value:.0f}KB in {thirdPartyRequests} requests (optimal: <{max}KB)'}
+                ]
+            }
+        ]
+    },
+    {
+        'id': 'thirdPartyDomains',
+        'metric': 'thirdPartyDomains',
+        'params': {'max': 15, 'points': 5},
+        'cases': [
+            {
+                'when': [('thirdPartyDomains', '>', 'max')],
+                'issue': {
+                    'title': 'Too Many Third-Party Domains: {value}',
+                    'description': '{excess} more external domains than recommended ({max} max); each needs its own DNS lookup and connection',
+                    'severity': 'warning',
+                    'impact': 'Third-party sprawl costs {points} best-practice points'
+                },
+                'breakdown': [
+                    {'category': 'bestPractices', 'check': 'Third-Party Domains', 'status': 'fail',
+                     'points': 'points', 'reason': '{value} domains (optimal: <{max})'}
+                ]
+            },
+            {
+                'breakdown': [
+                    {'category': 'bestPractices', 'check': 'Third-Party Domains', 'status': 'pass',
+                     'points': 0, 'reason': '{value} domains (optimal: <{max})'}
+                ]
+            }
+        ]
+    },
+    # The next three only run with the opt-in coverage stage (options.coverage)
+    {
+        'id': 'renderBlocking',
+        'metric': 'renderBlockingMs',
+        'params': {'max': 150, 'points': 10},
+        'cases': [
+            {
+                'when': [('renderBlockingMs', '>', 'max')],
+                'issue': {
+                    'title': 'Render-Blocking Resources: {renderBlockingCount}',
+                    'description': 'Synchronous scripts and stylesheets hold back first paint by about {value:.0f}ms',
+                    'severity': 'warning',
+                    'impact': 'Estimated savings: {value:.0f}ms of FCP by deferring or inlining them'
+                },
+                'breakdown': [
+                    {'category': 'performance', 'check': 'Render-Blocking Resources', 'status': 'fail',
+                     'points': 'points', 'reason': '{renderBlockingCount} resources delay first paint by ~{value:.0f}ms (optimal: <{max}ms)'}
+                ]
+            },
+            {
+                'breakdown': [
+                    {'category': 'performance', 'check': 'Render-Blocking Resources', 'status': 'pass',
+                     'points': 0, 'reason': '{renderBlockingCount} resources, ~{value:.0f}ms (optimal: <{max}ms)'}
+                ]
+            }
+        ]
+    },
+    {
+        'id': 'unusedJavascript',
+        'metric': 'unusedJsKb',
+        'params': {'max': 50, 'points': 5},
+        'cases': [
+            {
+                'when': [('unusedJsKb', '>', 'max')],
+                'issue': {
+                    'title': 'Unused JavaScript: {value:.0f} KB',
+                    'description': '{unusedJsPercent:.0f}% of script bytes never ran during the page load',
+                    'severity': 'warning',
+                    'impact': 'Estimated savings: {value:.0f} KB by code splitting or removing dead code'
+                },
+                'breakdown': [
+                    {'category': 'performance', 'check': 'Unused JavaScript', 'status': 'fail',
+                     'points': 'points', 'reason': '{value:.0f}KB unused (optimal: <{max}KB)'}
+                ]
+            },
+            {
+                'breakdown': [
+                    {'category': 'performance', 'check': 'Unused JavaScript', 'status': 'pass',
+                     'points': 0, 'reason': '{value:.0f}KB unused (optimal: <{max}KB)'}
+                ]
+            }
+        ]
+    },
+    {
+        'id': 'unusedCss',
+        'metric': 'unusedCssKb',
+        'params': {'max': 20, 'points': 5},
+        'cases': [
+            {
+                'when': [('unusedCssKb', '>', 'max')],
+                'issue': {
+                    'title': 'Unused CSS: {value:.0f} KB',
+                    'description': '{unusedCssPercent:.0f}% of stylesheet bytes match nothing on the page',
+                    'severity': 'warning',
+                    'impact': 'Estimated savings: {value:.0f} KB by removing or splitting unused rules'
+                },
+                'breakdown': [
+                    {'category': 'performance', 'check': 'Unused CSS', 'status': 'fail',
+                     'points': 'points', 'reason': '{value:.0f}KB unused (optimal: <{max}KB)'}
+                ]
+            },
+            {
+                'breakdown': [
+                    {'category': 'performance', 'check': 'Unused CSS', 'status': 'pass',
+                     'points': 0, 'reason': '{value:.0f}KB unused (optimal: <{max}KB)'}
+                ]
+            }
+        ]
+    },
+]
+
+# Param overrides per rule id; 'default' uses the values in RULES as-is
+RULE_PROFILES = {
+    'default': {},
+    'strict': {
+        'ttfb': {'max': 400},
+        'fcp': {'max': 1800},
+        'pageLoad': {'max': 2500},
+        'networkRequests': {'max': 40},
+        'pageSize': {'max': 800},
+        'lcp': {'max': 2000},
+        'cls': {'max': 0.05},
+        'tbt': {'max': 150},
+        'inp': {'max': 150},
+        'renderBlocking': {'max': 50},
+        'unusedJavascript': {'max': 20},
+        'unusedCss': {'max': 10},
+        'thirdPartyBlocking': {'max': 150},
+        'thirdPartyWeight': {'max': 300},
+        'thirdPartyDomains': {'max': 10},
+    },
+}
+DEFAULT_PROFILE = 'default'
+
+# Timing thresholds per emulated device (devices.DEVICE_PROFILES) and rule
+# profile, applied over RULE_PROFILES. Throttled phones can't be held to
+# desktop numbers; CLS and page weight don't depend on the device.
+DEVICE_THRESHOLDS = {
+    'desktop': {},
+    'mobile': {
+        'default': {
+            'ttfb': {'max': 800},
+            'fcp': {'max': 3000},
+            'pageLoad': {'max': 6000},
+            'lcp': {'max': 4000},
+            'tbt': {'max': 600},
+            'inp': {'max': 300},
+            'renderBlocking': {'max': 600},
+        },
+        'strict': {
+            'ttfb': {'max': 600},
+            'fcp': {'max': 1800},
+            'pageLoad': {'max': 4000},
+            'lcp': {'max': 2500},
+            'tbt': {'max': 300},
+            'inp': {'max': 200},
+            'renderBlocking': {'max': 300},
+        },
+    },
+    'lowEndMobile': {
+        'default': {
+            'ttfb': {'max': 1200},
+            'fcp': {'max': 4500},
+            'pageLoad': {'max': 9000},
+            'lcp': {'max': 6000},
+            'tbt': {'max': 1200},
+            'inp': {'max': 500},
+            'renderBlocking': {'max': 1200},
+        },
+        'strict': {
+            'ttfb': {'max': 900},
+            'fcp': {'max': 3000},
+            'pageLoad': {'max': 6000},
+            'lcp': {'max': 4000},
+            'tbt': {'max': 600},
+            'inp': {'max': 300},
+            'renderBlocking': {'max': 600},
+        },
+    },
+}
+
+
+def build_raw_metrics(url, page_data):
+    """The flat numbers every rule reads, taken from collect_page_data() output.
+
+    This is what gets stored with a result, so it has to be enough to
+    re-score the page without a browser.
+    """
+    performance = page_data['performance']
+    meta_checks = page_data['metaChecks']
+    alt_data = page_data['altData']
+    network = page_data['network'] or {}
+    vitals = page_data['vitals']
+    total_images = alt_data['total']
+    missing_alts = alt_data['missing']
+    # Only present when the coverage stage ran and succeeded
+    coverage = page_data.get('coverage') or {}
+    blocking = coverage.get('renderBlocking')
+    # Browser runs only; main-thread times need Long Animation Frame support
+    third_party = page_data.get('thirdParty')
+    return {
+        'isHttps': url.startswith('https://'),
+        'ttfb': performance.get('ttfb', 0),
+        'fcp': performance.get('fcp', 0),
+        'domLoad': performance.get('domLoad', 0),
+        'pageLoad': performance.get('pageLoad', 0),
+        'lcp': vitals['lcp'],
+        'cls': vitals['cls'],
+        'tbt': vitals['tbt'],
+        'inp': vitals['inp'],
+        'longTasks': vitals['longTasks'],
+        'networkRequests': network.get('requestCount'),
+        'pageSize': network['transferBytes'] / 1024 if network else None,
+        'titleLength': meta_checks['titleLength'],
+        'descriptionLength': meta_checks['descriptionLength'],
+        'viewport': meta_checks['viewport'],
+        'ogImage': meta_checks['ogImage'],
+        'totalImages': total_images,
+        'missingAlts': missing_alts,
+        'missingAltPercent': (missing_alts / total_images * 100) if total_images > 0 else 0,
+        'renderBlockingMs': blocking['estimatedSavingsMs'] if blocking else None,
+        'renderBlockingCount': len(blocking['resources']) if blocking else None,
+        'unusedJsKb': coverage['unusedJsBytes'] / 1024 if blocking else None,
+        'unusedJsPercent': _percent(coverage['unusedJsBytes'], coverage['totalJsBytes']) if blocking else None,
+        'unusedCssKb': coverage['unusedCssBytes'] / 1024 if blocking else None,
+        'unusedCssPercent': _percent(coverage['unusedCssBytes'], coverage['totalCssBytes']) if blocking else None,
+        'thirdPartyRequests': third_party['requests'] if third_party else None,
+        'thirdPartyKb': third_party['transferBytes'] / 1024 if third_party else None,
+        'thirdPartyDomains': third_party['totals']['domains'] if third_party else None,
+        'thirdPartyBlockingMs': third_party['blockingMs'] if third_party else None,
+        'thirdPartyScriptMs': third_party['scriptMs'] if third_party else None
+    }
+
+
+def _percent(part, total):
+    return part / total * 100 if total else 0
+
+
+# Fields evaluate() puts in every message context on top of the raw metrics and params
+MESSAGE_FIELDS = ('value', 'excess', 'points')
+
+
+def compile_rules(profile=DEFAULT_PROFILE, device=DEFAULT_DEVICE):
+    """Resolve params, operators and points for a profile and device into a flat, ready-to-run list"""
+    overrides = RULE_PROFILES[profile]
+    device_overrides = DEVICE_THRESHOLDS[device].get(profile, {})
+    compiled = []
+    for rule in RULES:
+        params = dict(rule.get('params', {}))
+        params.update(overrides.get(rule['id'], {}))
+        params.update(device_overrides.get(rule['id'], {}))
+
+        def resolve(value, params=params):
+            return params[value] if isinstance(value, str) else value
+
+        requires = {rule['metric']}
+        cases = []
+        for case in rule['cases']:
+            conditions = []
+            for metric, op, operand in case.get('when', []):
+                conditions.append((metric, OPERATORS[op], resolve(operand)))
+                requires.add(metric)
+            # Raw metrics the messages print are needed too, or formatting them would fail
+            templates = list((case.get('issue') or {}).values())
+            templates += [item['reason'] for item in case.get('breakdown', []) if 'reason' in item]
+            requires.update(_template_metrics(templates, params))
+            items = []
+            for item in case.get('breakdown', []):
+                points = item.get('points', 0)
+                if isinstance(points, dict):
+                    points = {'per': resolve(points['per']), 'max': resolve(points['max'])}
+                else:
+                    points = resolve(points)
+                items.append(dict(item, points=points))
+            cases.append({'conditions': conditions, 'issue': case.get('issue'), 'breakdown': items})
+
+        compiled.append({
+            'id': rule['id'],
+            'metric': rule['metric'],
+            'requires': tuple(requires),
+            'params': params,
+            'cases': cases,
+        })
+    return compiled
+
+
+def _template_metrics(templates, params):
+    """Raw metric names referenced by message templates, leaving out params and evaluate()'s own fields"""
+    names = set()
+    for template in templates:
+        for _, field, _, _ in string.Formatter().parse(template):
+            if field:
+                name = field.split('.')[0].split('[')[0]
+                if name not in params and name not in MESSAGE_FIELDS and not name.startswith('points_'):
+                    names.add(name)
+    return names
+
+
+_compiled = {}
+_compiled_lock = threading.Lock()
+
+
+def get_rules(profile=DEFAULT_PROFILE, device=DEFAULT_DEVICE):
+    """Compiled rules for a profile and device; each pair is compiled once per process"""
+    rules = _compiled.get((profile, device))
+    if rules is None:
+        with _compiled_lock:
+            rules = _compiled.get((profile, device))
+            if rules is None:
+                rules = _compiled[(profile, device)] = compile_rules(profile, device)
+    return rules
+
+
+def check_raw_metrics(raw):
+    """Raise ValueError if a metric the rules read is neither a number, a boolean nor None"""
+    known = {metric for rule in get_rules() for metric in rule['requires']}
+    invalid = sorted(name for name in known
+                     if raw.get(name) is not None and not isinstance(raw[name], (int, float, bool)))
+    if invalid:
+        raise ValueError(f"rawMetrics must be numbers or booleans: {', '.join(invalid)}")
+
+
+def evaluate(raw, profile=DEFAULT_PROFILE, messages=True, device=DEFAULT_DEVICE):
+    """Score raw metrics in a single pass over the compiled rules.
+
+    Rules whose metrics are missing (None) are skipped, so partial payloads
+    only lose the checks they can't support. With messages=False no text is
+    formatted at all: there are no issues and breakdown items carry only
+    check, status and points.
+    """
+    totals = {category: 100 for category in CATEGORIES}
+    breakdown = {category: [] for category in CATEGORIES}
+    issues = []
+
+    for rule in get_rules(profile, device):
+        if any(raw.get(metric) is None for metric in rule['requires']):
+            continue
+        for case in rule['cases']:
+            if all(op(raw[metric], operand) for metric, op, operand in case['conditions']):
+                break
+        else:
+            continue
+
+        value = raw[rule['metric']]
+        lost = []
+        for item in case['breakdown']:
+            points = item['points']
+            if isinstance(points, dict):
+                points = min(value * points['per'], points['max'])
+            lost.append(points)
+            totals[item['category']] -= points
+
+        if not messages:
+            for item, points in zip(case['breakdown'], lost):
+                breakdown[item['category']].append(
+                    {'check': item['check'], 'status': item['status'], 'points_lost': points})
+            continue
+
+        context = dict(raw)
+        context.update(rule['params'])
+        context['value'] = value
+        context['excess'] = _excess(raw, case['conditions'])
+        context['points'] = lost[0] if lost else 0
+        for item, points in zip(case['breakdown'], lost):
+            context[f"points_{item['category']}"] = points
+
+        if case['issue']:
+            issues.append({key: text.format_map(context) for key, text in case['issue'].items()})
+        for item, points in zip(case['breakdown'], lost):
+            breakdown[item['category']].append({
+                'check': item['check'],
+                'status': item['status'],
+                'points_lost': points,
+                'reason': item['reason'].format_map(context)
+            })
+
+    return {
+        'scores': {category: max(0, totals[category]) for category in CATEGORIES},
+        'issues': issues,
+        'breakdown': breakdown
+    }
+
+
+def _excess(raw, conditions):
+    if not conditions:
+        return 0
+    metric, _, operand = conditions[0]
+    value = raw[metric]
+    if isinstance(value, bool) or not isinstance(value, (int, float)) or isinstance(operand, bool):
+        return 0
+    return value - operand
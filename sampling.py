@@ -0,0 +1,105 @@
+import math
+import statistics
+
+# Raw metrics that vary between loads and get replaced by their median
+TIMING_METRICS = ('ttfb', 'fcp', 'domLoad', 'pageLoad', 'lcp', 'cls', 'tbt', 'inp', 'renderBlockingMs',
+                  'thirdPartyBlockingMs', 'thirdPartyScriptMs')
+SAMPLE_MODES = ('cold', 'warm')
+MAX_RUNS = 10
+
+
+def run_samples(context, runs, mode, collect, context_options=None):
+    """Take `runs` samples on one warm browser.
+
+    collect(page, index, is_last) returns one sample; index is None for the
+    warm-mode priming load, whose sample is discarded.
+
+    cold: every sample gets its own fresh context (created with
+          context_options, like the first one), so nothing is cached.
+    warm: one unrecorded priming load fills the HTTP cache, then every
+          sample loads in a new page of that same context.
+    """
+    samples = []
+    if mode == 'warm':
+        collect(context.new_page(), None, False)
+        for index in range(runs):
+            samples.append(collect(context.new_page(), index, index == runs - 1))
+        return samples
+
+    extra_contexts = []
+    try:
+        for index in range(runs):
+            if index == 0:
+                sample_context = context
+            else:
+                sample_context = context.browser.new_context(**(context_options or {}))
+                extra_contexts.append(sample_context)
+            samples.append(collect(sample_context.new_page(), index, index == runs - 1))
+            if index > 0:
+                # Release each extra context as soon as its sample is in
+                sample_context.close()
+                extra_contexts.remove(sample_context)
+    finally:
+        for extra in extra_contexts:
+            try:
+                extra.close()
+            except Exception:
+                pass
+    return samples
+
+
+async def run_samples_async(context, runs, mode, collect, context_options=None):
+    """run_samples() for Playwright's async API; collect is a coroutine function"""
+    samples = []
+    if mode == 'warm':
+        await collect(await context.new_page(), None, False)
+        for index in range(runs):
+            samples.append(await collect(await context.new_page(), index, index == runs - 1))
+        return samples
+
+    extra_contexts = []
+    try:
+        for index in range(runs):
+            if index == 0:
+                sample_context = context
+            else:
+                sample_context = await context.browser.new_context(**(context_options or {}))
+                extra_contexts.append(sample_context)
+            samples.append(await collect(await sample_context.new_page(), index, index == runs - 1))
+            if index > 0:
+                await sample_context.close()
+                extra_contexts.remove(sample_context)
+    finally:
+        for extra in extra_contexts:
+            try:
+                await extra.close()
+            except Exception:
+                pass
+    return samples
+
+
+def summarize(values):
+    """median/p90/min/max/stddev of one metric across samples"""
+    ordered = sorted(values)
+    p90_index = max(0, math.ceil(0.9 * len(ordered)) - 1)
+    return {
+        'median': round(statistics.median(ordered), 4),
+        'p90': round(ordered[p90_index], 4),
+        'min': round(ordered[0], 4),
+        'max': round(ordered[-1], 4),
+        'stddev': round(statistics.stdev(ordered), 4) if len(ordered) > 1 else 0.0,
+        'values': [round(value, 4) for value in values]
+    }
+
+
+def aggregate(raw_samples, metrics=TIMING_METRICS):
+    """Per-metric stats across samples plus the medians to score against"""
+    stats = {}
+    medians = {}
+    for metric in metrics:
+        values = [raw[metric] for raw in raw_samples if raw.get(metric) is not None]
+        if not values:
+            continue
+        stats[metric] = summarize(values)
+        medians[metric] = stats[metric]['median']
+    return stats, medians
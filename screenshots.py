@@ -0,0 +1,181 @@
+import base64
+import hashlib
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+SCREENSHOT_FORMATS = ('jpeg', 'webp', 'png')
+EXTENSIONS = {'jpeg': 'jpg', 'webp': 'webp', 'png': 'png'}
+
+DEFAULT_SCREENSHOT = {'format': 'jpeg', 'quality': 70, 'width': None}
+
+
+def parse_screenshot_option(value):
+    """Turn the request's `screenshot` field into capture settings, or None to skip.
+
+    Accepts true/false, a format name, or an object with format/quality/width
+    (width downscales to a thumbnail of that many CSS pixels).
+    """
+    if value is None or value is True:
+        return dict(DEFAULT_SCREENSHOT)
+    if value is False:
+        return None
+    if isinstance(value, str):
+        value = {'format': value}
+    if not isinstance(value, dict):
+        raise ValueError('screenshot must be a boolean, a format name or an object')
+
+    settings = dict(DEFAULT_SCREENSHOT)
+    settings.update({key: value[key] for key in ('format', 'quality', 'width') if key in value})
+    if settings['format'] not in SCREENSHOT_FORMATS:
+        raise ValueError(f"screenshot format must be one of: {', '.join(SCREENSHOT_FORMATS)}")
+    try:
+        settings['quality'] = int(settings['quality'])
+        settings['width'] = int(settings['width']) if settings['width'] else None
+    except (TypeError, ValueError):
+        raise ValueError('screenshot quality and width must be integers')
+    if not 1 <= settings['quality'] <= 100:
+        raise ValueError('screenshot quality must be between 1 and 100')
+    if settings['width'] is not None and not 16 <= settings['width'] <= 4096:
+        raise ValueError('screenshot width must be between 16 and 4096')
+    return settings
+
+
+VIEWPORT_SCRIPT = "() => ({width: window.innerWidth, height: window.innerHeight})"
+
+
+def _capture_params(settings, viewport):
+    """Page.captureScreenshot parameters; viewport is only needed to downscale"""
+    params = {'format': settings['format'], 'captureBeyondViewport': False}
+    if settings['format'] != 'png':
+        params['quality'] = settings['quality']
+    if settings['width']:
+        params['clip'] = {
+            'x': 0,
+            'y': 0,
+            'width': viewport['width'],
+            'height': viewport['height'],
+            'scale': min(1.0, settings['width'] / viewport['width'])
+        }
+    return params
+
+
+class ScreenshotStore:
+    """Captures compact screenshots and keeps the screenshot directory bounded.
+
+    Chromium encodes the image (JPEG/WebP/PNG, optionally downscaled) during
+    capture; hashing, writing and retention run on a background thread, so
+    the analysis can collect the page while the file is written. The URL is
+    handed out once the file exists, never before. Files are named by
+    content hash, so concurrent captures never collide and identical
+    screenshots are stored once.
+    """
+
+    def __init__(self, directory='static/screenshots', max_bytes=200 * 1024 * 1024,
+                 max_age=7 * 86400, sweep_interval=300):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.max_age = max_age
+        self.sweep_interval = sweep_interval
+        os.makedirs(directory, exist_ok=True)
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='screenshot-writer')
+        self._lock = threading.Lock()
+        self._total_bytes = None
+        self._last_sweep = 0.0
+
+    def capture(self, page, settings):
+        """Capture the viewport; returns a Future of its public URL (None if it couldn't be written)"""
+        viewport = None
+        if settings['width']:
+            viewport = page.viewport_size or page.evaluate(VIEWPORT_SCRIPT)
+        params = _capture_params(settings, viewport)
+        session = page.context.new_cdp_session(page)
+        try:
+            data = base64.b64decode(session.send('Page.captureScreenshot', params)['data'])
+        finally:
+            session.detach()
+        return self._store(data, settings)
+
+    async def capture_async(self, page, settings):
+        """capture() for Playwright's async API"""
+        viewport = None
+        if settings['width']:
+            viewport = page.viewport_size or await page.evaluate(VIEWPORT_SCRIPT)
+        params = _capture_params(settings, viewport)
+        session = await page.context.new_cdp_session(page)
+        try:
+            response = await session.send('Page.captureScreenshot', params)
+        finally:
+            await session.detach()
+        return self._store(base64.b64decode(response['data']), settings)
+
+    def _store(self, data, settings):
+        return self._executor.submit(self._save, data, settings)
+
+    def _save(self, data, settings):
+        name = f"{hashlib.sha256(data).hexdigest()[:24]}.{EXTENSIONS[settings['format']]}"
+        path = os.path.join(self.directory, name)
+        try:
+            self._write(path, data)
+        except OSError as e:
+            print(f"Screenshot write error: {e}")
+            return None
+        try:
+            self._maybe_sweep()
+        except OSError as e:
+            print(f"Screenshot retention error: {e}")
+        return '/' + path.replace(os.sep, '/')
+
+    def _write(self, path, data):
+        if os.path.exists(path):
+            # Same content already stored; mark it recently used
+            os.utime(path)
+            return
+        tmp_path = f'{path}.{threading.get_ident()}.tmp'
+        with open(tmp_path, 'wb') as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+        with self._lock:
+            if self._total_bytes is not None:
+                self._total_bytes += len(data)
+
+    def exists(self, url):
+        """True while the file behind a URL handed out by capture() is still on disk"""
+        return os.path.isfile(os.path.join(self.directory, url.rsplit('/', 1)[-1]))
+
+    def _maybe_sweep(self):
+        with self._lock:
+            over_budget = self._total_bytes is None or self._total_bytes > self.max_bytes
+            due = time.time() - self._last_sweep >= self.sweep_interval
+        if over_budget or due:
+            self.sweep()
+
+    def sweep(self):
+        """Delete expired screenshots, then least recently used ones until under the size budget"""
+        now = time.time()
+        files = []
+        for entry in os.scandir(self.directory):
+            if not entry.is_file() or entry.name.endswith('.tmp'):
+                continue
+            stat = entry.stat()
+            files.append((stat.st_mtime, stat.st_size, entry.path))
+
+        files.sort()
+        total = sum(size for _, size, _ in files)
+        removed = 0
+        for mtime, size, path in files:
+            if now - mtime <= self.max_age and total <= self.max_bytes:
+                break
+            try:
+                os.remove(path)
+                total -= size
+                removed += 1
+            except OSError:
+                pass
+
+        with self._lock:
+            self._total_bytes = total
+            self._last_sweep = now
+        if removed:
+            print(f"Screenshot retention removed {removed} files ({total / 1024 / 1024:.1f} MB kept)")
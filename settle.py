@@ -0,0 +1,151 @@
+import asyncio
+import time
+
+# How long the page has to stay quiet before it counts as settled, and the
+# hard cap on waiting. maxInflight tolerates long-lived connections
+# (analytics beacons, long polling) that would otherwise never go idle.
+SETTLE_PROFILES = {
+    'fast': {'quietMs': 250, 'maxMs': 3000, 'maxInflight': 2, 'requireLoad': False, 'mainThreadQuietMs': 0},
+    'balanced': {'quietMs': 500, 'maxMs': 8000, 'maxInflight': 2, 'requireLoad': True, 'mainThreadQuietMs': 250},
+    'thorough': {'quietMs': 1000, 'maxMs': 15000, 'maxInflight': 0, 'requireLoad': True, 'mainThreadQuietMs': 500},
+}
+DEFAULT_SETTLE = 'balanced'
+
+# The analyzer used to sleep this long unconditionally after domcontentloaded
+LEGACY_WAIT_MS = 2000
+
+POLL_MS = 50
+
+# Installed before navigation: remembers when the main thread last did
+# visible work (long tasks, paints, layout shifts)
+SETTLE_INIT_SCRIPT = """(() => {
+    const state = window.__analyzerSettle = { lastActivity: 0 };
+    const touch = (entry) => {
+        const end = entry.startTime + (entry.duration || 0);
+        if (end > state.lastActivity) state.lastActivity = end;
+    };
+    for (const type of ['longtask', 'paint', 'largest-contentful-paint', 'layout-shift']) {
+        try {
+            new PerformanceObserver(list => list.getEntries().forEach(touch))
+                .observe({ type: type, buffered: true });
+        } catch (e) {}
+    }
+})();"""
+
+IGNORED_RESOURCE_TYPES = ('websocket', 'eventsource')
+
+IDLE_SCRIPT = """() => {
+    const state = window.__analyzerSettle;
+    return state ? performance.now() - state.lastActivity : null;
+}"""
+
+
+class SettleTracker:
+    """Watches a page's network activity so we can stop waiting as soon as it is stable.
+
+    Must be created before page.goto() so no request or the load event is missed.
+    """
+
+    def __init__(self, page):
+        self._listen(page)
+        page.add_init_script(SETTLE_INIT_SCRIPT)
+
+    def _listen(self, page):
+        self.page = page
+        self.loaded = False
+        self._inflight = set()
+        self._last_network = time.monotonic()
+        page.on('request', self._on_request)
+        page.on('requestfinished', self._on_done)
+        page.on('requestfailed', self._on_done)
+        page.on('load', self._on_load)
+
+    def _on_request(self, request):
+        if request.resource_type in IGNORED_RESOURCE_TYPES:
+            return
+        self._inflight.add(request)
+        self._last_network = time.monotonic()
+
+    def _on_done(self, request):
+        self._inflight.discard(request)
+        self._last_network = time.monotonic()
+
+    def _on_load(self, _page):
+        self.loaded = True
+
+    def _main_thread_idle_ms(self):
+        try:
+            return self.page.evaluate(IDLE_SCRIPT)
+        except Exception:
+            return None
+
+    def _network_settled(self, config):
+        quiet = (len(self._inflight) <= config['maxInflight']
+                 and (time.monotonic() - self._last_network) * 1000 >= config['quietMs'])
+        return quiet and (self.loaded or not config['requireLoad'])
+
+    def wait(self, strategy=DEFAULT_SETTLE):
+        """Block until the page is quiet or the strategy's cap is hit; report the wait"""
+        config = SETTLE_PROFILES[strategy]
+        start = time.monotonic()
+        deadline = start + config['maxMs'] / 1000
+        reason = 'timeout'
+
+        while time.monotonic() < deadline:
+            if self._network_settled(config):
+                if config['mainThreadQuietMs'] == 0:
+                    reason = 'networkIdle'
+                    break
+                idle_ms = self._main_thread_idle_ms()
+                if idle_ms is None or idle_ms >= config['mainThreadQuietMs']:
+                    reason = 'settled'
+                    break
+            # wait_for_timeout (unlike time.sleep) lets Playwright dispatch page events
+            self.page.wait_for_timeout(POLL_MS)
+        return self._report(strategy, start, reason)
+
+    def _report(self, strategy, start, reason):
+        waited_ms = (time.monotonic() - start) * 1000
+        return {
+            'strategy': strategy,
+            'reason': reason,
+            'waitedMs': round(waited_ms),
+            'savedMs': round(LEGACY_WAIT_MS - waited_ms),
+            'loadEventFired': self.loaded,
+            'pendingRequests': len(self._inflight)
+        }
+
+
+class AsyncSettleTracker(SettleTracker):
+    """SettleTracker for Playwright's async API; await install() before page.goto()"""
+
+    def __init__(self, page):
+        self._listen(page)
+
+    async def install(self):
+        await self.page.add_init_script(SETTLE_INIT_SCRIPT)
+
+    async def _main_thread_idle_ms(self):
+        try:
+            return await self.page.evaluate(IDLE_SCRIPT)
+        except Exception:
+            return None
+
+    async def wait(self, strategy=DEFAULT_SETTLE):
+        config = SETTLE_PROFILES[strategy]
+        start = time.monotonic()
+        deadline = start + config['maxMs'] / 1000
+        reason = 'timeout'
+
+        while time.monotonic() < deadline:
+            if self._network_settled(config):
+                if config['mainThreadQuietMs'] == 0:
+                    reason = 'networkIdle'
+                    break
+                idle_ms = await self._main_thread_idle_ms()
+                if idle_ms is None or idle_ms >= config['mainThreadQuietMs']:
+                    reason = 'settled'
+                    break
+            # Page events are dispatched by the event loop while we sleep
+            await asyncio.sleep(POLL_MS / 1000)
+        return self._report(strategy, start, reason)
@@ -0,0 +1,393 @@
+import codecs
+import os
+import re
+import threading
+import time
+from html.parser import HTMLParser
+from urllib.parse import urljoin, urlparse
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from collector import COLLECT_LIST_LIMIT, section_defaults
+
+# browser: full Chromium run; static: markup only, no browser;
+# auto: static first, browser when the markup looks client-rendered
+ENGINE_MODES = ('browser', 'static', 'auto')
+DEFAULT_ENGINE = 'browser'
+
+MAX_DOCUMENT_BYTES = int(os.environ.get('ANALYZER_STATIC_MAX_KB', 5120)) * 1024
+FETCH_TIMEOUT = float(os.environ.get('ANALYZER_STATIC_TIMEOUT', 15))
+CHUNK_BYTES = 64 * 1024
+USER_AGENT = os.environ.get(
+    'ANALYZER_STATIC_USER_AGENT',
+    'Mozilla/5.0 (X11; Linux x86_64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0 Safari/537.36')
+
+# Elements single-page apps mount into; empty in the served markup means
+# the content only exists after JavaScript runs
+MOUNT_IDS = ('root', 'app', '__next', '__nuxt', '___gatsby', 'svelte')
+# Less visible text than this, with external scripts, counts as client-rendered
+MIN_STATIC_TEXT = 200
+
+# Same-origin link targets kept per page, for the crawler
+MAX_LINKS = 1000
+
+HIDDEN_TEXT_TAGS = ('script', 'style', 'noscript', 'template', 'title')
+CHARSET_PATTERN = re.compile(rb'<meta[^>]+charset=["\']?([\w-]+)', re.IGNORECASE)
+
+_session = None
+_session_lock = threading.Lock()
+
+
+class NotHtmlError(Exception):
+    """Raised when the fetched document is not HTML"""
+
+
+def get_session():
+    """One pooled, keep-alive HTTP session shared by all static analyses"""
+    global _session
+    with _session_lock:
+        if _session is None:
+            session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=32, pool_maxsize=32)
+            session.mount('http://', adapter)
+            session.mount('https://', adapter)
+            session.headers.update({
+                'User-Agent': USER_AGENT,
+                'Accept': 'text/html,application/xhtml+xml;q=0.9,*/*;q=0.8',
+                'Accept-Encoding': 'gzip, deflate'
+            })
+            _session = session
+        return _session
+
+
+class MarkupParser(HTMLParser):
+    """Builds the collector's pageInfo/overview/altData/metaChecks sections from raw HTML.
+
+    Fed incrementally, it keeps only counters and the short lists the
+    sections report, never a DOM tree. Like the collector, every overview
+    list keeps its first `limit` items and `totals` has the real counts;
+    with a list of `sections` the overview lists and crawl links are only
+    gathered when asked for.
+    """
+
+    def __init__(self, url, sections=None, limit=COLLECT_LIST_LIMIT):
+        super().__init__(convert_charrefs=True)
+        self.base = url
+        self.only = sections
+        self.limit = limit
+        self.lists = sections is None or 'overview' in sections
+        self.collect_links = sections is None or 'links' in sections
+        self.totals = {'cssFiles': 0, 'jsFiles': 0, 'images': 0, 'metaTags': 0, 'ogTags': 0, 'twitterTags': 0}
+        self.origin = '{0.scheme}://{0.netloc}'.format(urlparse(url))
+        self.total = 0
+        self.tags = {}
+        self.submit_inputs = 0
+        self.language = None
+        self.charset = None
+        self.links_total = 0
+        self.links_internal = 0
+        self.meta_by_name = {}
+        self.meta_by_property = {}
+        self.meta_all = []
+        self.og = []
+        self.twitter = []
+        self.icon = None
+        self.canonical = False
+        self.css_files = []
+        self.js_files = []
+        self.inline_scripts = 0
+        self.schema_markup = 0
+        self.images = []
+        self.missing_alts = 0
+        self.lazy_images = 0
+        self.title = None
+        self.h1 = None
+        self.text_chars = 0
+        self.empty_mounts = []
+        self.links = set()
+        self._base_seen = False
+        self._title_parts = None
+        self._h1_parts = None
+        self._h1_depth = 0
+        self._hidden_depth = 0
+        self._pending_mount = None
+
+    def _keep(self, name, items, item):
+        """Count an overview list item and keep it while the list is under the limit"""
+        self.totals[name] += 1
+        if self.lists and len(items) < self.limit:
+            items.append(item())
+
+    def _resolve(self, value):
+        return urljoin(self.base, value.strip()) if value is not None else ''
+
+    def handle_starttag(self, tag, attrs):
+        attributes = dict(attrs)
+        self.total += 1
+        self.tags[tag] = self.tags.get(tag, 0) + 1
+        self._pending_mount = None
+        if attributes.get('id') in MOUNT_IDS:
+            self._pending_mount = (tag, attributes['id'])
+
+        if tag in HIDDEN_TEXT_TAGS:
+            self._hidden_depth += 1
+        if tag == 'title' and self.title is None and self._title_parts is None:
+            self._title_parts = []
+        elif tag == 'h1':
+            if self.h1 is None and self._h1_parts is None:
+                self._h1_parts = []
+            if self._h1_parts is not None:
+                self._h1_depth += 1
+        elif tag == 'html':
+            self.language = attributes.get('lang') or self.language
+        elif tag == 'base' and not self._base_seen and attributes.get('href'):
+            self._base_seen = True
+            self.base = self._resolve(attributes['href'])
+        elif tag == 'a':
+            self.links_total += 1
+            href = self._resolve(attributes.get('href')) if 'href' in attributes else ''
+            if href.startswith(self.origin) or href.startswith('/'):
+                self.links_internal += 1
+            nofollow = 'nofollow' in (attributes.get('rel') or '').lower()
+            if (self.collect_links and href.startswith(self.origin + '/') and not nofollow
+                    and len(self.links) < MAX_LINKS):
+                self.links.add(href.split('#')[0])
+        elif tag == 'img':
+            self._image(attributes)
+        elif tag == 'meta':
+            self._meta(attributes)
+        elif tag == 'link':
+            self._link(attributes)
+        elif tag == 'script':
+            if 'src' in attributes:
+                self._keep('jsFiles', self.js_files, lambda: {
+                    'src': self._resolve(attributes['src']),
+                    'async': 'async' in attributes,
+                    'defer': 'defer' in attributes
+                })
+            else:
+                self.inline_scripts += 1
+            if (attributes.get('type') or '') == 'application/ld+json':
+                self.schema_markup += 1
+        elif tag == 'input' and (attributes.get('type') or '').lower() == 'submit':
+            self.submit_inputs += 1
+
+    def handle_endtag(self, tag):
+        if self._pending_mount and self._pending_mount[0] == tag:
+            self.empty_mounts.append(self._pending_mount[1])
+        self._pending_mount = None
+        if tag in HIDDEN_TEXT_TAGS and self._hidden_depth:
+            self._hidden_depth -= 1
+        if tag == 'title' and self._title_parts is not None:
+            self.title = ' '.join(''.join(self._title_parts).split())
+            self._title_parts = None
+        elif tag == 'h1' and self._h1_parts is not None:
+            self._h1_depth -= 1
+            if self._h1_depth <= 0:
+                self.h1 = ''.join(self._h1_parts).strip()
+                self._h1_parts = None
+
+    def handle_data(self, data):
+        if self._title_parts is not None:
+            self._title_parts.append(data)
+        if self._h1_parts is not None:
+            self._h1_parts.append(data)
+        if not self._hidden_depth:
+            stripped = len(data.strip())
+            if stripped:
+                self.text_chars += stripped
+                self._pending_mount = None
+
+    def _image(self, attributes):
+        alt = attributes.get('alt') or ''
+        if not alt:
+            self.missing_alts += 1
+        loading = (attributes.get('loading') or '').lower()
+        loading = loading if loading == 'lazy' else 'eager'
+        if loading == 'lazy':
+            self.lazy_images += 1
+        size = lambda name: int(attributes[name]) if (attributes.get(name) or '').isdigit() else 'auto'
+        self._keep('images', self.images, lambda: {
+            'src': self._resolve(attributes['src']) if 'src' in attributes else '',
+            'alt': alt or 'missing',
+            'width': size('width') or 'auto',
+            'height': size('height') or 'auto',
+            'loading': loading
+        })
+
+    def _meta(self, attributes):
+        if attributes.get('charset') and not self.charset:
+            self.charset = attributes['charset'].strip()
+        name = attributes.get('name') or ''
+        prop = attributes.get('property') or ''
+        content = attributes.get('content') or ''
+        if name and name not in self.meta_by_name:
+            self.meta_by_name[name] = content
+        if prop and prop not in self.meta_by_property:
+            self.meta_by_property[prop] = content
+        if prop.startswith('og:'):
+            self._keep('ogTags', self.og, lambda: {'property': prop, 'content': content})
+        if name.startswith('twitter:'):
+            self._keep('twitterTags', self.twitter, lambda: {'name': name, 'content': content})
+        self._keep('metaTags', self.meta_all, lambda: {'name': name or prop or 'http-equiv', 'content': content[:100]})
+
+    def _link(self, attributes):
+        rel = (attributes.get('rel') or '').lower()
+        if 'icon' in rel and self.icon is None:
+            self.icon = self._resolve(attributes.get('href'))
+        if rel == 'canonical':
+            self.canonical = True
+        if rel == 'stylesheet':
+            self._keep('cssFiles', self.css_files, lambda: {'href': self._resolve(attributes.get('href')),
+                                                            'media': attributes.get('media') or 'all'})
+
+    def sections(self, charset):
+        """The same section dicts collector.COLLECT_SCRIPT returns, limited to the requested ones"""
+        title = self.title or ''
+        description = self.meta_by_name.get('description', '')
+        sections = {
+            'pageInfo': {
+                'title': title,
+                'description': description,
+                'favicon': self.icon or '',
+                'h1': self.h1 or 'No H1 found'
+            },
+            'overview': {
+                'totalElements': self.total,
+                'links': {'total': self.links_total, 'internal': self.links_internal,
+                          'external': self.links_total - self.links_internal},
+                'forms': self.tags.get('form', 0),
+                'buttons': self.tags.get('button', 0) + self.submit_inputs,
+                'headings': {f'h{level}': self.tags.get(f'h{level}', 0) for level in range(1, 7)},
+                'metaTags': self.meta_all,
+                'language': self.language or 'not specified',
+                'charset': (self.charset or charset).upper(),
+                'cssFiles': self.css_files,
+                'jsFiles': self.js_files,
+                'inlineScripts': self.inline_scripts,
+                'favicon': self.icon or 'none',
+                'schemaMarkup': self.schema_markup,
+                'ogTags': self.og,
+                'twitterTags': self.twitter,
+                'images': self.images,
+                'lazyLoadedImages': self.lazy_images,
+                'totals': dict(self.totals)
+            },
+            'altData': {'total': self.totals['images'], 'missing': self.missing_alts},
+            'links': sorted(self.links),
+            'metaChecks': {
+                'title': title,
+                'titleLength': len(title),
+                'description': description,
+                'descriptionLength': len(description),
+                'viewport': 'viewport' in self.meta_by_name,
+                'ogImage': 'og:image' in self.meta_by_property,
+                'ogTitle': 'og:title' in self.meta_by_property,
+                'ogDescription': 'og:description' in self.meta_by_property,
+                'canonical': self.canonical,
+                'robots': self.meta_by_name.get('robots', 'not set')
+            }
+        }
+        if self.only is None:
+            return sections
+        return {name: value for name, value in sections.items() if name in self.only}
+
+    def client_rendered_reason(self):
+        """Why the markup looks like it needs JavaScript to show its content, or None"""
+        if self.empty_mounts:
+            return f"empty app mount point #{self.empty_mounts[0]}"
+        if self.text_chars < MIN_STATIC_TEXT and self.totals['jsFiles']:
+            return f"only {self.text_chars} characters of text with {self.totals['jsFiles']} external scripts"
+        return None
+
+
+def _charset(response, head):
+    content_type = response.headers.get('content-type', '')
+    if 'charset=' in content_type:
+        return content_type.split('charset=')[-1].split(';')[0].strip().strip('"') or 'utf-8'
+    match = CHARSET_PATTERN.search(head)
+    return match.group(1).decode('ascii') if match else 'utf-8'
+
+
+def fetch_and_parse(url, sections=None):
+    """Stream the document and parse it as it arrives.
+
+    Returns (parser, info) where info has the final URL, status, headers
+    subset, fetch time, byte count, charset and whether the document was
+    cut at MAX_DOCUMENT_BYTES.
+    """
+    start = time.time()
+    response = get_session().get(url, stream=True, timeout=FETCH_TIMEOUT, allow_redirects=True)
+    try:
+        content_type = response.headers.get('content-type', '')
+        if content_type and 'html' not in content_type.lower():
+            raise NotHtmlError(f"not an HTML document ({content_type})")
+
+        parser = MarkupParser(response.url, sections)
+        decoder = None
+        charset = 'utf-8'
+        received = 0
+        truncated = False
+        for chunk in response.iter_content(CHUNK_BYTES):
+            if decoder is None:
+                charset = _charset(response, chunk[:2048])
+                try:
+                    decoder = codecs.getincrementaldecoder(charset)(errors='replace')
+                except LookupError:
+                    charset = 'utf-8'
+                    decoder = codecs.getincrementaldecoder(charset)(errors='replace')
+            received += len(chunk)
+            parser.feed(decoder.decode(chunk))
+            if received >= MAX_DOCUMENT_BYTES:
+                truncated = True
+                break
+        if decoder is not None:
+            parser.feed(decoder.decode(b'', final=True))
+        parser.close()
+    finally:
+        response.close()
+
+    info = {
+        'url': response.url,
+        'status': response.status_code,
+        'contentType': content_type or None,
+        'etag': response.headers.get('etag'),
+        'lastModified': response.headers.get('last-modified'),
+        'fetchTime': time.time() - start,
+        'bytes': received,
+        'charset': charset,
+        'truncated': truncated
+    }
+    return parser, info
+
+
+def collect_static(url, sections=None):
+    """One browserless sample in the shape app.build_result() expects.
+
+    sections is payload.collector_sections(); sections outside it get the
+    collector's defaults, as in a browser run.
+    """
+    parser, info = fetch_and_parse(url, sections)
+    collected = parser.sections(info['charset'])
+    page_data = {name: collected.get(name, default)
+                 for name, default in section_defaults(info['fetchTime']).items()}
+    # Nothing timing- or network-related can be known without a browser;
+    # None makes the rule engine skip those checks
+    page_data['performance'] = {'dns': None, 'tcp': None, 'ttfb': None, 'domLoad': None,
+                                'pageLoad': None, 'fcp': None}
+    page_data['vitals'] = {'lcp': None, 'lcpElement': None, 'lcpUrl': None, 'cls': None, 'tbt': None,
+                           'longTasks': None, 'longestTask': None, 'inp': None, 'interactions': 0}
+    page_data['network'] = None
+    page_data['errors'] = {}
+    return {
+        'engine': 'static',
+        'loadTime': info['fetchTime'],
+        'document': {key: info[key] for key in ('status', 'contentType', 'etag', 'lastModified')},
+        'settle': None,
+        'screenshot': None,
+        'pageData': page_data,
+        'clientRendered': parser.client_rendered_reason(),
+        'static': {'finalUrl': info['url'], 'bytes': info['bytes'], 'charset': info['charset'],
+                   'truncated': info['truncated']}
+    }
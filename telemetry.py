@@ -0,0 +1,182 @@
+import threading
+import time
+from contextlib import contextmanager
+
+# Seconds; covers everything from a cached lookup to a 30s navigation timeout
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 20, 30, 60)
+
+
+def _labels(names, values):
+    if not names:
+        return ''
+    pairs = ','.join(f'{name}="{_escape(value)}"' for name, value in zip(names, values))
+    return '{' + pairs + '}'
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+
+def _number(value):
+    if value == float('inf'):
+        return '+Inf'
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return repr(value) if isinstance(value, float) else str(value)
+
+
+class _Metric:
+    kind = None
+
+    def __init__(self, name, help_text, labelnames=()):
+        self.name = name
+        self.help = help_text
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+        self._values = {}
+
+    def _key(self, labels):
+        return tuple(str(labels[name]) for name in self.labelnames)
+
+    def header(self):
+        return [f'# HELP {self.name} {self.help}', f'# TYPE {self.name} {self.kind}']
+
+
+class Counter(_Metric):
+    kind = 'counter'
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def render(self):
+        with self._lock:
+            values = sorted(self._values.items())
+        return self.header() + [f'{self.name}{_labels(self.labelnames, key)} {_number(value)}'
+                                for key, value in values]
+
+
+class Gauge(Counter):
+    kind = 'gauge'
+
+    def dec(self, amount=1, **labels):
+        self.inc(-amount, **labels)
+
+    def set(self, value, **labels):
+        with self._lock:
+            self._values[self._key(labels)] = value
+
+
+class Histogram(_Metric):
+    kind = 'histogram'
+
+    def __init__(self, name, help_text, labelnames=(), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, help_text, labelnames)
+        self.buckets = tuple(buckets) + (float('inf'),)
+
+    def observe(self, value, **labels):
+        key = self._key(labels)
+        with self._lock:
+            state = self._values.get(key)
+            if state is None:
+                state = self._values[key] = {'counts': [0] * len(self.buckets), 'sum': 0.0, 'count': 0}
+            for index, bound in enumerate(self.buckets):
+                if value <= bound:
+                    state['counts'][index] += 1
+                    break
+            state['sum'] += value
+            state['count'] += 1
+
+    def render(self):
+        with self._lock:
+            values = sorted((key, {'counts': list(state['counts']), 'sum': state['sum'], 'count': state['count']})
+                            for key, state in self._values.items())
+        lines = self.header()
+        names = self.labelnames + ('le',)
+        for key, state in values:
+            running = 0
+            for bound, hits in zip(self.buckets, state['counts']):
+                running += hits
+                lines.append(f'{self.name}_bucket{_labels(names, key + (_number(float(bound)),))} {running}')
+            lines.append(f'{self.name}_sum{_labels(self.labelnames, key)} {_number(state["sum"])}')
+            lines.append(f'{self.name}_count{_labels(self.labelnames, key)} {state["count"]}')
+        return lines
+
+
+class Registry:
+    """Metrics rendered in the Prometheus text exposition format.
+
+    collectors are callables run at scrape time that return extra
+    (name, kind, help, [(labels_dict, value), ...]) tuples, for numbers
+    that other components already track (pool, cache, job queue).
+    """
+
+    def __init__(self):
+        self.metrics = []
+        self.collectors = []
+
+    def register(self, metric):
+        self.metrics.append(metric)
+        return metric
+
+    def render(self):
+        lines = []
+        for metric in self.metrics:
+            lines.extend(metric.render())
+        for collector in self.collectors:
+            try:
+                families = collector()
+            except Exception as e:
+                print(f"Metrics collector error: {e}")
+                continue
+            for name, kind, help_text, samples in families:
+                lines.append(f'# HELP {name} {help_text}')
+                lines.append(f'# TYPE {name} {kind}')
+                for labels, value in samples:
+                    lines.append(f'{name}{_labels(tuple(labels), tuple(labels.values()))} {_number(value)}')
+        return '\n'.join(lines) + '\n'
+
+
+REGISTRY = Registry()
+PHASE_SECONDS = REGISTRY.register(Histogram(
+    'analyzer_phase_seconds', 'Time spent in each analysis phase', ('phase',)))
+ANALYSIS_SECONDS = REGISTRY.register(Histogram(
+    'analyzer_analysis_seconds', 'End-to-end analysis time by engine and outcome', ('engine', 'outcome')))
+ANALYSES_IN_FLIGHT = REGISTRY.register(Gauge(
+    'analyzer_analyses_in_flight', 'Analyses currently running (cache hits excluded)'))
+ANALYSES_TOTAL = REGISTRY.register(Counter(
+    'analyzer_analyses_total', 'Analysis requests by result', ('result',)))
+ERRORS_TOTAL = REGISTRY.register(Counter(
+    'analyzer_errors_total', 'Failed analyses by exception type', ('type',)))
+ORIGIN_WAIT_SECONDS = REGISTRY.register(Histogram(
+    'analyzer_origin_wait_seconds', 'Time spent waiting for a per-origin concurrency slot'))
+
+
+class Timings:
+    """Per-analysis phase spans; each one is also observed in analyzer_phase_seconds.
+
+    A phase that runs more than once (multi-run sampling) accumulates.
+    """
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.phases = {}
+
+    @contextmanager
+    def span(self, name):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add(name, time.perf_counter() - start)
+
+    def add(self, name, seconds):
+        self.phases[name] = self.phases.get(name, 0.0) + seconds
+        PHASE_SECONDS.observe(seconds, phase=name)
+
+    def report(self):
+        return {
+            'phases': {name: round(seconds * 1000, 1) for name, seconds in self.phases.items()},
+            'totalMs': round((time.perf_counter() - self.started) * 1000, 1)
+        }
@@ -0,0 +1,17 @@
+import os
+import sys
+
+import pytest
+
+# The modules live at the repository root
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+# Importing the app must not open the SQLite stores in the working directory
+os.environ['ANALYZER_HISTORY_DB'] = ''
+os.environ.pop('ANALYZER_MONITOR_CONFIG', None)
+os.environ.pop('ANALYZER_MONITOR_DB', None)
+
+
+@pytest.fixture
+def client():
+    from app import app
+    return app.test_client()
@@ -0,0 +1,123 @@
+import base64
+import json
+import os
+import subprocess
+import sys
+
+import pytest
+
+from archive import ArchiveNotFound, ArchiveStore, ReplayRouter, diff_results
+
+
+class Request:
+    def __init__(self, url, method='GET'):
+        self.url = url
+        self.method = method
+
+
+def entry(url, status=200, body=None, headers=(), method='GET'):
+    content = {'mimeType': 'text/html'}
+    if body is not None:
+        content.update(text=base64.b64encode(body).decode(), encoding='base64')
+    return {'request': {'method': method, 'url': url},
+            'response': {'status': status, 'headers': [{'name': name, 'value': value} for name, value in headers],
+                         'content': content}}
+
+
+@pytest.fixture
+def store(tmp_path):
+    return ArchiveStore(str(tmp_path / 'archives'))
+
+
+def ingest(store, tmp_path, entries, url='https://a.test/'):
+    path = store.recording_path()
+    with open(path, 'w') as f:
+        json.dump({'log': {'version': '1.2', 'entries': entries}}, f)
+    return store.ingest(url, path)
+
+
+def test_ingest_deduplicates_bodies_and_har_round_trips(store, tmp_path):
+    body = b'body { color: red }'
+    first = ingest(store, tmp_path, [entry('https://a.test/a.css', body=body), entry('https://a.test/b.css', body=body)])
+    assert first['entries'] == 2 and first['newBlobs'] == 1
+    second = ingest(store, tmp_path, [entry('https://a.test/a.css', body=body)])
+    assert second['newBlobs'] == 0
+    assert store.latest('https://A.test') == second['id']
+    har = store.har(first['id'])
+    assert base64.b64decode(har['log']['entries'][1]['response']['content']['text']) == body
+    with pytest.raises(ArchiveNotFound):
+        store.manifest('missing')
+
+
+def test_replay_serves_in_recorded_order_and_repeats_the_last(store, tmp_path):
+    archive = ingest(store, tmp_path, [
+        entry('https://a.test/', body=b'<html>', headers=[('Content-Type', 'text/html'), ('Content-Length', '6')]),
+        entry('https://a.test/poll', body=b'1', headers=[('Set-Cookie', 'a=1'), ('Set-Cookie', 'b=2')]),
+        entry('https://a.test/poll', body=b'2'),
+        entry('https://a.test/cached.js', status=304),
+        entry('https://a.test/failed.js', status=0),
+        entry('https://a.test/form', method='POST', body=b'ok'),
+    ])
+    router = ReplayRouter(store, archive['id'])
+
+    page = router._lookup(Request('https://a.test/'))
+    assert page['body'] == b'<html>'
+    # Content-Length described the recorded encoding, not the body being fulfilled
+    assert page['headers'] == {'content-type': 'text/html'}
+    first = router._lookup(Request('https://a.test/poll'))
+    assert first['body'] == b'1' and first['headers']['set-cookie'] == 'a=1\nb=2'
+    assert router._lookup(Request('https://a.test/poll'))['body'] == b'2'
+    assert router._lookup(Request('https://a.test/poll'))['body'] == b'2'
+    assert router._lookup(Request('https://a.test/cached.js')) is None
+    assert router._lookup(Request('https://a.test/failed.js')) is None
+    assert router._lookup(Request('https://a.test/form')) is None
+    assert router._lookup(Request('https://a.test/form', 'POST'))['body'] == b'ok'
+
+    report = router.report()
+    assert report['served'] == 5 and report['missing'] == 3
+    assert report['missingUrls'][0] == 'https://a.test/cached.js'
+
+
+def test_diff_results():
+    before = {'scores': {'seo': 90, 'accessibility': 100},
+              'breakdown': {'seo': [{'check': 'Title', 'status': 'pass'}, {'check': 'Canonical', 'status': 'fail'}]}}
+    after = {'scores': {'seo': 80, 'accessibility': 100},
+             'breakdown': {'seo': [{'check': 'Title', 'status': 'fail'}, {'check': 'Robots', 'status': 'pass'}]}}
+    assert diff_results(before, after, ('seo', 'accessibility')) == [
+        {'category': 'seo', 'check': None, 'before': 90, 'after': 80},
+        {'category': 'seo', 'check': 'Canonical', 'before': 'fail', 'after': None},
+        {'category': 'seo', 'check': 'Robots', 'before': None, 'after': 'pass'},
+        {'category': 'seo', 'check': 'Title', 'before': 'pass', 'after': 'fail'},
+    ]
+    assert diff_results(before, before) == []
+
+
+def test_importing_the_app_creates_no_archive_directory(tmp_path):
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    subprocess.run([sys.executable, '-c', 'import app'], cwd=tmp_path, check=True,
+                   env=dict(os.environ, PYTHONPATH=root))
+    assert not (tmp_path / 'archives').exists()
+
+
+def test_archive_endpoints_before_any_recording(client, monkeypatch, tmp_path):
+    import app as app_module
+    monkeypatch.setattr(app_module, 'ARCHIVE_DIR', str(tmp_path / 'archives'))
+    monkeypatch.setattr(app_module, '_archive_store', None)
+    response = client.get('/api/archives')
+    assert response.get_json()['archives'] == [] and response.get_json()['stats']['archives'] == 0
+    assert client.get('/api/archives/abc/har').status_code == 404
+    assert not (tmp_path / 'archives').exists()
+    assert app_module.get_archive_store().latest('https://a.test/') is None
+    assert (tmp_path / 'archives' / 'index.db').exists()
+
+
+def test_replay_cursors_name_the_pinned_cache_key(client):
+    from app import parse_options, shape_result
+    from cache import cache_key
+    from payload import decode_cursor
+    options = parse_options({'archive': 'replay', 'links': True})
+    result = {'url': 'https://a.test/', 'archive': {'mode': 'replay', 'id': 'abc'},
+              'links': ['https://a.test/%d' % index for index in range(5)]}
+    cursor = shape_result('https://a.test/', result, options, 2)['truncated']['links']['nextCursor']
+    assert decode_cursor(cursor)[0] == cache_key('https://a.test/', dict(options, archiveId='abc'))
+    assert decode_cursor(cursor)[0] != cache_key('https://a.test/', options)
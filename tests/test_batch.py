@@ -0,0 +1,55 @@
+import json
+
+import app as app_module
+
+
+def fake_result(url):
+    return {'url': url, 'timestamp': 'now', 'engine': 'static', 'profile': 'default', 'device': 'desktop',
+            'cached': False, 'ageSeconds': 0, 'scores': {'seo': 90},
+            'overview': {'images': [{'src': str(index)} for index in range(5)], 'totals': {'images': 5}}}
+
+
+def records(response):
+    return [json.loads(line) for line in response.get_data(as_text=True).splitlines()]
+
+
+def test_batch_records_are_shaped(client, monkeypatch):
+    monkeypatch.setattr(app_module, 'analyze_cached', lambda url, options: fake_result(url))
+    response = client.post('/api/batch', json={'urls': ['https://a.test/'], 'fields': ['overview'], 'limit': 2})
+    record = records(response)[0]
+    assert 'scores' not in record['result']
+    assert len(record['result']['overview']['images']) == 2
+    assert record['result']['truncated']['overview.images']['total'] == 5
+
+
+def test_text_batch_accepts_query_string_options(client, monkeypatch):
+    seen = []
+    monkeypatch.setattr(app_module, 'analyze_cached', lambda url, options: seen.append(options) or fake_result(url))
+    response = client.post('/api/batch?compact=true&coverage=false&runs=2&block=*.gif&block=*.png',
+                           data='https://a.test/\nhttps://b.test/', content_type='text/plain')
+    assert response.status_code == 200
+    assert len(records(response)) == 3
+    options = seen[0]
+    assert options['compact'] is True and options['coverage'] is False and options['runs'] == 2
+    assert options['block'] == ['*.gif', '*.png']
+
+
+def test_text_batch_rejects_bad_query_booleans(client):
+    response = client.post('/api/batch?compact=maybe', data='https://a.test/', content_type='text/plain')
+    assert response.status_code == 400
+
+
+def test_process_workers_are_spawned_not_forked(monkeypatch):
+    import batch
+    contexts = []
+
+    class Executor(batch.ThreadPoolExecutor):
+        def __init__(self, max_workers, initializer, mp_context):
+            contexts.append(mp_context.get_start_method())
+            super().__init__(max_workers)
+
+    monkeypatch.setattr(batch, 'ProcessPoolExecutor', Executor)
+    monkeypatch.setattr(batch, '_timed_in_process', lambda url, options: ({'url': url}, 0.1))
+    records = list(batch.run_batch(['https://a.test/'], None, workers=1, processes=True))
+    assert contexts == ['spawn']
+    assert records[-1]['summary'] == dict(records[-1]['summary'], succeeded=1, mode='processes')
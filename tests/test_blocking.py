@@ -0,0 +1,79 @@
+import pytest
+
+from blocking import MAX_BLOCK_PATTERNS, RequestBlocker, is_tracker, parse_block_patterns
+
+
+@pytest.mark.parametrize('host, expected', [
+    ('www.google-analytics.com', True),
+    ('google-analytics.com', True),
+    ('GOOGLETAGMANAGER.COM', True),
+    ('region1.analytics.google-analytics.com', True),
+    ('adservice.google.com', True),
+    ('google.com', False),
+    ('notgoogle-analytics.com', False),
+    ('com', False),
+    ('', False),
+    (None, False),
+])
+def test_is_tracker(host, expected):
+    assert is_tracker(host) is expected
+
+
+def test_parse_block_patterns():
+    assert parse_block_patterns(None) == []
+    assert parse_block_patterns('*.gif') == ['*.gif']
+    assert parse_block_patterns(['*.png', '*.gif', '*.png']) == ['*.gif', '*.png']
+    too_many = [f'*.{index}' for index in range(MAX_BLOCK_PATTERNS + 1)]
+    for value in (['*.gif', ''], [1], {'a': 1}, too_many):
+        with pytest.raises(ValueError):
+            parse_block_patterns(value)
+
+
+class Request:
+    def __init__(self, url, resource_type='script'):
+        self.url = url
+        self.resource_type = resource_type
+
+
+class Route:
+    def __init__(self, request):
+        self.request = request
+        self.outcome = None
+
+    def fallback(self):
+        self.outcome = 'fallback'
+
+    def abort(self, reason):
+        self.outcome = reason
+
+
+class Page:
+    def __init__(self):
+        self.routes = []
+
+    def route(self, pattern, handler):
+        self.routes.append(handler)
+
+
+def handle(blocker, url, resource_type='script'):
+    route = Route(Request(url, resource_type))
+    blocker.page.routes[0](route)
+    return route.outcome
+
+
+def test_full_profile_routes_nothing():
+    page = Page()
+    blocker = RequestBlocker(page)
+    assert page.routes == []
+    assert blocker.report()['representative'] is True
+
+
+def test_lite_profile_blocks_media_and_trackers():
+    blocker = RequestBlocker(Page(), 'lite', ['*/ads/*'])
+    assert handle(blocker, 'https://a.test/logo.png', 'image') == 'blockedbyclient'
+    assert handle(blocker, 'https://www.google-analytics.com/g.js') == 'blockedbyclient'
+    assert handle(blocker, 'https://a.test/ads/banner.js') == 'blockedbyclient'
+    assert handle(blocker, 'https://a.test/app.js') == 'fallback'
+    report = blocker.report()
+    assert report['blockedByReason'] == {'image': 1, 'tracker': 1, 'pattern': 1}
+    assert report['blockedRequests'] == 3 and report['representative'] is False
@@ -0,0 +1,85 @@
+import os
+import threading
+import time
+
+import pytest
+from playwright.sync_api import Error, sync_playwright
+
+from browser_pool import BrowserPool, PoolBusyError, processes_rss_mb
+
+
+@pytest.fixture(scope='module')
+def chromium():
+    with sync_playwright() as p:
+        try:
+            p.chromium.launch(headless=True).close()
+        except Error:
+            pytest.skip('Chromium is not installed (playwright install chromium)')
+
+
+@pytest.fixture
+def pool(chromium):
+    pool = BrowserPool(size=1, max_uses=2, max_queue=1, acquire_timeout=30)
+    yield pool
+    pool.shutdown()
+
+
+def test_every_analysis_gets_a_fresh_context(pool):
+    def analyze(context):
+        page = context.new_page()
+        page.set_content('<title>pooled</title>')
+        return page.title()
+
+    phases = []
+    assert pool.run(analyze, on_timing=lambda phase, seconds: phases.append(phase)) == 'pooled'
+    assert phases[0] == 'queue' and 'newContext' in phases
+    assert pool.run(lambda context: len(context.pages)) == 0
+
+
+def test_errors_propagate_and_browsers_are_recycled(pool):
+    with pytest.raises(ValueError):
+        pool.run(lambda context: int('not a number'))
+    pool.run(lambda context: None)
+    pool.run(lambda context: None)
+    counters = pool.stats()['counters']
+    assert counters['failed'] == 1 and counters['completed'] == 2
+    # max_uses=2: the browser is replaced after every second analysis
+    assert counters['recycles'] >= 1 and counters['launches'] >= 2
+
+
+def test_queue_is_bounded(pool):
+    release = threading.Event()
+    busy = threading.Thread(target=pool.run, args=(lambda context: release.wait(30),))
+    busy.start()
+    while pool.stats()['busy'] < 1:
+        time.sleep(0.01)
+    queued = threading.Thread(target=pool.run, args=(lambda context: None,))
+    queued.start()
+    while pool.stats()['queueDepth'] < 1:
+        time.sleep(0.01)
+    with pytest.raises(PoolBusyError):
+        pool.run(lambda context: None)
+    release.set()
+    busy.join()
+    queued.join()
+    assert pool.stats()['counters']['rejected'] == 1
+
+
+def test_acquire_timeout(pool):
+    release = threading.Event()
+    busy = threading.Thread(target=pool.run, args=(lambda context: release.wait(30),))
+    busy.start()
+    while pool.stats()['busy'] < 1:
+        time.sleep(0.01)
+    with pytest.raises(PoolBusyError):
+        pool.run(lambda context: None, timeout=0.05)
+    release.set()
+    busy.join()
+    stats = pool.stats()
+    assert stats['counters']['timedOut'] == 1 and stats['queueDepth'] == 0
+
+
+def test_processes_rss_mb_skips_missing_processes():
+    info = {'processInfo': [{'id': os.getpid()}, {'id': 2 ** 22 + 1}, {}]}
+    assert processes_rss_mb(info) > 0
+    assert processes_rss_mb({}) == 0
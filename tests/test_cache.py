@@ -0,0 +1,64 @@
+import sqlite3
+import time
+
+from cache import ResultCache, cache_key
+
+
+def rows(path):
+    db = sqlite3.connect(path)
+    try:
+        return [key for key, in db.execute('SELECT key FROM results ORDER BY key')]
+    finally:
+        db.close()
+
+
+def test_cache_key_ignores_cache_mode():
+    assert cache_key('https://example.com', {'cache': 'bypass', 'runs': 1}) == \
+        cache_key('https://example.com/', {'cache': 'prefer', 'runs': 1})
+
+
+def test_disk_tier_evicts_least_recently_used(tmp_path):
+    path = str(tmp_path / 'cache.db')
+    cache = ResultCache(db_path=path, db_max_entries=2)
+    cache.put('a', 'https://a.test', {'url': 'https://a.test'})
+    cache.put('b', 'https://b.test', {'url': 'https://b.test'})
+    # Reading a straight from disk makes b the least recently used row
+    cache._entries.clear()
+    cache._db.execute("UPDATE results SET last_used = last_used - 120 WHERE key = 'b'")
+    assert cache.get('a', 'https://a.test') is not None
+    cache.put('c', 'https://c.test', {'url': 'https://c.test'})
+    assert rows(path) == ['a', 'c']
+    assert cache.stats()['diskEvictions'] == 1
+
+
+def test_disk_tier_bounded_by_bytes(tmp_path):
+    path = str(tmp_path / 'cache.db')
+    cache = ResultCache(db_path=path, db_max_bytes=300)
+    for index in range(5):
+        cache.put(f'k{index}', 'https://a.test', {'url': 'https://a.test', 'body': str(index) * 400})
+    total, = cache._db.execute('SELECT SUM(size) FROM results').fetchone()
+    assert total <= 300
+    assert 'k4' in rows(path)
+
+
+def test_disk_tier_drops_expired_rows(tmp_path):
+    path = str(tmp_path / 'cache.db')
+    cache = ResultCache(ttl=10, max_stale=100, db_path=path)
+    cache.put('plain', 'https://a.test', {'url': 'https://a.test'})
+    cache.put('validated', 'https://b.test', {'url': 'https://b.test', 'document': {'etag': '"x"'}})
+    cache._db.execute('UPDATE results SET stored_at = ?', (time.time() - 50,))
+    cache.put('fresh', 'https://c.test', {'url': 'https://c.test'})
+    # Past the TTL only an entry with a validator is kept, for revalidation
+    assert rows(path) == ['fresh', 'validated']
+
+
+def test_old_databases_are_migrated(tmp_path):
+    path = str(tmp_path / 'cache.db')
+    db = sqlite3.connect(path)
+    db.execute("""CREATE TABLE results (key TEXT PRIMARY KEY, url TEXT NOT NULL, stored_at REAL NOT NULL,
+                  etag TEXT, last_modified TEXT, payload BLOB NOT NULL)""")
+    db.execute("INSERT INTO results VALUES ('old', 'https://a.test', ?, NULL, NULL, x'00')", (time.time(),))
+    db.commit()
+    db.close()
+    cache = ResultCache(db_path=path)
+    assert cache._db.execute("SELECT size, last_used IS NOT NULL FROM results").fetchone() == (1, 1)
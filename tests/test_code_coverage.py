@@ -0,0 +1,54 @@
+import random
+
+from code_coverage import unused_script_bytes, used_stylesheet_bytes
+
+
+def brute_force_unused(functions):
+    """Innermost range wins: paint ranges outermost first, then count unexecuted bytes"""
+    ranges = sorted((item['startOffset'], -item['endOffset'], item['count'])
+                    for function in functions for item in function['ranges'])
+    total = max(-negative_end for _, negative_end, _ in ranges)
+    counts = [None] * total
+    for start, negative_end, count in ranges:
+        for offset in range(start, -negative_end):
+            counts[offset] = count
+    return total, sum(1 for count in counts if count == 0)
+
+
+def nested_ranges(rng, start, end, depth):
+    ranges = [{'startOffset': start, 'endOffset': end, 'count': rng.choice([0, 0, 1, 3])}]
+    position = start
+    while depth and position < end - 2 and rng.random() < 0.7:
+        inner_start = rng.randint(position, end - 2)
+        inner_end = rng.randint(inner_start + 1, end)
+        ranges += nested_ranges(rng, inner_start, inner_end, depth - 1)
+        position = inner_end
+    return ranges
+
+
+def test_script_with_one_unexecuted_function():
+    functions = [
+        {'ranges': [{'startOffset': 0, 'endOffset': 100, 'count': 1}]},
+        {'ranges': [{'startOffset': 10, 'endOffset': 40, 'count': 0}]},
+        {'ranges': [{'startOffset': 50, 'endOffset': 90, 'count': 2},
+                    {'startOffset': 60, 'endOffset': 70, 'count': 0}]},
+    ]
+    assert unused_script_bytes(functions) == (100, 40)
+
+
+def test_unexecuted_script_is_all_unused():
+    assert unused_script_bytes([{'ranges': [{'startOffset': 0, 'endOffset': 64, 'count': 0}]}]) == (64, 64)
+
+
+def test_nested_ranges_match_brute_force():
+    rng = random.Random(7)
+    for _ in range(300):
+        ranges = nested_ranges(rng, 0, rng.randint(5, 400), 4)
+        # V8 reports each function's ranges separately; split them up like it does
+        functions = [{'ranges': ranges[index:index + 2]} for index in range(0, len(ranges), 2)]
+        assert unused_script_bytes(functions) == brute_force_unused(functions)
+
+
+def test_used_stylesheet_bytes_merges_overlaps():
+    assert used_stylesheet_bytes([]) == 0
+    assert used_stylesheet_bytes([(10, 20), (0, 5), (15, 30), (30, 35), (50, 60)]) == 5 + 25 + 10
@@ -0,0 +1,54 @@
+from crawl import BloomFilter, Frontier, run_crawl
+
+
+def test_frontier_is_fifo_and_deduplicated(tmp_path):
+    frontier = Frontier(str(tmp_path / 'frontier.db'))
+    assert frontier.add_many(['https://a.test/1', 'https://a.test/2', 'https://a.test/1'], 0) == 2
+    assert frontier.add_many(['https://a.test/2'], 1) == 0
+    assert frontier.pop() == ('https://a.test/1', 0)
+    assert frontier.pop() == ('https://a.test/2', 0)
+    assert frontier.pop() is None
+    frontier.close()
+
+
+def test_leased_urls_are_requeued_on_resume(tmp_path):
+    path = str(tmp_path / 'frontier.db')
+    frontier = Frontier(path)
+    frontier.add_many(['https://a.test/1', 'https://a.test/2', 'https://a.test/3'], 0)
+    frontier.pop()
+    frontier.done('https://a.test/1')
+    frontier.pop()
+    assert frontier.pending == 1 and frontier.leased == 1
+    frontier.close()
+
+    resumed = Frontier(path)
+    assert resumed.pending == 2
+    assert resumed.pop() == ('https://a.test/2', 0)
+    assert resumed.pop() == ('https://a.test/3', 0)
+    assert resumed.add_many(['https://a.test/1'], 0) == 0
+    resumed.close()
+
+
+def test_interrupted_crawl_resumes_pages_in_flight(tmp_path):
+    path = str(tmp_path / 'frontier.db')
+    pages = {'https://a.test/': ['https://a.test/x', 'https://a.test/y'], 'https://a.test/x': [], 'https://a.test/y': []}
+    runner = lambda url: {'url': url, 'links': list(pages[url]), 'scores': {}}
+
+    crawl = run_crawl('https://a.test/', runner, workers=1, delay=0, frontier_path=path)
+    assert next(crawl)['url'] == 'https://a.test/'
+    # Stopped with https://a.test/x's record handed over but not yet written
+    assert next(crawl)['url'] == 'https://a.test/x'
+    crawl.close()
+
+    resumed = [record for record in run_crawl('https://a.test/', runner, workers=1, delay=0, frontier_path=path)
+               if 'url' in record]
+    assert [record['url'] for record in resumed] == ['https://a.test/x', 'https://a.test/y']
+
+
+def test_bloom_filter_has_no_false_negatives_and_few_false_positives():
+    bloom = BloomFilter(10000, error_rate=0.01)
+    for index in range(10000):
+        bloom.add(b'in-%d' % index)
+    assert all(b'in-%d' % index in bloom for index in range(10000))
+    false_positives = sum(b'out-%d' % index in bloom for index in range(10000))
+    assert false_positives < 300
@@ -0,0 +1,56 @@
+import pytest
+
+from devices import (DEVICE_PROFILES, _throttle_commands, combine_devices, device_context_options, device_phases,
+                     parse_devices)
+from rules import evaluate
+
+
+def test_parse_devices():
+    assert parse_devices(None) == ['desktop']
+    assert parse_devices('mobile') == ['mobile']
+    assert parse_devices(['desktop', 'lowEndMobile']) == ['desktop', 'lowEndMobile']
+    for value in ('tablet', [], ['mobile', 'mobile'], [1]):
+        with pytest.raises(ValueError):
+            parse_devices(value)
+
+
+def test_context_options_merge_extra_options():
+    options = device_context_options('mobile', {'record_har_path': 'x.har'})
+    assert options['is_mobile'] is True and options['record_har_path'] == 'x.har'
+    assert 'record_har_path' not in DEVICE_PROFILES['mobile']['context']
+
+
+def test_throttling_commands():
+    assert _throttle_commands('desktop') == []
+    commands = dict(_throttle_commands('mobile'))
+    assert commands['Emulation.setCPUThrottlingRate'] == {'rate': 4}
+    conditions = commands['Network.emulateNetworkConditions']
+    assert conditions['latency'] == 562.5
+    assert conditions['downloadThroughput'] == pytest.approx(1474.6 * 1024 / 8)
+
+
+def test_device_phases_tag_events():
+    events = []
+    on_phase = device_phases(lambda name, data: events.append((name, data)), 'mobile')
+    on_phase('metrics', {'lcp': '1200ms'})
+    assert events == [('metrics', {'lcp': '1200ms', 'device': 'mobile'})]
+    assert device_phases(None, 'mobile') is None
+
+
+def test_phones_get_looser_timing_thresholds():
+    raw = {'lcp': 3000}
+    assert evaluate(raw, device='desktop')['scores']['performance'] < 100
+    assert evaluate(raw, device='mobile')['scores']['performance'] == 100
+
+
+def test_combine_devices():
+    results = {
+        'desktop': {'scores': {'performance': 95}, 'rawMetrics': {'lcp': 1200}, 'cached': True, 'ageSeconds': 10},
+        'mobile': {'scores': {'performance': 70}, 'rawMetrics': {'lcp': 3100}, 'cached': False, 'ageSeconds': 0},
+    }
+    report = combine_devices('https://a.test/', 'default', results)
+    assert report['devices'] is results
+    assert report['comparison']['scores'] == {'desktop': {'performance': 95}, 'mobile': {'performance': 70}}
+    assert report['comparison']['metrics']['lcp'] == {'desktop': 1200, 'mobile': 3100}
+    assert report['comparison']['metrics']['tbt'] == {'desktop': None, 'mobile': None}
+    assert report['cached'] is False and report['ageSeconds'] == 10
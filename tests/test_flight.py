@@ -0,0 +1,151 @@
+import asyncio
+import threading
+import time
+
+import pytest
+
+from flight import OriginBusyError, OriginLimiter, SingleFlight
+
+
+def test_followers_share_the_leaders_result():
+    flights = SingleFlight()
+    release = threading.Event()
+    calls = []
+
+    def work():
+        calls.append(1)
+        release.wait(5)
+        return {'score': 90}
+
+    outcomes = []
+    threads = [threading.Thread(target=lambda: outcomes.append(flights.do('key', work))) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    while flights.stats()['followers'] < 3:
+        time.sleep(0.01)
+    release.set()
+    for thread in threads:
+        thread.join()
+
+    assert len(calls) == 1
+    assert sorted(shared for _, shared in outcomes) == [False, True, True, True]
+    results = [result for result, _ in outcomes]
+    assert all(result == {'score': 90} for result in results)
+    # Each follower gets its own copy
+    assert len({id(result) for result in results}) == 4
+    assert flights.stats() == {'leaders': 1, 'followers': 3, 'inFlight': 0, 'hitRate': 0.75}
+
+
+def test_followers_get_the_leaders_error():
+    flights = SingleFlight()
+    started = threading.Event()
+    release = threading.Event()
+
+    def fail():
+        started.set()
+        release.wait(5)
+        raise RuntimeError('boom')
+
+    errors = []
+
+    def call():
+        try:
+            flights.do('key', fail)
+        except RuntimeError as e:
+            errors.append(str(e))
+
+    leader = threading.Thread(target=call)
+    leader.start()
+    started.wait(5)
+    follower = threading.Thread(target=call)
+    follower.start()
+    while flights.stats()['followers'] < 1:
+        time.sleep(0.01)
+    release.set()
+    leader.join()
+    follower.join()
+    assert errors == ['boom', 'boom']
+
+
+def test_finished_calls_are_not_remembered():
+    flights = SingleFlight()
+    assert flights.do('key', lambda: 1) == (1, False)
+    assert flights.do('key', lambda: 2) == (2, False)
+
+
+def test_async_follower_joins_a_thread_leader():
+    flights = SingleFlight()
+    release = threading.Event()
+    leader = threading.Thread(target=lambda: flights.do('key', lambda: release.wait(5) and 'done'))
+    leader.start()
+    while flights.stats()['inFlight'] < 1:
+        time.sleep(0.01)
+
+    async def follow():
+        async def never():
+            raise AssertionError('follower must not run')
+        task = asyncio.ensure_future(flights.do_async('key', never))
+        await asyncio.sleep(0.05)
+        release.set()
+        return await task
+
+    assert asyncio.run(follow()) == ('done', True)
+    leader.join()
+
+
+def test_origin_limiter_caps_concurrency_per_origin():
+    limiter = OriginLimiter(limit=2, timeout=5)
+    active = {'a': 0}
+    peak = {'a': 0}
+    lock = threading.Lock()
+
+    def analyze(origin):
+        with limiter.slot(origin):
+            with lock:
+                active[origin] = active.get(origin, 0) + 1
+                peak[origin] = max(peak.get(origin, 0), active[origin])
+            time.sleep(0.02)
+            with lock:
+                active[origin] -= 1
+
+    threads = [threading.Thread(target=analyze, args=(origin,)) for origin in ['a'] * 6 + ['b'] * 2]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert peak == {'a': 2, 'b': 2}
+    stats = limiter.stats()
+    assert stats['acquired'] == 8 and stats['waited'] >= 4
+    assert all(origin['active'] == 0 and origin['queued'] == 0 for origin in stats['origins'])
+
+
+def test_origin_limiter_serves_waiters_in_arrival_order():
+    limiter = OriginLimiter(limit=1, timeout=5)
+    order = []
+
+    def analyze(index):
+        with limiter.slot('a'):
+            order.append(index)
+
+    threads = []
+    with limiter.slot('a'):
+        for index in range(3):
+            threads.append(threading.Thread(target=analyze, args=(index,)))
+            threads[-1].start()
+            while len(limiter._origins['a']['waiters']) < index + 1:
+                time.sleep(0.01)
+    for thread in threads:
+        thread.join()
+    assert order == [0, 1, 2]
+
+
+def test_origin_limiter_times_out():
+    limiter = OriginLimiter(limit=1, timeout=0.05)
+    with limiter.slot('a'):
+        with pytest.raises(OriginBusyError):
+            with limiter.slot('a'):
+                pass
+    assert limiter.stats()['timedOut'] == 1
+    # The abandoned ticket left the queue, so the origin is free again
+    with limiter.slot('a') as waited:
+        assert waited < 0.05
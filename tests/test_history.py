@@ -0,0 +1,49 @@
+import pytest
+
+from history import HistoryStore, mann_whitney_p
+
+
+def test_mann_whitney_separated_samples():
+    # U = 0, variance 22.92: z = (12.5 - 0.5) / 4.787
+    assert mann_whitney_p([1, 2, 3, 4, 5], [6, 7, 8, 9, 10]) == pytest.approx(0.01219, abs=1e-4)
+
+
+def test_mann_whitney_is_symmetric_and_handles_ties():
+    a, b = [1, 2, 2, 3, 3, 3, 4], [3, 4, 4, 5, 5, 6]
+    assert mann_whitney_p(a, b) == pytest.approx(mann_whitney_p(b, a))
+    # U = 3.5, tie-corrected variance 46.85: z = (17.5 - 0.5) / 6.844
+    assert mann_whitney_p(a, b) == pytest.approx(0.0130, abs=1e-4)
+
+
+def test_mann_whitney_identical_samples():
+    assert mann_whitney_p([5, 5, 5], [5, 5, 5]) == 1.0
+    assert mann_whitney_p([1, 2, 3], [1, 2, 3]) == 1.0
+
+
+def test_regressions_flag_only_significant_worsening(tmp_path):
+    store = HistoryStore(str(tmp_path / 'history.db'))
+    now = 1_000_000.0
+    for index in range(20):
+        ts = now - 10 * 86400 + index * 3600
+        store.record({'url': 'https://a.test/', 'rawMetrics': {'ttfb': 200 + index % 3, 'lcp': 2000 + index % 5},
+                      'scores': {'performance': 90}}, ts=ts)
+    for index in range(10):
+        ts = now - 3600 * (index + 1)
+        store.record({'url': 'https://a.test', 'rawMetrics': {'ttfb': 400 + index % 3, 'lcp': 1500 + index % 5},
+                      'scores': {'performance': 90}}, ts=ts)
+    findings = {finding['metric']: finding for finding in store.regressions('https://a.test/', 86400, 14 * 86400, now=now)}
+    assert findings['ttfb']['regression'] is True
+    # Faster LCP is a significant change, but not a regression
+    assert findings['lcp']['pValue'] < 0.01 and findings['lcp']['regression'] is False
+    assert findings['performance']['regression'] is False
+
+
+def test_store_creates_its_file_on_the_first_write(tmp_path):
+    path = tmp_path / 'history.db'
+    store = HistoryStore(str(path))
+    assert store.summary('https://a.test/', 'lcp', 0) == {'metric': 'lcp', 'count': 0}
+    assert store.recent_urls(0) == [] and store.regressions('https://a.test/', 60, 60) == []
+    assert not path.exists()
+    store.record({'url': 'https://a.test/', 'rawMetrics': {'lcp': 1200}})
+    assert path.exists()
+    assert HistoryStore(str(path)).summary('https://a.test/', 'lcp', 0)['count'] == 1
@@ -0,0 +1,94 @@
+import json
+import threading
+import time
+
+import pytest
+
+import app as app_module
+from jobs import JobManager, JobQueueFull
+
+
+def fake_runner(url, options, on_phase=None):
+    on_phase('overview', {'internalLinks': 3, 'totals': {'images': 5}})
+    return {'url': url, 'timestamp': 'now', 'cached': False, 'scores': {'seo': 90},
+            'overview': {'images': [{'src': str(index)} for index in range(5)], 'totals': {'images': 5}},
+            'network': {'uncached': ['https://a.test/%d.js' % index for index in range(5)]}}
+
+
+def wait_for(client, job_id):
+    for _ in range(100):
+        job = client.get(f'/api/jobs/{job_id}').get_json()
+        if job['status'] in ('done', 'failed'):
+            return job
+        time.sleep(0.02)
+    raise AssertionError('job did not finish')
+
+
+def test_job_result_and_done_event_are_shaped(client, monkeypatch):
+    monkeypatch.setattr(app_module.job_manager, 'runner', fake_runner)
+    response = client.post('/api/jobs', json={'url': 'https://a.test/', 'fields': ['overview', 'network'],
+                                              'limit': 2})
+    job = wait_for(client, response.get_json()['id'])
+    assert job['status'] == 'done'
+    assert 'scores' not in job['result']
+    assert len(job['result']['overview']['images']) == 2
+    assert job['result']['truncated']['network.uncached']['total'] == 5
+    assert job['phases']['overview'] == {'internalLinks': 3, 'totals': {'images': 5}}
+
+    stream = client.get(f"/api/jobs/{job['id']}/events").get_data(as_text=True)
+    done = [block for block in stream.split('\n\n') if block.startswith('event: done')][0]
+    assert json.loads(done.split('data: ', 1)[1]) == job['result']
+
+
+def test_job_rejects_a_bad_limit(client):
+    assert client.post('/api/jobs', json={'url': 'https://a.test/', 'limit': 0}).status_code == 400
+
+
+def test_job_queue_is_bounded():
+    release = threading.Event()
+    manager = JobManager(lambda url, options, on_phase=None: release.wait(5), concurrency=1, max_pending=1)
+    running = manager.submit('https://a.test/1')
+    while manager.get(running['id'])['status'] != 'running':
+        time.sleep(0.01)
+    manager.submit('https://a.test/2')
+    with pytest.raises(JobQueueFull):
+        manager.submit('https://a.test/3')
+    assert manager.stats()['jobs'] == {'running': 1, 'queued': 1}
+    release.set()
+
+
+def test_events_arrive_in_order_and_replay_for_late_subscribers():
+
+    def runner(url, options, on_phase=None):
+        on_phase('navigation', {'status': 200})
+        on_phase('metrics', {'lcp': '1200ms'})
+        return {'url': url}
+
+    manager = JobManager(runner)
+    job = manager.submit('https://a.test/')
+    live = [name for name, _ in filter(None, manager.stream(job['id']))]
+    late = list(manager.stream(job['id']))
+    assert live == ['status', 'status', 'navigation', 'metrics', 'done']
+    assert [name for name, _ in late] == live
+    assert late[-1][1] == {'url': 'https://a.test/'}
+    assert manager.get(job['id'])['phases'] == {'navigation': {'status': 200}, 'metrics': {'lcp': '1200ms'}}
+
+
+def test_failed_jobs_report_their_error():
+
+    def runner(url, options, on_phase=None):
+        raise RuntimeError('navigation timeout')
+
+    manager = JobManager(runner)
+    job = manager.submit('https://a.test/')
+    assert list(manager.stream(job['id']))[-1] == ('failed', {'error': 'navigation timeout'})
+    assert manager.get(job['id'])['error'] == 'navigation timeout'
+
+
+def test_finished_jobs_expire_after_retention():
+    manager = JobManager(lambda url, options, on_phase=None: {}, retention=0.05)
+    job = manager.submit('https://a.test/')
+    list(manager.stream(job['id']))
+    time.sleep(0.1)
+    manager.submit('https://a.test/other')
+    assert manager.get(job['id']) is None
@@ -0,0 +1,42 @@
+import pytest
+
+from monitor import BreachStore, check_budget, parse_budget, parse_config, run_monitor
+
+
+def test_parse_budget_rejects_unknown_metrics():
+    with pytest.raises(ValueError):
+        parse_budget({'lcpp': 1})
+    with pytest.raises(ValueError):
+        parse_budget({'scores': {'speed': 90}})
+    assert parse_budget({'lcp': 2500, 'scores': {'seo': 90}}) == {'lcp': 2500, 'scores': {'seo': 90}}
+
+
+def test_check_budget_skips_missing_metrics():
+    result = {'rawMetrics': {'lcp': 3000, 'ttfb': None}, 'scores': {'performance': None, 'seo': 80}}
+    budget = parse_budget({'lcp': 2500, 'ttfb': 100, 'scores': {'performance': 90, 'seo': 90}})
+    assert check_budget(result, budget) == [
+        {'metric': 'lcp', 'kind': 'max', 'limit': 2500, 'value': 3000},
+        {'metric': 'seo', 'kind': 'minScore', 'limit': 90, 'value': 80},
+    ]
+
+
+def test_breach_store_round_trip(tmp_path):
+    store = BreachStore(str(tmp_path / 'monitor.db'))
+    monitor = {'url': 'https://Example.com', 'options': {'device': 'desktop'}, 'budget': {'lcp': 1}}
+    store.record(run_monitor(monitor, lambda url, options: {'rawMetrics': {'lcp': 5}, 'scores': {}}))
+    breaches = store.breaches(0, 'https://example.com/')
+    assert [(breach['metric'], breach['value']) for breach in breaches] == [('lcp', 5)]
+    assert store.summary(0)[0]['failed'] == 1
+
+
+def test_app_does_not_open_monitor_db_unless_configured(client):
+    import app
+    assert app.breach_store is None
+    assert client.get('/api/monitors/breaches').status_code == 404
+
+
+def test_monitors_always_bypass_the_cache():
+    from app import parse_options
+    config = parse_config({'monitors': [{'url': 'https://a.test/', 'options': {'cache': 'refresh'}}]}, parse_options)
+    options = config['monitors'][0]['options']
+    assert options['cache'] == 'bypass' and not options['screenshot']
@@ -0,0 +1,66 @@
+import pytest
+
+from payload import (DEFAULT_LIMIT, collector_sections, decode_cursor, encode_cursor, list_page, parse_fields,
+                     parse_limit, shape)
+
+RESULT = {
+    'url': 'https://a.test/', 'timestamp': 'now', 'cached': False, 'scores': {'seo': 90},
+    'overview': {'images': list(range(7)), 'metaTags': list(range(3)), 'totals': {'images': 12}},
+    'links': ['https://a.test/%d' % index for index in range(5)],
+}
+
+
+def test_parse_fields_and_limit():
+    assert parse_fields('scores, overview,scores') == ['overview', 'scores']
+    with pytest.raises(ValueError):
+        parse_fields(['nope'])
+    assert parse_limit(None) == DEFAULT_LIMIT
+    assert parse_limit('5') == 5
+    with pytest.raises(ValueError):
+        parse_limit(0)
+
+
+def test_collector_sections():
+    assert collector_sections(None) == ['performance', 'vitals', 'metaChecks', 'altData', 'scriptTiming',
+                                        'pageInfo', 'overview']
+    assert collector_sections(None, links=True) is None
+    assert 'overview' not in collector_sections(['scores'])
+
+
+def test_cursor_round_trip():
+    cursor = encode_cursor('key', 'https://a.test/', 'overview.images', 3, 2)
+    assert '=' not in cursor
+    assert decode_cursor(cursor) == ('key', 'https://a.test/', 'overview.images', 3, 2)
+
+
+@pytest.mark.parametrize('cursor', ['', 'not-base64!', encode_cursor('k', 'u', 'scores', 0, 2),
+                                    encode_cursor('k', 'u', 'links', -1, 2)])
+def test_bad_cursors(cursor):
+    with pytest.raises(ValueError):
+        decode_cursor(cursor)
+
+
+def test_shape_projects_and_truncates_without_touching_the_result():
+    shaped = shape(RESULT, ['overview'], limit=3, key='key')
+    assert set(shaped) == {'url', 'timestamp', 'cached', 'overview', 'truncated'}
+    assert shaped['overview']['images'] == [0, 1, 2]
+    assert RESULT['overview']['images'] == list(range(7))
+    truncated = shaped['truncated']['overview.images']
+    # The collector's own total wins over the length of the list it kept
+    assert truncated['total'] == 12 and truncated['returned'] == 3
+    assert 'overview.metaTags' not in shaped['truncated']
+
+
+def test_paging_through_a_list_with_cursors():
+    cursor = shape(RESULT, None, limit=2, key='key')['truncated']['links']['nextCursor']
+    seen = RESULT['links'][:2]
+    while cursor:
+        key, url, path, offset, limit = decode_cursor(cursor)
+        page = list_page(RESULT, path, offset, limit, key)
+        seen += page['items']
+        cursor = page['nextCursor']
+    assert seen == RESULT['links']
+
+
+def test_no_cursor_without_a_cache_key():
+    assert shape(RESULT, None, limit=2)['truncated']['links']['nextCursor'] is None
@@ -0,0 +1,53 @@
+import pytest
+
+from rules import compile_rules, evaluate
+
+
+def checks(evaluation, category):
+    return {item['check'] for item in evaluation['breakdown'][category]}
+
+
+def test_partial_payload_skips_checks_it_cannot_support():
+    evaluation = evaluate({'ttfb': 900})
+    assert 'Time to First Byte (TTFB)' in checks(evaluation, 'performance')
+    assert evaluation['scores']['seo'] == 100
+
+
+def test_message_fields_are_required():
+    requires = {rule['id']: set(rule['requires']) for rule in compile_rules()}
+    assert 'longTasks' in requires['tbt']
+    assert 'thirdPartyRequests' in requires['thirdPartyWeight']
+    assert 'renderBlockingCount' in requires['renderBlocking']
+    assert 'unusedJsPercent' in requires['unusedJavascript']
+    assert 'unusedCssPercent' in requires['unusedCss']
+
+
+@pytest.mark.parametrize('raw', [
+    {'tbt': 500}, {'thirdPartyKb': 900}, {'renderBlockingMs': 500}, {'unusedJsKb': 100}, {'unusedCssKb': 100}
+])
+def test_rescore_partial_payload(client, raw):
+    response = client.post('/api/rescore', json={'rawMetrics': raw})
+    assert response.status_code == 200
+    assert response.get_json()['scores']['performance'] == 100
+
+
+def test_rescore_full_payload_formats_messages(client):
+    response = client.post('/api/rescore', json={'rawMetrics': {'tbt': 500, 'longTasks': 4}})
+    assert response.status_code == 200
+    result = response.get_json()
+    assert result['scores']['performance'] < 100
+    assert any(issue['description'].startswith('4 long tasks') for issue in result['issues'])
+
+
+def test_rescore_rejects_non_numeric_metrics(client):
+    response = client.post('/api/rescore', json={'rawMetrics': {'ttfb': '700'}})
+    assert response.status_code == 400
+    assert 'ttfb' in response.get_json()['error']
+
+
+def test_rescore_batch_reports_bad_payloads_individually(client):
+    response = client.post('/api/rescore', json={'rawMetrics': [{'ttfb': 700}, {'ttfb': [1]}, {'viewport': False}]})
+    assert response.status_code == 200
+    good, bad, flag = response.get_json()
+    assert 'scores' in good and 'scores' in flag
+    assert bad == {'error': 'rawMetrics must be numbers or booleans: ttfb'}
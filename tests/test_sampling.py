@@ -0,0 +1,58 @@
+import pytest
+
+from sampling import aggregate, run_samples, summarize
+
+
+def test_summarize():
+    stats = summarize([300, 100, 200, 1000])
+    assert stats['median'] == 250
+    assert stats['p90'] == 1000 and stats['min'] == 100 and stats['max'] == 1000
+    assert stats['stddev'] == pytest.approx(408.2483, abs=1e-4)
+    # Values stay in run order
+    assert stats['values'] == [300, 100, 200, 1000]
+
+
+def test_summarize_single_run_has_no_spread():
+    assert summarize([42.123456]) == {'median': 42.1235, 'p90': 42.1235, 'min': 42.1235, 'max': 42.1235,
+                                      'stddev': 0.0, 'values': [42.1235]}
+
+
+def test_aggregate_medians_skip_missing_values():
+    samples = [{'lcp': 1200, 'ttfb': 90, 'inp': None}, {'lcp': 1500, 'ttfb': 110}, {'lcp': 900, 'ttfb': None}]
+    stats, medians = aggregate(samples)
+    assert medians == {'lcp': 1200, 'ttfb': 100}
+    assert stats['ttfb']['values'] == [90, 110]
+    assert 'inp' not in stats
+
+
+class Context:
+    def __init__(self, log, name='first'):
+        self.log = log
+        self.name = name
+        self.browser = self
+
+    def new_context(self, **options):
+        self.log.append(('context', options))
+        return Context(self.log, 'extra')
+
+    def new_page(self):
+        return self.name
+
+    def close(self):
+        self.log.append(('close', self.name))
+
+
+def test_cold_runs_use_a_fresh_context_each():
+    log = []
+    samples = run_samples(Context(log), 3, 'cold', lambda page, index, last: (page, index, last),
+                          {'viewport': {'width': 390, 'height': 844}})
+    assert samples == [('first', 0, False), ('extra', 1, False), ('extra', 2, True)]
+    assert log == [('context', {'viewport': {'width': 390, 'height': 844}}), ('close', 'extra')] * 2
+
+
+def test_warm_runs_discard_the_priming_load():
+    log = []
+    seen = []
+    samples = run_samples(Context(log), 2, 'warm', lambda page, index, last: seen.append(index) or index)
+    assert seen == [None, 0, 1] and samples == [0, 1]
+    assert log == []
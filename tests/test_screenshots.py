@@ -0,0 +1,95 @@
+import asyncio
+import base64
+import os
+
+from screenshots import ScreenshotStore, parse_screenshot_option
+
+IMAGE = b'\x89PNG fake image bytes'
+
+
+class FakeSession:
+    def send(self, method, params):
+        assert method == 'Page.captureScreenshot'
+        return {'data': base64.b64encode(IMAGE).decode()}
+
+    def detach(self):
+        pass
+
+
+class FakeAsyncSession(FakeSession):
+    async def send(self, method, params):
+        return FakeSession.send(self, method, params)
+
+    async def detach(self):
+        pass
+
+
+class FakeContext:
+    def __init__(self, session):
+        self.session = session
+
+    def new_cdp_session(self, page):
+        return self.session
+
+
+class FakeAsyncContext(FakeContext):
+    async def new_cdp_session(self, page):
+        return self.session
+
+
+class FakePage:
+    viewport_size = {'width': 1280, 'height': 720}
+
+    def __init__(self, context):
+        self.context = context
+
+
+def test_capture_url_is_only_handed_out_once_written(tmp_path):
+    store = ScreenshotStore(directory=str(tmp_path))
+    url = store.capture(FakePage(FakeContext(FakeSession())), parse_screenshot_option('png')).result()
+    assert url.endswith('.png')
+    path = os.path.join(str(tmp_path), os.path.basename(url))
+    with open(path, 'rb') as f:
+        assert f.read() == IMAGE
+
+
+def test_identical_captures_share_one_file(tmp_path):
+    store = ScreenshotStore(directory=str(tmp_path))
+    settings = parse_screenshot_option('png')
+    page = FakePage(FakeContext(FakeSession()))
+    assert store.capture(page, settings).result() == store.capture(page, settings).result()
+    assert len(os.listdir(str(tmp_path))) == 1
+
+
+def test_capture_async(tmp_path):
+    store = ScreenshotStore(directory=str(tmp_path))
+    page = FakePage(FakeAsyncContext(FakeAsyncSession()))
+
+    async def capture():
+        written = await store.capture_async(page, parse_screenshot_option({'format': 'jpeg', 'width': 320}))
+        return await asyncio.wrap_future(written)
+
+    url = asyncio.run(capture())
+    assert os.path.exists(os.path.join(str(tmp_path), os.path.basename(url)))
+
+
+def test_failed_write_yields_no_url(tmp_path):
+    store = ScreenshotStore(directory=str(tmp_path))
+    store.directory = str(tmp_path / 'missing')
+    assert store.capture(FakePage(FakeContext(FakeSession())), parse_screenshot_option('png')).result() is None
+
+
+def test_cache_hits_drop_screenshots_retention_deleted(tmp_path, monkeypatch):
+    import app as app_module
+    from telemetry import Timings
+    store = ScreenshotStore(str(tmp_path))
+    monkeypatch.setattr(app_module, 'screenshot_store', store)
+    url = store.capture(FakePage(FakeContext(FakeSession())), parse_screenshot_option(None)).result()
+    assert store.exists(url)
+    result = app_module.cached_result(({'url': 'https://a.test/', 'screenshot': url}, 5), Timings())
+    assert result['screenshot'] == url
+    store.max_bytes = 0
+    store.sweep()
+    assert not store.exists(url)
+    result = app_module.cached_result(({'url': 'https://a.test/', 'screenshot': url}, 5), Timings())
+    assert result['screenshot'] is None
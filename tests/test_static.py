@@ -0,0 +1,54 @@
+from static import MarkupParser
+
+PAGE = """<html lang="en"><head><title> Shop </title>
+<meta name="description" content="Things"><meta property="og:image" content="/a.png">
+<link rel="stylesheet" href="/a.css"><link rel="stylesheet" href="/b.css"><link rel="stylesheet" href="/c.css">
+<script src="/a.js" defer></script><script src="/b.js"></script><script>inline()</script>
+</head><body><h1>Hello <b>there</b></h1>
+<img src="1.png"><img src="2.png" alt="two"><img src="3.png" loading="lazy">
+<a href="/next">next</a><a href="https://other.test/">away</a><a href="/skip" rel="nofollow">skip</a>
+</body></html>"""
+
+
+def parse(sections=None, limit=1000):
+    parser = MarkupParser('https://shop.test/', sections, limit)
+    parser.feed(PAGE)
+    parser.close()
+    return parser
+
+
+def test_sections_match_collector_shape():
+    data = parse().sections('utf-8')
+    assert data['pageInfo']['title'] == 'Shop'
+    assert data['pageInfo']['h1'] == 'Hello there'
+    assert data['altData'] == {'total': 3, 'missing': 2}
+    assert data['metaChecks']['ogImage'] is True
+    assert data['links'] == ['https://shop.test/next']
+    assert data['overview']['links'] == {'total': 3, 'internal': 2, 'external': 1}
+
+
+def test_lists_are_capped_with_totals():
+    overview = parse(limit=2).sections('utf-8')['overview']
+    assert [css['href'] for css in overview['cssFiles']] == ['https://shop.test/a.css', 'https://shop.test/b.css']
+    assert len(overview['images']) == 2
+    assert overview['totals'] == {'cssFiles': 3, 'jsFiles': 2, 'images': 3, 'metaTags': 2, 'ogTags': 1,
+                                  'twitterTags': 0}
+    # Counts that feed scoring still see every element
+    assert parse(limit=2).sections('utf-8')['altData']['total'] == 3
+
+
+def test_projection_skips_sections_and_lists():
+    parser = parse(['performance', 'vitals', 'metaChecks', 'altData', 'scriptTiming'])
+    data = parser.sections('utf-8')
+    assert set(data) == {'metaChecks', 'altData'}
+    assert parser.images == [] and parser.links == set()
+    assert parser.totals['images'] == 3
+
+
+def test_concurrent_callers_share_one_session(monkeypatch):
+    import static
+    from concurrent.futures import ThreadPoolExecutor
+    monkeypatch.setattr(static, '_session', None)
+    with ThreadPoolExecutor(max_workers=16) as executor:
+        sessions = list(executor.map(lambda _: static.get_session(), range(64)))
+    assert len({id(session) for session in sessions}) == 1
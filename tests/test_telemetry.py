@@ -0,0 +1,68 @@
+from telemetry import Counter, Gauge, Histogram, Registry, Timings, PHASE_SECONDS
+
+
+def test_counter_and_gauge_render():
+    counter = Counter('analyzer_things_total', 'Things', ('result',))
+    counter.inc(result='ok')
+    counter.inc(2, result='ok')
+    counter.inc(result='fail "quoted"\n')
+    assert counter.render() == [
+        '# HELP analyzer_things_total Things',
+        '# TYPE analyzer_things_total counter',
+        'analyzer_things_total{result="fail \\"quoted\\"\\n"} 1',
+        'analyzer_things_total{result="ok"} 3',
+    ]
+    gauge = Gauge('analyzer_busy', 'Busy')
+    gauge.inc(3)
+    gauge.dec()
+    assert gauge.render()[-1] == 'analyzer_busy 2'
+    gauge.set(0.5)
+    assert gauge.render()[-1] == 'analyzer_busy 0.5'
+
+
+def test_histogram_buckets_are_cumulative():
+    histogram = Histogram('analyzer_phase_seconds', 'Phases', ('phase',), buckets=(0.1, 1))
+    for value in (0.05, 0.5, 0.7, 3):
+        histogram.observe(value, phase='goto')
+    assert histogram.render()[2:] == [
+        'analyzer_phase_seconds_bucket{phase="goto",le="0.1"} 1',
+        'analyzer_phase_seconds_bucket{phase="goto",le="1"} 3',
+        'analyzer_phase_seconds_bucket{phase="goto",le="+Inf"} 4',
+        'analyzer_phase_seconds_sum{phase="goto"} 4.25',
+        'analyzer_phase_seconds_count{phase="goto"} 4',
+    ]
+
+
+def test_registry_renders_collectors_and_survives_their_errors():
+    registry = Registry()
+    registry.register(Counter('analyzer_a_total', 'A')).inc()
+
+    def broken():
+        raise RuntimeError('no pool')
+
+    registry.collectors.append(broken)
+    registry.collectors.append(lambda: [('analyzer_pool_busy', 'gauge', 'Busy', [({'slot': 0}, 1), ({'slot': 1}, 0)])])
+    assert registry.render() == '\n'.join([
+        '# HELP analyzer_a_total A', '# TYPE analyzer_a_total counter', 'analyzer_a_total 1',
+        '# HELP analyzer_pool_busy Busy', '# TYPE analyzer_pool_busy gauge',
+        'analyzer_pool_busy{slot="0"} 1', 'analyzer_pool_busy{slot="1"} 0',
+    ]) + '\n'
+
+
+def test_timings_accumulate_repeated_phases():
+    timings = Timings()
+    before = PHASE_SECONDS.render()
+    timings.add('goto', 0.25)
+    timings.add('goto', 0.5)
+    with timings.span('collect'):
+        pass
+    report = timings.report()
+    assert report['phases']['goto'] == 750.0 and 'collect' in report['phases']
+    assert PHASE_SECONDS.render() != before
+
+
+def test_metrics_endpoint(client):
+    response = client.get('/metrics')
+    assert response.status_code == 200
+    assert response.mimetype == 'text/plain'
+    assert '# TYPE analyzer_phase_seconds histogram' in response.get_data(as_text=True)
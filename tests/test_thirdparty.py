@@ -0,0 +1,69 @@
+import pytest
+
+from thirdparty import SuffixTrie, entity_of, get_suffix_trie, summarize_third_parties
+
+RULES = ['com', 'uk', 'co.uk', 'jp', '*.kawasaki.jp', '!city.kawasaki.jp', 'github.io', 'рф']
+
+
+@pytest.mark.parametrize('host, expected', [
+    ('www.example.com', 'example.com'),
+    ('example.com', 'example.com'),
+    ('com', 'com'),
+    ('a.b.example.co.uk', 'example.co.uk'),
+    ('co.uk', 'co.uk'),
+    # Wildcard: every label under kawasaki.jp is a suffix...
+    ('www.shop.foo.kawasaki.jp', 'shop.foo.kawasaki.jp'),
+    # ...except the exception rule, which is registrable itself
+    ('www.city.kawasaki.jp', 'city.kawasaki.jp'),
+    # Private section: each github.io user is a separate site
+    ('docs.user.github.io', 'user.github.io'),
+    # IDN rules match the punycode hosts browsers report
+    ('www.xn--e1afmkfd.xn--p1ai', 'xn--e1afmkfd.xn--p1ai'),
+    # Unlisted TLDs fall back to the implicit '*' rule
+    ('cdn.example.invalidtld', 'example.invalidtld'),
+    ('192.168.0.1', '192.168.0.1'),
+    ('WWW.Example.COM.', 'example.com'),
+])
+def test_registrable_domain(host, expected):
+    assert SuffixTrie(RULES).registrable_domain(host) == expected
+
+
+@pytest.mark.parametrize('host, expected', [
+    ('www.bbc.co.uk', 'bbc.co.uk'),
+    ('d1234.cloudfront.net', 'd1234.cloudfront.net'),
+    ('fonts.googleapis.com', 'fonts.googleapis.com'),
+    ('www.google-analytics.com', 'google-analytics.com'),
+])
+def test_bundled_list(host, expected):
+    assert get_suffix_trie().registrable_domain(host) == expected
+
+
+def test_entity_of_falls_back_for_providers_on_public_suffixes():
+    assert entity_of('d1234.cloudfront.net') == entity_of('cloudfront.net')
+    assert entity_of('cloudfront.net') is not None
+    assert entity_of('example.com') is None
+
+
+def test_summarize_third_parties():
+    network = {'requests': [
+        {'url': 'https://www.shop.test/', 'transferBytes': 1000},
+        {'url': 'https://cdn.shop.test/app.js', 'transferBytes': 500},
+        {'url': 'https://www.google-analytics.com/analytics.js', 'transferBytes': 300},
+        {'url': 'https://tracker.example/pixel.gif', 'transferBytes': 50},
+        {'url': 'https://tracker.example/b.gif', 'transferBytes': 50},
+    ]}
+    timing = {'supported': True, 'scripts': [
+        ['https://www.google-analytics.com/analytics.js', 120, 40],
+        ['https://cdn.shop.test/app.js', 300, 200],
+    ]}
+    summary = summarize_third_parties('https://www.shop.test/', network, timing)
+    assert summary['firstParty'] == 'shop.test'
+    assert summary['requests'] == 3 and summary['transferBytes'] == 400
+    assert summary['blockingMs'] == 40 and summary['scriptMs'] == 120
+    assert [entry['domain'] for entry in summary['domains']] == ['google-analytics.com', 'tracker.example']
+    assert summary['totals'] == {'domains': 2, 'entities': 2}
+
+
+def test_summarize_without_long_animation_frames():
+    summary = summarize_third_parties('https://a.test/', {'requests': []}, {'supported': False, 'scripts': []})
+    assert summary['scriptMs'] is None and summary['blockingMs'] is None and summary['scriptTiming'] is None
@@ -0,0 +1,31 @@
+import pytest
+
+from urls import normalize_url, origin_of
+
+
+@pytest.mark.parametrize('url, expected', [
+    ('HTTP://Example.COM', 'http://example.com/'),
+    ('https://example.com:443/a?b=2&a=1#top', 'https://example.com/a?a=1&b=2'),
+    ('http://example.com:8080/', 'http://example.com:8080/'),
+    ('http://user:pw@example.com/', 'http://user:pw@example.com/'),
+    ('http://[::1]:8080/x', 'http://[::1]:8080/x'),
+    ('https://[2001:DB8::1]/', 'https://[2001:db8::1]/'),
+])
+def test_normalize_url(url, expected):
+    assert normalize_url(url) == expected
+
+
+def test_origin_of_keeps_ipv6_brackets():
+    assert origin_of('http://[::1]:80/path') == 'http://[::1]'
+    assert origin_of('http://[::1]:8080/path') == 'http://[::1]:8080'
+
+
+@pytest.mark.parametrize('url', ['http://a:abc/', 'http://a:99999/'])
+def test_malformed_port_raises(url):
+    with pytest.raises(ValueError):
+        normalize_url(url)
+
+
+def test_analyze_rejects_malformed_port(client):
+    response = client.post('/api/analyze', json={'url': 'http://a:abc/'})
+    assert response.status_code == 400
@@ -0,0 +1,264 @@
+import ipaddress
+import os
+import threading
+from urllib.parse import urlparse
+
+# Bundled copy of https://publicsuffix.org/list/public_suffix_list.dat (ICANN
+# and private sections); point ANALYZER_PSL_PATH at a fresher copy to update it
+PSL_PATH = os.environ.get('ANALYZER_PSL_PATH',
+                          os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data', 'public_suffix_list.dat'))
+
+# Known providers by registrable domain (as the suffix list yields it). A
+# page's own entity counts as first party, so google.com loading gstatic.com
+# isn't third-party code.
+ENTITIES = (
+    ('Google Analytics', 'analytics', ('google-analytics.com',)),
+    ('Google Tag Manager', 'tag-manager', ('googletagmanager.com',)),
+    ('Google', 'utility', ('google.com', 'gstatic.com', 'googleapis.com', 'googleusercontent.com', 'google.co.uk')),
+    ('Google Ads', 'ad', ('doubleclick.net', 'googlesyndication.com', 'googleadservices.com',
+                          'googletagservices.com')),
+    ('YouTube', 'video', ('youtube.com', 'ytimg.com', 'youtube-nocookie.com', 'googlevideo.com')),
+    ('Facebook', 'social', ('facebook.com', 'facebook.net', 'fbcdn.net', 'instagram.com', 'cdninstagram.com')),
+    ('X (Twitter)', 'social', ('twitter.com', 'twimg.com', 'x.com', 'ads-twitter.com', 't.co')),
+    ('LinkedIn', 'social', ('linkedin.com', 'licdn.com')),
+    ('TikTok', 'social', ('tiktok.com', 'tiktokcdn.com', 'ttwstatic.com')),
+    ('Pinterest', 'social', ('pinterest.com', 'pinimg.com')),
+    ('Microsoft Clarity', 'analytics', ('clarity.ms',)),
+    ('Microsoft Advertising', 'ad', ('bing.com',)),
+    ('Yandex', 'analytics', ('yandex.ru',)),
+    ('Hotjar', 'analytics', ('hotjar.com', 'hotjar.io')),
+    ('FullStory', 'analytics', ('fullstory.com',)),
+    ('Mouseflow', 'analytics', ('mouseflow.com',)),
+    ('Crazy Egg', 'analytics', ('crazyegg.com',)),
+    ('Segment', 'analytics', ('segment.com', 'segment.io')),
+    ('Mixpanel', 'analytics', ('mixpanel.com', 'mxpnl.com')),
+    ('Amplitude', 'analytics', ('amplitude.com',)),
+    ('Heap', 'analytics', ('heap.io', 'heapanalytics.com')),
+    ('Chartbeat', 'analytics', ('chartbeat.com', 'chartbeat.net')),
+    ('Comscore', 'analytics', ('scorecardresearch.com',)),
+    ('Quantcast', 'analytics', ('quantserve.com', 'quantcount.com')),
+    ('Adobe Experience Cloud', 'analytics', ('omtrdc.net', 'demdex.net', 'adobedtm.com', 'everesttech.net')),
+    ('Adobe Fonts', 'cdn', ('typekit.net', 'typekit.com')),
+    ('Criteo', 'ad', ('criteo.com', 'criteo.net')),
+    ('Taboola', 'ad', ('taboola.com',)),
+    ('Outbrain', 'ad', ('outbrain.com', 'outbrainimg.com')),
+    ('Xandr', 'ad', ('adnxs.com',)),
+    ('Magnite', 'ad', ('rubiconproject.com',)),
+    ('PubMatic', 'ad', ('pubmatic.com',)),
+    ('OpenX', 'ad', ('openx.net',)),
+    ('Index Exchange', 'ad', ('casalemedia.com',)),
+    ('Amazon Ads', 'ad', ('amazon-adsystem.com',)),
+    ('Moat', 'ad', ('moatads.com',)),
+    ('HubSpot', 'marketing', ('hubspot.com', 'hs-scripts.com', 'hs-analytics.net', 'hsforms.net',
+                              'hs-banner.com', 'hscollectedforms.net', 'hubspotusercontent-na1.net')),
+    ('Marketo', 'marketing', ('marketo.net', 'marketo.com', 'mktoresp.com')),
+    ('Mailchimp', 'marketing', ('list-manage.com', 'chimpstatic.com')),
+    ('Klaviyo', 'marketing', ('klaviyo.com',)),
+    ('Optimizely', 'ab-testing', ('optimizely.com',)),
+    ('VWO', 'ab-testing', ('visualwebsiteoptimizer.com', 'wingify.com')),
+    ('Intercom', 'customer-success', ('intercom.io', 'intercomcdn.com', 'intercomassets.com')),
+    ('Drift', 'customer-success', ('drift.com', 'driftt.com')),
+    ('Zendesk', 'customer-success', ('zendesk.com', 'zdassets.com', 'zopim.com')),
+    ('LiveChat', 'customer-success', ('livechatinc.com',)),
+    ('Tawk.to', 'customer-success', ('tawk.to',)),
+    ('Crisp', 'customer-success', ('crisp.chat',)),
+    ('OneTrust', 'consent-provider', ('onetrust.com', 'cookielaw.org')),
+    ('Cookiebot', 'consent-provider', ('cookiebot.com',)),
+    ('TrustArc', 'consent-provider', ('trustarc.com',)),
+    ('Stripe', 'utility', ('stripe.com', 'stripe.network')),
+    ('PayPal', 'utility', ('paypal.com', 'paypalobjects.com')),
+    ('reCAPTCHA', 'utility', ('recaptcha.net',)),
+    ('Cloudflare', 'cdn', ('cloudflare.com', 'cloudflareinsights.com')),
+    ('jsDelivr', 'cdn', ('jsdelivr.net',)),
+    ('unpkg', 'cdn', ('unpkg.com',)),
+    ('jQuery CDN', 'cdn', ('jquery.com',)),
+    ('Font Awesome', 'cdn', ('fontawesome.com',)),
+    ('Amazon CloudFront', 'cdn', ('cloudfront.net',)),
+    ('Akamai', 'cdn', ('akamaihd.net', 'akamaized.net', 'akamai.net')),
+    ('Fastly', 'cdn', ('fastly.net',)),
+    ('Vimeo', 'video', ('vimeo.com', 'vimeocdn.com')),
+    ('Wistia', 'video', ('wistia.com', 'wistia.net')),
+    ('New Relic', 'utility', ('newrelic.com', 'nr-data.net')),
+    ('Sentry', 'utility', ('sentry.io', 'sentry-cdn.com')),
+    ('Datadog', 'utility', ('datadoghq.com', 'datadoghq-browser-agent.com', 'browser-intake-datadoghq.com')),
+    ('Shopify', 'hosting', ('shopify.com', 'shopifycdn.com', 'shopifycloud.com')),
+    ('Wix', 'hosting', ('wix.com', 'wixstatic.com', 'parastorage.com')),
+    ('Squarespace', 'hosting', ('squarespace.com', 'squarespace-cdn.com', 'sqspcdn.com')),
+)
+
+
+class SuffixTrie:
+    """Public suffix rules in a trie keyed by label, right to left.
+
+    Finding a host's registrable domain walks one node per label, so the
+    cost doesn't depend on the ~10k rules in the list. '*' children are
+    wildcard rules; exception rules ('!') end the suffix one label early.
+    """
+
+    def __init__(self, rules=()):
+        self._root = {}
+        for rule in rules:
+            self.add(rule)
+
+    @classmethod
+    def from_file(cls, path):
+        trie = cls()
+        with open(path, encoding='utf-8') as f:
+            for line in f:
+                rule = line.strip()
+                if rule and not rule.startswith('//'):
+                    trie.add(rule)
+        return trie
+
+    def add(self, rule):
+        exception = rule.startswith('!')
+        rule = rule.lstrip('!')
+        try:
+            # Browsers report hosts in punycode; the list is written in Unicode
+            rule = '.'.join(label if label == '*' else label.encode('idna').decode('ascii')
+                            for label in rule.split('.'))
+        except UnicodeError:
+            pass
+        node = self._root
+        for label in reversed(rule.lower().split('.')):
+            node = node.setdefault(label, {})
+        node['!' if exception else '$'] = True
+
+    def suffix_labels(self, labels):
+        """How many trailing labels of labels (host.split('.')) form its public suffix"""
+        # Hosts on no listed suffix fall back to the implicit '*' rule: their TLD
+        matched = 1
+        nodes = [self._root]
+        for depth, label in enumerate(reversed(labels), 1):
+            next_nodes = []
+            for node in nodes:
+                for key in (label, '*'):
+                    child = node.get(key)
+                    if child is None:
+                        continue
+                    if '!' in child:
+                        return depth - 1
+                    if '$' in child:
+                        matched = max(matched, depth)
+                    next_nodes.append(child)
+            if not next_nodes:
+                break
+            nodes = next_nodes
+        return matched
+
+    def registrable_domain(self, host):
+        """The public suffix plus one label (eTLD+1); IPs and bare suffixes come back as they are"""
+        host = (host or '').lower().rstrip('.')
+        if not host or _is_ip(host):
+            return host
+        labels = host.split('.')
+        count = self.suffix_labels(labels)
+        if len(labels) <= count:
+            return host
+        return '.'.join(labels[-count - 1:])
+
+
+def _is_ip(host):
+    try:
+        ipaddress.ip_address(host.strip('[]'))
+    except ValueError:
+        return False
+    return True
+
+
+_trie = None
+_trie_lock = threading.Lock()
+
+
+def get_suffix_trie():
+    """The bundled public suffix list, parsed once per process"""
+    global _trie
+    if _trie is None:
+        with _trie_lock:
+            if _trie is None:
+                _trie = SuffixTrie.from_file(PSL_PATH)
+    return _trie
+
+
+_entity_by_domain = {domain: {'name': name, 'category': category}
+                     for name, category, domains in ENTITIES for domain in domains}
+
+
+def entity_of(domain):
+    """Known provider owning a registrable domain, or None.
+
+    Some providers' domains are public suffixes themselves (cloudfront.net,
+    googleapis.com), so their customers' subdomains are looked up one level up.
+    """
+    entity = _entity_by_domain.get(domain)
+    if entity is None and '.' in domain:
+        entity = _entity_by_domain.get(domain.split('.', 1)[1])
+    return entity
+
+
+def summarize_third_parties(page_url, network, script_timing=None):
+    """Requests, transfer bytes and main-thread time per third-party registrable domain.
+
+    network is the NetworkRecorder summary; script_timing the collector's
+    per-script main-thread totals from Long Animation Frames, which only
+    cover work inside frames over 50ms - the work that blocks. Domains
+    belonging to the page's own entity count as first party.
+    """
+    trie = get_suffix_trie()
+    domains = {}
+    page_host = urlparse(page_url).hostname or ''
+    first_party = trie.registrable_domain(page_host)
+    first_entity = entity_of(first_party)
+    known = {}
+
+    def bucket(url):
+        host = urlparse(url).hostname
+        if not host:
+            return None
+        domain = known.get(host)
+        if domain is None:
+            domain = known[host] = trie.registrable_domain(host)
+            entity = entity_of(domain)
+            if domain != first_party and (first_entity is None or entity != first_entity):
+                domains.setdefault(domain, {
+                    'domain': domain,
+                    'entity': entity['name'] if entity else None,
+                    'category': entity['category'] if entity else None,
+                    'requests': 0, 'transferBytes': 0, 'scriptMs': 0, 'blockingMs': 0
+                })
+        return domains.get(domain)
+
+    for request in (network or {}).get('requests') or ():
+        entry = bucket(request['url'])
+        if entry is not None:
+            entry['requests'] += 1
+            entry['transferBytes'] += request['transferBytes']
+    timing = script_timing or {}
+    for url, script_ms, blocking_ms in timing.get('scripts') or ():
+        entry = bucket(url)
+        if entry is not None:
+            entry['scriptMs'] += script_ms
+            entry['blockingMs'] += blocking_ms
+
+    entries = sorted(domains.values(), key=lambda entry: (entry['blockingMs'], entry['transferBytes']), reverse=True)
+    entities = {}
+    for entry in entries:
+        name = entry['entity'] or entry['domain']
+        group = entities.setdefault(name, {'name': name, 'category': entry['category'], 'domains': [],
+                                           'requests': 0, 'transferBytes': 0, 'scriptMs': 0, 'blockingMs': 0})
+        group['domains'].append(entry['domain'])
+        for key in ('requests', 'transferBytes', 'scriptMs', 'blockingMs'):
+            group[key] += entry[key]
+    supported = bool(timing.get('supported'))
+    return {
+        'firstParty': first_party,
+        'scriptTiming': 'long-animation-frame' if supported else None,
+        'requests': sum(entry['requests'] for entry in entries),
+        'transferBytes': sum(entry['transferBytes'] for entry in entries),
+        'scriptMs': sum(entry['scriptMs'] for entry in entries) if supported else None,
+        'blockingMs': sum(entry['blockingMs'] for entry in entries) if supported else None,
+        'entities': sorted(entities.values(), key=lambda group: (group['blockingMs'], group['transferBytes']),
+                           reverse=True),
+        'domains': entries,
+        'totals': {'domains': len(entries), 'entities': len(entities)}
+    }
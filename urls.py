@@ -0,0 +1,39 @@
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
+
+DEFAULT_PORTS = {'http': 80, 'https': 443}
+
+
+def normalize_url(url):
+    """Canonical form of a URL so equivalent spellings share cache entries, crawl slots, etc.
+
+    Lowercases scheme and host, drops default ports, fragments and empty
+    queries, sorts query parameters and gives bare hosts a '/' path.
+    Raises ValueError for a malformed port.
+    """
+    parts = urlsplit(url.strip())
+    scheme = parts.scheme.lower()
+    host = _host_port(parts, scheme)
+    if parts.username:
+        userinfo = parts.username + (f':{parts.password}' if parts.password else '')
+        host = f'{userinfo}@{host}'
+    path = parts.path or '/'
+    query = urlencode(sorted(parse_qsl(parts.query, keep_blank_values=True)))
+    return urlunsplit((scheme, host, path, query, ''))
+
+
+def origin_of(url):
+    """scheme://host[:port] of a URL, with default ports dropped"""
+    parts = urlsplit(url)
+    scheme = parts.scheme.lower()
+    return f'{scheme}://{_host_port(parts, scheme)}'
+
+
+def _host_port(parts, scheme):
+    """Lowercased host, bracketed if IPv6, plus the port unless it is the scheme's default"""
+    host = (parts.hostname or '').lower()
+    if ':' in host:
+        host = f'[{host}]'
+    port = parts.port
+    if port and port != DEFAULT_PORTS.get(scheme):
+        host = f'{host}:{port}'
+    return host